@@ -11,6 +11,9 @@ type AssetWithRelations = Asset & {
   flight?: { uuid: string; name: string; description: string | null } | null;
 }
 
+// Thumbnail size (longest edge, px) served in thumbnail_url; written by workstreams/thumbnails.py
+const THUMBNAIL_SIZE = 256;
+
 // Accepted MIME types for upload
 const ACCEPTED_MIME_TYPES = new Set([
     // Images
@@ -141,14 +144,16 @@ export const assetController = {
             // Update presigned URL if needed
             const s3Client = S3Client.getInstance();
             const updatedDownloadUrl = s3Client.getDownloadUrl(asset.stored_path);
+            const updatedThumbnailUrl = generateThumbnailUrl(asset.stored_path, asset.file_type);
             
-            // Update the download URL in the database if it has changed
-            if (updatedDownloadUrl !== asset.download_url) {
+            // Update the download and thumbnail URLs in the database if they have changed
+            if (updatedDownloadUrl !== asset.download_url || updatedThumbnailUrl !== asset.thumbnail_url) {
                 await prisma.asset.update({
                     where: { uuid: assetId },
-                    data: { download_url: updatedDownloadUrl }
+                    data: { download_url: updatedDownloadUrl, thumbnail_url: updatedThumbnailUrl }
                 });
                 asset.download_url = updatedDownloadUrl;
+                asset.thumbnail_url = updatedThumbnailUrl;
             }
 
             return asset;
@@ -198,14 +203,16 @@ export const assetController = {
             for (const asset of assets) {
                 // Update the download URL
                 const updatedDownloadUrl = s3Client.getDownloadUrl(asset.stored_path);
+                const updatedThumbnailUrl = generateThumbnailUrl(asset.stored_path, asset.file_type);
                 
                 // Update in database if changed
-                if (updatedDownloadUrl !== asset.download_url) {
+                if (updatedDownloadUrl !== asset.download_url || updatedThumbnailUrl !== asset.thumbnail_url) {
                     await prisma.asset.update({
                         where: { uuid: asset.uuid },
-                        data: { download_url: updatedDownloadUrl }
+                        data: { download_url: updatedDownloadUrl, thumbnail_url: updatedThumbnailUrl }
                     });
                     asset.download_url = updatedDownloadUrl;
+                    asset.thumbnail_url = updatedThumbnailUrl;
                 }
             }
 
@@ -451,15 +458,36 @@ function getFileExtension(filename: string): string {
     return ext ? `.${ext}` : '';
 }
 
+/**
+ * Helper function to derive the thumbnail key for an asset
+ *
+ * Mirrors `thumbnail_key` in workstreams/thumbnails.py: the asset at
+ * `assets/{owner}/{uuid}.{ext}` has its thumbnails at `thumbnails/{owner}/{uuid}/{size}.jpg`.
+ */
+function thumbnailPath(path: string, size: number = THUMBNAIL_SIZE): string | null {
+    if (!path.startsWith('assets/')) {
+        return null;
+    }
+    const relative = path.substring('assets/'.length);
+    const dot = relative.lastIndexOf('.');
+    const stem = dot > relative.lastIndexOf('/') ? relative.substring(0, dot) : relative;
+    return `thumbnails/${stem}/${size}.jpg`;
+}
+
 /**
  * Helper function to generate thumbnail URL based on asset type and path
- * Implementation depends on your requirements
+ *
+ * Points at the thumbnail written by the asset-thumbnails workstream rather than the full image.
  */
 function generateThumbnailUrl(path: string, fileType: string): string | null {
-    // For image files, generate a pre-signed URL for direct access
+    // For image files, generate a pre-signed URL for the derived thumbnail
     if (fileType.startsWith('image/')) {
+        const thumbnail = thumbnailPath(path);
+        if (!thumbnail) {
+            return null;
+        }
         const s3Client = S3Client.getInstance();
-        return s3Client.getDownloadUrl(path);
+        return s3Client.getDownloadUrl(thumbnail);
     }
     return null;
-} 
\ No newline at end of file
+}
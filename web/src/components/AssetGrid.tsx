@@ -258,7 +258,7 @@ export function AssetGrid({ assets, onView, onDownload, onDelete }: AssetGridPro
               height={180}
               alt={asset.name}
               fit="cover"
-              fallbackSrc="https://placehold.co/600x400?text=No+Preview"
+              fallbackSrc={asset.download_url || "https://placehold.co/600x400?text=No+Preview"}
             />
           ) : (
             <Paper 
@@ -386,7 +386,7 @@ export function AssetGrid({ assets, onView, onDownload, onDelete }: AssetGridPro
                 radius="md"
                 alt={asset.name}
                 fit="cover"
-                fallbackSrc="https://placehold.co/60x60?text=No+Preview"
+                fallbackSrc={asset.download_url || "https://placehold.co/60x60?text=No+Preview"}
               />
             ) : (
               <Center 
@@ -666,7 +666,7 @@ export function AssetGrid({ assets, onView, onDownload, onDelete }: AssetGridPro
         {previewAsset && (
           <Stack gap="md">
             <Image
-              src={previewAsset.thumbnail_url || ''}
+              src={previewAsset.download_url || previewAsset.thumbnail_url || ''}
               alt={previewAsset.name}
               fit="contain"
               style={{ maxHeight: '70vh' }}
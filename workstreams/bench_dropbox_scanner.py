@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Benchmark the dropbox scanners against a synthetic bucket and a mock asset API.
+
+The scanners normally need MinIO and the API on localhost:4151. Here the bucket is an
+in-memory stand-in seeded with ``--keys`` objects spread over ``--users`` user folders,
+served to both the boto3-style (sync) and the AsyncS3Storage-style (async) code paths,
+and ``/assets/create-from-existing`` is a local HTTP server with configurable latency
+and error rate. Each target is run unchanged against them:
+
+    create-assets   create_assets_from_dropbox.main (async listing and creation)
+    test-script     test_dropbox_asset_creation.main (sync listing, async creation)
+    scanner         dropbox_scanner.scan_dropbox (the Prefect flow, needs a Prefect server)
+
+Reported per target: keys/sec listed, assets/sec created, API errors, files whose request
+was never answered (client-side timeouts), and peak Python memory (tracemalloc) and
+process RSS. With ``--skew``, a share of the keys goes to the first user folder, and the
+mean latency of the other users' files (queued until created, from the fair scheduler's
+skystore_tenant_latency_seconds) shows whether small uploads stay fast behind a large one.
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import logging
+import multiprocessing
+import random
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger("bench_dropbox_scanner")
+
+PAGE_SIZE = 1000
+TARGETS = ("create-assets", "test-script", "scanner")
+
+
+class InMemoryBucket:
+    """Sorted key list answering list_objects_v2 the way S3 does: 1000 keys per page, in key order."""
+
+    def __init__(self, keys: List[str], size: int = 4 * 1024 * 1024):
+        self.keys = sorted(keys)
+        self.size = size
+        self.last_modified = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        self.keys_listed = 0
+        self._lock = threading.Lock()
+
+    def _entry(self, key: str) -> Dict[str, Any]:
+        return {'Key': key, 'Size': self.size, 'LastModified': self.last_modified, 'ETag': '"bench"'}
+
+    def pages(self, prefix: str = "", delimiter: str = "") -> Iterator[Dict[str, Any]]:
+        """Yield list_objects_v2 response pages."""
+        index = bisect.bisect_left(self.keys, prefix)
+        while True:
+            contents, prefixes = [], []
+            while index < len(self.keys) and len(contents) + len(prefixes) < PAGE_SIZE:
+                key = self.keys[index]
+                if not key.startswith(prefix):
+                    index = len(self.keys)
+                    break
+                cut = key.find(delimiter, len(prefix)) if delimiter else -1
+                if cut >= 0:
+                    common = key[:cut + 1]
+                    prefixes.append({'Prefix': common})
+                    # Skip the rest of the folder, as S3 does for common prefixes
+                    index = bisect.bisect_left(self.keys, common[:-1] + chr(ord(delimiter) + 1))
+                else:
+                    contents.append(self._entry(key))
+                    index += 1
+            with self._lock:
+                self.keys_listed += len(contents)
+            truncated = index < len(self.keys) and self.keys[index].startswith(prefix)
+            page = {'KeyCount': len(contents) + len(prefixes), 'IsTruncated': truncated}
+            if contents:
+                page['Contents'] = contents
+            if prefixes:
+                page['CommonPrefixes'] = prefixes
+            yield page
+            if not truncated:
+                return
+
+
+class SyncS3StandIn:
+    """The parts of a boto3 S3 client the scanners use."""
+
+    def __init__(self, bucket: InMemoryBucket):
+        self.bucket = bucket
+
+    def head_bucket(self, Bucket: str) -> Dict[str, Any]:
+        return {}
+
+    def get_paginator(self, operation: str):
+        bucket = self.bucket
+
+        class Paginator:
+            def paginate(self, Bucket: str, Prefix: str = "", Delimiter: str = "", **kwargs):
+                return bucket.pages(Prefix, Delimiter)
+
+        return Paginator()
+
+
+class AsyncS3StandIn:
+    """The parts of storage_async.AsyncS3Storage the scanners use; accepts its constructor arguments."""
+
+    bucket: Optional[InMemoryBucket] = None
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    async def __aenter__(self) -> "AsyncS3StandIn":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+    async def head_bucket(self, bucket: str) -> Dict[str, Any]:
+        return {}
+
+    async def list_objects(self, bucket: str, prefix: str = ""):
+        for page in self.bucket.pages(prefix):
+            for obj in page.get('Contents', []):
+                yield obj
+            # A real listing awaits the network between pages
+            await asyncio.sleep(0)
+
+    async def list_level(self, bucket: str, prefix: str = "", delimiter: str = "/") -> Tuple[List[str], List[Dict[str, Any]]]:
+        prefixes, objects = [], []
+        for page in self.bucket.pages(prefix, delimiter):
+            prefixes.extend(p['Prefix'] for p in page.get('CommonPrefixes', []))
+            objects.extend(page.get('Contents', []))
+            await asyncio.sleep(0)
+        return prefixes, objects
+
+
+def _serve_asset_api(port_pipe, latency: float, jitter: float, error_rate: float, seed: int, created, failed):
+    """Body of the mock API process: a threaded HTTP server until the process is terminated."""
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body are separate writes; with Nagle on, each response waits
+        # for the client's delayed ACK (~40 ms)
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            with lock:
+                delay = max(0.0, latency + rng.uniform(-jitter, jitter))
+                fail = rng.random() < error_rate
+            time.sleep(delay)
+            if self.path != '/assets/create-from-existing':
+                status, payload = 404, {'error': 'not found'}
+            elif fail:
+                status, payload = 500, {'error': 'injected failure'}
+            else:
+                stored_path = json.loads(body).get('stored_path')
+                status, payload = 200, {'data': {'uuid': f"asset-{hash(stored_path) & 0xffffffff:08x}"}}
+            counter = created if status == 200 else failed
+            with counter.get_lock():
+                counter.value += 1
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        # Read by listen() in the constructor; the default backlog of 5 drops bursts
+        # of concurrent connections
+        request_queue_size = 1024
+
+    server = Server(('127.0.0.1', 0), Handler)
+    port_pipe.send(server.server_address[1])
+    port_pipe.close()
+    server.serve_forever()
+
+
+class MockAssetAPI:
+    """
+    Local /assets/create-from-existing endpoint with configurable latency and error rate.
+
+    The server runs in its own process so that its handler threads do not compete for the
+    GIL with the scanner being measured.
+    """
+
+    def __init__(self, latency_ms: float = 5.0, jitter_ms: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.seed = seed
+        self._created = multiprocessing.Value('q', 0)
+        self._failed = multiprocessing.Value('q', 0)
+        self._process = None
+        self._port = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._port}"
+
+    @property
+    def created(self) -> int:
+        return self._created.value
+
+    @property
+    def failed(self) -> int:
+        return self._failed.value
+
+    def reset(self):
+        self._created.value = 0
+        self._failed.value = 0
+
+    def start(self) -> "MockAssetAPI":
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        self._process = multiprocessing.Process(
+            target=_serve_asset_api,
+            args=(sender, self.latency, self.jitter, self.error_rate, self.seed, self._created, self._failed),
+            name="mock-asset-api",
+            daemon=True
+        )
+        self._process.start()
+        sender.close()
+        self._port = receiver.recv()
+        return self
+
+    def stop(self):
+        self._process.terminate()
+        self._process.join()
+
+
+def synthetic_keys(num_keys: int, num_users: int, keep_markers: bool = True, skew: float = 0.0) -> List[str]:
+    """
+    Image keys spread over user folders, plus the .keep marker of each folder.
+
+    A share ``skew`` of the keys goes to the first folder, as one user's large upload; the
+    rest is spread evenly over all folders.
+    """
+    heavy = int(num_keys * skew)
+    keys = [f"dropbox/user-{0:06d}/BULK_{i:07d}.JPG" for i in range(heavy)]
+    keys += [f"dropbox/user-{i % num_users:06d}/IMG_{i // num_users:07d}.JPG" for i in range(num_keys - heavy)]
+    if keep_markers:
+        keys.extend(f"dropbox/user-{u:06d}/.keep" for u in range(num_users))
+    return keys
+
+
+def _run_target(target: str, bucket: InMemoryBucket, api_url: str):
+    """Point a scanner module at the stand-ins and run it."""
+    AsyncS3StandIn.bucket = bucket
+    sync_client = SyncS3StandIn(bucket)
+
+    if target == "create-assets":
+        import create_assets_from_dropbox as module
+        module.AsyncS3Storage = AsyncS3StandIn
+        module.API_CONFIG['url'] = api_url
+        asyncio.run(module.main())
+    elif target == "test-script":
+        import test_dropbox_asset_creation as module
+        module.get_s3_client = lambda *args, **kwargs: sync_client
+        module.API_CONFIG['url'] = api_url
+        asyncio.run(module.main())
+    elif target == "scanner":
+        import dropbox_scanner as module
+        module.AsyncS3Storage = AsyncS3StandIn
+        module.get_s3_client = lambda *args, **kwargs: sync_client
+        module.API_CONFIG['url'] = api_url
+        module.scan_dropbox()
+    else:
+        raise ValueError(f"Unknown target '{target}'. Available: {', '.join(TARGETS)}")
+
+
+def _other_tenant_latency() -> Tuple[float, float]:
+    """Summed latency and count of dropbox files of every user folder but the first."""
+    from metrics import REGISTRY
+    total, count = 0.0, 0.0
+    for metric in REGISTRY.collect():
+        if metric.name != "skystore_tenant_latency_seconds":
+            continue
+        for sample in metric.samples:
+            if sample.labels.get("workstream") != "dropbox" or sample.labels.get("tenant") == f"user-{0:06d}":
+                continue
+            if sample.name.endswith("_sum"):
+                total += sample.value
+            elif sample.name.endswith("_count"):
+                count += sample.value
+    return total, count
+
+
+def run_benchmark(target: str, bucket: InMemoryBucket, api: MockAssetAPI, num_files: int,
+                  trace_memory: bool = True) -> Dict[str, Any]:
+    """Run one target and collect its throughput, memory and the latency of small tenants."""
+    latency_before = _other_tenant_latency()
+    bucket.keys_listed = 0
+    api.reset()
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        _run_target(target, bucket, api.url)
+    finally:
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+    latency_after = _other_tenant_latency()
+    latency_count = latency_after[1] - latency_before[1]
+    return {
+        'target': target,
+        'seconds': elapsed,
+        'keys_listed': bucket.keys_listed,
+        'keys_per_sec': bucket.keys_listed / elapsed if elapsed > 0 else 0.0,
+        'assets_created': api.created,
+        'assets_per_sec': api.created / elapsed if elapsed > 0 else 0.0,
+        'api_errors': api.failed,
+        # Files whose request never got an answer, e.g. client-side timeouts
+        'unserved': num_files - api.created - api.failed,
+        'peak_mb': peak / 1e6 if peak is not None else None,
+        # ru_maxrss is in KB on Linux; it only grows, so it is the peak of the whole process so far
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        # Only targets that go through the fair scheduler record tenant latency
+        'other_latency_ms': (latency_after[0] - latency_before[0]) / latency_count * 1000 if latency_count else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark dropbox scanning against a synthetic bucket and mock API')
+    parser.add_argument('--keys', type=int, nargs='+', default=[1000, 10000], help='Object counts to benchmark')
+    parser.add_argument('--users', type=int, default=10, help='Number of dropbox user folders')
+    parser.add_argument('--skew', type=float, default=0.0,
+                        help='Share of the keys uploaded by the first user folder, e.g. 0.9')
+    parser.add_argument('--targets', nargs='+', default=['create-assets', 'test-script'], choices=TARGETS,
+                        help='Scanners to run')
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='Mock API latency per request')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='Uniform jitter added to the latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of API requests that fail with 500')
+    parser.add_argument('--no-tracemalloc', action='store_true', help='Skip tracemalloc, which slows Python down')
+    parser.add_argument('--show-logs', action='store_true', help='Keep the scanners\' per-file log output')
+    args = parser.parse_args()
+
+    if not args.show_logs:
+        # Records are still created, so logging cost is measured, but not written to the terminal
+        logging.getLogger().handlers = [logging.NullHandler()]
+
+    api = MockAssetAPI(args.latency_ms, args.jitter_ms, args.error_rate).start()
+    rows = []
+    try:
+        for num_keys in args.keys:
+            bucket = InMemoryBucket(synthetic_keys(num_keys, args.users, skew=args.skew))
+            for target in args.targets:
+                logger.info(f"Running {target} on {num_keys} keys in {args.users} user folders")
+                rows.append(dict(run_benchmark(target, bucket, api, num_keys, not args.no_tracemalloc), keys=num_keys))
+    finally:
+        api.stop()
+
+    print(f"\n{'target':<14} {'keys':>9} {'seconds':>8} {'keys/sec':>10} {'assets/sec':>10} "
+          f"{'errors':>7} {'unserved':>8} {'peak MB':>8} {'RSS MB':>8} {'others ms':>9}")
+    for row in rows:
+        peak = f"{row['peak_mb']:.1f}" if row['peak_mb'] is not None else "-"
+        others = f"{row['other_latency_ms']:.0f}" if row['other_latency_ms'] is not None else "-"
+        print(f"{row['target']:<14} {row['keys']:>9} {row['seconds']:>8.2f} {row['keys_per_sec']:>10.0f} "
+              f"{row['assets_per_sec']:>10.1f} {row['api_errors']:>7} {row['unserved']:>8} {peak:>8} {row['max_rss_mb']:>8.1f} {others:>9}")
+
+
+if __name__ == "__main__":
+    main()
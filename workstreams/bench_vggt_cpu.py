@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark VGGT inference throughput (images/sec) for each execution profile.
+
+Each profile runs in its own subprocess, since thread pools can only be sized once per
+process and torch.compile caches would otherwise leak between profiles.
+"""
+import argparse
+import json
+import logging
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger("bench_vggt_cpu")
+
+
+def find_images(image_dir: str, num_images: int):
+    """Return up to num_images image paths from a directory, sorted by name."""
+    image_files = []
+    for ext in ['*.jpg', '*.jpeg', '*.png', '*.tif', '*.tiff']:
+        image_files.extend(Path(image_dir).glob(ext))
+        image_files.extend(Path(image_dir).glob(ext.upper()))
+    return [str(p) for p in sorted(set(image_files))[:num_images]]
+
+
+def run_profile(profile: str, image_paths, device: str, warmup: int, repeats: int) -> dict:
+    """Load the model with one profile and time full forward passes over the images."""
+    from vggt_s3_task import (
+        load_vggt_model, preprocess_images, run_vggt_aggregator,
+        predict_cameras, predict_depth_maps, predict_point_maps
+    )
+
+    start = time.perf_counter()
+    model = load_vggt_model.fn(device, profile)
+    load_seconds = time.perf_counter() - start
+    images = preprocess_images.fn(image_paths)
+
+    def forward():
+        images_batch, tokens, ps_idx = run_vggt_aggregator.fn(model, images=images)
+        predict_cameras.fn(model, tokens, images_batch)
+        predict_depth_maps.fn(model, tokens, images_batch, ps_idx)
+        predict_point_maps.fn(model, tokens, images_batch, ps_idx)
+
+    # Warmup also absorbs torch.compile's first-call compilation
+    start = time.perf_counter()
+    for _ in range(warmup):
+        forward()
+    warmup_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        forward()
+    elapsed = time.perf_counter() - start
+
+    return {
+        'profile': profile,
+        'images': len(image_paths),
+        'repeats': repeats,
+        'load_seconds': load_seconds,
+        'warmup_seconds': warmup_seconds,
+        'seconds_per_pass': elapsed / repeats,
+        'images_per_sec': len(image_paths) * repeats / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark VGGT execution profiles')
+    parser.add_argument('image_dir', help='Directory containing benchmark images')
+    parser.add_argument('--profiles', nargs='+', default=['default', 'cpu-fp32', 'cpu-bf16', 'cpu-bf16-compile'],
+                        help='Execution profiles to compare')
+    parser.add_argument('--num-images', type=int, default=8, help='Number of images per forward pass')
+    parser.add_argument('--device', default='cpu', help='Device to benchmark on')
+    parser.add_argument('--warmup', type=int, default=1, help='Untimed passes before measuring')
+    parser.add_argument('--repeats', type=int, default=3, help='Timed passes per profile')
+    parser.add_argument('--single-profile', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    image_paths = find_images(args.image_dir, args.num_images)
+    if not image_paths:
+        logger.error(f"No image files found in '{args.image_dir}'.")
+        sys.exit(1)
+
+    if args.single_profile:
+        result = run_profile(args.single_profile, image_paths, args.device, args.warmup, args.repeats)
+        print("RESULT " + json.dumps(result))
+        return
+
+    results = []
+    for profile in args.profiles:
+        logger.info(f"Benchmarking profile '{profile}' on {len(image_paths)} images")
+        proc = subprocess.run(
+            [sys.executable, __file__, args.image_dir,
+             '--single-profile', profile,
+             '--num-images', str(args.num_images),
+             '--device', args.device,
+             '--warmup', str(args.warmup),
+             '--repeats', str(args.repeats)],
+            capture_output=True, text=True
+        )
+        lines = [line for line in proc.stdout.splitlines() if line.startswith("RESULT ")]
+        if proc.returncode != 0 or not lines:
+            logger.error(f"Profile '{profile}' failed:\n{proc.stderr[-2000:]}")
+            continue
+        results.append(json.loads(lines[-1][len("RESULT "):]))
+
+    print(f"\n{'profile':<20} {'images/sec':>10} {'s/pass':>8} {'load s':>8} {'warmup s':>9}")
+    for r in results:
+        print(f"{r['profile']:<20} {r['images_per_sec']:>10.3f} {r['seconds_per_pass']:>8.2f} "
+              f"{r['load_seconds']:>8.2f} {r['warmup_seconds']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark VGGT image preprocessing: VGGT's serial loader against the process pool.
+
+Also checks that the parallel output matches the serial one, so a speedup never comes from
+preprocessing the images differently.
+"""
+import argparse
+import logging
+import sys
+import time
+
+from bench_vggt_cpu import find_images
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger("bench_vggt_preprocess")
+
+
+def time_runs(fn, repeats: int):
+    """Call fn repeats times and return the last output and the mean seconds per call."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        output = fn()
+    return output, (time.perf_counter() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark serial vs. process-pool VGGT preprocessing')
+    parser.add_argument('image_dir', help='Directory containing benchmark images')
+    parser.add_argument('--num-images', type=int, default=64, help='Number of images per batch')
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 4, 8], help='Worker counts to compare')
+    parser.add_argument('--repeats', type=int, default=3, help='Timed runs per configuration')
+    args = parser.parse_args()
+
+    image_paths = find_images(args.image_dir, args.num_images)
+    if not image_paths:
+        logger.error(f"No image files found in '{args.image_dir}'.")
+        sys.exit(1)
+
+    from vggt_s3_task import _require_vggt, load_and_preprocess_images
+    from vggt_preprocess import preprocess_parallel
+
+    _require_vggt()
+    logger.info(f"Preprocessing {len(image_paths)} images serially")
+    baseline, serial_seconds = time_runs(lambda: load_and_preprocess_images(image_paths), args.repeats)
+    rows = [('serial', serial_seconds, 0.0)]
+
+    for workers in args.workers:
+        logger.info(f"Preprocessing {len(image_paths)} images with {workers} workers")
+        # Untimed run so process start-up is not counted, the pool is reused across calls
+        preprocess_parallel(image_paths, workers)
+        output, seconds = time_runs(lambda: preprocess_parallel(image_paths, workers), args.repeats)
+        if output.shape != baseline.shape:
+            logger.error(f"Shape mismatch with {workers} workers: {tuple(output.shape)} vs {tuple(baseline.shape)}")
+            sys.exit(1)
+        rows.append((f'{workers} workers', seconds, (output - baseline).abs().max().item()))
+
+    print(f"\n{'mode':<12} {'images/sec':>10} {'s/batch':>8} {'speedup':>8} {'max diff':>9}")
+    for mode, seconds, diff in rows:
+        print(f"{mode:<12} {len(image_paths) / seconds:>10.2f} {seconds:>8.3f} "
+              f"{serial_seconds / seconds:>7.2f}x {diff:>9.2e}")
+
+
+if __name__ == "__main__":
+    main()
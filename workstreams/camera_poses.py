@@ -0,0 +1,282 @@
+"""
+Compact camera pose export for VGGT flights, and a fast reader for many flights.
+
+``extrinsic.pt``/``intrinsic.pt`` need torch to read and sit next to the large depth and
+point maps. For trajectory views and other pose-only tools every flight additionally gets:
+
+    {output_prefix}/poses.npz          Columnar arrays, one row per frame (see POSE_COLUMNS)
+    {output_prefix}/colmap/cameras.txt  COLMAP text model: one PINHOLE camera per frame
+    {output_prefix}/colmap/images.txt   COLMAP text model: one pose per frame
+    {output_prefix}/colmap/points3D.txt Empty, so COLMAP tools accept the model
+
+Rotations are stored as unit quaternions (w, x, y, z) and, like the extrinsics and COLMAP,
+map world to camera coordinates. ``center`` holds the camera positions in world
+coordinates so trajectories need no math on the reading side. The npz is uncompressed
+and holds no Python objects, so it loads with numpy alone and without pickle.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from io import BytesIO
+from typing import List, Dict, Optional, Sequence, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Configure logging
+logger = logging.getLogger("camera_poses")
+logger.setLevel(logging.INFO)
+
+POSES_FILE = "poses.npz"
+COLMAP_DIR = "colmap"
+POSES_VERSION = 1
+
+POSE_COLUMNS = ("frame", "name", "qvec", "tvec", "center", "fx", "fy", "cx", "cy", "width", "height")
+
+
+def rotation_to_quaternion(rotation: "np.ndarray") -> "np.ndarray":
+    """
+    Convert rotation matrices to unit quaternions (w, x, y, z) with w >= 0.
+
+    Uses Shepperd's method: every frame takes the formula built around its largest of
+    (trace, R00, R11, R22), which avoids dividing by a small number near 180 degrees.
+
+    Args:
+        rotation: Rotation matrices of shape (..., 3, 3)
+
+    Returns:
+        np.ndarray: Quaternions of shape (..., 4)
+    """
+    import numpy as np
+
+    r = np.asarray(rotation, dtype=np.float64)
+    m00, m01, m02 = r[..., 0, 0], r[..., 0, 1], r[..., 0, 2]
+    m10, m11, m12 = r[..., 1, 0], r[..., 1, 1], r[..., 1, 2]
+    m20, m21, m22 = r[..., 2, 0], r[..., 2, 1], r[..., 2, 2]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        s = np.sqrt(np.maximum(0.0, 1 + m00 + m11 + m22)) * 2
+        from_trace = np.stack((s / 4, (m21 - m12) / s, (m02 - m20) / s, (m10 - m01) / s), axis=-1)
+        s = np.sqrt(np.maximum(0.0, 1 + m00 - m11 - m22)) * 2
+        from_x = np.stack(((m21 - m12) / s, s / 4, (m01 + m10) / s, (m02 + m20) / s), axis=-1)
+        s = np.sqrt(np.maximum(0.0, 1 - m00 + m11 - m22)) * 2
+        from_y = np.stack(((m02 - m20) / s, (m01 + m10) / s, s / 4, (m12 + m21) / s), axis=-1)
+        s = np.sqrt(np.maximum(0.0, 1 - m00 - m11 + m22)) * 2
+        from_z = np.stack(((m10 - m01) / s, (m02 + m20) / s, (m12 + m21) / s, s / 4), axis=-1)
+
+    candidates = np.stack((from_trace, from_x, from_y, from_z), axis=-2)
+    choice = np.argmax(np.stack((m00 + m11 + m22, m00, m11, m22), axis=-1), axis=-1)
+    quaternion = np.take_along_axis(candidates, choice[..., None, None], axis=-2)[..., 0, :]
+    quaternion /= np.linalg.norm(quaternion, axis=-1, keepdims=True)
+    return np.where(quaternion[..., :1] < 0, -quaternion, quaternion)
+
+
+def quaternion_to_rotation(quaternion: "np.ndarray") -> "np.ndarray":
+    """Convert unit quaternions (w, x, y, z) of shape (..., 4) to rotation matrices (..., 3, 3)."""
+    import numpy as np
+
+    w, x, y, z = np.moveaxis(np.asarray(quaternion, dtype=np.float64), -1, 0)
+    return np.stack((
+        np.stack((1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)), axis=-1),
+        np.stack((2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)), axis=-1),
+        np.stack((2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)), axis=-1),
+    ), axis=-2)
+
+
+def poses_from_cameras(
+    extrinsic: "np.ndarray",
+    intrinsic: "np.ndarray",
+    image_size: Tuple[int, int],
+    names: Optional[Sequence[str]] = None
+) -> Dict[str, "np.ndarray"]:
+    """
+    Build the pose columns of a flight from VGGT's camera predictions.
+
+    Args:
+        extrinsic: World-to-camera matrices of shape (S, 3, 4)
+        intrinsic: Intrinsic matrices of shape (S, 3, 3)
+        image_size: (height, width) of the images the intrinsics refer to
+        names: Image name per frame. If None, frames are named by their index.
+
+    Returns:
+        Dict[str, np.ndarray]: One array per entry of POSE_COLUMNS
+    """
+    import numpy as np
+
+    extrinsic = np.asarray(extrinsic, dtype=np.float64).reshape(-1, 3, 4)
+    intrinsic = np.asarray(intrinsic, dtype=np.float64).reshape(-1, 3, 3)
+    num_frames = extrinsic.shape[0]
+    rotation, translation = extrinsic[:, :, :3], extrinsic[:, :, 3]
+    height, width = image_size
+    if names is None:
+        names = [f"{index:06d}" for index in range(num_frames)]
+    if len(names) != num_frames:
+        raise ValueError(f"Got {len(names)} image names for {num_frames} frames")
+
+    return {
+        "frame": np.arange(num_frames, dtype=np.int32),
+        "name": np.asarray(names, dtype=str),
+        "qvec": rotation_to_quaternion(rotation),
+        "tvec": translation,
+        # Camera position in world coordinates: -R^T t
+        "center": -np.einsum("sji,sj->si", rotation, translation),
+        "fx": intrinsic[:, 0, 0],
+        "fy": intrinsic[:, 1, 1],
+        "cx": intrinsic[:, 0, 2],
+        "cy": intrinsic[:, 1, 2],
+        "width": np.full(num_frames, width, dtype=np.int32),
+        "height": np.full(num_frames, height, dtype=np.int32),
+    }
+
+
+def to_colmap_text(poses: Dict[str, "np.ndarray"]) -> Dict[str, str]:
+    """
+    Render pose columns as a COLMAP text model.
+
+    Args:
+        poses: Pose columns from poses_from_cameras
+
+    Returns:
+        Dict[str, str]: Contents of cameras.txt, images.txt and points3D.txt
+    """
+    num_frames = len(poses["frame"])
+    cameras = ["# Camera list with one line of data per camera:",
+               "#   CAMERA_ID, MODEL, WIDTH, HEIGHT, PARAMS[]",
+               f"# Number of cameras: {num_frames}"]
+    images = ["# Image list with two lines of data per image:",
+              "#   IMAGE_ID, QW, QX, QY, QZ, TX, TY, TZ, CAMERA_ID, NAME",
+              "#   POINTS2D[] as (X, Y, POINT3D_ID)",
+              f"# Number of images: {num_frames}, mean observations per image: 0"]
+    for index in range(num_frames):
+        # COLMAP ids start at 1; every frame has its own camera since VGGT predicts per-frame intrinsics
+        image_id = index + 1
+        cameras.append(f"{image_id} PINHOLE {poses['width'][index]} {poses['height'][index]} "
+                       f"{poses['fx'][index]:.6f} {poses['fy'][index]:.6f} "
+                       f"{poses['cx'][index]:.6f} {poses['cy'][index]:.6f}")
+        qvec = " ".join(f"{value:.9f}" for value in poses["qvec"][index])
+        tvec = " ".join(f"{value:.9f}" for value in poses["tvec"][index])
+        images.append(f"{image_id} {qvec} {tvec} {image_id} {poses['name'][index]}")
+        images.append("")
+    points = ["# 3D point list with one line of data per point:",
+              "#   POINT3D_ID, X, Y, Z, R, G, B, ERROR, TRACK[] as (IMAGE_ID, POINT2D_IDX)",
+              "# Number of points: 0, mean track length: 0"]
+    return {
+        "cameras.txt": "\n".join(cameras) + "\n",
+        "images.txt": "\n".join(images) + "\n",
+        "points3D.txt": "\n".join(points) + "\n",
+    }
+
+
+def write_poses(s3_client, bucket_name: str, output_prefix: str, poses: Dict[str, "np.ndarray"]) -> str:
+    """
+    Write poses.npz and the COLMAP text model of a flight.
+
+    Args:
+        s3_client: Configured S3 client
+        bucket_name: S3 bucket name
+        output_prefix: Prefix of the flight's VGGT results
+        poses: Pose columns from poses_from_cameras
+
+    Returns:
+        str: S3 path of poses.npz
+    """
+    import numpy as np
+
+    buffer = BytesIO()
+    np.savez(buffer, version=np.int32(POSES_VERSION), **poses)
+    poses_path = f"{output_prefix}/{POSES_FILE}"
+    s3_client.put_object(Bucket=bucket_name, Key=poses_path, Body=buffer.getvalue())
+    for file_name, text in to_colmap_text(poses).items():
+        s3_client.put_object(
+            Bucket=bucket_name,
+            Key=f"{output_prefix}/{COLMAP_DIR}/{file_name}",
+            Body=text.encode(),
+            ContentType="text/plain"
+        )
+    logger.info(f"Wrote {len(poses['frame'])} camera poses to s3://{bucket_name}/{poses_path}")
+    return poses_path
+
+
+@dataclass
+class FlightPoses:
+    """Camera poses of one flight, as columns with one row per frame."""
+    output_prefix: str
+    columns: Dict[str, "np.ndarray"]
+
+    def __len__(self) -> int:
+        return len(self.columns["frame"])
+
+    def __getitem__(self, column: str) -> "np.ndarray":
+        return self.columns[column]
+
+    @property
+    def centers(self) -> "np.ndarray":
+        """Camera positions in world coordinates (S, 3), i.e. the trajectory."""
+        return self.columns["center"]
+
+    @property
+    def rotations(self) -> "np.ndarray":
+        """World-to-camera rotation matrices (S, 3, 3)."""
+        return quaternion_to_rotation(self.columns["qvec"])
+
+    @property
+    def extrinsics(self) -> "np.ndarray":
+        """World-to-camera matrices (S, 3, 4), as predicted by VGGT."""
+        import numpy as np
+
+        return np.concatenate((self.rotations, self.columns["tvec"][:, :, None]), axis=2)
+
+    @property
+    def intrinsics(self) -> "np.ndarray":
+        """Intrinsic matrices (S, 3, 3)."""
+        import numpy as np
+
+        intrinsic = np.zeros((len(self), 3, 3))
+        intrinsic[:, 0, 0] = self.columns["fx"]
+        intrinsic[:, 1, 1] = self.columns["fy"]
+        intrinsic[:, 0, 2] = self.columns["cx"]
+        intrinsic[:, 1, 2] = self.columns["cy"]
+        intrinsic[:, 2, 2] = 1.0
+        return intrinsic
+
+
+def parse_poses(output_prefix: str, data: bytes) -> FlightPoses:
+    """Parse the contents of a poses.npz."""
+    import numpy as np
+
+    with np.load(BytesIO(data), allow_pickle=False) as npz:
+        columns = {name: npz[name] for name in POSE_COLUMNS}
+    return FlightPoses(output_prefix, columns)
+
+
+def load_poses(
+    s3_client,
+    bucket_name: str,
+    output_prefixes: List[str],
+    max_workers: int = 16
+) -> Dict[str, FlightPoses]:
+    """
+    Load the camera poses of many flights concurrently.
+
+    Each flight costs one small GET; flights without a poses.npz are logged and left out.
+
+    Args:
+        s3_client: Configured S3 client
+        bucket_name: S3 bucket name
+        output_prefixes: Prefixes of the flights' VGGT results
+        max_workers: Concurrent downloads
+
+    Returns:
+        Dict[str, FlightPoses]: Poses keyed by output prefix
+    """
+    def fetch(output_prefix: str) -> Tuple[str, Optional[bytes]]:
+        try:
+            response = s3_client.get_object(Bucket=bucket_name, Key=f"{output_prefix}/{POSES_FILE}")
+        except s3_client.exceptions.NoSuchKey:
+            logger.warning(f"No camera poses under s3://{bucket_name}/{output_prefix}")
+            return output_prefix, None
+        return output_prefix, response['Body'].read()
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(output_prefixes)))) as executor:
+        downloaded = list(executor.map(fetch, output_prefixes))
+    return {prefix: parse_poses(prefix, data) for prefix, data in downloaded if data is not None}
@@ -2,10 +2,14 @@
 import os
 import asyncio
 import httpx
-import boto3
 import mimetypes
 import logging
-from botocore.client import Config
+import time
+from typing import Optional
+from fair_scheduler import DEFAULT_TENANT_CONCURRENCY, FairScheduler, dropbox_tenant, run_fair
+from metrics import ASSETS, OBJECTS_LISTED, observe_api_request, push_metrics, serve_metrics
+from progress import ProgressReporter
+from storage_async import AsyncS3Storage
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -24,25 +28,22 @@ API_CONFIG = {
     'token': 'test_token'  # Replace with your token
 }
 
-def get_s3():
-    """Get S3 client for local MinIO."""
-    return boto3.client(
-        's3',
-        endpoint_url=f"http://{MINIO_CONFIG['endpoint']}",
-        aws_access_key_id=MINIO_CONFIG['access_key'],
-        aws_secret_access_key=MINIO_CONFIG['secret_key'],
-        region_name="us-east-1",
-        config=Config(signature_version='s3v4')
-    )
+# Maximum asset creation requests in flight at once
+MAX_CONCURRENT_REQUESTS = 64
+# Maximum requests in flight for one dropbox user folder, so one large upload cannot
+# hold every connection
+MAX_REQUESTS_PER_USER = DEFAULT_TENANT_CONCURRENCY
 
-async def create_asset(client: httpx.AsyncClient, file_info: dict, user_id: str):
-    """Create an asset record for a file."""
+async def create_asset(client: httpx.AsyncClient, file_info: dict, user_id: str,
+                       progress: Optional[ProgressReporter] = None):
+    """Create an asset record for a file, counting the outcome in progress if given."""
     try:
         # Basic file info
         filename = os.path.basename(file_info['key'])
         mime_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
         
         # Create asset
+        start = time.perf_counter()
         response = await client.post(
             '/assets/create-from-existing',
             json={
@@ -52,51 +53,90 @@ async def create_asset(client: httpx.AsyncClient, file_info: dict, user_id: str)
                 'flight_uuid': None  # Optional flight UUID
             }
         )
+        observe_api_request("dropbox", "create-from-existing", start, response.status_code == 200)
+        ASSETS.labels("dropbox", "created" if response.status_code == 200 else "failed").inc()
         
         if response.status_code == 200:
-            logger.info(f"Created asset for {filename}")
+            logger.debug(f"Created asset for {filename}")
+            if progress is not None:
+                progress.update("created")
+        elif progress is not None:
+            progress.failure(f"Failed to create asset for {filename}: {response}")
         else:
             logger.error(f"Failed to create asset for {filename}: {response}")
             
     except Exception as e:
-        logger.error(f"Error processing {filename}: {e}")
+        ASSETS.labels("dropbox", "failed").inc()
+        if progress is not None:
+            progress.failure(f"Error processing {filename}: {e}")
+        else:
+            logger.error(f"Error processing {filename}: {e}")
 
 async def main():
     """Main function."""
-    s3 = get_s3()
-    
     # List files in dropbox
     prefix = "dropbox/"
     logger.info(f"Listing files in {prefix}")
     
-    files = []
-    paginator = s3.get_paginator('list_objects_v2')
-    for page in paginator.paginate(Bucket=MINIO_CONFIG['bucket'], Prefix=prefix):
-        if 'Contents' in page:
-            for obj in page['Contents']:
-                key = obj['Key']
-                # Skip directories and special files
-                if not key.endswith('/') and not key.endswith('/.keep'):
-                    files.append({
-                        'key': key,
-                        'size': obj['Size']
-                    })
-                    logger.info(f"Found: {key} ({obj['Size']} bytes)")
-
-    if not files:
-        logger.info("No files found")
-        return
-
-    # Create assets
-    async with httpx.AsyncClient(
+    async with AsyncS3Storage(
+        f"http://{MINIO_CONFIG['endpoint']}",
+        MINIO_CONFIG['access_key'],
+        MINIO_CONFIG['secret_key']
+    ) as storage, httpx.AsyncClient(
         base_url=API_CONFIG['url'],
         headers={'Authorization': f"Bearer {API_CONFIG['token']}"},
-        timeout=30.0
+        timeout=30.0,
+        limits=httpx.Limits(max_connections=MAX_CONCURRENT_REQUESTS)
     ) as client:
-        # Get user ID from path (assuming dropbox/user_id/...)
-        for file in files:
+        # Listing and asset creation share the event loop: assets are created while
+        # later pages are still being listed. User folders are listed concurrently and
+        # their files queued per user, so requests go round-robin across users instead
+        # of working through the largest upload first.
+        scheduler = FairScheduler(MAX_CONCURRENT_REQUESTS, MAX_REQUESTS_PER_USER)
+        # Per-file lines only at debug level; progress is logged as periodic summaries
+        listing = ProgressReporter(logger, "Listing dropbox objects")
+        creating = ProgressReporter(logger, "Creating assets")
+        
+        def queue(obj: dict):
+            OBJECTS_LISTED.labels("dropbox").inc()
+            listing.update()
+            key = obj['Key']
+            # Skip directories and special files
+            if not key.endswith('/') and not key.endswith('/.keep'):
+                logger.debug(f"Found: {key} ({obj['Size']} bytes)")
+                scheduler.put(dropbox_tenant(key), {
+                    'key': key,
+                    'size': obj['Size']
+                })
+                creating.total = (creating.total or 0) + 1
+        
+        async def list_folder(folder_prefix: str):
+            async for obj in storage.list_objects(MINIO_CONFIG['bucket'], folder_prefix):
+                queue(obj)
+        
+        async def list_all():
+            folders, root_objects = await storage.list_level(MINIO_CONFIG['bucket'], prefix)
+            for obj in root_objects:
+                queue(obj)
+            await asyncio.gather(*[list_folder(folder) for folder in folders])
+            listing.finish()
+        
+        async def create(file: dict):
+            # Get user ID from path (assuming dropbox/user_id/...)
             user_id = file['key'].split('/')[1]  # dropbox/user_id/...
-            await create_asset(client, file, user_id)
+            await create_asset(client, file, user_id, creating)
+        
+        await run_fair(scheduler, create, list_all())
+        
+        if not creating.total:
+            logger.info("No files found")
+            return
+        
+        creating.finish()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    serve_metrics()
+    try:
+        asyncio.run(main())
+    finally:
+        push_metrics("create_assets_from_dropbox")
\ No newline at end of file
@@ -4,12 +4,21 @@ import asyncio
 from prefect import flow, task, get_run_logger
 from prefect.cache_policies import NO_CACHE
 from prefect.context import get_run_context
-import boto3
+from prefect.utilities.asyncutils import run_coro_as_sync
 import httpx
-from botocore.client import Config
 import logging
 import mimetypes
+import queue
+import time
 from datetime import datetime
+from typing import Optional
+
+from fair_scheduler import DEFAULT_CONCURRENCY, DEFAULT_TENANT_CONCURRENCY, FairScheduler, dropbox_tenant
+from metrics import ASSETS, OBJECTS_LISTED, observe_api_request, track_flow
+from profiling import profiled_flow
+from progress import ProgressReporter
+from storage import get_s3_client
+from storage_async import AsyncS3Storage
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -38,13 +47,10 @@ def get_s3():
     logger = get_run_logger()
     logger.info(f"Connecting to MinIO at {MINIO_CONFIG['endpoint']}")
     
-    client = boto3.client(
-        's3',
-        endpoint_url=f"http://{MINIO_CONFIG['endpoint']}",
-        aws_access_key_id=MINIO_CONFIG['access_key'],
-        aws_secret_access_key=MINIO_CONFIG['secret_key'],
-        region_name="us-east-1",
-        config=Config(signature_version='s3v4')
+    client = get_s3_client(
+        f"http://{MINIO_CONFIG['endpoint']}",
+        MINIO_CONFIG['access_key'],
+        MINIO_CONFIG['secret_key']
     )
     
     # Test connection
@@ -57,61 +63,83 @@ def get_s3():
         
     return client
 
+def is_dropbox_file(key: str) -> bool:
+    """Whether a key is an uploaded file, not a folder marker or a failed/skipped file."""
+    return (not key.endswith('/.keep') and 
+            not key.endswith('/') and 
+            '/_failed/' not in key and 
+            '/_skipped/' not in key)
+
+
+async def list_dropbox_files(
+    storage: AsyncS3Storage,
+    bucket: str,
+    prefix: str = "dropbox/",
+    progress: Optional[ProgressReporter] = None
+) -> list:
+    """
+    List the files of every user folder under the dropbox prefix.
+    
+    User folders are listed concurrently on the event loop instead of one after another.
+    
+    Args:
+        storage: Open async S3 storage
+        bucket: Bucket name
+        prefix: Dropbox prefix
+        progress: Optional reporter counting listed objects
+        
+    Returns:
+        list: File info dicts with key, size and last_modified
+    """
+    async def list_folder(folder_prefix: str) -> list:
+        objects = []
+        async for obj in storage.list_objects(bucket, folder_prefix):
+            objects.append(obj)
+            if progress is not None:
+                progress.update()
+        return objects
+    
+    folders, root_objects = await storage.list_level(bucket, prefix)
+    folder_objects = await asyncio.gather(*[list_folder(folder) for folder in folders])
+    OBJECTS_LISTED.labels("dropbox").inc(len(root_objects) + sum(len(objects) for objects in folder_objects))
+    
+    files = []
+    for obj in [o for objects in folder_objects for o in objects] + root_objects:
+        if is_dropbox_file(obj['Key']):
+            files.append({
+                'key': obj['Key'],
+                'size': obj['Size'],
+                'last_modified': obj['LastModified']
+            })
+    return files
+
+
 @task(cache_policy=NO_CACHE, 
       tags=["minio", "storage"],
       retries=2,
       log_prints=True)
-def list_files(s3_client: boto3.client):
+def list_files():
     """List all files in dropbox directories."""
     logger = get_run_logger()
     prefix = "dropbox/"
-    files = []
+    progress = ProgressReporter(logger, "Listing dropbox objects")
+    
+    async def list_all():
+        async with AsyncS3Storage(
+            f"http://{MINIO_CONFIG['endpoint']}",
+            MINIO_CONFIG['access_key'],
+            MINIO_CONFIG['secret_key']
+        ) as storage:
+            return await list_dropbox_files(storage, MINIO_CONFIG['bucket'], prefix, progress)
     
     try:
         logger.info(f"Listing files in bucket '{MINIO_CONFIG['bucket']}' with prefix '{prefix}'")
-        paginator = s3_client.get_paginator('list_objects_v2')
+        files = run_coro_as_sync(list_all())
+        progress.finish()
         
-        for page in paginator.paginate(Bucket=MINIO_CONFIG['bucket'], Prefix=prefix, Delimiter='/'):
-            # Process common prefixes (folders)
-            if 'CommonPrefixes' in page:
-                for prefix_obj in page['CommonPrefixes']:
-                    folder_prefix = prefix_obj.get('Prefix')
-                    logger.info(f"Found folder: {folder_prefix}")
-                    
-                    # List files in this subfolder
-                    for subpage in paginator.paginate(Bucket=MINIO_CONFIG['bucket'], Prefix=folder_prefix, Delimiter=''):
-                        if 'Contents' in subpage:
-                            for obj in subpage['Contents']:
-                                key = obj['Key']
-                                # Skip directories and special files
-                                if (not key.endswith('/.keep') and 
-                                    not key.endswith('/') and 
-                                    '/_failed/' not in key and 
-                                    '/_skipped/' not in key):
-                                    files.append({
-                                        'key': key,
-                                        'size': obj['Size'],
-                                        'last_modified': obj['LastModified']
-                                    })
-                                    logger.info(f"Found file: {key} ({obj['Size']} bytes)")
-                                    print(f"Processing: {key}")
-            
-            # Process files in the root of the prefix
-            if 'Contents' in page:
-                for obj in page['Contents']:
-                    key = obj['Key']
-                    # Skip directories and special files
-                    if (not key.endswith('/.keep') and 
-                        not key.endswith('/') and 
-                        '/_failed/' not in key and 
-                        '/_skipped/' not in key):
-                        files.append({
-                            'key': key,
-                            'size': obj['Size'],
-                            'last_modified': obj['LastModified']
-                        })
-                        logger.info(f"Found file: {key} ({obj['Size']} bytes)")
-                        print(f"Processing: {key}")
+        if logger.isEnabledFor(logging.DEBUG):
+            for file_info in files:
+                logger.debug(f"Found file: {file_info['key']} ({file_info['size']} bytes)")
                         
         logger.info(f"Total files found: {len(files)}")
         
@@ -138,9 +166,8 @@ def create_asset(file_info: dict):
         filename = os.path.basename(file_path)
         mime_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
         
-        logger.info(f"Creating asset for {filename}")
-        logger.debug(f"File details: type={mime_type}, size={file_info['size']} bytes, path={file_path}")
-        print(f"Processing file: {filename}")  # Will be logged due to log_prints=True
+        # Per-file detail stays at debug level; scan_dropbox logs aggregated progress
+        logger.debug(f"Creating asset for {filename}: type={mime_type}, size={file_info['size']} bytes, path={file_path}")
         
         # Create asset using httpx in synchronous mode
         with httpx.Client(
@@ -148,6 +175,7 @@ def create_asset(file_info: dict):
             headers={'Authorization': f"Bearer {API_CONFIG['token']}"},
             timeout=30.0
         ) as client:
+            start = time.perf_counter()
             response = client.post(
                 '/assets/create-from-existing',
                 json={
@@ -156,44 +184,68 @@ def create_asset(file_info: dict):
                     'uploader_uuid': user_id
                 }
             )
+            observe_api_request("dropbox", "create-from-existing", start, response.is_success)
+            ASSETS.labels("dropbox", "created" if response.is_success else "failed").inc()
             
             if response.is_success:
-                logger.info(f"✅ Created asset for {filename}")
-                logger.debug(f"Asset creation response: {response.json()}")
                 result = {
                     'success': True,
                     'filename': filename,
                     'asset_id': response.json().get('data', {}).get('uuid')
                 }
-                # Print the result of creating a new asset
-                print(f"New asset created: {result}")
+                logger.debug(f"✅ Created asset for {filename}: {result['asset_id']}")
                 return result
             else:
-                logger.error(f"❌ Failed to create asset for {filename}: {response.text}")
-                result = {
+                # Failures are reported by scan_dropbox, capped so an API outage does not flood the log
+                logger.debug(f"❌ Failed to create asset for {filename}: {response.text}")
+                return {
                     'success': False,
                     'filename': filename,
                     'error': response.text
                 }
-                print(f"Failed to create asset: {result}")
-                return result
             
     except Exception as e:
-        logger.error(f"❌ Error processing {file_path}: {e}")
-        result = {
+        logger.debug(f"❌ Error processing {file_path}: {e}")
+        ASSETS.labels("dropbox", "failed").inc()
+        return {
             'success': False,
             'filename': os.path.basename(file_path),
             'error': str(e)
         }
-        print(f"Error creating asset: {result}")
-        return result
+
+def _profile_storage(arguments: dict) -> tuple:
+    """S3 client and bucket for the profile of a run."""
+    client = get_s3_client(
+        f"http://{MINIO_CONFIG['endpoint']}",
+        MINIO_CONFIG['access_key'],
+        MINIO_CONFIG['secret_key']
+    )
+    return client, MINIO_CONFIG['bucket']
 
 @flow(name="Dropbox Scanner",
       description="Scans MinIO dropbox folders and creates assets",
       version="1.0.0",
       log_prints=True)
-def scan_dropbox():
-    """Scan dropbox directories and create assets."""
+@track_flow("dropbox_scanner")
+@profiled_flow("dropbox_scanner", storage=_profile_storage)
+def scan_dropbox(
+    profile: Optional[bool] = None,
+    max_concurrency: int = DEFAULT_CONCURRENCY,
+    tenant_concurrency: int = DEFAULT_TENANT_CONCURRENCY
+):
+    """
+    Scan dropbox directories and create assets.
+    
+    Asset creation is scheduled fairly across user folders (see fair_scheduler), so a
+    large upload of one user does not hold back the small uploads of others.
+    
+    Args:
+        profile: Sample the run's stacks and publish them as folded stacks in S3 and a
+            Prefect artifact (see profiling). If None, follows SKYSTORE_PROFILE; False
+            turns it off even when SKYSTORE_PROFILE is set
+        max_concurrency: Asset creation tasks in flight at once
+        tenant_concurrency: Asset creation tasks in flight at once for one user folder, at least 1
+    """
     logger = get_run_logger()
     flow_start_time = datetime.now()
     
@@ -202,9 +254,9 @@ def scan_dropbox():
         logger.info(f"MinIO endpoint: {MINIO_CONFIG['endpoint']}")
         logger.info(f"API endpoint: {API_CONFIG['url']}")
         
-        # List all files
-        s3 = get_s3()
-        files = list_files(s3)
+        # Check the bucket, then list all files
+        get_s3()
+        files = list_files()
         
         if not files:
             logger.info("No files found to process")
@@ -216,24 +268,39 @@ def scan_dropbox():
             
         logger.info(f"Found {len(files)} files to process")
         
-        # Process files in parallel using Prefect tasks
-        futures = []
+        # Queue the files per user folder and submit Prefect tasks in fair order, keeping
+        # at most max_concurrency (tenant_concurrency per user) in flight
+        scheduler = FairScheduler(max_concurrency, tenant_concurrency)
         for file_info in files:
-            future = create_asset.submit(file_info)
-            futures.append(future)
-            
-        # Wait for all tasks to complete and get results
+            scheduler.put(dropbox_tenant(file_info['key']), file_info)
+        finished = queue.Queue()
+        
+        # Wait for tasks to complete, submitting more as slots free up
+        progress = ProgressReporter(logger, "Creating assets", total=len(files))
         results = []
-        for future in futures:
+        while not scheduler.idle:
+            job = scheduler.next()
+            while job is not None:
+                future = create_asset.submit(job.item)
+                future.add_done_callback(lambda future, job=job: finished.put((future, job)))
+                job = scheduler.next()
+            
+            future, job = finished.get()
+            scheduler.done(job)
             try:
                 result = future.result()
-                results.append(result)
             except Exception as e:
-                logger.error(f"Task failed: {e}")
-                results.append({
+                result = {
                     'success': False,
+                    'filename': os.path.basename(job.item['key']),
                     'error': str(e)
-                })
+                }
+            results.append(result)
+            if result.get('success', False):
+                progress.update("created")
+            else:
+                progress.failure(f"❌ Failed to create asset for {result.get('filename')}: {result.get('error')}")
+        progress.finish()
             
         # Analyze results
         successes = [r for r in results if r and r.get('success', False)]
@@ -247,11 +314,6 @@ def scan_dropbox():
         logger.info(f"Failed asset creations: {len(failures)}")
         logger.info(f"Duration: {duration:.2f} seconds")
         
-        if failures:
-            logger.warning("Failed files:")
-            for f in failures:
-                logger.warning(f"  - {f.get('filename')}: {f.get('error')}")
-        
         return {
             'success': len(failures) == 0,
             'files_processed': len(files),
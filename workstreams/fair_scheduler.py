@@ -0,0 +1,247 @@
+"""
+Fair scheduling of dropbox work across user folders.
+
+Every ``dropbox/<user_id>/...`` folder is a tenant with its own queue. Instead of working
+through one flat listing, where a user who uploads 50k frames holds back every upload
+listed after theirs, FairScheduler hands out work with deficit round-robin: tenants take
+turns, and on each turn a tenant's deficit grows by ``quantum * weight`` and it may start
+queued items while their cost fits in the deficit. With the default cost of 1 per item
+and weight 1 this is plain round-robin; weights give tenants a larger share, and costs
+(e.g. bytes) make large items use up a turn sooner.
+
+On top of the global ``concurrency`` limit, ``tenant_concurrency`` caps the items of one
+tenant in flight, so a heavy tenant can never hold every slot and a small upload always
+finds one within one round.
+
+Per tenant, the time from put() until the item starts and until it is done are recorded
+in skystore_tenant_wait_seconds and skystore_tenant_latency_seconds (see metrics).
+
+    SKYSTORE_TENANT_WEIGHTS     Tenant weights, e.g. "user-a=2,user-b=0.5" (default: 1 each)
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from metrics import TENANT_LATENCY, TENANT_WAIT
+
+# Configure logging
+logger = logging.getLogger("fair_scheduler")
+logger.setLevel(logging.INFO)
+
+DEFAULT_CONCURRENCY = 64
+DEFAULT_TENANT_CONCURRENCY = 8
+
+
+def dropbox_tenant(key: str) -> str:
+    """Tenant of a dropbox key: the user folder of dropbox/<user_id>/..., or "" at the root."""
+    parts = key.split('/')
+    return parts[1] if len(parts) > 2 else ""
+
+
+def parse_weights(spec: Optional[str]) -> Dict[str, float]:
+    """Parse "tenant=weight,..." as in SKYSTORE_TENANT_WEIGHTS."""
+    weights = {}
+    for entry in (spec or "").split(","):
+        if not entry.strip():
+            continue
+        tenant, _, weight = entry.partition("=")
+        weights[tenant.strip()] = float(weight)
+    return weights
+
+
+@dataclass
+class Job:
+    """One queued item of a tenant."""
+    tenant: str
+    item: Any
+    cost: float = 1.0
+    queued_at: float = field(default_factory=time.perf_counter)
+    started_at: Optional[float] = None
+
+
+@dataclass
+class _Tenant:
+    queue: Deque[Job] = field(default_factory=deque)
+    deficit: float = 0.0
+    in_flight: int = 0
+
+
+class FairScheduler:
+    """
+    Deficit round-robin over per-tenant queues with global and per-tenant concurrency caps.
+
+    Not thread-safe: put(), next() and done() are called from one thread or event loop.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        tenant_concurrency: Optional[int] = DEFAULT_TENANT_CONCURRENCY,
+        weights: Optional[Dict[str, float]] = None,
+        quantum: float = 1.0,
+        workstream: str = "dropbox"
+    ):
+        """
+        Args:
+            concurrency: Items in flight at once across all tenants
+            tenant_concurrency: Items of one tenant in flight at once, at least 1; None for no cap
+            weights: Share of each tenant relative to the default weight of 1. If None,
+                uses SKYSTORE_TENANT_WEIGHTS.
+            quantum: Deficit a tenant with weight 1 gains per turn, in units of item cost
+            workstream: Workstream label of the tenant metrics
+        """
+        if tenant_concurrency is not None and tenant_concurrency < 1:
+            # No tenant could ever start an item, and run_fair would wait forever
+            raise ValueError(f"tenant_concurrency must be at least 1 or None, got {tenant_concurrency}")
+        self.concurrency = max(1, concurrency)
+        self.tenant_concurrency = tenant_concurrency
+        self.weights = weights if weights is not None else parse_weights(os.environ.get("SKYSTORE_TENANT_WEIGHTS"))
+        if any(weight <= 0 for weight in self.weights.values()):
+            raise ValueError(f"Tenant weights must be positive: {self.weights}")
+        self.quantum = quantum
+        self.workstream = workstream
+        self.in_flight = 0
+        self.pending = 0
+        # Called after put() and done(), so a dispatcher can wait for new work or free slots
+        self.notify: Optional[Callable[[], None]] = None
+        self._tenants: Dict[str, _Tenant] = {}
+        # Tenants with queued items, in turn order; the head has the current turn
+        self._ring: Deque[str] = deque()
+        self._turn: Optional[str] = None
+
+    def put(self, tenant: str, item: Any, cost: float = 1.0) -> Job:
+        """Queue an item of a tenant."""
+        state = self._tenants.setdefault(tenant, _Tenant())
+        if not state.queue:
+            self._ring.append(tenant)
+        job = Job(tenant, item, cost)
+        state.queue.append(job)
+        self.pending += 1
+        if self.notify is not None:
+            self.notify()
+        return job
+
+    def _capped(self, state: _Tenant) -> bool:
+        return self.tenant_concurrency is not None and state.in_flight >= self.tenant_concurrency
+
+    def _end_turn(self):
+        self._ring.rotate(-1)
+        self._turn = None
+
+    def next(self) -> Optional[Job]:
+        """
+        Start the next item in fair order.
+
+        Returns:
+            Optional[Job]: The item to run, or None if nothing is queued or every tenant with
+                queued items (or the whole scheduler) is at its concurrency cap
+        """
+        if self.in_flight >= self.concurrency:
+            return None
+        capped = 0
+        while self._ring and capped < len(self._ring):
+            tenant = self._ring[0]
+            state = self._tenants[tenant]
+            if self._capped(state):
+                # A capped tenant loses its turn and does not bank deficit while waiting
+                capped += 1
+                self._end_turn()
+                continue
+            capped = 0
+            if self._turn != tenant:
+                self._turn = tenant
+                state.deficit += self.quantum * self.weights.get(tenant, 1.0)
+            job = state.queue[0]
+            if state.deficit < job.cost:
+                self._end_turn()
+                continue
+
+            state.queue.popleft()
+            state.deficit -= job.cost
+            state.in_flight += 1
+            self.pending -= 1
+            self.in_flight += 1
+            if not state.queue:
+                # An idle tenant keeps no credit, as in DRR
+                state.deficit = 0.0
+                self._ring.popleft()
+                self._turn = None
+            job.started_at = time.perf_counter()
+            TENANT_WAIT.labels(self.workstream, tenant).observe(job.started_at - job.queued_at)
+            return job
+        return None
+
+    def done(self, job: Job):
+        """Release the slot of a finished item, successful or not."""
+        self._tenants[job.tenant].in_flight -= 1
+        self.in_flight -= 1
+        TENANT_LATENCY.labels(self.workstream, job.tenant).observe(time.perf_counter() - job.queued_at)
+        if self.notify is not None:
+            self.notify()
+
+    @property
+    def idle(self) -> bool:
+        """Whether nothing is queued or in flight."""
+        return self.pending == 0 and self.in_flight == 0
+
+
+async def run_fair(
+    scheduler: FairScheduler,
+    worker: Callable[[Any], Awaitable[Any]],
+    producer: Awaitable[Any]
+):
+    """
+    Run worker(item) for every item the producer puts into the scheduler, in fair order.
+
+    The producer (e.g. a listing) runs concurrently, so work starts while later items are
+    still being found. Returns when the producer has finished and every item is done;
+    errors of the producer are raised after that, errors of the worker are its own to handle
+    (unhandled ones are logged). If run_fair itself is cancelled, the producer and every
+    running worker are cancelled and awaited before it returns.
+
+    Args:
+        scheduler: Scheduler the producer puts items into
+        worker: Coroutine function processing one item
+        producer: Awaitable that puts items and completes when there are no more
+    """
+    wake = asyncio.Event()
+    scheduler.notify = wake.set
+    producing = asyncio.ensure_future(producer)
+    producing.add_done_callback(lambda _: wake.set())
+    running = set()
+
+    async def run(job: Job):
+        try:
+            await worker(job.item)
+        finally:
+            scheduler.done(job)
+
+    def finished(task: asyncio.Task):
+        running.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Unhandled error in fair scheduler worker: {task.exception()!r}")
+
+    try:
+        while True:
+            job = scheduler.next()
+            while job is not None:
+                task = asyncio.ensure_future(run(job))
+                running.add(task)
+                task.add_done_callback(finished)
+                job = scheduler.next()
+            if producing.done() and scheduler.idle:
+                break
+            await wake.wait()
+            wake.clear()
+    finally:
+        scheduler.notify = None
+        # Only left undone when the loop was interrupted, e.g. by cancellation of the flow
+        pending = [task for task in (producing, *running) if not task.done()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    await producing
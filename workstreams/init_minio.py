@@ -3,12 +3,12 @@
 Script to initialize the MinIO bucket for VGGT processing.
 This ensures the required bucket exists before running the flows.
 """
-import boto3
-from botocore.client import Config
 import logging
 import sys
 import time
 
+from storage import get_s3_client
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -42,14 +42,7 @@ def init_minio(
     while retry_count < max_retries:
         try:
             # Create S3 client
-            s3_client = boto3.client(
-                's3',
-                endpoint_url=endpoint_url,
-                aws_access_key_id=access_key,
-                aws_secret_access_key=secret_key,
-                region_name="us-east-1",
-                config=Config(signature_version='s3v4')
-            )
+            s3_client = get_s3_client(endpoint_url, access_key, secret_key)
             
             # Check if bucket exists
             existing_buckets = [bucket['Name'] for bucket in s3_client.list_buckets()['Buckets']]
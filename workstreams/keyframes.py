@@ -0,0 +1,340 @@
+"""
+Keyframe selection for VGGT flights.
+
+Survey flights are shot with 80-90% overlap between consecutive frames, and VGGT's global
+attention grows quadratically with the number of frames, so near-duplicate frames cost a
+lot and add little. This module picks a representative subset before anything is
+downloaded in full, from cheap signals only:
+
+    EXIF GPS and capture time   From a ranged GET of the first 64 KB of each image
+    Perceptual hash (dHash)     From the thumbnail cameras embed in EXIF (IFD1), which is
+                                part of the same ranged read; else from the 256 px
+                                thumbnail written by thumbnails.py for assets, or the image
+                                itself decoded in JPEG draft mode when there is neither
+
+Selection runs in two passes over the frames in capture order:
+
+    1. Drop near-duplicates: a frame is redundant when it looks like the last kept frame
+       (dHash within ``min_hash_distance`` bits) and, if both have GPS, was taken within
+       ``min_spacing_m`` of it. A capture-time gap above ``max_time_gap_s`` always starts
+       a new segment.
+    2. If more than ``max_frames`` remain, farthest-point sampling on the GPS positions
+       keeps the best spatial coverage, or an even spread in capture order without GPS.
+"""
+import math
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from io import BytesIO
+from typing import List, Dict, Any, Optional, Tuple
+
+from thumbnails import thumbnail_key
+
+# Configure logging
+logger = logging.getLogger("keyframes")
+logger.setLevel(logging.INFO)
+
+# EXIF lives in the APP1 segment, which JPEG limits to 64 KB
+HEADER_BYTES = 64 * 1024
+
+HASH_SIZE = 8
+DEFAULT_HASH_DISTANCE = 6
+DEFAULT_SPACING_M = 2.0
+DEFAULT_TIME_GAP_S = 60.0
+
+EXIF_IFD = 0x8769
+GPS_IFD = 0x8825
+TAG_DATETIME = 306
+TAG_DATETIME_ORIGINAL = 36867
+TAG_SUBSEC_ORIGINAL = 37521
+TAG_THUMBNAIL_OFFSET = 0x0201
+TAG_THUMBNAIL_LENGTH = 0x0202
+
+EARTH_RADIUS_M = 6371008.8
+
+
+@dataclass
+class FrameInfo:
+    """Cheap signals about one frame."""
+    index: int
+    s3_path: str
+    timestamp: Optional[float] = None
+    gps: Optional[Tuple[float, float, Optional[float]]] = None
+    dhash: Optional[int] = None
+
+
+def dhash(image, hash_size: int = HASH_SIZE) -> int:
+    """
+    Difference hash: compares horizontally adjacent pixels of a tiny grayscale copy.
+
+    Args:
+        image: PIL image
+        hash_size: Hash is hash_size * hash_size bits
+
+    Returns:
+        int: Hash as an integer
+    """
+    import numpy as np
+    from PIL import Image
+
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+    pixels = np.asarray(small)
+    bits = (pixels[:, :-1] > pixels[:, 1:]).reshape(-1)
+    # Row-major, first pixel pair in the most significant bit
+    return int.from_bytes(np.packbits(bits).tobytes(), "big") >> (-bits.size % 8)
+
+
+def _exif_thumbnail(exif, tiff: bytes) -> Optional[bytes]:
+    """The JPEG thumbnail of IFD1, or None; offsets are relative to the TIFF header."""
+    from PIL import ExifTags
+
+    thumbnail_ifd = exif.get_ifd(ExifTags.IFD.IFD1)
+    start = thumbnail_ifd.get(TAG_THUMBNAIL_OFFSET)
+    length = thumbnail_ifd.get(TAG_THUMBNAIL_LENGTH)
+    if not start or not length or start + length > len(tiff):
+        return None
+    thumbnail = tiff[start:start + length]
+    return thumbnail if thumbnail.startswith(b"\xff\xd8") else None
+
+
+def _exif_from_header(data: bytes) -> Tuple[Optional[Any], Optional[bytes]]:
+    """
+    Parse EXIF from the leading bytes of a JPEG.
+
+    Returns:
+        Tuple containing:
+            - PIL Exif object, or None when there is none
+            - The embedded JPEG thumbnail, or None when there is none
+    """
+    from PIL import Image
+
+    if not data.startswith(b"\xff\xd8"):
+        return None, None
+    offset = 2
+    while offset + 4 <= len(data) and data[offset] == 0xFF:
+        marker = data[offset + 1]
+        length = int.from_bytes(data[offset + 2:offset + 4], "big")
+        if marker == 0xE1 and data[offset + 4:offset + 10] == b"Exif\x00\x00":
+            segment = data[offset + 4:offset + 2 + length]
+            exif = Image.Exif()
+            exif.load(segment)
+            return exif, _exif_thumbnail(exif, segment[6:])
+        if marker == 0xDA:
+            # Start of scan, no metadata follows
+            break
+        offset += 2 + length
+    return None, None
+
+
+def _rational(value) -> float:
+    return float(value[0]) / float(value[1]) if isinstance(value, tuple) else float(value)
+
+
+def parse_exif(exif) -> Tuple[Optional[float], Optional[Tuple[float, float, Optional[float]]]]:
+    """
+    Capture time and GPS position from EXIF.
+
+    Args:
+        exif: PIL Exif object
+
+    Returns:
+        Tuple containing:
+            - Capture time as a POSIX timestamp (local camera time), or None
+            - (latitude, longitude, altitude) in degrees and meters, or None
+    """
+    timestamp = None
+    details = exif.get_ifd(EXIF_IFD)
+    raw_time = details.get(TAG_DATETIME_ORIGINAL) or exif.get(TAG_DATETIME)
+    if raw_time:
+        try:
+            timestamp = datetime.strptime(str(raw_time).strip("\x00 "), "%Y:%m:%d %H:%M:%S").timestamp()
+            subsec = str(details.get(TAG_SUBSEC_ORIGINAL, "")).strip("\x00 ")
+            if subsec.isdigit():
+                timestamp += int(subsec) / 10 ** len(subsec)
+        except ValueError:
+            timestamp = None
+
+    gps = None
+    gps_ifd = exif.get_ifd(GPS_IFD)
+    if 2 in gps_ifd and 4 in gps_ifd:
+        def degrees(values) -> float:
+            d, m, s = (_rational(v) for v in values)
+            return d + m / 60 + s / 3600
+
+        latitude = degrees(gps_ifd[2]) * (-1 if gps_ifd.get(1) == "S" else 1)
+        longitude = degrees(gps_ifd[4]) * (-1 if gps_ifd.get(3) == "W" else 1)
+        altitude = None
+        if 6 in gps_ifd:
+            altitude = _rational(gps_ifd[6]) * (-1 if gps_ifd.get(5) in (1, b"\x01") else 1)
+        gps = (latitude, longitude, altitude)
+    return timestamp, gps
+
+
+def read_frame_info(
+    s3_client,
+    bucket_name: str,
+    s3_path: str,
+    index: int,
+    asset_prefix: str = "assets/",
+    thumbnail_prefix: str = "thumbnails/"
+) -> FrameInfo:
+    """
+    Gather the selection signals of one image with as few bytes as possible.
+
+    The ranged header read usually carries everything: EXIF and the embedded thumbnail to
+    hash. Without one, the asset thumbnail (only assets under asset_prefix have one) and
+    then the image itself are read.
+
+    Args:
+        s3_client: Configured S3 client
+        bucket_name: S3 bucket name
+        s3_path: Image key
+        index: Position of the image in the flight
+        asset_prefix: Prefix the assets live under, to locate thumbnails
+        thumbnail_prefix: Prefix the thumbnails are written to
+
+    Returns:
+        FrameInfo: Signals of the frame; missing ones are None
+    """
+    from PIL import Image
+
+    info = FrameInfo(index=index, s3_path=s3_path)
+    header = s3_client.get_object(
+        Bucket=bucket_name, Key=s3_path, Range=f"bytes=0-{HEADER_BYTES - 1}"
+    )['Body'].read()
+    exif, thumbnail = _exif_from_header(header)
+
+    if thumbnail is None and s3_path.startswith(asset_prefix):
+        try:
+            thumbnail = s3_client.get_object(
+                Bucket=bucket_name, Key=thumbnail_key(s3_path, 256, asset_prefix, thumbnail_prefix)
+            )['Body'].read()
+        except s3_client.exceptions.NoSuchKey:
+            thumbnail = None
+
+    if thumbnail is not None:
+        with Image.open(BytesIO(thumbnail)) as img:
+            info.dhash = dhash(img)
+    else:
+        data = s3_client.get_object(Bucket=bucket_name, Key=s3_path)['Body'].read()
+        with Image.open(BytesIO(data)) as img:
+            if img.format == "JPEG":
+                # libjpeg scales by up to 1/8 while decoding, the hash only needs 9x8 pixels
+                img.draft("RGB", (64, 64))
+            if exif is None:
+                exif = img.getexif()
+            info.dhash = dhash(img)
+
+    if exif is not None:
+        info.timestamp, info.gps = parse_exif(exif)
+    return info
+
+
+def _distance_m(a: Tuple[float, float, Optional[float]], b: Tuple[float, float, Optional[float]]) -> float:
+    """Distance between two GPS positions, including altitude when both have it."""
+    phi1, phi2 = math.radians(a[0]), math.radians(b[0])
+    dphi = phi2 - phi1
+    dlambda = math.radians(b[1] - a[1])
+    h = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    ground = 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(h)))
+    if a[2] is None or b[2] is None:
+        return ground
+    return math.hypot(ground, b[2] - a[2])
+
+
+def _farthest_point_sample(frames: List[FrameInfo], count: int) -> List[FrameInfo]:
+    """Pick count frames spreading the GPS positions as far apart as possible."""
+    chosen = [frames[0]]
+    nearest = [_distance_m(frames[0].gps, frame.gps) for frame in frames]
+    while len(chosen) < count:
+        index = max(range(len(frames)), key=nearest.__getitem__)
+        chosen.append(frames[index])
+        nearest = [min(d, _distance_m(frames[index].gps, frame.gps)) for d, frame in zip(nearest, frames)]
+    return sorted(chosen, key=lambda frame: frame.index)
+
+
+def select_keyframes(
+    frames: List[FrameInfo],
+    max_frames: Optional[int] = None,
+    min_hash_distance: int = DEFAULT_HASH_DISTANCE,
+    min_spacing_m: float = DEFAULT_SPACING_M,
+    max_time_gap_s: float = DEFAULT_TIME_GAP_S
+) -> List[FrameInfo]:
+    """
+    Pick a representative subset of frames.
+
+    Args:
+        frames: Signals of every frame of the flight
+        max_frames: Frame budget. If None, only near-duplicates are dropped.
+        min_hash_distance: dHash bits two frames must differ by to both be kept
+        min_spacing_m: GPS distance under which similar-looking frames count as duplicates
+        max_time_gap_s: Capture-time gap that always keeps the next frame
+
+    Returns:
+        List[FrameInfo]: Kept frames, in their original order
+    """
+    if not frames:
+        return []
+    if all(frame.timestamp is not None for frame in frames):
+        ordered = sorted(frames, key=lambda frame: (frame.timestamp, frame.index))
+    else:
+        ordered = list(frames)
+
+    kept = [ordered[0]]
+    for frame in ordered[1:]:
+        last = kept[-1]
+        looks_same = (frame.dhash is not None and last.dhash is not None
+                      and bin(frame.dhash ^ last.dhash).count("1") < min_hash_distance)
+        close = frame.gps is None or last.gps is None or _distance_m(frame.gps, last.gps) < min_spacing_m
+        gap = (frame.timestamp is not None and last.timestamp is not None
+               and frame.timestamp - last.timestamp > max_time_gap_s)
+        if gap or not (looks_same and close):
+            kept.append(frame)
+
+    if max_frames is not None and len(kept) > max_frames:
+        if max_frames <= 1:
+            kept = kept[:max(0, max_frames)]
+        elif all(frame.gps is not None for frame in kept):
+            kept = _farthest_point_sample(kept, max_frames)
+        else:
+            step = (len(kept) - 1) / (max_frames - 1)
+            kept = [kept[round(i * step)] for i in range(max_frames)]
+    return sorted(kept, key=lambda frame: frame.index)
+
+
+def estimate_savings(total: int, kept: int) -> Dict[str, float]:
+    """
+    Estimated share of VGGT compute saved by running kept of total frames.
+
+    The aggregator's frame attention, the heads and preprocessing scale linearly with the
+    frame count, and its global attention quadratically.
+
+    Returns:
+        Dict[str, float]: "linear" and "global_attention" fractions saved
+    """
+    if total == 0:
+        return {"linear": 0.0, "global_attention": 0.0}
+    ratio = kept / total
+    return {"linear": 1 - ratio, "global_attention": 1 - ratio ** 2}
+
+
+def gather_frame_info(
+    s3_client,
+    bucket_name: str,
+    s3_paths: List[str],
+    max_workers: int = 16,
+    **kwargs: Any
+) -> List[FrameInfo]:
+    """Read the signals of every frame concurrently; see read_frame_info for kwargs."""
+    def read(item: Tuple[int, str]) -> FrameInfo:
+        index, s3_path = item
+        try:
+            return read_frame_info(s3_client, bucket_name, s3_path, index, **kwargs)
+        except Exception as e:
+            # A frame without signals is never treated as a duplicate, so it is kept
+            logger.warning(f"Could not read selection signals of {s3_path}: {e}")
+            return FrameInfo(index=index, s3_path=s3_path)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(s3_paths)))) as executor:
+        return list(executor.map(read, enumerate(s3_paths)))
@@ -0,0 +1,216 @@
+"""
+Prometheus metrics shared by the workstreams.
+
+Every workstream records into one registry, labelled by workstream:
+
+    skystore_objects_listed_total       Objects returned by S3 listings
+    skystore_bytes_transferred_total    Bytes downloaded from or uploaded to S3 (direction label)
+    skystore_api_request_seconds        Latency of SkyStore API requests (endpoint, outcome)
+    skystore_assets_total               Assets created or failed from dropbox files (outcome)
+    skystore_stage_seconds              Duration of flow stages, e.g. VGGT aggregator or heads
+    skystore_flow_runs_total            Finished flow runs (flow, outcome)
+    skystore_flow_seconds               Duration of flow runs (flow)
+    skystore_tenant_wait_seconds        Time dropbox items of a tenant (user folder) wait to start
+    skystore_tenant_latency_seconds     Time from queueing a tenant's item until it is done
+
+Nothing is exposed unless configured through the environment of the worker:
+
+    SKYSTORE_METRICS_PORT       Serve /metrics on this port while the process runs, for a
+                                live view of long runs
+    SKYSTORE_PUSHGATEWAY        Push the registry to this Pushgateway (host:port or URL) when
+                                a flow finishes
+    SKYSTORE_PUSH_INTERVAL      Also push every this many seconds while a flow runs
+"""
+import functools
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+from prometheus_client import CollectorRegistry, Counter, Histogram, push_to_gateway, start_http_server
+
+# Configure logging
+logger = logging.getLogger("metrics")
+logger.setLevel(logging.INFO)
+
+# Kept apart from prometheus_client's default registry so a push only carries our metrics
+REGISTRY = CollectorRegistry()
+
+# Stages range from sub-second API calls to hour-long VGGT runs
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 7200)
+API_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+OBJECTS_LISTED = Counter(
+    "skystore_objects_listed", "Objects returned by S3 listings",
+    ["workstream"], registry=REGISTRY
+)
+BYTES_TRANSFERRED = Counter(
+    "skystore_bytes_transferred", "Bytes moved between the worker and S3",
+    ["workstream", "direction"], registry=REGISTRY
+)
+API_LATENCY = Histogram(
+    "skystore_api_request_seconds", "Latency of SkyStore API requests",
+    ["workstream", "endpoint", "outcome"], buckets=API_BUCKETS, registry=REGISTRY
+)
+ASSETS = Counter(
+    "skystore_assets", "Assets created from dropbox files",
+    ["workstream", "outcome"], registry=REGISTRY
+)
+STAGE_SECONDS = Histogram(
+    "skystore_stage_seconds", "Duration of flow stages",
+    ["workstream", "stage"], buckets=STAGE_BUCKETS, registry=REGISTRY
+)
+FLOW_RUNS = Counter(
+    "skystore_flow_runs", "Finished flow runs",
+    ["flow", "outcome"], registry=REGISTRY
+)
+FLOW_SECONDS = Histogram(
+    "skystore_flow_seconds", "Duration of flow runs",
+    ["flow"], buckets=STAGE_BUCKETS, registry=REGISTRY
+)
+# One series per dropbox user folder seen by the fair scheduler
+TENANT_WAIT = Histogram(
+    "skystore_tenant_wait_seconds", "Time items of a tenant are queued before they start",
+    ["workstream", "tenant"], buckets=STAGE_BUCKETS, registry=REGISTRY
+)
+TENANT_LATENCY = Histogram(
+    "skystore_tenant_latency_seconds", "Time from queueing an item of a tenant until it is done",
+    ["workstream", "tenant"], buckets=STAGE_BUCKETS, registry=REGISTRY
+)
+
+_server_lock = threading.Lock()
+_server_port: Optional[int] = None
+
+
+def serve_metrics(port: Optional[int] = None) -> Optional[int]:
+    """
+    Serve /metrics from this process, once; later calls are no-ops.
+
+    Args:
+        port: Port to listen on. If None, uses SKYSTORE_METRICS_PORT and does nothing when
+            that is unset.
+
+    Returns:
+        Optional[int]: Port being served, or None
+    """
+    global _server_port
+    if port is None:
+        port = int(os.environ["SKYSTORE_METRICS_PORT"]) if os.environ.get("SKYSTORE_METRICS_PORT") else None
+    if port is None:
+        return None
+    with _server_lock:
+        if _server_port is None:
+            try:
+                start_http_server(port, registry=REGISTRY)
+                _server_port = port
+                logger.info(f"Serving metrics on :{port}/metrics")
+            except OSError as e:
+                # Another flow run on this host already holds the port
+                logger.warning(f"Could not serve metrics on port {port}: {e}")
+        return _server_port
+
+
+def push_metrics(job: str, gateway: Optional[str] = None) -> bool:
+    """
+    Push the registry to a Pushgateway, grouped by job and host.
+
+    Failures are logged and never fail the run.
+
+    Args:
+        job: Pushgateway job name, usually the flow
+        gateway: Gateway address. If None, uses SKYSTORE_PUSHGATEWAY.
+
+    Returns:
+        bool: Whether metrics were pushed
+    """
+    gateway = gateway or os.environ.get("SKYSTORE_PUSHGATEWAY")
+    if not gateway:
+        return False
+    try:
+        push_to_gateway(gateway, job=job, registry=REGISTRY, grouping_key={"instance": socket.gethostname()})
+        return True
+    except Exception as e:
+        logger.warning(f"Could not push metrics to {gateway}: {e}")
+        return False
+
+
+@contextmanager
+def time_stage(workstream: str, stage: str) -> Iterator[None]:
+    """Observe the duration of the enclosed block as one stage run, failed or not."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(workstream, stage).observe(time.perf_counter() - start)
+
+
+def timed_stage(workstream: str, stage: str) -> Callable:
+    """Decorator form of time_stage; goes below @task so .fn is timed too."""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with time_stage(workstream, stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def observe_api_request(workstream: str, endpoint: str, start: float, success: bool):
+    """Record one API request that started at time.perf_counter() value start."""
+    API_LATENCY.labels(workstream, endpoint, "success" if success else "error").observe(time.perf_counter() - start)
+
+
+def _push_periodically(job: str, interval: float, stop: threading.Event):
+    while not stop.wait(interval):
+        push_metrics(job)
+
+
+def track_flow(name: str) -> Callable:
+    """
+    Decorator for flow functions; goes below @flow.
+
+    Serves /metrics if configured, counts the run and its duration, and pushes the registry
+    when the flow finishes (and periodically while it runs, if configured).
+
+    Args:
+        name: Flow label and Pushgateway job
+    """
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            serve_metrics()
+            stop = None
+            interval = float(os.environ.get("SKYSTORE_PUSH_INTERVAL", 0) or 0)
+            if interval > 0 and os.environ.get("SKYSTORE_PUSHGATEWAY"):
+                stop = threading.Event()
+                threading.Thread(
+                    target=_push_periodically, args=(name, interval, stop),
+                    name=f"metrics-push-{name}", daemon=True
+                ).start()
+            start = time.perf_counter()
+            outcome = "failed"
+            try:
+                result = fn(*args, **kwargs)
+                outcome = "completed"
+                return result
+            finally:
+                FLOW_SECONDS.labels(name).observe(time.perf_counter() - start)
+                FLOW_RUNS.labels(name, outcome).inc()
+                if stop is not None:
+                    stop.set()
+                push_metrics(name)
+        return wrapper
+    return decorator
+
+
+def snapshot() -> Dict[str, float]:
+    """Current value of every sample in the registry, keyed by name and labels; for logs and tests."""
+    values = {}
+    for metric in REGISTRY.collect():
+        for sample in metric.samples:
+            labels = ",".join(f"{k}={v}" for k, v in sorted(sample.labels.items()))
+            values[f"{sample.name}{{{labels}}}" if labels else sample.name] = sample.value
+    return values
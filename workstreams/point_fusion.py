@@ -0,0 +1,238 @@
+"""
+Batched depth unprojection and multi-view point fusion.
+
+VGGT predicts one depth map per frame, and ``construct_point_cloud`` turns them into a
+dense (S, H, W, 3) world point map. Neighbouring drone frames overlap heavily, so most
+surface points appear in several frames, and low-confidence pixels (sky, water, image
+borders) are kept as well. The functions here unproject all frames in one batched tensor
+operation and fuse them into a single deduplicated cloud:
+
+    1. Drop pixels below a confidence threshold (a percentile of depth_conf by default)
+    2. Bucket the remaining points into voxels through an integer spatial hash
+    3. Merge each voxel into one point: confidence-weighted mean position and color, and
+       the highest confidence of its members
+
+The default voxel size is the median ground footprint of one pixel, so points that the
+frames disagree on by less than a pixel are merged and detail the model resolved is kept.
+"""
+import math
+import logging
+from typing import Dict, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import torch
+
+# Configure logging
+logger = logging.getLogger("point_fusion")
+logger.setLevel(logging.INFO)
+
+# Percentile of depth_conf below which pixels are discarded, as in VGGT's demo
+DEFAULT_CONF_PERCENTILE = 50.0
+
+# Voxel coordinates are packed into one int64 key while the grid fits in 63 bits
+_MAX_PACKED_CELLS = 2 ** 62
+
+
+def unproject_depth_maps(
+    depth_map: "torch.Tensor",
+    extrinsic: "torch.Tensor",
+    intrinsic: "torch.Tensor"
+) -> "torch.Tensor":
+    """
+    Unproject the depth maps of all frames to world points in one batched operation.
+
+    Matches ``vggt.utils.geometry.unproject_depth_map_to_point_map``, which loops over the
+    frames in NumPy, but runs as a few tensor operations on whatever device the inputs are.
+
+    Args:
+        depth_map: Depth maps of shape (S, H, W) or (S, H, W, 1)
+        extrinsic: Camera-from-world matrices of shape (S, 3, 4)
+        intrinsic: Intrinsic matrices of shape (S, 3, 3)
+
+    Returns:
+        torch.Tensor: World points of shape (S, H, W, 3)
+    """
+    import torch
+
+    depth = depth_map.reshape(depth_map.shape[:3]).float()
+    extrinsic = extrinsic.to(depth)
+    intrinsic = intrinsic.to(depth)
+    num_frames, height, width = depth.shape
+
+    rows = torch.arange(height, device=depth.device, dtype=depth.dtype).view(1, height, 1)
+    cols = torch.arange(width, device=depth.device, dtype=depth.dtype).view(1, 1, width)
+    fx, fy = intrinsic[:, 0, 0].view(-1, 1, 1), intrinsic[:, 1, 1].view(-1, 1, 1)
+    cx, cy = intrinsic[:, 0, 2].view(-1, 1, 1), intrinsic[:, 1, 2].view(-1, 1, 1)
+    camera_points = torch.stack(((cols - cx) / fx * depth, (rows - cy) / fy * depth, depth), dim=-1)
+
+    # world = R^T (camera - t); as row vectors that is (camera - t) @ R
+    rotation = extrinsic[:, :, :3]
+    translation = extrinsic[:, :, 3]
+    world = (camera_points.view(num_frames, -1, 3) - translation[:, None, :]) @ rotation
+    return world.view(num_frames, height, width, 3)
+
+
+def _unproject_pixels(
+    depth: "torch.Tensor",
+    frames: "torch.Tensor",
+    rows: "torch.Tensor",
+    cols: "torch.Tensor",
+    extrinsic: "torch.Tensor",
+    intrinsic: "torch.Tensor"
+) -> "torch.Tensor":
+    """Unproject a flat list of pixels, each with its frame index, to world points (N, 3)."""
+    import torch
+
+    intrinsic = intrinsic[frames]
+    x = (cols.to(depth) - intrinsic[:, 0, 2]) / intrinsic[:, 0, 0] * depth
+    y = (rows.to(depth) - intrinsic[:, 1, 2]) / intrinsic[:, 1, 1] * depth
+    camera_points = torch.stack((x, y, depth), dim=-1)
+    extrinsic = extrinsic[frames]
+    # world = R^T (camera - t), batched over pixels
+    return ((camera_points - extrinsic[:, :, 3]).unsqueeze(1) @ extrinsic[:, :, :3]).squeeze(1)
+
+
+def _conf_threshold(conf: "torch.Tensor", percentile: float) -> float:
+    """Value of the given percentile of the confidences, -inf when nothing is filtered."""
+    if percentile <= 0 or conf.numel() == 0:
+        return float("-inf")
+    # quantile() is limited to 16M elements; a strided sample gives the same threshold
+    step = max(1, conf.numel() // 1_000_000)
+    return conf[::step].float().quantile(percentile / 100).item()
+
+
+def default_voxel_size(depth: "torch.Tensor", intrinsic: "torch.Tensor") -> float:
+    """
+    Median ground footprint of one pixel: depth divided by focal length.
+
+    Args:
+        depth: Depth maps of shape (S, H, W)
+        intrinsic: Intrinsic matrices of shape (S, 3, 3)
+
+    Returns:
+        float: Voxel edge length in world units
+    """
+    import torch
+
+    focal = (intrinsic[:, 0, 0] + intrinsic[:, 1, 1]).to(depth) / 2
+    footprint = depth / focal.view(-1, 1, 1)
+    footprint = footprint[torch.isfinite(footprint) & (footprint > 0)]
+    if footprint.numel() == 0:
+        return 1.0
+    # A strided sample is plenty for a median and avoids sorting every pixel of the flight
+    step = max(1, footprint.numel() // 1_000_000)
+    return footprint[::step].median().item()
+
+
+def _voxel_ids(points: "torch.Tensor", voxel_size: float) -> "torch.Tensor":
+    """Index of each point's voxel among the occupied voxels (0..n-1)."""
+    import torch
+
+    if points.shape[0] == 0:
+        return torch.zeros(0, dtype=torch.long, device=points.device)
+    cells = torch.floor(points / voxel_size).long()
+    cells -= cells.min(dim=0).values
+    extent = cells.max(dim=0).values + 1
+    # The cell count in Python ints; the int64 product wraps for far-apart outliers
+    if math.prod(extent.tolist()) < _MAX_PACKED_CELLS:
+        # Spatial hash: one int64 key per cell, so a 1-D unique suffices
+        keys = (cells[:, 0] * extent[1] + cells[:, 1]) * extent[2] + cells[:, 2]
+        _, inverse = torch.unique(keys, return_inverse=True)
+    else:
+        _, inverse = torch.unique(cells, dim=0, return_inverse=True)
+    return inverse
+
+
+def fuse_points(
+    points: "torch.Tensor",
+    conf: "torch.Tensor",
+    voxel_size: float,
+    colors: Optional["torch.Tensor"] = None
+) -> Dict[str, "torch.Tensor"]:
+    """
+    Merge points that fall into the same voxel.
+
+    Args:
+        points: Points of shape (N, 3)
+        conf: Positive confidences of shape (N,), used as merge weights
+        voxel_size: Voxel edge length in world units
+        colors: Optional RGB colors in [0, 1] of shape (N, 3)
+
+    Returns:
+        Dict[str, torch.Tensor]: "fused_points" (M, 3) float32, "fused_conf" (M,) and, with
+            colors, "fused_colors" (M, 3) uint8
+    """
+    import torch
+
+    points = points.float()
+    weights = conf.float()
+    inverse = _voxel_ids(points, voxel_size)
+    num_voxels = int(inverse.max().item()) + 1 if inverse.numel() else 0
+
+    weight_sum = torch.zeros(num_voxels, dtype=weights.dtype, device=weights.device).index_add_(0, inverse, weights)
+    fused_points = torch.zeros(num_voxels, 3, dtype=points.dtype, device=points.device)
+    fused_points.index_add_(0, inverse, points * weights[:, None])
+    fused_points /= weight_sum[:, None]
+    fused_conf = torch.full((num_voxels,), float("-inf"), dtype=weights.dtype, device=weights.device)
+    fused_conf.scatter_reduce_(0, inverse, weights, reduce="amax")
+
+    fused = {"fused_points": fused_points, "fused_conf": fused_conf}
+    if colors is not None:
+        fused_colors = torch.zeros(num_voxels, 3, dtype=points.dtype, device=points.device)
+        fused_colors.index_add_(0, inverse, colors.float() * weights[:, None])
+        fused_colors /= weight_sum[:, None]
+        fused["fused_colors"] = (fused_colors * 255).round().clamp(0, 255).to(torch.uint8)
+    return fused
+
+
+def fuse_point_cloud(
+    extrinsic: "torch.Tensor",
+    intrinsic: "torch.Tensor",
+    depth_map: "torch.Tensor",
+    depth_conf: "torch.Tensor",
+    images: Optional["torch.Tensor"] = None,
+    conf_percentile: float = DEFAULT_CONF_PERCENTILE,
+    voxel_size: Optional[float] = None
+) -> Dict[str, "torch.Tensor"]:
+    """
+    Unproject all frames, drop low-confidence pixels and fuse overlapping points.
+
+    Only the pixels that pass the confidence filter are unprojected, so the flight's dense
+    (S, H, W, 3) point map is never materialized.
+
+    Args:
+        extrinsic: Camera-from-world matrices of shape (S, 3, 4)
+        intrinsic: Intrinsic matrices of shape (S, 3, 3)
+        depth_map: Depth maps of shape (S, H, W) or (S, H, W, 1)
+        depth_conf: Depth confidences of shape (S, H, W)
+        images: Optional input images of shape (S, 3, H, W) in [0, 1], for point colors
+        conf_percentile: Pixels below this percentile of depth_conf are dropped
+        voxel_size: Voxel edge length in world units. If None, uses default_voxel_size().
+
+    Returns:
+        Dict[str, torch.Tensor]: Fused cloud, see fuse_points()
+    """
+    import torch
+
+    depth = depth_map.reshape(depth_map.shape[:3]).float()
+    conf = depth_conf.reshape(depth.shape).to(depth)
+    if voxel_size is None:
+        voxel_size = default_voxel_size(depth, intrinsic)
+
+    valid = torch.isfinite(depth) & (depth > 0) & torch.isfinite(conf) & (conf > 0)
+    threshold = _conf_threshold(conf[valid], conf_percentile)
+    keep = valid & (conf >= threshold)
+
+    frames, rows, cols = keep.nonzero(as_tuple=True)
+    points = _unproject_pixels(depth[keep], frames, rows, cols, extrinsic.to(depth), intrinsic.to(depth))
+    colors = None
+    if images is not None:
+        images = images.reshape(depth.shape[0], 3, *depth.shape[1:])
+        colors = images[frames, :, rows, cols]
+
+    fused = fuse_points(points, conf[keep], voxel_size, colors)
+    num_fused = fused["fused_points"].shape[0]
+    logger.info(f"Fused {depth.numel():,} pixels ({int(keep.sum()):,} above confidence "
+                f"{float(threshold):.3g}) into {num_fused:,} points with voxel size {voxel_size:.4g} "
+                f"({depth.numel() / max(1, num_fused):.1f}x fewer)")
+    return fused
@@ -0,0 +1,252 @@
+"""
+Opt-in sampling profiler for flow runs.
+
+A background thread snapshots the Python stack of every thread with sys._current_frames()
+at a fixed interval, so profiling costs one stack walk per thread per sample instead of
+a hook on every call like cProfile. Threads that are only waiting for work (idle pool
+workers, empty pipeline queues) are left out, so the samples show where wall-clock time
+goes: Python code, and the calls blocked in C on S3, the API or torch kernels.
+
+The result is written in the folded-stack format, one ``frame;frame;frame count`` line
+per distinct stack, which flamegraph.pl, speedscope and inferno read directly.
+
+Flows opt in with the ``profiled_flow`` decorator. A run is profiled when its ``profile``
+parameter is true or ``SKYSTORE_PROFILE`` is set in the worker environment; the folded
+stacks are uploaded to S3 and summarized in a Prefect markdown artifact of the run.
+
+    SKYSTORE_PROFILE            Profile every run of the decorated flows ("1", "true")
+    SKYSTORE_PROFILE_INTERVAL   Seconds between samples (default: 0.01)
+"""
+import functools
+import inspect
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger("profiling")
+logger.setLevel(logging.INFO)
+
+DEFAULT_INTERVAL = 0.01
+PROFILE_PREFIX = "profiles"
+
+# Leaf frames of threads that are parked waiting for work rather than doing it
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+}
+
+# Inline the folded stacks in the artifact while they stay this small
+MAX_INLINE_BYTES = 64 * 1024
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class SamplingProfiler:
+    """Wall-clock sampler over all threads of the process."""
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, include_idle: bool = False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            code = frame.f_code
+            if not self.include_idle and (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(names.get(ident, f"thread-{ident}"))
+            self.stacks[";".join(reversed(labels))] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> "SamplingProfiler":
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "SamplingProfiler":
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.elapsed = time.perf_counter() - self.started_at
+        return self
+
+    def __enter__(self) -> "SamplingProfiler":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def folded(self) -> str:
+        """Folded stacks, most frequent first."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit: int = 20) -> List[Tuple[str, int, int]]:
+        """
+        Functions with the most samples.
+
+        Returns:
+            List[Tuple[str, int, int]]: (function, self samples, total samples), by total
+                samples. Self counts samples where the function was running; total also
+                counts samples where it was waiting on a callee.
+        """
+        self_counts, total_counts = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")[1:]
+            if not frames:
+                continue
+            self_counts[frames[-1]] += count
+            for label in set(frames):
+                total_counts[label] += count
+        return [(label, self_counts[label], total) for label, total in total_counts.most_common(limit)]
+
+
+def profile_markdown(profiler: SamplingProfiler, name: str, location: Optional[str] = None, limit: int = 20) -> str:
+    """Markdown summary of a profile: top functions, and the folded stacks when they are small."""
+    total = sum(profiler.stacks.values()) or 1
+    lines = [
+        f"# Profile of {name}",
+        "",
+        f"{profiler.samples} samples every {profiler.interval * 1000:.0f} ms over {profiler.elapsed:.1f}s, "
+        f"{len(profiler.stacks)} distinct stacks.",
+        "",
+    ]
+    if location:
+        lines += [f"Folded stacks: `{location}` (open with speedscope or `flamegraph.pl`)", ""]
+    lines += ["| Function | Self | Total |", "|---|---|---|"]
+    for label, self_count, total_count in profiler.top_functions(limit):
+        lines.append(f"| `{label}` | {self_count / total:.1%} | {total_count / total:.1%} |")
+    folded = profiler.folded()
+    if len(folded.encode()) <= MAX_INLINE_BYTES:
+        lines += ["", "```", folded.rstrip("\n"), "```"]
+    return "\n".join(lines) + "\n"
+
+
+def _run_id() -> str:
+    """Prefect flow run id, or a timestamp outside of a run."""
+    try:
+        from prefect.runtime import flow_run
+        if flow_run.id:
+            return str(flow_run.id)
+    except Exception:
+        pass
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def publish_profile(
+    profiler: SamplingProfiler,
+    name: str,
+    s3_client=None,
+    bucket_name: Optional[str] = None,
+    prefix: str = PROFILE_PREFIX
+) -> Optional[str]:
+    """
+    Upload the folded stacks to S3 and attach a summary artifact to the current run.
+
+    Failures are logged and never fail the run.
+
+    Args:
+        profiler: Stopped profiler
+        name: Flow name, used in the S3 key and the artifact key
+        s3_client: S3 client for the upload. If None, the stacks are only in the artifact
+            (when small enough).
+        bucket_name: Bucket for the upload
+        prefix: Prefix for profiles in the bucket
+
+    Returns:
+        Optional[str]: S3 URI of the folded stacks, or None if they were not uploaded
+    """
+    location = None
+    if s3_client is not None and bucket_name:
+        key = f"{prefix}/{name}/{_run_id()}.folded"
+        try:
+            s3_client.put_object(Bucket=bucket_name, Key=key, Body=profiler.folded().encode(), ContentType="text/plain")
+            location = f"s3://{bucket_name}/{key}"
+        except Exception as e:
+            logger.warning(f"Could not upload profile to s3://{bucket_name}/{key}: {e}")
+
+    try:
+        from prefect.artifacts import create_markdown_artifact
+        create_markdown_artifact(
+            key=f"profile-{name.replace('_', '-').lower()}",
+            markdown=profile_markdown(profiler, name, location),
+            description=f"Sampling profile of {name}"
+        )
+    except Exception as e:
+        logger.warning(f"Could not create profile artifact: {e}")
+
+    for label, self_count, total_count in profiler.top_functions(5):
+        logger.info(f"Profile: {label} self {self_count} total {total_count} samples")
+    return location
+
+
+def profiling_enabled(requested: Optional[bool] = None) -> bool:
+    """Whether to profile: the flow parameter when given (an explicit False wins), else SKYSTORE_PROFILE."""
+    if requested is not None:
+        return bool(requested)
+    return os.environ.get("SKYSTORE_PROFILE", "").lower() in ("1", "true", "yes", "on")
+
+
+def profiled_flow(name: str, storage: Optional[Callable[[Dict[str, Any]], Tuple[Any, str]]] = None) -> Callable:
+    """
+    Decorator for flow functions with a ``profile`` parameter; goes below @flow.
+
+    Args:
+        name: Flow name for the S3 key and artifact
+        storage: Called with the flow's arguments by name, returns (s3_client, bucket_name)
+            to upload the folded stacks to
+    """
+    def decorator(fn: Callable) -> Callable:
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            arguments = signature.bind(*args, **kwargs)
+            arguments.apply_defaults()
+            if not profiling_enabled(arguments.arguments.get("profile")):
+                return fn(*args, **kwargs)
+
+            interval = float(os.environ.get("SKYSTORE_PROFILE_INTERVAL", DEFAULT_INTERVAL) or DEFAULT_INTERVAL)
+            profiler = SamplingProfiler(interval).start()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profiler.stop()
+                s3_client, bucket_name = None, None
+                if storage is not None:
+                    try:
+                        s3_client, bucket_name = storage(arguments.arguments)
+                    except Exception as e:
+                        logger.warning(f"No S3 storage for the profile: {e}")
+                publish_profile(profiler, name, s3_client, bucket_name)
+        return wrapper
+    return decorator
@@ -0,0 +1,511 @@
+"""
+Spatial index over VGGT flight results, and a project-level index of flight extents.
+
+VGGT results are stored as whole-flight tensors, so finding the points in one area means
+downloading and decoding everything. This module adds two levels of index:
+
+Flight index (per VGGT output prefix), in the flight's own reconstruction frame:
+    {output_prefix}/spatial_index/index.json              Grid origin, chunk size, chunk bounds
+    {output_prefix}/spatial_index/chunks/{i}_{j}_{k}.npz   Points, confidences and colors of one cell
+
+    The cloud (fused_points when the flight was fused, else the confidence-filtered
+    final_point_map) is split into a regular 3-D grid of chunks. A bbox or radius query
+    reads index.json, fetches only the chunks that intersect the query, concurrently, and
+    filters their points exactly.
+
+Project index, in geographic coordinates:
+    {index_prefix}/flights.json   Per flight: output prefix, latitude/longitude/altitude of
+                                  the flight and the radius in meters it covers
+
+    Queries by lat/lon bbox or by radius return the flights whose extent intersects the
+    area, and so which flight indexes to query next. The file is rewritten as a whole, so
+    it assumes one writer at a time (the deployment runs with concurrency_limit 1).
+
+Reading an index needs only numpy; torch is needed to build one from the results.
+"""
+from prefect import flow, task, get_run_logger
+from prefect.cache_policies import NO_CACHE
+import math
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from io import BytesIO
+from typing import List, Dict, Any, Optional, Sequence, Tuple, TYPE_CHECKING
+
+from metrics import timed_stage, track_flow
+from storage import get_s3_client
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Configure logging
+logger = logging.getLogger("spatial_index")
+logger.setLevel(logging.INFO)
+
+INDEX_DIR = "spatial_index"
+INDEX_FILE = "index.json"
+INDEX_VERSION = 1
+PROJECT_INDEX_FILE = "flights.json"
+
+# Grid cells along the longest axis of a flight's bounding box
+DEFAULT_CHUNKS_PER_AXIS = 8
+
+# Extent assumed for flights that do not specify one
+DEFAULT_FLIGHT_RADIUS_M = 500.0
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def _put_json(s3_client, bucket_name: str, key: str, data: Dict[str, Any]):
+    s3_client.put_object(
+        Bucket=bucket_name,
+        Key=key,
+        Body=json.dumps(data, indent=2).encode(),
+        ContentType="application/json"
+    )
+
+
+def _get_json(s3_client, bucket_name: str, key: str) -> Dict[str, Any]:
+    return json.loads(s3_client.get_object(Bucket=bucket_name, Key=key)['Body'].read())
+
+
+def load_flight_cloud(
+    s3_client,
+    bucket_name: str,
+    output_prefix: str,
+    conf_percentile: float = 50.0
+) -> Tuple[str, Dict[str, "np.ndarray"]]:
+    """
+    Load the point cloud of one flight's VGGT results.
+
+    Uses the fused cloud when the flight was run with fuse_views, otherwise the dense
+    final_point_map with pixels below conf_percentile of its confidence dropped.
+
+    Args:
+        s3_client: Configured S3 client
+        bucket_name: S3 bucket name
+        output_prefix: Prefix the VGGT results were saved under
+        conf_percentile: Confidence percentile filter for the dense map
+
+    Returns:
+        Tuple containing:
+            - Name of the result the cloud was built from
+            - "points" (N, 3) float32, "conf" (N,) float32 and optionally "colors" (N, 3) uint8
+    """
+    import numpy as np
+    from vggt_encoding import load_result, read_manifest
+
+    manifest = read_manifest(s3_client, bucket_name, output_prefix)
+    results = manifest["results"]
+    if "fused_points" in results:
+        cloud = {
+            "points": load_result(s3_client, bucket_name, manifest, "fused_points").numpy(),
+            "conf": load_result(s3_client, bucket_name, manifest, "fused_conf").numpy(),
+        }
+        if "fused_colors" in results:
+            cloud["colors"] = load_result(s3_client, bucket_name, manifest, "fused_colors").numpy()
+        source = "fused_points"
+    else:
+        points = load_result(s3_client, bucket_name, manifest, "final_point_map").numpy().reshape(-1, 3)
+        conf = load_result(s3_client, bucket_name, manifest, "final_point_conf").numpy().reshape(-1)
+        keep = np.isfinite(points).all(axis=1) & np.isfinite(conf)
+        if conf_percentile > 0 and keep.any():
+            keep &= conf >= np.percentile(conf[keep], conf_percentile)
+        cloud = {"points": points[keep], "conf": conf[keep]}
+        source = "final_point_map"
+
+    cloud["points"] = np.ascontiguousarray(cloud["points"], dtype=np.float32)
+    cloud["conf"] = np.ascontiguousarray(cloud["conf"], dtype=np.float32)
+    return source, cloud
+
+
+def split_into_chunks(
+    points: "np.ndarray",
+    chunks_per_axis: int = DEFAULT_CHUNKS_PER_AXIS
+) -> Tuple["np.ndarray", float, Dict[Tuple[int, int, int], "np.ndarray"]]:
+    """
+    Assign points to the cells of a regular 3-D grid.
+
+    Cells are cubes sized so that the longest axis of the bounding box spans chunks_per_axis
+    cells; only occupied cells are returned.
+
+    Args:
+        points: Points of shape (N, 3)
+        chunks_per_axis: Cells along the longest axis
+
+    Returns:
+        Tuple containing:
+            - Grid origin (3,), the minimum corner of the bounding box
+            - Cell edge length
+            - Point indices per occupied cell
+    """
+    import numpy as np
+
+    origin = points.min(axis=0)
+    extent = float((points.max(axis=0) - origin).max())
+    chunk_size = extent / chunks_per_axis if extent > 0 else 1.0
+
+    cells = np.minimum(((points - origin) / chunk_size).astype(np.int64), chunks_per_axis - 1)
+    keys = (cells[:, 0] * chunks_per_axis + cells[:, 1]) * chunks_per_axis + cells[:, 2]
+    # One sort groups the points of every cell, instead of a mask per cell
+    order = np.argsort(keys, kind="stable")
+    unique_keys, starts = np.unique(keys[order], return_index=True)
+    groups = np.split(order, starts[1:])
+
+    chunks = {}
+    for key, indices in zip(unique_keys.tolist(), groups):
+        cell = (key // (chunks_per_axis * chunks_per_axis), (key // chunks_per_axis) % chunks_per_axis, key % chunks_per_axis)
+        chunks[cell] = indices
+    return origin, chunk_size, chunks
+
+
+def _boxes_intersect(bounds: Sequence[Sequence[float]], low: Sequence[float], high: Sequence[float]) -> bool:
+    return all(bounds[0][axis] <= high[axis] and bounds[1][axis] >= low[axis] for axis in range(3))
+
+
+def _box_within_radius(bounds: Sequence[Sequence[float]], center: Sequence[float], radius: float) -> bool:
+    # Distance from the center to the nearest point of the box
+    squared = 0.0
+    for axis in range(3):
+        nearest = min(max(center[axis], bounds[0][axis]), bounds[1][axis])
+        squared += (center[axis] - nearest) ** 2
+    return squared <= radius * radius
+
+
+class FlightIndex:
+    """
+    Chunked spatial index of one flight's point cloud in S3.
+
+    Coordinates are those of the VGGT reconstruction, i.e. relative to the flight's first
+    camera, not geographic.
+    """
+
+    def __init__(self, s3_client, bucket_name: str, output_prefix: str, index: Dict[str, Any], max_workers: int = 8):
+        """
+        Args:
+            s3_client: Configured S3 client
+            bucket_name: S3 bucket name
+            output_prefix: Prefix of the flight's VGGT results
+            index: Contents of index.json
+            max_workers: Concurrent chunk downloads per query
+        """
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.output_prefix = output_prefix
+        self.index = index
+        self.max_workers = max_workers
+
+    @classmethod
+    def load(cls, s3_client, bucket_name: str, output_prefix: str, max_workers: int = 8) -> "FlightIndex":
+        """Read a flight's index.json; the chunks are only fetched by queries."""
+        index = _get_json(s3_client, bucket_name, f"{output_prefix}/{INDEX_DIR}/{INDEX_FILE}")
+        return cls(s3_client, bucket_name, output_prefix, index, max_workers)
+
+    @property
+    def bounds(self) -> List[List[float]]:
+        """Minimum and maximum corner of the whole cloud."""
+        return self.index["bounds"]
+
+    def _read_chunks(self, chunks: List[Dict[str, Any]]) -> Dict[str, "np.ndarray"]:
+        import numpy as np
+
+        def read(chunk: Dict[str, Any]) -> Dict[str, "np.ndarray"]:
+            body = self.s3_client.get_object(Bucket=self.bucket_name, Key=chunk["path"])['Body'].read()
+            with np.load(BytesIO(body)) as data:
+                return {name: data[name] for name in data.files}
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(chunks)))) as executor:
+            parts = list(executor.map(read, chunks))
+        if not parts:
+            empty = {"points": np.zeros((0, 3), np.float32), "conf": np.zeros(0, np.float32)}
+            if self.index.get("has_colors"):
+                empty["colors"] = np.zeros((0, 3), np.uint8)
+            return empty
+        return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+    def query_bbox(self, low: Sequence[float], high: Sequence[float]) -> Dict[str, "np.ndarray"]:
+        """
+        Points inside an axis-aligned box.
+
+        Args:
+            low: Minimum corner (x, y, z)
+            high: Maximum corner (x, y, z)
+
+        Returns:
+            Dict[str, np.ndarray]: "points", "conf" and, if indexed, "colors" of the points inside
+        """
+        import numpy as np
+
+        chunks = [chunk for chunk in self.index["chunks"] if _boxes_intersect(chunk["bounds"], low, high)]
+        data = self._read_chunks(chunks)
+        inside = np.all((data["points"] >= low) & (data["points"] <= high), axis=1)
+        logger.info(f"bbox query read {len(chunks)}/{len(self.index['chunks'])} chunks, "
+                    f"{int(inside.sum())} points inside")
+        return {name: values[inside] for name, values in data.items()}
+
+    def query_radius(self, center: Sequence[float], radius: float) -> Dict[str, "np.ndarray"]:
+        """
+        Points within a distance of a center point.
+
+        Args:
+            center: Center (x, y, z)
+            radius: Distance in reconstruction units
+
+        Returns:
+            Dict[str, np.ndarray]: "points", "conf" and, if indexed, "colors" of the points inside
+        """
+        import numpy as np
+
+        chunks = [chunk for chunk in self.index["chunks"] if _box_within_radius(chunk["bounds"], center, radius)]
+        data = self._read_chunks(chunks)
+        inside = np.sum((data["points"] - np.asarray(center, dtype=np.float32)) ** 2, axis=1) <= radius * radius
+        logger.info(f"radius query read {len(chunks)}/{len(self.index['chunks'])} chunks, "
+                    f"{int(inside.sum())} points inside")
+        return {name: values[inside] for name, values in data.items()}
+
+
+@task(name="Build Flight Index",
+      description="Split a flight's point cloud into grid chunks in S3",
+      cache_policy=NO_CACHE)
+@timed_stage("spatial_index", "build_flight_index")
+def build_flight_index(
+    s3_client,
+    bucket_name: str,
+    output_prefix: str,
+    chunks_per_axis: int = DEFAULT_CHUNKS_PER_AXIS,
+    conf_percentile: float = 50.0,
+    max_workers: int = 8
+) -> Dict[str, Any]:
+    """
+    Build the chunked spatial index of one flight's VGGT results.
+
+    Args:
+        s3_client: Configured S3 client
+        bucket_name: S3 bucket name
+        output_prefix: Prefix the VGGT results were saved under
+        chunks_per_axis: Grid cells along the longest axis of the cloud
+        conf_percentile: Confidence filter when indexing the dense final_point_map
+        max_workers: Concurrent chunk uploads
+
+    Returns:
+        Dict[str, Any]: The written index.json
+    """
+    import numpy as np
+
+    source, cloud = load_flight_cloud(s3_client, bucket_name, output_prefix, conf_percentile)
+    if cloud["points"].shape[0] == 0:
+        raise ValueError(f"No points to index under s3://{bucket_name}/{output_prefix}")
+    origin, chunk_size, cells = split_into_chunks(cloud["points"], chunks_per_axis)
+    index_prefix = f"{output_prefix}/{INDEX_DIR}"
+
+    def write_chunk(item: Tuple[Tuple[int, int, int], "np.ndarray"]) -> Dict[str, Any]:
+        cell, indices = item
+        chunk = {name: values[indices] for name, values in cloud.items()}
+        buffer = BytesIO()
+        # Uncompressed, so readers pay no inflate cost; points are float32 already
+        np.savez(buffer, **chunk)
+        path = f"{index_prefix}/chunks/{cell[0]}_{cell[1]}_{cell[2]}.npz"
+        s3_client.put_object(Bucket=bucket_name, Key=path, Body=buffer.getvalue())
+        return {
+            "cell": list(cell),
+            "path": path,
+            "num_points": int(len(indices)),
+            "bounds": [chunk["points"].min(axis=0).tolist(), chunk["points"].max(axis=0).tolist()],
+        }
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        chunks = list(executor.map(write_chunk, cells.items()))
+
+    index = {
+        "version": INDEX_VERSION,
+        "source": source,
+        "num_points": int(cloud["points"].shape[0]),
+        "has_colors": "colors" in cloud,
+        "origin": origin.tolist(),
+        "chunk_size": chunk_size,
+        "bounds": [cloud["points"].min(axis=0).tolist(), cloud["points"].max(axis=0).tolist()],
+        "chunks": chunks,
+    }
+    _put_json(s3_client, bucket_name, f"{index_prefix}/{INDEX_FILE}", index)
+    logger.info(f"Indexed {index['num_points']:,} points of {source} into {len(chunks)} chunks "
+                f"at s3://{bucket_name}/{index_prefix}")
+    return index
+
+
+def _haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in meters."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _geo_bounds(latitude: float, longitude: float, radius_m: float) -> Tuple[float, float, float, float]:
+    """(min_lat, min_lon, max_lat, max_lon) of a circle, for bbox tests."""
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    dlon = math.degrees(radius_m / (EARTH_RADIUS_M * max(1e-9, math.cos(math.radians(latitude)))))
+    return latitude - dlat, longitude - dlon, latitude + dlat, longitude + dlon
+
+
+class ProjectIndex:
+    """Geographic extents of every indexed flight, stored as one JSON object in S3."""
+
+    def __init__(self, s3_client, bucket_name: str, index_prefix: str = INDEX_DIR, flights: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            s3_client: Configured S3 client
+            bucket_name: S3 bucket name
+            index_prefix: Prefix of flights.json
+            flights: Flight entries keyed by flight ID
+        """
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.index_prefix = index_prefix.rstrip('/')
+        self.flights = flights or {}
+
+    @property
+    def path(self) -> str:
+        return f"{self.index_prefix}/{PROJECT_INDEX_FILE}"
+
+    @classmethod
+    def load(cls, s3_client, bucket_name: str, index_prefix: str = INDEX_DIR) -> "ProjectIndex":
+        """Read flights.json, or start an empty index if there is none yet."""
+        project = cls(s3_client, bucket_name, index_prefix)
+        try:
+            project.flights = _get_json(s3_client, bucket_name, project.path)["flights"]
+        except s3_client.exceptions.NoSuchKey:
+            pass
+        return project
+
+    def save(self):
+        """Write flights.json."""
+        _put_json(self.s3_client, self.bucket_name, self.path, {"version": INDEX_VERSION, "flights": self.flights})
+
+    def upsert(
+        self,
+        flight_id: str,
+        output_prefix: str,
+        latitude: float,
+        longitude: float,
+        altitude: Optional[float] = None,
+        radius_m: float = DEFAULT_FLIGHT_RADIUS_M,
+        flight_index: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Add or replace a flight's entry.
+
+        Args:
+            flight_id: Flight UUID
+            output_prefix: Prefix of the flight's VGGT results and spatial index
+            latitude: Flight latitude, as stored on the Flight
+            longitude: Flight longitude, as stored on the Flight
+            altitude: Flight altitude, as stored on the Flight
+            radius_m: Ground radius the flight covers around its position
+            flight_index: The flight's index.json, to record its local bounds and size
+        """
+        entry = {
+            "output_prefix": output_prefix,
+            "latitude": latitude,
+            "longitude": longitude,
+            "altitude": altitude,
+            "radius_m": radius_m,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }
+        if flight_index is not None:
+            entry["bounds"] = flight_index["bounds"]
+            entry["num_points"] = flight_index["num_points"]
+        self.flights[flight_id] = entry
+
+    def query_bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> List[str]:
+        """IDs of the flights whose extent intersects a lat/lon box."""
+        matches = []
+        for flight_id, entry in self.flights.items():
+            low_lat, low_lon, high_lat, high_lon = _geo_bounds(entry["latitude"], entry["longitude"], entry["radius_m"])
+            if low_lat <= max_lat and high_lat >= min_lat and low_lon <= max_lon and high_lon >= min_lon:
+                matches.append(flight_id)
+        return matches
+
+    def query_radius(self, latitude: float, longitude: float, radius_m: float) -> List[str]:
+        """IDs of the flights whose extent comes within radius_m of a position, nearest first."""
+        distances = []
+        for flight_id, entry in self.flights.items():
+            distance = _haversine_m(latitude, longitude, entry["latitude"], entry["longitude"])
+            if distance <= radius_m + entry["radius_m"]:
+                distances.append((distance, flight_id))
+        return [flight_id for _, flight_id in sorted(distances)]
+
+    def flight_index(self, flight_id: str, max_workers: int = 8) -> FlightIndex:
+        """Open the chunked index of one flight listed here."""
+        return FlightIndex.load(self.s3_client, self.bucket_name, self.flights[flight_id]["output_prefix"], max_workers)
+
+
+@flow(name="Build Spatial Index",
+      description="Index VGGT flight point clouds for bbox and radius queries")
+@track_flow("spatial_index")
+def build_spatial_index(
+    bucket_name: str = "skystore",
+    flights: Optional[List[Dict[str, Any]]] = None,
+    index_prefix: str = INDEX_DIR,
+    chunks_per_axis: int = DEFAULT_CHUNKS_PER_AXIS,
+    conf_percentile: float = 50.0,
+    minio_endpoint: str = "minio",
+    minio_port: int = 9000,
+    minio_access_key: str = "minioadmin",
+    minio_secret_key: str = "minioadmin",
+    max_workers: int = 8
+) -> Dict[str, Any]:
+    """
+    Build the chunked index of each flight and register the flights in the project index.
+
+    Args:
+        bucket_name: S3 bucket name
+        flights: Flight specs, each with ``flight_id``, ``output_prefix`` of its VGGT results,
+            ``latitude`` and ``longitude``, and optionally ``altitude`` and ``radius_m``
+        index_prefix: Prefix of the project index
+        chunks_per_axis: Grid cells along the longest axis of each cloud
+        conf_percentile: Confidence filter for flights without a fused cloud
+        minio_endpoint: MinIO server endpoint
+        minio_port: MinIO server port
+        minio_access_key: MinIO access key
+        minio_secret_key: MinIO secret key
+        max_workers: Concurrent chunk uploads per flight
+
+    Returns:
+        Dict[str, Any]: Counts of indexed and failed flights
+    """
+    run_logger = get_run_logger()
+    s3_client = get_s3_client(
+        f"http://{minio_endpoint}:{minio_port}",
+        minio_access_key,
+        minio_secret_key
+    )
+
+    project = ProjectIndex.load(s3_client, bucket_name, index_prefix)
+    indexed, failed = 0, 0
+    for spec in flights or []:
+        flight_id = spec["flight_id"]
+        try:
+            flight_index = build_flight_index(
+                s3_client, bucket_name, spec["output_prefix"], chunks_per_axis, conf_percentile, max_workers
+            )
+        except Exception as e:
+            run_logger.warning(f"Could not index flight {flight_id}: {e}")
+            failed += 1
+            continue
+        project.upsert(
+            flight_id,
+            spec["output_prefix"],
+            spec["latitude"],
+            spec["longitude"],
+            spec.get("altitude"),
+            spec.get("radius_m", DEFAULT_FLIGHT_RADIUS_M),
+            flight_index
+        )
+        indexed += 1
+    project.save()
+
+    run_logger.info("📊 Spatial Index Summary:")
+    run_logger.info(f"Flights indexed: {indexed} ({failed} failed), {len(project.flights)} in project index")
+    return {'flights_indexed': indexed, 'flights_failed': failed, 'flights_total': len(project.flights)}
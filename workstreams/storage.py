@@ -0,0 +1,136 @@
+"""Shared S3 client factory for the workstreams."""
+import os
+import threading
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger("storage")
+
+DEFAULT_REGION = "us-east-1"
+
+
+@dataclass(frozen=True)
+class S3ClientSettings:
+    """
+    Connection settings for S3 clients.
+
+    The botocore default of 10 pooled connections serializes any transfer with more than
+    10 workers, so the default here is sized for parallel uploads and downloads.
+
+    Attributes:
+        max_pool_connections: Size of the HTTP connection pool per client
+        connect_timeout: Seconds to wait for a connection
+        read_timeout: Seconds to wait for data on an open connection
+        retry_mode: botocore retry mode ("standard", "adaptive" or "legacy")
+        max_attempts: Total attempts per request, including the first
+        tcp_keepalive: Enable TCP keep-alive on pooled connections
+    """
+    max_pool_connections: int = 64
+    connect_timeout: float = 5.0
+    read_timeout: float = 60.0
+    retry_mode: str = "standard"
+    max_attempts: int = 5
+    tcp_keepalive: bool = True
+
+    @classmethod
+    def from_env(cls) -> "S3ClientSettings":
+        """Defaults overridden by S3_MAX_POOL_CONNECTIONS, S3_CONNECT_TIMEOUT, S3_READ_TIMEOUT,
+        S3_RETRY_MODE and S3_MAX_ATTEMPTS."""
+        defaults = cls()
+        return cls(
+            max_pool_connections=int(os.environ.get("S3_MAX_POOL_CONNECTIONS", defaults.max_pool_connections)),
+            connect_timeout=float(os.environ.get("S3_CONNECT_TIMEOUT", defaults.connect_timeout)),
+            read_timeout=float(os.environ.get("S3_READ_TIMEOUT", defaults.read_timeout)),
+            retry_mode=os.environ.get("S3_RETRY_MODE", defaults.retry_mode),
+            max_attempts=int(os.environ.get("S3_MAX_ATTEMPTS", defaults.max_attempts)),
+        )
+
+
+# One client per (endpoint, credentials, region, settings) per process. boto3 clients are
+# thread-safe, so every task and thread in the process shares the same connection pool.
+_clients: Dict[Tuple, Any] = {}
+_clients_lock = threading.Lock()
+
+
+def get_s3_client(
+    endpoint_url: str,
+    access_key: str = "minioadmin",
+    secret_key: str = "minioadmin",
+    region_name: str = DEFAULT_REGION,
+    settings: Optional[S3ClientSettings] = None
+):
+    """
+    Return the process-wide S3 client for an endpoint and set of credentials.
+
+    Args:
+        endpoint_url: The URL of the S3/MinIO server, e.g. "http://minio:9000"
+        access_key: Access key
+        secret_key: Secret key
+        region_name: AWS region name (not actually used by MinIO but required by boto3)
+        settings: Pool size, timeouts and retries. If None, uses S3ClientSettings.from_env().
+
+    Returns:
+        boto3.client: Configured S3 client, shared with other callers using the same arguments
+    """
+    settings = settings or S3ClientSettings.from_env()
+    key = (endpoint_url, access_key, secret_key, region_name, settings)
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            # Imported here so that modules using the factory stay cheap to import
+            import boto3
+            from botocore.client import Config
+
+            logger.info(f"Creating S3 client for {endpoint_url} "
+                        f"(pool={settings.max_pool_connections}, retries={settings.retry_mode}/{settings.max_attempts})")
+            # A dedicated session, since the default boto3 session is not thread-safe
+            client = boto3.session.Session().client(
+                's3',
+                endpoint_url=endpoint_url,
+                aws_access_key_id=access_key,
+                aws_secret_access_key=secret_key,
+                region_name=region_name,
+                config=Config(
+                    signature_version='s3v4',
+                    max_pool_connections=settings.max_pool_connections,
+                    connect_timeout=settings.connect_timeout,
+                    read_timeout=settings.read_timeout,
+                    retries={'mode': settings.retry_mode, 'total_max_attempts': settings.max_attempts},
+                    tcp_keepalive=settings.tcp_keepalive
+                )
+            )
+            _clients[key] = client
+    return client
+
+
+def get_transfer_config(settings: Optional[S3ClientSettings] = None, max_concurrency: Optional[int] = None):
+    """
+    Transfer settings for upload_file/download_file that fit inside the client's pool.
+
+    Args:
+        settings: Client settings the transfers will run on
+        max_concurrency: Threads per transfer. If None, a quarter of the pool so several
+            transfers can run side by side.
+
+    Returns:
+        boto3.s3.transfer.TransferConfig
+    """
+    from boto3.s3.transfer import TransferConfig
+
+    settings = settings or S3ClientSettings.from_env()
+    if max_concurrency is None:
+        max_concurrency = max(1, settings.max_pool_connections // 4)
+    return TransferConfig(
+        multipart_threshold=16 * 1024 * 1024,
+        multipart_chunksize=16 * 1024 * 1024,
+        max_concurrency=max_concurrency
+    )
+
+
+def clear_s3_clients():
+    """Drop all cached clients, e.g. after a fork or when credentials rotate."""
+    with _clients_lock:
+        _clients.clear()
@@ -0,0 +1,313 @@
+"""Async S3 storage backend (aiobotocore) for the workstreams."""
+import asyncio
+import logging
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+from storage import DEFAULT_REGION, S3ClientSettings
+
+# Configure logging
+logger = logging.getLogger("storage_async")
+
+DEFAULT_PART_SIZE = 16 * 1024 * 1024
+
+
+class AsyncS3Storage:
+    """
+    Async S3 client for listing, streaming reads, writes, multipart uploads and copies.
+
+    Runs every request on the event loop, so S3 calls can share a loop with httpx API calls
+    and keep thousands of operations in flight without a thread per request. A semaphore
+    caps concurrent requests at ``max_concurrency``.
+
+    Streams from get_stream hold their connection until they are drained or closed, for as
+    long as the consumer takes, so they are counted separately: at most ``max_open_streams``
+    are open at once, and the HTTP pool has room for those on top of ``max_concurrency``
+    requests. Piping streams into put or upload_multipart on the same instance therefore
+    always finds a connection for the upload. Opening more streams than
+    ``max_open_streams`` and needing all of them to make progress at once (e.g. merging
+    them) still blocks.
+
+    Usage:
+        async with AsyncS3Storage("http://minio:9000") as storage:
+            async for obj in storage.list_objects("skystore", "dropbox/"):
+                ...
+    """
+
+    def __init__(
+        self,
+        endpoint_url: str,
+        access_key: str = "minioadmin",
+        secret_key: str = "minioadmin",
+        region_name: str = DEFAULT_REGION,
+        settings: Optional[S3ClientSettings] = None,
+        max_concurrency: Optional[int] = None,
+        max_open_streams: Optional[int] = None
+    ):
+        """
+        Args:
+            endpoint_url: The URL of the S3/MinIO server
+            access_key: Access key
+            secret_key: Secret key
+            region_name: AWS region name (not actually used by MinIO but required by botocore)
+            settings: Pool size, timeouts and retries. If None, uses S3ClientSettings.from_env().
+            max_concurrency: Maximum in-flight requests. If None, the pool size.
+            max_open_streams: Maximum streams from get_stream open at once. If None,
+                max_concurrency.
+        """
+        self.endpoint_url = endpoint_url
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region_name = region_name
+        self.settings = settings or S3ClientSettings.from_env()
+        self.max_concurrency = max_concurrency or self.settings.max_pool_connections
+        self.max_open_streams = max_open_streams or self.max_concurrency
+        self._client_context = None
+        self._client = None
+        self._semaphore = None
+        self._streams = None
+
+    async def __aenter__(self) -> "AsyncS3Storage":
+        # Imported here so that modules using the backend stay cheap to import
+        from aiobotocore.session import get_session
+        from aiobotocore.config import AioConfig
+
+        self._client_context = get_session().create_client(
+            's3',
+            endpoint_url=self.endpoint_url,
+            aws_access_key_id=self.access_key,
+            aws_secret_access_key=self.secret_key,
+            region_name=self.region_name,
+            config=AioConfig(
+                signature_version='s3v4',
+                # Open streams keep their connections, so they get their own share
+                max_pool_connections=self.max_concurrency + self.max_open_streams,
+                connect_timeout=self.settings.connect_timeout,
+                read_timeout=self.settings.read_timeout,
+                retries={'mode': self.settings.retry_mode, 'total_max_attempts': self.settings.max_attempts}
+            )
+        )
+        self._client = await self._client_context.__aenter__()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._streams = asyncio.Semaphore(self.max_open_streams)
+        logger.info(f"Opened async S3 client for {self.endpoint_url} (max in-flight {self.max_concurrency}, "
+                    f"max open streams {self.max_open_streams})")
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._client_context.__aexit__(exc_type, exc, tb)
+        self._client = None
+
+    @property
+    def client(self):
+        """The underlying aiobotocore client, for calls not wrapped here."""
+        if self._client is None:
+            raise RuntimeError("AsyncS3Storage must be used as an async context manager")
+        return self._client
+
+    async def head_bucket(self, bucket: str) -> Dict[str, Any]:
+        """Check that a bucket exists and is accessible."""
+        async with self._semaphore:
+            return await self.client.head_bucket(Bucket=bucket)
+
+    async def list_objects(self, bucket: str, prefix: str = "") -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield every object under a prefix.
+
+        Args:
+            bucket: Bucket name
+            prefix: Key prefix
+
+        Yields:
+            Dict[str, Any]: Object entries with Key, Size, LastModified and ETag
+        """
+        paginator = self.client.get_paginator('list_objects_v2')
+        async for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                yield obj
+
+    async def list_level(
+        self,
+        bucket: str,
+        prefix: str = "",
+        delimiter: str = "/"
+    ) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """
+        List one level below a prefix: its "folders" and the objects directly inside it.
+
+        Args:
+            bucket: Bucket name
+            prefix: Key prefix, usually ending with the delimiter
+            delimiter: Folder delimiter
+
+        Returns:
+            Tuple containing:
+                - Common prefixes, e.g. ["dropbox/user1/", "dropbox/user2/"]
+                - Object entries directly under the prefix
+        """
+        prefixes, objects = [], []
+        paginator = self.client.get_paginator('list_objects_v2')
+        async for page in paginator.paginate(Bucket=bucket, Prefix=prefix, Delimiter=delimiter):
+            prefixes.extend(p['Prefix'] for p in page.get('CommonPrefixes', []))
+            objects.extend(page.get('Contents', []))
+        return prefixes, objects
+
+    async def get_stream(self, bucket: str, key: str, chunk_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
+        """
+        Stream an object's body in chunks without holding it in memory.
+
+        The stream takes one of max_open_streams slots until it is drained or closed, not a
+        request permit, so other calls on this instance proceed while it is consumed.
+
+        Args:
+            bucket: Bucket name
+            key: Object key
+            chunk_size: Bytes per chunk
+
+        Yields:
+            bytes: Consecutive chunks of the object
+        """
+        async with self._streams:
+            response = await self.client.get_object(Bucket=bucket, Key=key)
+            body = response['Body']
+            try:
+                while True:
+                    chunk = await body.read(chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+            finally:
+                body.close()
+
+    async def get(self, bucket: str, key: str) -> bytes:
+        """Read a whole object into memory."""
+        async with self._semaphore:
+            response = await self.client.get_object(Bucket=bucket, Key=key)
+            async with response['Body'] as body:
+                return await body.read()
+
+    async def put(
+        self,
+        bucket: str,
+        key: str,
+        body: bytes,
+        content_type: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Write an object in a single request."""
+        kwargs = {'Bucket': bucket, 'Key': key, 'Body': body}
+        if content_type:
+            kwargs['ContentType'] = content_type
+        async with self._semaphore:
+            return await self.client.put_object(**kwargs)
+
+    async def upload_multipart(
+        self,
+        bucket: str,
+        key: str,
+        data: Union[bytes, memoryview, AsyncIterable[bytes]],
+        part_size: int = DEFAULT_PART_SIZE,
+        content_type: Optional[str] = None,
+        max_parallel_parts: int = 8
+    ) -> Dict[str, Any]:
+        """
+        Upload an object as a multipart upload, sending parts concurrently.
+
+        ``data`` may be a bytes-like buffer or an async iterable of chunks (e.g. another
+        object's get_stream), which is re-chunked into ``part_size`` parts. Small buffers
+        fall back to a single put. The upload is aborted if any part fails.
+
+        Args:
+            bucket: Bucket name
+            key: Object key
+            data: Buffer or async iterable of chunks
+            part_size: Bytes per part (S3 minimum is 5 MiB, except the last part)
+            content_type: Optional Content-Type
+            max_parallel_parts: Parts uploaded at the same time for this object
+
+        Returns:
+            Dict[str, Any]: The CompleteMultipartUpload (or PutObject) response
+        """
+        if isinstance(data, (bytes, bytearray, memoryview)) and len(data) <= part_size:
+            return await self.put(bucket, key, bytes(data), content_type)
+
+        kwargs = {'Bucket': bucket, 'Key': key}
+        if content_type:
+            kwargs['ContentType'] = content_type
+        async with self._semaphore:
+            upload = await self.client.create_multipart_upload(**kwargs)
+        upload_id = upload['UploadId']
+
+        parts_limiter = asyncio.Semaphore(max_parallel_parts)
+        tasks = []
+
+        async def send_part(number: int, payload: bytes) -> Dict[str, Any]:
+            try:
+                async with self._semaphore:
+                    response = await self.client.upload_part(
+                        Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=payload
+                    )
+                return {'PartNumber': number, 'ETag': response['ETag']}
+            finally:
+                parts_limiter.release()
+
+        try:
+            number = 0
+            async for payload in _iter_parts(data, part_size):
+                number += 1
+                # Bound the parts held in memory, not just the ones in flight
+                await parts_limiter.acquire()
+                tasks.append(asyncio.ensure_future(send_part(number, payload)))
+            if not tasks:
+                # An empty stream, but a multipart upload needs at least one part
+                async with self._semaphore:
+                    await self.client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+                return await self.put(bucket, key, b"", content_type)
+            parts = await asyncio.gather(*tasks)
+            async with self._semaphore:
+                return await self.client.complete_multipart_upload(
+                    Bucket=bucket, Key=key, UploadId=upload_id, MultipartUpload={'Parts': parts}
+                )
+        except BaseException:
+            for pending in tasks:
+                pending.cancel()
+            logger.error(f"Multipart upload of s3://{bucket}/{key} failed, aborting")
+            async with self._semaphore:
+                await self.client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+            raise
+
+    async def copy(
+        self,
+        bucket: str,
+        source_key: str,
+        destination_key: str,
+        source_bucket: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Server-side copy of an object (up to 5 GB) without moving bytes through the client."""
+        async with self._semaphore:
+            return await self.client.copy_object(
+                Bucket=bucket,
+                Key=destination_key,
+                CopySource={'Bucket': source_bucket or bucket, 'Key': source_key}
+            )
+
+    async def delete(self, bucket: str, key: str) -> Dict[str, Any]:
+        """Delete an object."""
+        async with self._semaphore:
+            return await self.client.delete_object(Bucket=bucket, Key=key)
+
+
+async def _iter_parts(data: Union[bytes, memoryview, AsyncIterable[bytes]], part_size: int) -> AsyncIterator[bytes]:
+    """Split a buffer or re-chunk an async stream into parts of part_size bytes."""
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        view = memoryview(data)
+        for offset in range(0, len(view), part_size):
+            yield bytes(view[offset:offset + part_size])
+        return
+
+    buffer = bytearray()
+    async for chunk in data:
+        buffer.extend(chunk)
+        while len(buffer) >= part_size:
+            yield bytes(buffer[:part_size])
+            del buffer[:part_size]
+    if buffer:
+        yield bytes(buffer)
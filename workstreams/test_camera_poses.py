@@ -0,0 +1,124 @@
+"""Camera pose export: quaternion round-trips, pose columns, COLMAP text and reading back."""
+from io import BytesIO
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from camera_poses import (
+    load_poses,
+    parse_poses,
+    poses_from_cameras,
+    quaternion_to_rotation,
+    rotation_to_quaternion,
+    to_colmap_text,
+    write_poses,
+)
+
+
+class MemoryS3:
+    """put_object/get_object on a dict, with NoSuchKey like boto3."""
+
+    class exceptions:
+        class NoSuchKey(Exception):
+            pass
+
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[Key] = bytes(Body)
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise self.exceptions.NoSuchKey(Key)
+        return {'Body': BytesIO(self.objects[Key])}
+
+
+def _random_rotations(count: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    quaternions = rng.normal(size=(count, 4))
+    quaternions /= np.linalg.norm(quaternions, axis=-1, keepdims=True)
+    return quaternion_to_rotation(quaternions)
+
+
+def _axis_rotation(axis: int, angle: float):
+    rotation = np.eye(3)
+    i, j = [k for k in range(3) if k != axis]
+    rotation[i, i] = rotation[j, j] = np.cos(angle)
+    rotation[i, j], rotation[j, i] = -np.sin(angle), np.sin(angle)
+    return rotation
+
+
+def test_quaternion_round_trip():
+    rotations = _random_rotations(500)
+    quaternions = rotation_to_quaternion(rotations)
+
+    assert quaternions.shape == (500, 4)
+    assert np.allclose(np.linalg.norm(quaternions, axis=-1), 1.0)
+    assert (quaternions[:, 0] >= 0).all()
+    assert np.allclose(quaternion_to_rotation(quaternions), rotations, atol=1e-12)
+
+
+@pytest.mark.parametrize("axis", [0, 1, 2])
+@pytest.mark.parametrize("angle", [0.0, np.pi / 2, np.pi - 1e-9, np.pi])
+def test_quaternion_round_trip_near_half_turns(axis, angle):
+    rotation = _axis_rotation(axis, angle)
+    quaternion = rotation_to_quaternion(rotation)
+
+    assert np.isfinite(quaternion).all()
+    assert np.allclose(quaternion_to_rotation(quaternion), rotation, atol=1e-9)
+
+
+def _cameras(count: int = 4):
+    rng = np.random.default_rng(1)
+    extrinsic = np.concatenate((_random_rotations(count, seed=2), rng.normal(size=(count, 3, 1))), axis=2)
+    intrinsic = np.tile(np.array([[300.0, 0, 259], [0, 310.0, 147], [0, 0, 1]]), (count, 1, 1))
+    return extrinsic, intrinsic
+
+
+def test_pose_columns():
+    extrinsic, intrinsic = _cameras()
+    poses = poses_from_cameras(extrinsic, intrinsic, (294, 518), names=[f"img{i}.jpg" for i in range(4)])
+
+    rotation, translation = extrinsic[:, :, :3], extrinsic[:, :, 3]
+    for index in range(4):
+        # The center maps to the camera origin
+        assert np.allclose(rotation[index] @ poses["center"][index] + translation[index], 0)
+    assert list(poses["name"]) == ["img0.jpg", "img1.jpg", "img2.jpg", "img3.jpg"]
+    assert (poses["width"] == 518).all() and (poses["height"] == 294).all()
+    assert np.allclose(poses["fy"], 310.0)
+
+    with pytest.raises(ValueError):
+        poses_from_cameras(extrinsic, intrinsic, (294, 518), names=["only-one.jpg"])
+
+
+def test_colmap_text():
+    extrinsic, intrinsic = _cameras(2)
+    text = to_colmap_text(poses_from_cameras(extrinsic, intrinsic, (294, 518)))
+
+    cameras = [line for line in text["cameras.txt"].splitlines() if not line.startswith("#")]
+    assert cameras[1].split()[:4] == ["2", "PINHOLE", "518", "294"]
+    images = [line for line in text["images.txt"].splitlines() if not line.startswith("#")]
+    # Two lines per image; the second (observations) stays empty
+    assert len(images) == 4 and images[1] == ""
+    fields = images[2].split()
+    assert fields[0] == "2" and fields[8] == "2" and fields[9] == "000001"
+    qvec = np.array([float(value) for value in fields[1:5]])
+    assert np.allclose(quaternion_to_rotation(qvec), extrinsic[1, :, :3], atol=1e-8)
+
+
+def test_written_poses_read_back():
+    s3 = MemoryS3()
+    extrinsic, intrinsic = _cameras()
+    write_poses(s3, "bucket", "runs/1", poses_from_cameras(extrinsic, intrinsic, (294, 518)))
+
+    assert "runs/1/colmap/points3D.txt" in s3.objects
+    flights = load_poses(s3, "bucket", ["runs/1", "runs/missing"])
+
+    assert list(flights) == ["runs/1"]
+    poses = flights["runs/1"]
+    assert len(poses) == 4
+    assert np.allclose(poses.extrinsics, extrinsic)
+    assert np.allclose(poses.intrinsics, intrinsic)
+    assert np.allclose(parse_poses("runs/1", s3.objects["runs/1/poses.npz"]).centers, poses.centers)
@@ -2,11 +2,11 @@
 import os
 import sys
 import asyncio
-import boto3
 import httpx
 import logging
 import mimetypes
-from botocore.client import Config
+from progress import ProgressReporter
+from storage import get_s3_client
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -28,13 +28,10 @@ API_CONFIG = {
 def get_s3():
     """Get S3 client for local MinIO."""
     logger.info(f"Connecting to MinIO at {MINIO_CONFIG['endpoint']}")
-    return boto3.client(
-        's3',
-        endpoint_url=f"http://{MINIO_CONFIG['endpoint']}",
-        aws_access_key_id=MINIO_CONFIG['access_key'],
-        aws_secret_access_key=MINIO_CONFIG['secret_key'],
-        region_name="us-east-1",
-        config=Config(signature_version='s3v4')
+    return get_s3_client(
+        f"http://{MINIO_CONFIG['endpoint']}",
+        MINIO_CONFIG['access_key'],
+        MINIO_CONFIG['secret_key']
     )
 def list_files():
     """List all files in dropbox directories."""
@@ -60,14 +57,14 @@ def list_files():
                             'size': obj['Size'],
                             'last_modified': obj['LastModified']
                         })
-                        logger.info(f"Found file: {key} ({obj['Size']} bytes)")
+                        logger.debug(f"Found file: {key} ({obj['Size']} bytes)")
     except Exception as e:
         logger.error(f"Error listing files: {e}")
         raise
     
     return files
 
-async def create_asset(client: httpx.AsyncClient, file_info: dict):
+async def create_asset(client: httpx.AsyncClient, file_info: dict, progress: ProgressReporter):
     """Create an asset record for a file."""
     file_path = file_info['key']
     try:
@@ -78,7 +75,7 @@ async def create_asset(client: httpx.AsyncClient, file_info: dict):
         filename = os.path.basename(file_path)
         mime_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
         
-        logger.info(f"Creating asset for {filename} (type: {mime_type}, size: {file_info['size']} bytes)")
+        logger.debug(f"Creating asset for {filename} (type: {mime_type}, size: {file_info['size']} bytes)")
         
         # Create asset
         response = await client.post(
@@ -94,12 +91,13 @@ async def create_asset(client: httpx.AsyncClient, file_info: dict):
         )
         
         if response.is_success:
-            logger.info(f"Created asset for {filename}")
+            logger.debug(f"Created asset for {filename}")
+            progress.update("created")
         else:
-            logger.error(f"Failed to create asset for {filename}: {response.text}")
+            progress.failure(f"Failed to create asset for {filename}: {response.text}")
             
     except Exception as e:
-        logger.error(f"Error processing {file_path}: {e}")
+        progress.failure(f"Error processing {file_path}: {e}")
 
 async def main():
     """Main function."""
@@ -119,10 +117,12 @@ async def main():
             timeout=30.0
         ) as client:
             # Process all files concurrently
+            progress = ProgressReporter(logger, "Creating assets", total=len(files))
             await asyncio.gather(*[
-                create_asset(client, file_info) 
+                create_asset(client, file_info, progress) 
                 for file_info in files
             ])
+            progress.finish()
             
         logger.info("Processing completed")
         
@@ -0,0 +1,203 @@
+"""FairScheduler: deficit round-robin order, weights, costs and concurrency caps."""
+import asyncio
+
+import pytest
+
+from fair_scheduler import FairScheduler, dropbox_tenant, parse_weights, run_fair
+
+
+def _drain(scheduler: FairScheduler):
+    """Start items until next() returns None; returns their items in order."""
+    started = []
+    job = scheduler.next()
+    while job is not None:
+        started.append(job)
+        job = scheduler.next()
+    return started
+
+
+def test_tenants_take_turns():
+    scheduler = FairScheduler(concurrency=100, tenant_concurrency=None, weights={})
+    for index in range(5):
+        scheduler.put("heavy", f"h{index}")
+    scheduler.put("small", "s0")
+    scheduler.put("other", "o0")
+
+    order = [job.item for job in _drain(scheduler)]
+
+    # The small uploads start within the first round instead of after the heavy folder
+    assert order == ["h0", "s0", "o0", "h1", "h2", "h3", "h4"]
+
+
+def test_weights_and_costs_set_the_share():
+    scheduler = FairScheduler(concurrency=100, tenant_concurrency=None, weights={"a": 2})
+    for index in range(4):
+        scheduler.put("a", f"a{index}")
+        scheduler.put("b", f"b{index}")
+    order = [job.item for job in _drain(scheduler)]
+    assert order[:6] == ["a0", "a1", "b0", "a2", "a3", "b1"]
+
+    scheduler = FairScheduler(concurrency=100, tenant_concurrency=None, weights={})
+    scheduler.put("big", "big0", cost=3)
+    scheduler.put("big", "big1", cost=3)
+    for index in range(4):
+        scheduler.put("small", f"s{index}")
+    order = [job.item for job in _drain(scheduler)]
+    # An item costing 3 waits for three turns of deficit
+    assert order == ["s0", "s1", "big0", "s2", "s3", "big1"]
+
+
+def test_concurrency_caps():
+    scheduler = FairScheduler(concurrency=4, tenant_concurrency=2, weights={"a": 2})
+    for index in range(4):
+        scheduler.put("a", f"a{index}")
+    scheduler.put("b", "b0")
+    scheduler.put("c", "c0")
+
+    first = _drain(scheduler)
+    assert [job.item for job in first] == ["a0", "a1", "b0", "c0"]
+    assert scheduler.in_flight == 4 and scheduler.pending == 2
+
+    # A free global slot still leaves "a" at its tenant cap
+    scheduler.done(first[2])
+    assert scheduler.next() is None
+
+    scheduler.done(first[0])
+    assert [job.item for job in _drain(scheduler)] == ["a2"]
+
+
+def test_idle_after_everything_is_done():
+    scheduler = FairScheduler(concurrency=2, weights={})
+    assert scheduler.idle
+    scheduler.put("a", 1)
+    assert not scheduler.idle
+    job = scheduler.next()
+    assert not scheduler.idle
+    scheduler.done(job)
+    assert scheduler.idle and scheduler.next() is None
+
+
+def test_rejects_non_positive_weights():
+    with pytest.raises(ValueError):
+        FairScheduler(weights={"a": 0})
+
+
+@pytest.mark.parametrize("tenant_concurrency", [0, -1])
+def test_rejects_tenant_concurrency_below_one(tenant_concurrency):
+    with pytest.raises(ValueError, match="tenant_concurrency"):
+        FairScheduler(tenant_concurrency=tenant_concurrency, weights={})
+
+
+def test_run_fair_runs_every_item_within_the_caps():
+    scheduler = FairScheduler(concurrency=3, tenant_concurrency=2, weights={})
+    running = {"total": 0, "peak": 0}
+    tenant_peak = {}
+    tenant_running = {}
+    finished = []
+
+    async def worker(item):
+        tenant = dropbox_tenant(item)
+        running["total"] += 1
+        tenant_running[tenant] = tenant_running.get(tenant, 0) + 1
+        running["peak"] = max(running["peak"], running["total"])
+        tenant_peak[tenant] = max(tenant_peak.get(tenant, 0), tenant_running[tenant])
+        await asyncio.sleep(0.001)
+        running["total"] -= 1
+        tenant_running[tenant] -= 1
+        finished.append(item)
+        first_done.set()
+
+    async def producer():
+        for index in range(10):
+            scheduler.put("heavy", f"dropbox/heavy/{index}.jpg")
+        # Arrives while the heavy folder is being worked through
+        await first_done.wait()
+        scheduler.put("late", "dropbox/late/0.jpg")
+
+    first_done = asyncio.Event()
+
+    asyncio.run(run_fair(scheduler, worker, producer()))
+
+    assert len(finished) == 11 and scheduler.idle
+    assert running["peak"] <= 3
+    assert max(tenant_peak.values()) <= 2
+    # The late upload does not wait for the heavy folder to finish
+    assert finished.index("dropbox/late/0.jpg") < 10
+
+
+def test_run_fair_raises_producer_errors_after_draining():
+    scheduler = FairScheduler(concurrency=2, weights={})
+    finished = []
+
+    async def worker(item):
+        finished.append(item)
+
+    async def producer():
+        scheduler.put("a", "a0")
+        raise RuntimeError("listing failed")
+
+    with pytest.raises(RuntimeError, match="listing failed"):
+        asyncio.run(run_fair(scheduler, worker, producer()))
+    assert finished == ["a0"]
+
+
+def test_run_fair_logs_worker_errors_and_keeps_going(caplog):
+    scheduler = FairScheduler(concurrency=2, weights={})
+    finished = []
+
+    async def worker(item):
+        if item == "a1":
+            raise RuntimeError("upload failed")
+        finished.append(item)
+
+    async def producer():
+        for index in range(3):
+            scheduler.put("a", f"a{index}")
+
+    with caplog.at_level("ERROR", logger="fair_scheduler"):
+        asyncio.run(run_fair(scheduler, worker, producer()))
+
+    assert finished == ["a0", "a2"] and scheduler.idle
+    assert "upload failed" in caplog.text
+
+
+def test_cancelling_run_fair_cancels_producer_and_workers():
+    scheduler = FairScheduler(concurrency=2, weights={})
+    cancelled = []
+
+    async def worker(item):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(item)
+            raise
+
+    async def producer():
+        scheduler.put("a", "a0")
+        scheduler.put("b", "b0")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append("producer")
+            raise
+
+    async def main():
+        fair = asyncio.ensure_future(run_fair(scheduler, worker, producer()))
+        await asyncio.sleep(0.01)
+        fair.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await fair
+        # Nothing is left running once run_fair has returned
+        assert [task for task in asyncio.all_tasks() if task is not asyncio.current_task()] == []
+
+    asyncio.run(main())
+
+    assert sorted(cancelled) == ["a0", "b0", "producer"]
+    assert scheduler.in_flight == 0
+
+
+def test_dropbox_tenant_and_weight_parsing():
+    assert dropbox_tenant("dropbox/user-a/flight/0001.jpg") == "user-a"
+    assert dropbox_tenant("dropbox/loose.jpg") == ""
+    assert parse_weights(" user-a=2, user-b=0.5,") == {"user-a": 2.0, "user-b": 0.5}
+    assert parse_weights(None) == {}
@@ -0,0 +1,57 @@
+"""Check that importing the flow modules stays fast and does not pull in heavy dependencies."""
+import json
+import os
+import subprocess
+import sys
+
+# Seconds allowed on top of importing prefect itself, which every flow module needs anyway
+IMPORT_BUDGET_SECONDS = float(os.environ.get("IMPORT_BUDGET_SECONDS", "0.5"))
+
+# Modules that must only be imported once a task actually runs
+HEAVY_MODULES = ["torch", "torchvision", "numpy", "PIL", "boto3", "botocore", "vggt", "safetensors"]
+
+FLOW_MODULES = ["vggt_s3_task", "vggt_batch"]
+
+_PROBE = """
+import json, sys, time
+import prefect
+before = set(sys.modules)
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+loaded = {{name.split('.')[0] for name in set(sys.modules) - before}}
+print(json.dumps({{'seconds': elapsed, 'loaded': sorted(loaded)}}))
+"""
+
+
+def measure_import(module: str) -> dict:
+    """Import a module in a fresh interpreter and report its import time and new top-level modules."""
+    proc = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def test_flow_modules_import_lazily():
+    """Flow modules import within budget and leave torch, numpy, boto3 and VGGT unloaded."""
+    for module in FLOW_MODULES:
+        result = measure_import(module)
+        heavy = [name for name in HEAVY_MODULES if name in result['loaded']]
+        assert not heavy, f"Importing {module} eagerly loaded {heavy}"
+        assert result['seconds'] <= IMPORT_BUDGET_SECONDS, (
+            f"Importing {module} took {result['seconds']:.3f}s, budget is {IMPORT_BUDGET_SECONDS:.3f}s"
+        )
+
+
+if __name__ == "__main__":
+    failed = False
+    for module in FLOW_MODULES:
+        result = measure_import(module)
+        heavy = [name for name in HEAVY_MODULES if name in result['loaded']]
+        ok = not heavy and result['seconds'] <= IMPORT_BUDGET_SECONDS
+        failed = failed or not ok
+        print(f"{'OK  ' if ok else 'FAIL'} {module}: {result['seconds']:.3f}s "
+              f"(budget {IMPORT_BUDGET_SECONDS:.3f}s), heavy modules loaded: {heavy or 'none'}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,217 @@
+"""Keyframe selection: duplicate dropping, time gaps, frame budgets and the cheap signals."""
+import struct
+from io import BytesIO
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from keyframes import (
+    HEADER_BYTES,
+    FrameInfo,
+    _exif_from_header,
+    dhash,
+    estimate_savings,
+    parse_exif,
+    read_frame_info,
+    select_keyframes,
+)
+
+# About 1.1 m of latitude
+STEP_DEG = 1e-5
+
+
+def _frames(count: int, hashes=None, step_deg: float = STEP_DEG, seconds: float = 2.0):
+    """Frames along a straight north-bound line, one every `seconds`."""
+    return [
+        FrameInfo(
+            index=index,
+            s3_path=f"assets/flight/{index:04d}.jpg",
+            timestamp=1_700_000_000 + index * seconds,
+            gps=(52.0 + index * step_deg, 4.0, 100.0),
+            dhash=hashes[index] if hashes is not None else 0,
+        )
+        for index in range(count)
+    ]
+
+
+def test_near_duplicates_are_dropped():
+    # Same look, ~1.1 m apart: every other frame is within 2 m of the last kept one
+    kept = select_keyframes(_frames(10))
+    assert [frame.index for frame in kept] == [0, 2, 4, 6, 8]
+
+
+def test_different_looking_frames_are_kept():
+    hashes = [0, 0xFF, 0, 0xFF00, 0xFF00]
+    kept = select_keyframes(_frames(5, hashes=hashes, step_deg=0))
+    assert [frame.index for frame in kept] == [0, 1, 2, 3]
+
+
+def test_time_gap_starts_a_new_segment():
+    frames = _frames(4, step_deg=0)
+    frames[3].timestamp += 600
+    kept = select_keyframes(frames)
+    assert [frame.index for frame in kept] == [0, 3]
+
+
+def test_frames_without_signals_are_kept():
+    frames = [FrameInfo(index=index, s3_path=f"{index}.jpg") for index in range(3)]
+    assert select_keyframes(frames) == frames
+
+
+def test_budget_spreads_frames_over_the_flight():
+    # 100 m apart, so none are duplicates; the budget keeps both ends and the middle
+    frames = _frames(11, step_deg=100 * STEP_DEG)
+    kept = select_keyframes(frames, max_frames=3)
+    assert [frame.index for frame in kept] == [0, 5, 10]
+
+    for frame in frames:
+        frame.gps = None
+    kept = select_keyframes(frames, max_frames=3, min_hash_distance=0)
+    assert [frame.index for frame in kept] == [0, 5, 10]
+
+
+def test_capture_order_wins_over_listing_order():
+    frames = _frames(3, hashes=[0, 0xFFFF, 0], step_deg=0)
+    frames[1].timestamp, frames[2].timestamp = frames[2].timestamp, frames[1].timestamp
+    # In capture order 0 and 2 are adjacent and identical
+    kept = select_keyframes(frames)
+    assert [frame.index for frame in kept] == [0, 1]
+
+
+def test_estimate_savings():
+    assert estimate_savings(100, 50) == {"linear": 0.5, "global_attention": 0.75}
+    assert estimate_savings(0, 0) == {"linear": 0.0, "global_attention": 0.0}
+
+
+def _gradient(size=(64, 48), reverse=False) -> "Image.Image":
+    """Horizontal brightness ramp, dark to light or light to dark."""
+    turn = Image.Transpose.ROTATE_90 if reverse else Image.Transpose.ROTATE_270
+    return Image.linear_gradient("L").transpose(turn).resize(size).convert("RGB")
+
+
+def test_dhash_separates_different_images():
+    first = dhash(_gradient())
+    assert dhash(_gradient(size=(128, 96))) == first
+    assert bin(dhash(_gradient(reverse=True)) ^ first).count("1") > 32
+
+
+def _jpeg_with_exif(thumbnail: bytes = None) -> bytes:
+    """A JPEG with capture time and GPS, and optionally an IFD1 thumbnail like cameras write."""
+    exif = Image.Exif()
+    exif[306] = "2024:05:01 10:00:00"
+    gps = exif.get_ifd(0x8825)
+    gps.update({1: "S", 2: (33.0, 30.0, 0.0), 3: "E", 4: (151.0, 12.0, 36.0), 5: 0, 6: 120.5})
+    data = exif.tobytes()
+    if thumbnail is not None:
+        data = _with_ifd1_thumbnail(data, thumbnail)
+    buffer = BytesIO()
+    _gradient().save(buffer, "JPEG", exif=data)
+    return buffer.getvalue()
+
+
+def _with_ifd1_thumbnail(exif: bytes, thumbnail: bytes) -> bytes:
+    """Append IFD1 with JPEGInterchangeFormat(Length) to EXIF bytes from Pillow."""
+    tiff = bytearray(exif[6:])
+    order, fmt = ("little", "<") if tiff[:2] == b"II" else ("big", ">")
+    next_ifd = 10 + 12 * int.from_bytes(tiff[8:10], order)
+    tiff += b"\x00" * (len(tiff) % 2)
+    ifd1 = len(tiff)
+    tiff[next_ifd:next_ifd + 4] = ifd1.to_bytes(4, order)
+    data_offset = ifd1 + 2 + 2 * 12 + 4
+    tiff += (2).to_bytes(2, order)
+    tiff += struct.pack(fmt + "HHII", 0x0201, 4, 1, data_offset)
+    tiff += struct.pack(fmt + "HHII", 0x0202, 4, 1, len(thumbnail))
+    tiff += b"\x00" * 4 + thumbnail
+    return exif[:6] + bytes(tiff)
+
+
+def _jpeg(image) -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def test_exif_from_the_header_bytes():
+    exif, thumbnail = _exif_from_header(_jpeg_with_exif()[:4096])
+    timestamp, gps = parse_exif(exif)
+
+    assert thumbnail is None
+    assert timestamp is not None
+    assert gps[0] == pytest.approx(-33.5)
+    assert gps[1] == pytest.approx(151.21)
+    assert gps[2] == pytest.approx(120.5)
+    assert _exif_from_header(b"not a jpeg") == (None, None)
+
+
+def test_embedded_thumbnail_from_the_header_bytes():
+    embedded = _jpeg(_gradient(size=(160, 120), reverse=True))
+    exif, thumbnail = _exif_from_header(_jpeg_with_exif(embedded)[:HEADER_BYTES])
+
+    assert thumbnail == embedded
+    assert parse_exif(exif)[1][0] == pytest.approx(-33.5)
+
+
+class MemoryS3:
+    """get_object with byte ranges on a dict, with NoSuchKey like boto3; records every request."""
+
+    class exceptions:
+        class NoSuchKey(Exception):
+            pass
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.requests = []
+
+    def get_object(self, Bucket, Key, Range=None):
+        self.requests.append((Key, Range))
+        if Key not in self.objects:
+            raise self.exceptions.NoSuchKey(Key)
+        data = self.objects[Key]
+        if Range is not None:
+            start, end = Range.removeprefix("bytes=").split("-")
+            data = data[int(start):int(end) + 1]
+        return {'Body': BytesIO(data)}
+
+
+def test_read_frame_info_hashes_the_embedded_thumbnail():
+    embedded = _jpeg(_gradient(size=(160, 120), reverse=True))
+    s3 = MemoryS3({"test_images/f/1.jpg": _jpeg_with_exif(embedded)})
+
+    info = read_frame_info(s3, "bucket", "test_images/f/1.jpg", index=1)
+
+    assert info.gps[0] == pytest.approx(-33.5) and info.timestamp is not None
+    assert info.dhash == dhash(_gradient(reverse=True))
+    # The ranged header read is the only request
+    assert s3.requests == [("test_images/f/1.jpg", f"bytes=0-{HEADER_BYTES - 1}")]
+
+
+def test_read_frame_info_uses_the_asset_thumbnail():
+    s3 = MemoryS3({
+        "assets/f/1.jpg": _jpeg_with_exif(),
+        "thumbnails/f/1/256.jpg": _jpeg(_gradient(size=(256, 192))),
+    })
+
+    info = read_frame_info(s3, "bucket", "assets/f/1.jpg", index=1)
+
+    assert info.gps[0] == pytest.approx(-33.5) and info.timestamp is not None
+    assert info.dhash == dhash(_gradient())
+    assert ("assets/f/1.jpg", None) not in s3.requests
+
+
+def test_read_frame_info_without_thumbnail_decodes_the_image():
+    s3 = MemoryS3({"assets/f/1.jpg": _jpeg_with_exif()})
+
+    info = read_frame_info(s3, "bucket", "assets/f/1.jpg", index=1)
+
+    assert info.dhash is not None and info.gps is not None
+    assert ("assets/f/1.jpg", None) in s3.requests
+
+
+def test_read_frame_info_skips_the_thumbnail_lookup_outside_assets():
+    s3 = MemoryS3({"test_images/f/1.jpg": _jpeg_with_exif()})
+
+    info = read_frame_info(s3, "bucket", "test_images/f/1.jpg", index=1)
+
+    assert info.dhash == dhash(Image.open(BytesIO(s3.objects["test_images/f/1.jpg"])))
+    assert [key for key, _ in s3.requests] == ["test_images/f/1.jpg", "test_images/f/1.jpg"]
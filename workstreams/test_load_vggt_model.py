@@ -0,0 +1,69 @@
+"""Load the VGGT model through the flow task with a small stand-in for the VGGT class."""
+import pytest
+
+torch = pytest.importorskip("torch")
+
+import vggt_s3_task
+
+
+class StubVGGT(torch.nn.Module):
+    """Same top-level layout as VGGT, a few parameters each; the norm stays fp32 when quantized."""
+
+    def __init__(self):
+        super().__init__()
+        self.norm = torch.nn.LayerNorm(8)
+        self.aggregator = torch.nn.Linear(8, 8)
+        self.camera_head = torch.nn.Linear(8, 9)
+        self.depth_head = torch.nn.Linear(8, 2)
+        self.point_head = torch.nn.Linear(8, 4)
+
+
+@pytest.fixture
+def stub_vggt(tmp_path, monkeypatch):
+    """Point vggt_s3_task at StubVGGT and a local weights file of it."""
+    reference = StubVGGT()
+    weights_path = tmp_path / "model.pt"
+    torch.save(reference.state_dict(), weights_path)
+    monkeypatch.setenv("VGGT_WEIGHTS_PATH", str(weights_path))
+    monkeypatch.setenv("VGGT_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.delenv("VGGT_INTRA_OP_THREADS", raising=False)
+    monkeypatch.delenv("VGGT_INTER_OP_THREADS", raising=False)
+
+    vggt_s3_task._import_torch()
+    monkeypatch.setattr(vggt_s3_task, "VGGT_AVAILABLE", True)
+    monkeypatch.setattr(vggt_s3_task, "VGGT", StubVGGT, raising=False)
+    return reference
+
+
+def test_load_vggt_model_loads_stored_weights(stub_vggt):
+    model = vggt_s3_task.load_vggt_model.fn(device="cpu", execution_profile="default")
+
+    assert isinstance(model, StubVGGT)
+    assert not model.training
+    assert model.execution_profile.name == "default"
+    for name, param in model.named_parameters():
+        assert not param.is_meta
+        assert torch.equal(param, stub_vggt.state_dict()[name])
+
+
+def test_load_vggt_model_quantized_drops_autocast_and_compile(stub_vggt):
+    model = vggt_s3_task.load_vggt_model.fn(device="cpu", execution_profile="cpu-bf16-compile", quantized=True)
+
+    assert model.execution_profile.cpu_autocast_dtype is None
+    assert not model.execution_profile.compile
+    assert type(model.aggregator) is not torch.nn.Linear
+
+    # The second load comes from the cached quantized weights
+    cached = vggt_s3_task.load_vggt_model.fn(device="cpu", quantized=True)
+    assert type(cached.aggregator) is type(model.aggregator)
+
+
+def test_load_vggt_model_quantized_rejects_cuda(stub_vggt):
+    with pytest.raises(ValueError, match="only runs on the CPU"):
+        vggt_s3_task.load_vggt_model.fn(device="cuda", quantized=True)
+
+
+def test_load_vggt_model_requires_vggt(monkeypatch):
+    monkeypatch.setattr(vggt_s3_task, "VGGT_AVAILABLE", False)
+    with pytest.raises(ImportError):
+        vggt_s3_task.load_vggt_model.fn(device="cpu")
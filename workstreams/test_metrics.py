@@ -0,0 +1,92 @@
+"""track_flow outcome counting, stage timing and registry snapshots."""
+import pytest
+
+pytest.importorskip("prometheus_client")
+
+import metrics
+from metrics import ASSETS, snapshot, time_stage, timed_stage, track_flow
+
+
+@pytest.fixture(autouse=True)
+def no_export(monkeypatch):
+    for name in ("SKYSTORE_METRICS_PORT", "SKYSTORE_PUSHGATEWAY", "SKYSTORE_PUSH_INTERVAL"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def _runs(flow: str, outcome: str) -> float:
+    return snapshot().get(f"skystore_flow_runs_total{{flow={flow},outcome={outcome}}}", 0.0)
+
+
+def test_track_flow_counts_completed_runs():
+    @track_flow("test_completed")
+    def run(x, y=1):
+        """Adds."""
+        return x + y
+
+    assert run(1, y=2) == 3
+    assert run(2) == 3
+
+    assert _runs("test_completed", "completed") == 2
+    assert _runs("test_completed", "failed") == 0
+    assert snapshot()["skystore_flow_seconds_count{flow=test_completed}"] == 2
+    assert run.__name__ == "run" and run.__doc__ == "Adds."
+
+
+def test_track_flow_counts_failed_runs_and_reraises():
+    @track_flow("test_failed")
+    def run():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError, match="boom"):
+        run()
+
+    assert _runs("test_failed", "failed") == 1
+    assert _runs("test_failed", "completed") == 0
+    assert snapshot()["skystore_flow_seconds_count{flow=test_failed}"] == 1
+
+
+def test_track_flow_pushes_when_finished(monkeypatch):
+    pushed = []
+    monkeypatch.setenv("SKYSTORE_PUSHGATEWAY", "pushgateway:9091")
+    monkeypatch.setattr(metrics, "push_to_gateway", lambda gateway, job, **kwargs: pushed.append((gateway, job)))
+
+    track_flow("test_pushed")(lambda: None)()
+
+    assert pushed == [("pushgateway:9091", "test_pushed")]
+
+
+def test_failed_push_does_not_fail_the_run(monkeypatch):
+    def unreachable(*args, **kwargs):
+        raise OSError("connection refused")
+
+    monkeypatch.setenv("SKYSTORE_PUSHGATEWAY", "pushgateway:9091")
+    monkeypatch.setattr(metrics, "push_to_gateway", unreachable)
+
+    assert track_flow("test_push_failed")(lambda: "done")() == "done"
+    assert _runs("test_push_failed", "completed") == 1
+
+
+def test_time_stage_observes_failed_stages_too():
+    with time_stage("test_stage", "upload"):
+        pass
+    with pytest.raises(ValueError):
+        with time_stage("test_stage", "upload"):
+            raise ValueError()
+
+    @timed_stage("test_stage", "download")
+    def download():
+        return "data"
+
+    assert download() == "data"
+    values = snapshot()
+    assert values["skystore_stage_seconds_count{stage=upload,workstream=test_stage}"] == 2
+    assert values["skystore_stage_seconds_count{stage=download,workstream=test_stage}"] == 1
+
+
+def test_snapshot_keys_samples_by_name_and_sorted_labels():
+    ASSETS.labels("test_snapshot", "created").inc(3)
+
+    values = snapshot()
+
+    assert values["skystore_assets_total{outcome=created,workstream=test_snapshot}"] == 3
+    assert "skystore_assets_total{outcome=failed,workstream=test_snapshot}" not in values
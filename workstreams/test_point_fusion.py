@@ -0,0 +1,117 @@
+"""Point fusion: batched unprojection, voxel merging and confidence filtering."""
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from point_fusion import _voxel_ids, default_voxel_size, fuse_point_cloud, fuse_points, unproject_depth_maps
+
+
+def _cameras(count: int):
+    """Cameras at different positions looking down +z, with slightly different rotations."""
+    extrinsic = torch.zeros(count, 3, 4)
+    for index in range(count):
+        angle = torch.tensor(0.05 * index)
+        extrinsic[index, :, :3] = torch.tensor([
+            [torch.cos(angle), -torch.sin(angle), 0.0],
+            [torch.sin(angle), torch.cos(angle), 0.0],
+            [0.0, 0.0, 1.0],
+        ])
+        extrinsic[index, :, 3] = torch.tensor([0.1 * index, -0.2 * index, 0.5])
+    intrinsic = torch.tensor([[20.0, 0, 8], [0, 22.0, 6], [0, 0, 1]]).repeat(count, 1, 1)
+    return extrinsic, intrinsic
+
+
+def _unproject_reference(depth, extrinsic, intrinsic):
+    """Per-frame loop with an explicit camera-to-world inverse, as VGGT's NumPy version does."""
+    frames = []
+    height, width = depth.shape[1:3]
+    rows, cols = torch.meshgrid(torch.arange(height).float(), torch.arange(width).float(), indexing="ij")
+    for index in range(depth.shape[0]):
+        K = intrinsic[index]
+        d = depth[index, ..., 0]
+        camera = torch.stack(((cols - K[0, 2]) / K[0, 0] * d, (rows - K[1, 2]) / K[1, 1] * d, d), dim=-1)
+        world_from_camera = torch.linalg.inv(torch.cat((extrinsic[index], torch.tensor([[0.0, 0, 0, 1]]))))
+        homogeneous = torch.cat((camera, torch.ones(height, width, 1)), dim=-1)
+        frames.append((homogeneous @ world_from_camera.T)[..., :3])
+    return torch.stack(frames)
+
+
+def test_unproject_matches_per_frame_reference():
+    extrinsic, intrinsic = _cameras(3)
+    depth = torch.rand(3, 12, 16, 1, generator=torch.Generator().manual_seed(0)) * 10 + 1
+
+    points = unproject_depth_maps(depth, extrinsic, intrinsic)
+
+    assert points.shape == (3, 12, 16, 3)
+    assert torch.allclose(points, _unproject_reference(depth, extrinsic, intrinsic), atol=1e-4)
+
+
+def test_fuse_points_merges_voxels():
+    points = torch.tensor([[0.1, 0.1, 0.1], [0.3, 0.3, 0.3], [5.1, 0.1, 0.1]])
+    conf = torch.tensor([1.0, 3.0, 2.0])
+    colors = torch.tensor([[1.0, 0, 0], [0, 0, 1.0], [0, 1.0, 0]])
+
+    fused = fuse_points(points, conf, voxel_size=1.0, colors=colors)
+
+    assert fused["fused_points"].shape == (2, 3)
+    order = fused["fused_points"][:, 0].argsort()
+    merged, single = order.tolist()
+    # Confidence-weighted mean position and color, highest member confidence
+    assert torch.allclose(fused["fused_points"][merged], torch.full((3,), 0.25))
+    assert fused["fused_conf"][merged] == 3.0 and fused["fused_conf"][single] == 2.0
+    assert fused["fused_colors"][merged].tolist() == [64, 0, 191]
+    assert fused["fused_colors"].dtype == torch.uint8
+
+
+def test_fuse_points_handles_an_empty_cloud():
+    fused = fuse_points(torch.zeros(0, 3), torch.zeros(0), voxel_size=1.0)
+    assert fused["fused_points"].shape == (0, 3) and fused["fused_conf"].shape == (0,)
+
+
+def test_fuse_point_cloud_merges_overlapping_views():
+    extrinsic, intrinsic = _cameras(1)
+    extrinsic, intrinsic = extrinsic.repeat(2, 1, 1), intrinsic.repeat(2, 1, 1)
+    depth = torch.full((2, 12, 16), 4.0)
+    conf = torch.ones(2, 12, 16)
+
+    fused = fuse_point_cloud(extrinsic, intrinsic, depth, conf, conf_percentile=0)
+
+    # Both frames see the same surface, so every pixel pair collapses into one point
+    dense = unproject_depth_maps(depth[:1], extrinsic[:1], intrinsic[:1]).reshape(-1, 3)
+    assert fused["fused_points"].shape[0] <= dense.shape[0]
+    distances = torch.cdist(fused["fused_points"], dense).min(dim=1).values
+    assert distances.max() < default_voxel_size(depth, intrinsic)
+
+
+def test_fuse_point_cloud_drops_low_confidence_and_invalid_pixels():
+    extrinsic, intrinsic = _cameras(2)
+    depth = torch.full((2, 12, 16), 4.0)
+    depth[0, 0, 0] = float("nan")
+    depth[0, 0, 1] = 0.0
+    conf = torch.ones(2, 12, 16)
+    conf[1] = 0.01
+    images = torch.zeros(2, 3, 12, 16)
+    images[0, 0] = 1.0
+
+    fused = fuse_point_cloud(extrinsic, intrinsic, depth, conf, images=images, conf_percentile=60, voxel_size=1e-3)
+
+    # Only frame 0's valid pixels survive, each its own voxel, all red
+    assert fused["fused_points"].shape[0] == 12 * 16 - 2
+    assert torch.isfinite(fused["fused_points"]).all()
+    assert (fused["fused_conf"] == 1.0).all()
+    assert (fused["fused_colors"] == torch.tensor([255, 0, 0], dtype=torch.uint8)).all()
+
+
+def test_default_voxel_size_is_the_pixel_footprint():
+    _, intrinsic = _cameras(2)
+    depth = torch.full((2, 12, 16), 42.0)
+    assert default_voxel_size(depth, intrinsic) == pytest.approx(42.0 / 21.0)
+
+
+def test_far_apart_points_keep_their_voxels():
+    # 2^32 cells per axis: the int64 cell count wraps to 0, and packed keys would drop the x cell
+    points = torch.tensor([[0.0, 0.0, 0.0], [5.0, 0.0, 0.0], [2.0 ** 32 - 1] * 3], dtype=torch.float64)
+    assert _voxel_ids(points, voxel_size=1.0).tolist() == [0, 1, 2]
+
+    fused = fuse_points(points, torch.ones(3), voxel_size=1.0)
+    assert fused["fused_points"].shape[0] == 3
@@ -0,0 +1,155 @@
+"""SamplingProfiler output and the profiled_flow decorator's opt-in logic."""
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+import profiling
+from profiling import SamplingProfiler, profiled_flow, profiling_enabled
+
+
+def _profiler(stacks) -> SamplingProfiler:
+    profiler = SamplingProfiler()
+    profiler.stacks = Counter(stacks)
+    return profiler
+
+
+def test_folded_lists_most_frequent_stacks_first():
+    profiler = _profiler({
+        "MainThread;flow.py:main": 1,
+        "MainThread;flow.py:main;s3.py:download": 3,
+        "worker-0;flow.py:main;torch.py:forward": 2,
+    })
+
+    assert profiler.folded() == (
+        "MainThread;flow.py:main;s3.py:download 3\n"
+        "worker-0;flow.py:main;torch.py:forward 2\n"
+        "MainThread;flow.py:main 1\n"
+    )
+
+
+def test_top_functions_counts_self_and_total_samples():
+    profiler = _profiler({
+        "MainThread;flow.py:main": 1,
+        "MainThread;flow.py:main;s3.py:download": 3,
+        "worker-0;flow.py:main;torch.py:forward": 2,
+        # Recursion counts once towards the total of a sample
+        "worker-1;tree.py:walk;tree.py:walk": 4,
+    })
+
+    assert profiler.top_functions() == [
+        ("flow.py:main", 1, 6),
+        ("tree.py:walk", 4, 4),
+        ("s3.py:download", 3, 3),
+        ("torch.py:forward", 2, 2),
+    ]
+    assert profiler.top_functions(limit=1) == [("flow.py:main", 1, 6)]
+
+
+def _busy_loop(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_samples_running_threads_and_skips_idle_ones():
+    stop, idle = threading.Event(), threading.Event()
+    busy_thread = threading.Thread(target=_busy_loop, args=(stop,), name="busy")
+    idle_thread = threading.Thread(target=idle.wait, name="idle")
+    busy_thread.start()
+    idle_thread.start()
+    try:
+        with SamplingProfiler(interval=0.005) as profiler:
+            time.sleep(0.2)
+    finally:
+        stop.set()
+        idle.set()
+        busy_thread.join()
+        idle_thread.join()
+
+    assert profiler.samples > 0
+    assert profiler.elapsed >= 0.2
+    assert any(stack.startswith("busy;") and "test_profiling.py:_busy_loop" in stack for stack in profiler.stacks)
+    assert not any(stack.startswith("idle;") for stack in profiler.stacks)
+    assert not any(stack.startswith("sampling-profiler;") for stack in profiler.stacks)
+
+
+@pytest.mark.parametrize("requested, env, expected", [
+    (None, None, False),
+    (None, "1", True),
+    (None, "false", False),
+    (True, None, True),
+    (False, "1", False),
+    (False, None, False),
+])
+def test_profiling_enabled(monkeypatch, requested, env, expected):
+    if env is None:
+        monkeypatch.delenv("SKYSTORE_PROFILE", raising=False)
+    else:
+        monkeypatch.setenv("SKYSTORE_PROFILE", env)
+
+    assert profiling_enabled(requested) is expected
+
+
+@pytest.fixture
+def published(monkeypatch):
+    calls = []
+    monkeypatch.setattr(profiling, "publish_profile",
+                        lambda profiler, name, s3_client, bucket_name: calls.append((name, s3_client, bucket_name)))
+    monkeypatch.delenv("SKYSTORE_PROFILE", raising=False)
+    return calls
+
+
+def _flow(storage_calls):
+    def storage(arguments):
+        storage_calls.append(dict(arguments))
+        return "client", arguments["bucket_name"]
+
+    @profiled_flow("test_flow", storage=storage)
+    def run(bucket_name: str, profile=None, retries: int = 3):
+        return bucket_name, retries
+
+    return run
+
+
+def test_profiled_flow_binds_positional_and_default_arguments(published):
+    storage_calls = []
+    run = _flow(storage_calls)
+
+    assert run("skystore", True) == ("skystore", 3)
+
+    assert storage_calls == [{"bucket_name": "skystore", "profile": True, "retries": 3}]
+    assert published == [("test_flow", "client", "skystore")]
+
+
+def test_profiled_flow_is_off_by_default_and_follows_env(published, monkeypatch):
+    storage_calls = []
+    run = _flow(storage_calls)
+
+    assert run("skystore") == ("skystore", 3)
+    assert published == []
+
+    monkeypatch.setenv("SKYSTORE_PROFILE", "1")
+    run(bucket_name="skystore", retries=1)
+    assert storage_calls == [{"bucket_name": "skystore", "profile": None, "retries": 1}]
+    assert len(published) == 1
+
+
+def test_explicit_false_overrides_env(published, monkeypatch):
+    monkeypatch.setenv("SKYSTORE_PROFILE", "1")
+    run = _flow([])
+
+    run("skystore", profile=False)
+
+    assert published == []
+
+
+def test_profile_is_published_when_the_flow_fails(published):
+    @profiled_flow("test_failing_flow")
+    def run(profile=None):
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError, match="boom"):
+        run(profile=True)
+
+    assert published == [("test_failing_flow", None, None)]
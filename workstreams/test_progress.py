@@ -0,0 +1,101 @@
+"""ProgressReporter: rate-limited summaries and capped failure logging."""
+import logging
+import threading
+
+import progress
+from progress import ProgressReporter
+
+
+class RecordingLogger:
+    """Collects (level, message) pairs."""
+
+    def __init__(self):
+        self.records = []
+
+    def debug(self, message):
+        self.records.append((logging.DEBUG, message))
+
+    def info(self, message):
+        self.records.append((logging.INFO, message))
+
+    def warning(self, message):
+        self.records.append((logging.WARNING, message))
+
+    def at(self, level):
+        return [message for record_level, message in self.records if record_level == level]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _reporter(monkeypatch, **kwargs):
+    clock = FakeClock()
+    monkeypatch.setattr(progress.time, "perf_counter", clock)
+    logger = RecordingLogger()
+    return ProgressReporter(logger, "Creating assets", **kwargs), logger, clock
+
+
+def test_summaries_are_rate_limited(monkeypatch):
+    reporter, logger, clock = _reporter(monkeypatch, total=1000, interval=10)
+
+    for index in range(500):
+        clock.now = 1000.0 + index / 100
+        reporter.update("created", detail="created asset")
+    # 5 seconds in: per-object detail only at debug level, no summary yet
+    assert len(logger.at(logging.DEBUG)) == 500
+    assert logger.at(logging.INFO) == []
+
+    clock.now = 1010.0
+    reporter.update("created")
+    assert logger.at(logging.INFO) == ["Creating assets: 501/1,000 (50.1%), 50.1/s, 501 created, ETA 10s"]
+
+    reporter.update("created")
+    assert len(logger.at(logging.INFO)) == 1
+
+
+def test_failures_are_logged_up_to_the_cap(monkeypatch):
+    reporter, logger, _ = _reporter(monkeypatch, interval=10, max_failure_logs=3)
+
+    for index in range(10):
+        reporter.failure(f"asset {index} failed")
+
+    warnings = logger.at(logging.WARNING)
+    assert warnings == [
+        "asset 0 failed", "asset 1 failed", "asset 2 failed",
+        "Creating assets: further failures are only counted"
+    ]
+    assert reporter.outcomes["failed"] == 10
+
+
+def test_finish_reports_every_outcome(monkeypatch):
+    reporter, logger, clock = _reporter(monkeypatch, interval=60)
+    reporter.update("created", n=7)
+    reporter.update("skipped", n=3)
+    clock.now += 2
+
+    line = reporter.finish()
+
+    assert line == "Creating assets: 10, 5.0/s, 7 created, 3 skipped in 2.0s"
+    assert logger.at(logging.INFO) == [line]
+
+
+def test_counts_from_many_threads():
+    reporter = ProgressReporter(RecordingLogger(), "Listing", interval=3600)
+
+    def work():
+        for _ in range(1000):
+            reporter.update()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert reporter.count == 8000
+    assert reporter.outcomes == {"done": 8000}
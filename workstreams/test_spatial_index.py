@@ -0,0 +1,137 @@
+"""Spatial index: chunking, flight bbox/radius queries against brute force, and the project index."""
+import math
+from io import BytesIO
+
+import pytest
+
+np = pytest.importorskip("numpy")
+torch = pytest.importorskip("torch")
+
+import vggt_s3_task
+from spatial_index import FlightIndex, ProjectIndex, _haversine_m, build_flight_index, split_into_chunks
+
+
+class MemoryS3:
+    """The boto3 calls of the results upload and the index, on a dict of key -> (bytes, metadata)."""
+
+    class exceptions:
+        class NoSuchKey(Exception):
+            pass
+
+    def __init__(self):
+        self.objects = {}
+        self.reads = []
+
+    def put_object(self, Bucket, Key, Body, Metadata=None, **kwargs):
+        self.objects[Key] = (bytes(Body), dict(Metadata or {}))
+
+    def upload_fileobj(self, fileobj, bucket, key, ExtraArgs=None, Config=None):
+        self.put_object(bucket, key, fileobj.read(), **(ExtraArgs or {}))
+
+    def head_object(self, Bucket, Key):
+        body, metadata = self.objects[Key]
+        return {'ContentLength': len(body), 'Metadata': metadata}
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise self.exceptions.NoSuchKey(Key)
+        self.reads.append(Key)
+        return {'Body': BytesIO(self.objects[Key][0])}
+
+
+@pytest.fixture
+def flight():
+    """A fused flight saved like the VGGT flow saves it, with its index built."""
+    rng = np.random.default_rng(0)
+    points = rng.uniform([-50, -20, 0], [50, 20, 10], size=(5000, 3)).astype(np.float32)
+    results = {
+        "fused_points": torch.from_numpy(points),
+        "fused_conf": torch.from_numpy(rng.uniform(1, 10, 5000).astype(np.float32)),
+        "fused_colors": torch.from_numpy(rng.integers(0, 256, (5000, 3), dtype=np.uint8)),
+    }
+    s3 = MemoryS3()
+    paths = vggt_s3_task.save_results_to_s3.fn(s3, "bucket", results, "runs/1")
+    vggt_s3_task.write_results_manifest.fn(s3, "bucket", "runs/1", paths)
+    index = build_flight_index.fn(s3, "bucket", "runs/1", chunks_per_axis=4)
+    return s3, index, points
+
+
+def test_split_into_chunks_covers_every_point_once():
+    points = np.random.default_rng(1).normal(size=(1000, 3))
+    origin, chunk_size, chunks = split_into_chunks(points, chunks_per_axis=5)
+
+    assert np.array_equal(origin, points.min(axis=0))
+    assert chunk_size == pytest.approx((points.max(axis=0) - origin).max() / 5)
+    indices = np.concatenate(list(chunks.values()))
+    assert np.array_equal(np.sort(indices), np.arange(1000))
+    for cell, members in chunks.items():
+        assert all(0 <= axis < 5 for axis in cell)
+        expected = np.minimum(((points[members] - origin) / chunk_size).astype(int), 4)
+        assert (expected == cell).all()
+
+
+def test_flight_index_layout(flight):
+    s3, index, points = flight
+
+    assert index["source"] == "fused_points" and index["num_points"] == 5000
+    assert index["has_colors"]
+    assert sum(chunk["num_points"] for chunk in index["chunks"]) == 5000
+    assert np.allclose(index["bounds"], [points.min(axis=0), points.max(axis=0)])
+
+
+def test_bbox_query_matches_brute_force_and_reads_few_chunks(flight):
+    s3, index, points = flight
+    flight_index = FlightIndex.load(s3, "bucket", "runs/1")
+    s3.reads.clear()
+
+    low, high = [-10, -5, 2], [5, 5, 6]
+    found = flight_index.query_bbox(low, high)
+
+    inside = np.all((points >= low) & (points <= high), axis=1)
+    assert sorted(map(tuple, found["points"])) == sorted(map(tuple, points[inside]))
+    assert found["conf"].shape[0] == found["colors"].shape[0] == int(inside.sum())
+    assert 0 < len(s3.reads) < len(index["chunks"])
+
+
+def test_radius_query_matches_brute_force(flight):
+    s3, _, points = flight
+    flight_index = FlightIndex.load(s3, "bucket", "runs/1")
+
+    found = flight_index.query_radius([20, 0, 5], 8.0)
+
+    inside = np.sum((points - np.array([20, 0, 5], dtype=np.float32)) ** 2, axis=1) <= 64.0
+    assert sorted(map(tuple, found["points"])) == sorted(map(tuple, points[inside]))
+
+
+def test_queries_outside_the_cloud_are_empty(flight):
+    s3, _, _ = flight
+    flight_index = FlightIndex.load(s3, "bucket", "runs/1")
+    s3.reads.clear()
+
+    found = flight_index.query_bbox([500, 500, 500], [600, 600, 600])
+
+    assert found["points"].shape == (0, 3) and found["colors"].shape == (0, 3)
+    assert s3.reads == []
+
+
+def test_project_index_queries():
+    s3 = MemoryS3()
+    project = ProjectIndex.load(s3, "bucket")
+    assert project.flights == {}
+    project.upsert("near", "runs/near", 52.0, 4.0, radius_m=300)
+    project.upsert("close", "runs/close", 52.005, 4.0, radius_m=300)
+    project.upsert("far", "runs/far", 48.0, 2.0, radius_m=300)
+    project.save()
+
+    project = ProjectIndex.load(s3, "bucket")
+    assert project.query_radius(52.003, 4.0, 100) == ["close", "near"]
+    assert project.query_radius(52.0, 4.0, 100) == ["near"]
+    assert project.query_radius(52.0, 4.0, 300) == ["near", "close"]
+    assert project.query_bbox(51.99, 3.99, 52.001, 4.01) == ["near"]
+    assert project.query_bbox(40, -10, 60, 10) == ["near", "close", "far"]
+
+
+def test_haversine_distance():
+    # One degree of latitude is about 111.2 km on the mean earth radius
+    assert _haversine_m(0, 0, 1, 0) == pytest.approx(math.radians(1) * 6371008.8)
+    assert _haversine_m(52, 4, 52, 4) == 0.0
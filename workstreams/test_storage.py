@@ -0,0 +1,100 @@
+"""get_s3_client caching, S3ClientSettings.from_env and transfer configs sized to the pool."""
+import threading
+
+import pytest
+
+pytest.importorskip("boto3")
+
+import storage
+from storage import S3ClientSettings, clear_s3_clients, get_s3_client, get_transfer_config
+
+ENV_VARS = ("S3_MAX_POOL_CONNECTIONS", "S3_CONNECT_TIMEOUT", "S3_READ_TIMEOUT", "S3_RETRY_MODE", "S3_MAX_ATTEMPTS")
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients(monkeypatch):
+    for name in ENV_VARS:
+        monkeypatch.delenv(name, raising=False)
+    clear_s3_clients()
+    yield
+    clear_s3_clients()
+
+
+def test_same_arguments_share_one_client():
+    client = get_s3_client("http://minio:9000")
+
+    assert get_s3_client("http://minio:9000") is client
+    assert get_s3_client("http://minio:9000", settings=S3ClientSettings()) is client
+
+
+def test_different_endpoint_credentials_or_settings_get_their_own_client():
+    client = get_s3_client("http://minio:9000")
+
+    assert get_s3_client("http://other:9000") is not client
+    assert get_s3_client("http://minio:9000", access_key="someone") is not client
+    assert get_s3_client("http://minio:9000", settings=S3ClientSettings(max_pool_connections=8)) is not client
+
+
+def test_threads_share_the_client():
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(get_s3_client("http://minio:9000")))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(clients) == 8
+    assert all(client is clients[0] for client in clients)
+    assert len(storage._clients) == 1
+
+
+def test_clear_drops_cached_clients():
+    client = get_s3_client("http://minio:9000")
+    clear_s3_clients()
+
+    assert get_s3_client("http://minio:9000") is not client
+
+
+def test_client_uses_the_settings():
+    client = get_s3_client("http://minio:9000", settings=S3ClientSettings(
+        max_pool_connections=32, connect_timeout=2.0, read_timeout=30.0, max_attempts=3))
+    config = client.meta.config
+
+    assert config.max_pool_connections == 32
+    assert config.connect_timeout == 2.0
+    assert config.read_timeout == 30.0
+    # max_attempts counts the first request, like botocore's total_max_attempts
+    assert config.retries == {'mode': 'standard', 'total_max_attempts': 3}
+
+
+def test_from_env_defaults():
+    assert S3ClientSettings.from_env() == S3ClientSettings()
+
+
+def test_from_env_overrides(monkeypatch):
+    monkeypatch.setenv("S3_MAX_POOL_CONNECTIONS", "128")
+    monkeypatch.setenv("S3_CONNECT_TIMEOUT", "1.5")
+    monkeypatch.setenv("S3_READ_TIMEOUT", "120")
+    monkeypatch.setenv("S3_RETRY_MODE", "adaptive")
+    monkeypatch.setenv("S3_MAX_ATTEMPTS", "10")
+
+    settings = S3ClientSettings.from_env()
+
+    assert settings == S3ClientSettings(max_pool_connections=128, connect_timeout=1.5, read_timeout=120.0,
+                                        retry_mode="adaptive", max_attempts=10)
+    assert get_s3_client("http://minio:9000").meta.config.max_pool_connections == 128
+
+
+@pytest.mark.parametrize("pool", [1, 3, 10, 64, 200])
+def test_transfer_concurrency_fits_in_the_pool(pool):
+    config = get_transfer_config(S3ClientSettings(max_pool_connections=pool))
+
+    assert 1 <= config.max_concurrency <= pool
+
+
+def test_transfer_config_follows_env_pool(monkeypatch):
+    monkeypatch.setenv("S3_MAX_POOL_CONNECTIONS", "16")
+
+    assert get_transfer_config().max_concurrency == 4
+    assert get_transfer_config(max_concurrency=2).max_concurrency == 2
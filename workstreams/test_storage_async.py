@@ -0,0 +1,134 @@
+"""AsyncS3Storage request limits, against an in-memory client with a bounded connection pool."""
+import asyncio
+import threading
+
+from storage_async import AsyncS3Storage
+
+
+class FakeBody:
+    """Streaming body that keeps its pool connection until closed, like aiobotocore's."""
+
+    def __init__(self, data: bytes, pool: asyncio.Semaphore):
+        self.data = data
+        self.pool = pool
+        self.offset = 0
+        self.closed = False
+
+    async def read(self, size: int = -1) -> bytes:
+        await asyncio.sleep(0)
+        end = len(self.data) if size < 0 else self.offset + size
+        chunk = self.data[self.offset:end]
+        self.offset += len(chunk)
+        return chunk
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.pool.release()
+
+
+class FakeS3Client:
+    """Objects in a dict; every request waits for one of pool_size connections."""
+
+    def __init__(self, pool_size: int):
+        self.pool = asyncio.Semaphore(pool_size)
+        self.objects = {}
+        self.uploads = {}
+
+    async def _request(self):
+        await self.pool.acquire()
+        await asyncio.sleep(0)
+        self.pool.release()
+
+    async def get_object(self, Bucket, Key):
+        await self.pool.acquire()
+        return {'Body': FakeBody(self.objects[Key], self.pool)}
+
+    async def put_object(self, Bucket, Key, Body, **kwargs):
+        await self._request()
+        self.objects[Key] = Body
+        return {}
+
+    async def create_multipart_upload(self, Bucket, Key, **kwargs):
+        await self._request()
+        self.uploads[Key] = {}
+        return {'UploadId': Key}
+
+    async def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        await self._request()
+        self.uploads[Key][PartNumber] = Body
+        return {'ETag': str(PartNumber)}
+
+    async def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        await self._request()
+        parts = self.uploads.pop(Key)
+        self.objects[Key] = b"".join(parts[part['PartNumber']] for part in MultipartUpload['Parts'])
+        return {}
+
+    async def abort_multipart_upload(self, Bucket, Key, UploadId):
+        await self._request()
+        self.uploads.pop(Key, None)
+        return {}
+
+
+def _open(max_concurrency: int, max_open_streams: int = None) -> AsyncS3Storage:
+    """Storage wired to a fake client with the pool __aenter__ would configure."""
+    storage = AsyncS3Storage("http://fake", max_concurrency=max_concurrency, max_open_streams=max_open_streams)
+    storage._client = FakeS3Client(storage.max_concurrency + storage.max_open_streams)
+    storage._semaphore = asyncio.Semaphore(storage.max_concurrency)
+    storage._streams = asyncio.Semaphore(storage.max_open_streams)
+    return storage
+
+
+def test_streams_piped_into_uploads_do_not_deadlock():
+    async def run():
+        storage = _open(max_concurrency=4)
+        for index in range(8):
+            storage.client.objects[f"src/{index}"] = bytes([index]) * 100
+
+        async def pipe(index: int):
+            stream = storage.get_stream("bucket", f"src/{index}", chunk_size=16)
+            # One part at a time, so the stream can only advance once a part is uploaded
+            await storage.upload_multipart("bucket", f"dst/{index}", stream, part_size=32, max_parallel_parts=1)
+
+        # More pipes than request permits, each holding a stream while it uploads
+        await asyncio.gather(*[pipe(index) for index in range(8)])
+        results["storage"] = storage
+
+    # On a daemon thread, so a deadlock fails the test instead of hanging it
+    results = {}
+    thread = threading.Thread(target=lambda: asyncio.run(run()), daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    assert not thread.is_alive(), "streams piped into uploads deadlocked"
+    storage = results["storage"]
+    for index in range(8):
+        assert storage.client.objects[f"dst/{index}"] == bytes([index]) * 100
+
+
+def test_open_streams_do_not_take_request_permits():
+    async def run():
+        storage = _open(max_concurrency=2, max_open_streams=2)
+        storage.client.objects["a"] = b"x" * 10
+        storage.client.objects["b"] = b"y" * 10
+        streams = [storage.get_stream("bucket", key, chunk_size=4) for key in ("a", "b")]
+        firsts = [await stream.__anext__() for stream in streams]
+        # Both streams are open and undrained; plain requests still go through
+        await asyncio.wait_for(storage.put("bucket", "c", b"z"), timeout=5)
+        for stream in streams:
+            await stream.aclose()
+        return storage, firsts
+
+    storage, firsts = asyncio.run(run())
+    assert firsts == [b"xxxx", b"yyyy"]
+    assert storage.client.objects["c"] == b"z"
+    assert not storage._streams.locked()
+
+
+def test_stream_reads_whole_object():
+    async def run():
+        storage = _open(max_concurrency=1)
+        storage.client.objects["key"] = bytes(range(256)) * 3
+        return b"".join([chunk async for chunk in storage.get_stream("bucket", "key", chunk_size=100)])
+
+    assert asyncio.run(run()) == bytes(range(256)) * 3
@@ -0,0 +1,75 @@
+"""Thumbnail keys, rendering, and finding assets that still need thumbnails."""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from thumbnails import find_pending_assets, render_thumbnails, thumbnail_key
+
+
+def _encode(size, mode="RGB", format="JPEG") -> bytes:
+    buffer = BytesIO()
+    Image.new(mode, size, (200, 100, 50, 128)[:len(mode)]).save(buffer, format=format)
+    return buffer.getvalue()
+
+
+def test_thumbnail_key():
+    assert thumbnail_key("assets/owner/uuid.JPG", 256) == "thumbnails/owner/uuid/256.jpg"
+    assert thumbnail_key("other/uuid.png", 1024) == "thumbnails/other/uuid/1024.jpg"
+
+
+def test_render_thumbnails_sizes():
+    outputs = render_thumbnails(_encode((2000, 1000)), [256, 1024])
+
+    assert sorted(outputs) == [256, 1024]
+    for size, data in outputs.items():
+        with Image.open(BytesIO(data)) as img:
+            assert img.format == "JPEG"
+            assert max(img.size) == size
+            assert img.size[0] == 2 * img.size[1]
+
+
+def test_render_thumbnails_converts_transparent_png():
+    outputs = render_thumbnails(_encode((300, 300), mode="RGBA", format="PNG"), [128])
+    with Image.open(BytesIO(outputs[128])) as img:
+        assert img.mode == "RGB" and img.size == (128, 128)
+
+
+def test_render_thumbnails_on_spawned_workers():
+    # The flow renders on a spawn pool, so the worker must be importable and picklable
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        outputs = pool.submit(render_thumbnails, _encode((640, 480)), [64]).result(timeout=60)
+    assert 64 in outputs
+
+
+class _ListingClient:
+    def __init__(self, keys):
+        self.keys = keys
+
+    def get_paginator(self, operation):
+        keys = self.keys
+
+        class Paginator:
+            def paginate(self, Bucket, Prefix=""):
+                yield {'Contents': [{'Key': key, 'Size': 1} for key in keys if key.startswith(Prefix)]}
+        return Paginator()
+
+
+def test_find_pending_assets_needs_every_size():
+    client = _ListingClient([
+        "assets/u/done.jpg", "thumbnails/u/done/256.jpg", "thumbnails/u/done/1024.jpg",
+        "assets/u/partial.jpg", "thumbnails/u/partial/256.jpg",
+        "assets/u/new.png",
+        "assets/u/notes.txt",
+    ])
+
+    jobs, skipped = find_pending_assets.fn(client, "bucket", [256, 1024])
+
+    assert skipped == 1
+    assert sorted(job.asset_key for job in jobs) == ["assets/u/new.png", "assets/u/partial.jpg"]
+
+    jobs, skipped = find_pending_assets.fn(client, "bucket", [256, 1024], force=True)
+    assert skipped == 0 and len(jobs) == 3
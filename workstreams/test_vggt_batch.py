@@ -0,0 +1,21 @@
+"""vggt_batch: the summary has the same shape whether or not any flight ran."""
+import vggt_batch
+
+
+def test_no_flights_returns_the_full_summary(monkeypatch):
+    monkeypatch.setattr(vggt_batch, "check_vggt_install", lambda: True)
+    monkeypatch.setattr(vggt_batch, "setup_s3_client", lambda **kwargs: object())
+    monkeypatch.setattr(vggt_batch, "resolve_flight_jobs", lambda *args: [])
+
+    summary = vggt_batch.vggt_process_flights_from_s3.fn(bucket_name="skystore", flights=[])
+
+    assert summary == {
+        'flights_total': 0,
+        'flights_succeeded': 0,
+        'flights_failed': 0,
+        'images_processed': 0,
+        'duration': 0.0,
+        'flights_per_hour': 0.0,
+        'stage_seconds': {},
+        'flights': []
+    }
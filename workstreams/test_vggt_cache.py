@@ -0,0 +1,101 @@
+"""TensorCache: ETag-keyed hits and misses, LRU eviction and atomic writes."""
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from vggt_cache import TensorCache
+
+
+def _image(value: float, size: int = 8):
+    return np.full((3, size, size), value, dtype=np.float32)
+
+
+def _age(cache: TensorCache, key: str, seconds_ago: float):
+    path = os.path.join(cache.cache_dir, f"{key}.npy")
+    mtime = os.path.getmtime(path) - seconds_ago
+    os.utime(path, (mtime, mtime))
+
+
+def test_key_changes_with_etag_and_target_size():
+    key = TensorCache.make_key("skystore", "flights/a/0001.jpg", '"abc"', 518)
+
+    assert key == TensorCache.make_key("skystore", "flights/a/0001.jpg", "abc", 518)
+    assert key != TensorCache.make_key("skystore", "flights/a/0001.jpg", "def", 518)
+    assert key != TensorCache.make_key("skystore", "flights/a/0001.jpg", "abc", 224)
+    assert key != TensorCache.make_key("skystore", "flights/b/0001.jpg", "abc", 518)
+
+
+def test_hit_after_put_and_miss_for_new_etag(tmp_path):
+    cache = TensorCache(str(tmp_path), max_bytes=1 << 20)
+    key = TensorCache.make_key("skystore", "flights/a/0001.jpg", "v1", 518)
+
+    assert cache.get(key) is None
+    cache.put(key, _image(0.5))
+
+    hit = cache.get(key)
+    assert isinstance(hit, np.memmap)
+    np.testing.assert_array_equal(hit, _image(0.5))
+    assert cache.get(TensorCache.make_key("skystore", "flights/a/0001.jpg", "v2", 518)) is None
+
+
+def test_hits_are_copy_on_write(tmp_path):
+    cache = TensorCache(str(tmp_path))
+    cache.put("k", _image(1.0))
+
+    cache.get("k")[0, 0, 0] = 42.0
+
+    assert cache.get("k")[0, 0, 0] == 1.0
+
+
+def test_evict_removes_least_recently_used_first(tmp_path):
+    cache = TensorCache(str(tmp_path), max_bytes=1 << 30)
+    for age, key in ((30, "old"), (20, "middle"), (10, "new")):
+        cache.put(key, _image(0.0))
+        _age(cache, key, age)
+        entry_bytes = os.path.getsize(os.path.join(cache.cache_dir, f"{key}.npy"))
+
+    # Reading the oldest entry makes it the most recently used
+    assert cache.get("old") is not None
+
+    cache.max_bytes = 2 * entry_bytes
+    assert cache.evict() == 1
+    assert cache.get("middle") is None
+    assert cache.get("old") is not None
+    assert cache.get("new") is not None
+    assert cache.evict() == 0
+
+
+def test_failed_write_leaves_previous_entry(tmp_path, monkeypatch):
+    cache = TensorCache(str(tmp_path))
+    cache.put("k", _image(1.0))
+
+    def partial_save(f, array):
+        f.write(b"\x93NUMPY partial")
+        raise OSError("disk full")
+
+    monkeypatch.setattr(np, "save", partial_save)
+    with pytest.raises(OSError, match="disk full"):
+        cache.put("k", _image(2.0))
+    monkeypatch.undo()
+
+    np.testing.assert_array_equal(cache.get("k"), _image(1.0))
+    assert os.listdir(tmp_path) == ["k.npy"]
+
+
+def test_put_leaves_no_temp_files(tmp_path):
+    cache = TensorCache(str(tmp_path))
+    cache.put("a", _image(1.0))
+    cache.put("a", _image(2.0))
+
+    assert os.listdir(tmp_path) == ["a.npy"]
+    np.testing.assert_array_equal(cache.get("a"), _image(2.0))
+
+
+def test_truncated_entry_is_a_miss(tmp_path):
+    cache = TensorCache(str(tmp_path))
+    with open(os.path.join(tmp_path, "k.npy"), "wb") as f:
+        f.write(b"\x93NUMPY")
+
+    assert cache.get("k") is None
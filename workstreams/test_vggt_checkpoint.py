@@ -0,0 +1,136 @@
+"""Stage checkpoints: save and resume, safe loading, discard and TTL cleanup, against an in-memory S3."""
+import pickle
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from vggt_checkpoint import (
+    StageCheckpoints,
+    cleanup_expired_checkpoints,
+    make_run_key,
+    pack_tokens,
+    unpack_tokens,
+)
+
+
+class MemoryS3:
+    """The boto3 calls vggt_checkpoint makes, on a dict of key -> (bytes, LastModified)."""
+
+    class exceptions:
+        class NoSuchKey(Exception):
+            pass
+
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[Key] = (bytes(Body), datetime.now(timezone.utc))
+
+    def upload_fileobj(self, fileobj, bucket, key):
+        self.put_object(bucket, key, fileobj.read())
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise self.exceptions.NoSuchKey(Key)
+        return {'Body': BytesIO(self.objects[Key][0])}
+
+    def get_paginator(self, operation):
+        objects = self.objects
+
+        class Paginator:
+            def paginate(self, Bucket, Prefix=""):
+                yield {'Contents': [
+                    {'Key': key, 'LastModified': modified}
+                    for key, (_, modified) in sorted(objects.items()) if key.startswith(Prefix)
+                ]}
+        return Paginator()
+
+    def delete_objects(self, Bucket, Delete):
+        for obj in Delete['Objects']:
+            self.objects.pop(obj['Key'], None)
+
+
+class _Heads(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.depth_head = torch.nn.Module()
+        self.depth_head.intermediate_layer_idx = [4, 11, 17, 23]
+
+
+def test_pack_tokens_keeps_only_layers_the_heads_read():
+    tokens = [torch.full((1, 2), float(i)) for i in range(24)]
+
+    packed = pack_tokens(_Heads(), tokens)
+
+    assert sorted(packed["layers"]) == [4, 11, 17, 23]
+    unpacked = unpack_tokens(packed)
+    assert len(unpacked) == 24
+    assert unpacked[0] is None and torch.equal(unpacked[17], tokens[17])
+
+
+def test_resume_restores_saved_stages():
+    s3 = MemoryS3()
+    run_key = make_run_key({"paths": ["a.jpg", "b.jpg"], "quantized": False})
+    value = {"tokens": pack_tokens(_Heads(), [torch.randn(2, 3) for _ in range(24)]), "ps_idx": 5}
+
+    first = StageCheckpoints(s3, "bucket", run_key, params={"quantized": False})
+    first.save("aggregator", value)
+    first.save("depth", (torch.ones(2, 2), torch.zeros(2, 2)))
+    first.flush()
+
+    retry = StageCheckpoints(s3, "bucket", run_key)
+    assert retry.has("aggregator") and retry.has("depth") and not retry.has("camera")
+    restored = retry.load("aggregator")
+    assert restored["ps_idx"] == 5
+    for index, layer in value["tokens"]["layers"].items():
+        assert torch.equal(restored["tokens"]["layers"][index], layer)
+    depth, conf = retry.load("depth")
+    assert torch.equal(depth, torch.ones(2, 2)) and torch.equal(conf, torch.zeros(2, 2))
+    assert retry.manifest["params"] == {"quantized": False}
+
+
+class _Planted:
+    def __reduce__(self):
+        return (print, ("planted code ran",))
+
+
+def test_load_refuses_arbitrary_pickles():
+    s3 = MemoryS3()
+    checkpoints = StageCheckpoints(s3, "bucket", "run")
+    checkpoints.save("camera", torch.ones(1))
+    checkpoints.flush()
+
+    buffer = BytesIO()
+    torch.save({"value": _Planted()}, buffer)
+    s3.put_object("bucket", checkpoints.manifest["stages"]["camera"]["path"], buffer.getvalue())
+
+    with pytest.raises(pickle.UnpicklingError):
+        StageCheckpoints(s3, "bucket", "run").load("camera")
+
+
+def test_discard_deletes_the_run():
+    s3 = MemoryS3()
+    checkpoints = StageCheckpoints(s3, "bucket", "run")
+    checkpoints.save("camera", torch.ones(1))
+    checkpoints.discard()
+
+    assert not [key for key in s3.objects if key.startswith("vggt_scratch/run/")]
+
+
+def test_cleanup_deletes_only_expired_runs():
+    s3 = MemoryS3()
+    for run_key, ttl_hours in (("short", 1.0), ("long", 48.0)):
+        checkpoints = StageCheckpoints(s3, "bucket", run_key, ttl_hours=ttl_hours)
+        checkpoints.save("camera", torch.ones(1))
+        checkpoints.flush()
+    # A run that crashed before writing its manifest, judged by the default TTL
+    s3.objects["vggt_scratch/orphan/camera.pt"] = (b"", datetime.now(timezone.utc) - timedelta(days=3))
+
+    expired = cleanup_expired_checkpoints(s3, "bucket", now=datetime.now(timezone.utc) + timedelta(hours=2))
+
+    assert sorted(expired) == ["orphan", "short"]
+    assert any(key.startswith("vggt_scratch/long/") for key in s3.objects)
+    assert not any(key.startswith(("vggt_scratch/short/", "vggt_scratch/orphan/")) for key in s3.objects)
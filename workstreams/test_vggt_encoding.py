@@ -0,0 +1,150 @@
+"""Result encodings and the results manifest: round-trips through save, manifest and load."""
+from io import BytesIO
+
+import pytest
+
+np = pytest.importorskip("numpy")
+torch = pytest.importorskip("torch")
+
+import vggt_s3_task
+from vggt_encoding import decode_result, encode_result, load_result, max_decode_error, read_manifest
+
+
+class MemoryS3:
+    """The boto3 calls the results upload and manifest make, on a dict of key -> (bytes, metadata)."""
+
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, Metadata=None, **kwargs):
+        self.objects[Key] = (bytes(Body), dict(Metadata or {}))
+
+    def upload_fileobj(self, fileobj, bucket, key, ExtraArgs=None, Config=None):
+        self.put_object(bucket, key, fileobj.read(), **(ExtraArgs or {}))
+
+    def head_object(self, Bucket, Key):
+        body, metadata = self.objects[Key]
+        return {'ContentLength': len(body), 'Metadata': metadata}
+
+    def get_object(self, Bucket, Key):
+        return {'Body': BytesIO(self.objects[Key][0])}
+
+
+def _maps(frames: int = 3, height: int = 6, width: int = 8):
+    generator = torch.Generator().manual_seed(0)
+    return {
+        "depth_map": torch.rand(frames, height, width, 1, generator=generator) * 80 + 0.5,
+        "depth_conf": torch.exp(torch.rand(frames, height, width, generator=generator) * 6),
+        "point_map": torch.randn(frames, height, width, 3, generator=generator) * 20,
+        "extrinsic": torch.randn(frames, 3, 4, generator=generator),
+    }
+
+
+def test_fp32_stores_as_predicted():
+    depth = _maps()["depth_map"]
+    stored, encoding = encode_result("depth_map", depth, "fp32")
+    assert stored is depth
+    assert encoding == {"encoding": "raw", "dtype": "float32"}
+
+
+def test_fp16_round_trip():
+    points = _maps()["point_map"]
+    stored, encoding = encode_result("point_map", points, "fp16")
+
+    assert stored.dtype == torch.float16
+    decoded = decode_result(stored, encoding)
+    assert decoded.dtype == torch.float32
+    assert torch.allclose(decoded, points, rtol=1e-3, atol=1e-3)
+
+
+def test_depth_quantizes_to_int16_within_half_a_step():
+    depth = _maps()["depth_map"]
+    stored, encoding = encode_result("depth_map", depth, "quantized")
+
+    assert stored.dtype == torch.int16
+    assert encoding["encoding"] == "linear"
+    error = (decode_result(stored, encoding) - depth).abs().max().item()
+    assert error <= max_decode_error(encoding) * 1.001
+    # The full int16 range is used, so the step is range / 65534
+    assert max_decode_error(encoding) == pytest.approx((depth.max() - depth.min()).item() / (2 * 32767) / 2)
+
+
+def test_confidence_quantizes_to_uint8_within_relative_error():
+    conf = _maps()["depth_conf"]
+    stored, encoding = encode_result("depth_conf", conf, "quantized")
+
+    assert stored.dtype == torch.uint8
+    assert encoding["encoding"] == "log-linear"
+    relative = ((decode_result(stored, encoding) - conf).abs() / conf).max().item()
+    assert relative <= max_decode_error(encoding) * 1.001
+
+
+def test_non_finite_and_constant_maps_quantize():
+    depth = torch.full((2, 4, 4, 1), 3.0)
+    depth[0, 0, 0, 0] = float("nan")
+    stored, encoding = encode_result("depth_map", depth, "quantized")
+
+    decoded = decode_result(stored, encoding)
+    assert torch.equal(decoded[1], torch.full((4, 4, 1), 3.0))
+
+
+def test_cameras_and_integer_results_stay_raw():
+    extrinsic = _maps()["extrinsic"]
+    for precision in ("fp16", "quantized"):
+        stored, encoding = encode_result("extrinsic", extrinsic, precision)
+        assert stored is extrinsic and encoding["encoding"] == "raw"
+
+    ids = torch.arange(4)
+    stored, _ = encode_result("depth_map", ids, "quantized")
+    assert stored is ids
+
+
+def test_unknown_precision_and_encoding_are_rejected():
+    with pytest.raises(ValueError):
+        encode_result("depth_map", torch.ones(1), "int4")
+    with pytest.raises(ValueError):
+        decode_result(torch.ones(1), {"encoding": "delta"})
+
+
+@pytest.mark.parametrize("layout", ["tensor", "frames", "both"])
+def test_manifest_round_trip(layout):
+    s3 = MemoryS3()
+    results = _maps()
+    # Same memory as point_map, like final_point_map with use_point_map
+    results["final_point_map"] = results["point_map"]
+
+    paths = vggt_s3_task.save_results_to_s3.fn(
+        s3, "bucket", results, "runs/1", storage_precision="quantized",
+        aliases={"final_point_conf": "depth_conf"}, layout=layout
+    )
+    vggt_s3_task.write_results_manifest.fn(s3, "bucket", "runs/1", paths, storage_precision="quantized")
+    manifest = read_manifest(s3, "bucket", "runs/1")
+
+    assert manifest["storage_precision"] == "quantized"
+    assert manifest["results"]["final_point_map"]["alias_of"] == "point_map"
+    assert manifest["results"]["final_point_conf"]["alias_of"] == "depth_conf"
+    assert not any(key.endswith("final_point_map.pt") or "final_point_map.npy" in key for key in s3.objects)
+    if layout == "tensor":
+        assert "frames" not in manifest
+    else:
+        assert manifest["frames"] == 3
+        assert "depth_map" in manifest["frame_results"]
+        assert "runs/1/frames/2/depth_map.npy" in s3.objects
+
+    for name, expected in (
+        ("depth_map", results["depth_map"]),
+        ("point_map", results["point_map"]),
+        ("final_point_map", results["point_map"]),
+        ("depth_conf", results["depth_conf"]),
+        ("final_point_conf", results["depth_conf"]),
+        ("extrinsic", results["extrinsic"]),
+    ):
+        entry = manifest["results"][name]
+        loaded = load_result(s3, "bucket", manifest, name)
+        assert loaded.shape == expected.shape, name
+        if entry.get("encoding") == "log-linear":
+            assert ((loaded - expected).abs() / expected).max() <= max_decode_error(entry) * 1.001, name
+        elif entry.get("encoding") == "linear":
+            assert (loaded - expected).abs().max() <= max_decode_error(entry) * 1.001, name
+        else:
+            assert torch.allclose(loaded.float(), expected, rtol=1e-3, atol=1e-3), name
@@ -0,0 +1,106 @@
+"""The per-frame result layout of save_results_to_s3, against an in-memory S3 client."""
+import json
+from io import BytesIO
+
+import pytest
+
+np = pytest.importorskip("numpy")
+torch = pytest.importorskip("torch")
+
+import vggt_s3_task
+
+
+class MemoryS3:
+    """The boto3 calls the results upload makes, on a dict of key -> (bytes, metadata)."""
+
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, Metadata=None, **kwargs):
+        self.objects[Key] = (bytes(Body), dict(Metadata or {}))
+
+    def upload_fileobj(self, fileobj, bucket, key, ExtraArgs=None, Config=None):
+        self.put_object(bucket, key, fileobj.read(), **(ExtraArgs or {}))
+
+    def head_object(self, Bucket, Key):
+        body, metadata = self.objects[Key]
+        return {'ContentLength': len(body), 'Metadata': metadata}
+
+    def frame(self, key):
+        body, metadata = self.objects[key]
+        return np.load(BytesIO(body)), json.loads(metadata['vggt-encoding'])
+
+
+def _results(frames: int = 4):
+    generator = torch.Generator().manual_seed(0)
+    return {
+        "depth_map": torch.rand(frames, 5, 7, 1, generator=generator) * 50 + 1,
+        "extrinsic": torch.randn(frames, 3, 4, generator=generator),
+        "fused_points": torch.randn(100, 3, generator=generator),
+        "num_frames": torch.tensor(frames),
+    }
+
+
+def test_frames_layout_writes_one_npy_per_frame():
+    s3 = MemoryS3()
+    results = _results()
+
+    paths = vggt_s3_task.save_results_to_s3.fn(s3, "bucket", results, "runs/1", layout="frames")
+
+    assert paths["depth_map"] == "runs/1/frames/{frame}/depth_map.npy"
+    assert paths["extrinsic"] == "runs/1/frames/{frame}/extrinsic.npy"
+    for index in range(4):
+        depth, metadata = s3.frame(f"runs/1/frames/{index}/depth_map.npy")
+        np.testing.assert_array_equal(depth, results["depth_map"][index].numpy())
+        assert metadata["frames"] == 4
+        assert metadata["frame_shape"] == [5, 7, 1]
+        assert metadata["frame_path"] == paths["depth_map"]
+    assert "runs/1/frames/4/depth_map.npy" not in s3.objects
+    assert not any(key.endswith(("depth_map.pt", "extrinsic.pt")) for key in s3.objects)
+
+
+def test_results_without_a_frame_axis_stay_whole():
+    s3 = MemoryS3()
+
+    paths = vggt_s3_task.save_results_to_s3.fn(s3, "bucket", _results(), "runs/1", layout="frames")
+
+    assert paths["fused_points"] == "runs/1/fused_points.pt"
+    assert paths["num_frames"] == "runs/1/num_frames.pt"
+    assert not any("frames/" in key and ("fused_points" in key or "num_frames" in key) for key in s3.objects)
+
+
+def test_both_layout_keeps_the_tensor_files():
+    s3 = MemoryS3()
+
+    paths = vggt_s3_task.save_results_to_s3.fn(s3, "bucket", _results(), "runs/1", layout="both")
+
+    assert paths["depth_map"] == "runs/1/depth_map.pt"
+    assert "runs/1/frames/3/depth_map.npy" in s3.objects
+    metadata = json.loads(s3.objects["runs/1/depth_map.pt"][1]['vggt-encoding'])
+    assert metadata["frame_path"] == "runs/1/frames/{frame}/depth_map.npy"
+
+
+def test_quantized_frames_share_one_encoding():
+    s3 = MemoryS3()
+    results = _results()
+
+    vggt_s3_task.save_results_to_s3.fn(s3, "bucket", results, "runs/1",
+                                       storage_precision="quantized", layout="frames")
+
+    frames = [s3.frame(f"runs/1/frames/{index}/depth_map.npy") for index in range(4)]
+    encodings = [metadata for _, metadata in frames]
+    assert all(encoding == encodings[0] for encoding in encodings)
+    assert encodings[0]["encoding"] != "raw"
+    assert all(data.dtype == np.dtype(encodings[0]["dtype"]) for data, _ in frames)
+
+
+def test_aliases_point_at_the_frame_template():
+    s3 = MemoryS3()
+    results = _results()
+    results["final_depth"] = results["depth_map"]
+
+    paths = vggt_s3_task.save_results_to_s3.fn(s3, "bucket", results, "runs/1", layout="frames",
+                                               aliases={"depth_alias": "depth_map"})
+
+    assert paths["final_depth"] == paths["depth_alias"] == "runs/1/frames/{frame}/depth_map.npy"
+    assert not any("final_depth" in key for key in s3.objects)
@@ -0,0 +1,116 @@
+"""run_pipeline: stage ordering, backpressure, failures and shutdown, with fake stages."""
+import threading
+import time
+
+import pytest
+
+from vggt_pipeline import PipelineStage, run_pipeline
+
+
+def _pipeline_threads():
+    return [t for t in threading.enumerate() if t.name.startswith("pipeline-")]
+
+
+def test_items_pass_through_every_stage_in_order():
+    def stage(name):
+        return lambda item: item + [name]
+
+    result = run_pipeline(
+        ([n] for n in range(5)),
+        [PipelineStage("download", stage("download")),
+         PipelineStage("infer", stage("infer")),
+         PipelineStage("upload", stage("upload"))]
+    )
+
+    assert result.outputs == [[n, "download", "infer", "upload"] for n in range(5)]
+    assert result.errors == []
+    assert [s.name for s in result.stages] == ["download", "infer", "upload"]
+    assert all(s.items == 5 and s.failures == 0 for s in result.stages)
+
+
+def test_bounded_queues_hold_back_the_producer():
+    pulled = []
+    release = threading.Event()
+
+    def items():
+        for n in range(100):
+            pulled.append(n)
+            yield n
+
+    def slow_upload(item):
+        release.wait(timeout=10)
+        return item
+
+    stages = [PipelineStage("download", lambda item: item), PipelineStage("upload", slow_upload)]
+    outcome = {}
+    runner = threading.Thread(
+        target=lambda: outcome.setdefault("result", run_pipeline(items(), stages, queue_size=1))
+    )
+    runner.start()
+    time.sleep(0.3)
+
+    # One item per queue, one in each worker and one waiting in the producer's put
+    assert len(pulled) <= 2 * len(stages) + 1
+
+    release.set()
+    runner.join(timeout=10)
+    assert not runner.is_alive()
+    assert outcome["result"].outputs == list(range(100))
+
+
+def test_failing_stage_drops_the_item_and_keeps_the_rest():
+    reported = []
+
+    def infer(item):
+        if item == 2:
+            raise RuntimeError("out of memory")
+        return item * 10
+
+    result = run_pipeline(
+        range(5),
+        [PipelineStage("download", lambda item: item), PipelineStage("infer", infer),
+         PipelineStage("upload", lambda item: item)],
+        on_error=lambda stage, item, error: reported.append((stage, item, str(error)))
+    )
+
+    assert result.outputs == [0, 10, 30, 40]
+    assert result.errors == [{'stage': 'infer', 'item': 2, 'error': 'out of memory'}]
+    assert reported == [("infer", 2, "out of memory")]
+    infer_stats = result.stages[1]
+    assert (infer_stats.items, infer_stats.failures) == (4, 1)
+    assert result.stages[2].items == 4
+
+
+def test_all_workers_stop_when_the_input_is_drained():
+    result = run_pipeline(
+        range(20),
+        [PipelineStage("download", lambda item: item, workers=3),
+         PipelineStage("infer", lambda item: item + 1, workers=2),
+         PipelineStage("upload", lambda item: item, workers=4)],
+        queue_size=2
+    )
+
+    assert sorted(result.outputs) == list(range(1, 21))
+    assert _pipeline_threads() == []
+
+
+def test_workers_shut_down_when_the_input_raises():
+    processed = []
+
+    def items():
+        yield 1
+        yield 2
+        raise ValueError("listing failed")
+
+    def upload(item):
+        processed.append(item)
+        return item
+
+    with pytest.raises(ValueError, match="listing failed"):
+        run_pipeline(items(), [PipelineStage("download", lambda item: item, workers=2),
+                               PipelineStage("upload", upload, workers=2)])
+
+    for thread in _pipeline_threads():
+        thread.join(timeout=5)
+    assert _pipeline_threads() == []
+    assert sorted(processed) == [1, 2]
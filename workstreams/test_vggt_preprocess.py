@@ -0,0 +1,82 @@
+"""Preprocessing into the batch buffer: output layout and the buffer's fallback when /dev/shm is full."""
+import os
+import shutil
+from collections import namedtuple
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("torch")
+Image = pytest.importorskip("PIL.Image")
+
+import vggt_preprocess
+
+
+@pytest.fixture
+def images(tmp_path):
+    """A landscape and a portrait image, so the batch needs padding."""
+    rng = np.random.default_rng(0)
+    paths = []
+    for name, size in (("wide.png", (64, 32)), ("tall.png", (40, 60))):
+        path = tmp_path / name
+        Image.fromarray(rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)).save(path)
+        paths.append(str(path))
+    return paths
+
+
+def test_preprocess_layout_and_padding(images):
+    batch = vggt_preprocess.preprocess_parallel(images, num_workers=1, target_size=28)
+
+    shapes = vggt_preprocess.image_shapes(images, 28)
+    assert tuple(batch.shape) == (2, 3, max(h for h, _ in shapes), 28)
+    assert 0.0 <= float(batch.min()) and float(batch.max()) <= 1.0
+    # The shorter image is centered with white rows above and below
+    assert shapes == [(14, 28), (28, 28)]
+    rows, _ = vggt_preprocess.padded_region(tuple(batch.shape), shapes[0])
+    assert bool((batch[0, :, :rows.start] == vggt_preprocess.PAD_VALUE).all())
+    assert bool((batch[0, :, rows.stop:] == vggt_preprocess.PAD_VALUE).all())
+
+
+def test_parallel_matches_serial(images):
+    serial = vggt_preprocess.preprocess_parallel(images, num_workers=1, target_size=28)
+    parallel = vggt_preprocess.preprocess_parallel(images, num_workers=2, target_size=28)
+    assert np.array_equal(serial.numpy(), parallel.numpy())
+
+
+def _disk_usage_with_full(full_dir: str):
+    usage = namedtuple("usage", "total used free")
+    real = shutil.disk_usage
+
+    def disk_usage(path):
+        if os.path.realpath(path) == os.path.realpath(full_dir):
+            return usage(64 << 20, 64 << 20, 0)
+        return real(path)
+    return disk_usage
+
+
+def test_buffer_falls_back_when_shared_memory_is_full(images, tmp_path, monkeypatch):
+    shm = tmp_path / "shm"
+    shm.mkdir()
+    monkeypatch.setattr(vggt_preprocess, "SHARED_MEMORY_DIR", str(shm))
+    monkeypatch.setattr(vggt_preprocess.shutil, "disk_usage", _disk_usage_with_full(str(shm)))
+
+    path = vggt_preprocess._allocate_buffer(1 << 20)
+    try:
+        assert os.path.dirname(path) != str(shm)
+        assert os.path.getsize(path) == 1 << 20
+    finally:
+        os.unlink(path)
+
+    batch = vggt_preprocess.preprocess_parallel(images, num_workers=1, target_size=28)
+    assert batch.shape[0] == 2
+    assert not os.listdir(shm)
+
+
+def test_buffer_raises_when_nothing_has_room(tmp_path, monkeypatch):
+    monkeypatch.setattr(vggt_preprocess, "SHARED_MEMORY_DIR", str(tmp_path))
+    monkeypatch.setattr(vggt_preprocess.tempfile, "gettempdir", lambda: str(tmp_path))
+    monkeypatch.setattr(vggt_preprocess.shutil, "disk_usage", _disk_usage_with_full(str(tmp_path)))
+
+    with pytest.raises(OSError):
+        vggt_preprocess._allocate_buffer(1 << 20)
+    assert not os.listdir(tmp_path)
@@ -0,0 +1,140 @@
+"""The preview tier and tiers.json status transitions, against an in-memory S3 client."""
+import json
+from io import BytesIO
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+torch = pytest.importorskip("torch")
+
+import vggt_preprocess
+import vggt_s3_task
+from vggt_encoding import read_manifest
+
+
+class NoSuchKey(Exception):
+    pass
+
+
+class MemoryS3:
+    """The boto3 calls the preview tier makes, on a dict of key -> (bytes, metadata)."""
+
+    exceptions = SimpleNamespace(NoSuchKey=NoSuchKey)
+
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, Metadata=None, **kwargs):
+        self.objects[Key] = (bytes(Body), dict(Metadata or {}))
+
+    def upload_fileobj(self, fileobj, bucket, key, ExtraArgs=None, Config=None):
+        self.put_object(bucket, key, fileobj.read(), **(ExtraArgs or {}))
+
+    def head_object(self, Bucket, Key):
+        body, metadata = self.objects[Key]
+        return {'ContentLength': len(body), 'Metadata': metadata}
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise NoSuchKey(Key)
+        return {'Body': BytesIO(self.objects[Key][0])}
+
+    def tiers(self, output_prefix):
+        return json.loads(self.get_object(Bucket="bucket", Key=f"{output_prefix}/tiers.json")['Body'].read())["tiers"]
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    """Replace preprocessing and the model stages with tensors of the preview's shapes."""
+    calls = {}
+
+    def preprocess(image_paths, num_workers=None, target_size=518):
+        calls["target_size"] = target_size
+        height = target_size * 2 // 3 // 14 * 14
+        return torch.rand(len(image_paths), 3, height, target_size)
+
+    def aggregator(model, images):
+        return images[None], ["tokens"], 5
+
+    def cameras(model, tokens, images_batch):
+        frames = images_batch.shape[1]
+        extrinsic = torch.eye(3, 4).repeat(1, frames, 1, 1)
+        extrinsic[0, :, 0, 3] = torch.arange(frames, dtype=torch.float32)
+        focal, (height, width) = 100.0, images_batch.shape[-2:]
+        intrinsic = torch.tensor([[focal, 0, width / 2], [0, focal, height / 2], [0, 0, 1]]).repeat(1, frames, 1, 1)
+        return extrinsic, intrinsic
+
+    def depth_maps(model, tokens, images_batch, ps_idx):
+        frames, _, height, width = images_batch.shape[1:]
+        return torch.full((1, frames, height, width, 1), 10.0), torch.rand(1, frames, height, width) + 1
+
+    monkeypatch.setattr(vggt_preprocess, "preprocess_parallel", preprocess)
+    monkeypatch.setattr(vggt_s3_task, "run_vggt_aggregator", SimpleNamespace(fn=aggregator))
+    monkeypatch.setattr(vggt_s3_task, "predict_cameras", SimpleNamespace(fn=cameras))
+    monkeypatch.setattr(vggt_s3_task, "predict_depth_maps", SimpleNamespace(fn=depth_maps))
+    return calls
+
+
+def test_preview_writes_results_and_marks_the_tier_complete(fake_model):
+    s3 = MemoryS3()
+    images = [f"/tmp/frame_{n}.jpg" for n in range(3)]
+
+    paths = vggt_s3_task.run_preview_tier.fn(s3, "bucket", None, images, "runs/1",
+                                             s3_image_paths=[f"flights/a/{n}.jpg" for n in range(3)],
+                                             preview_size=224)
+
+    assert fake_model["target_size"] == 224
+    assert paths["manifest"] == "runs/1/preview/manifest.json"
+    assert paths["poses"].startswith("runs/1/preview/")
+    manifest = read_manifest(s3, "bucket", "runs/1/preview")
+    assert {"extrinsic", "intrinsic", "fused_points"} <= set(manifest["results"])
+    assert "depth_map" not in manifest["results"]
+
+    preview = s3.tiers("runs/1")["preview"]
+    assert preview["status"] == "complete"
+    assert preview["manifest"] == paths["manifest"]
+    assert preview["frames"] == 3
+    assert preview["resolution"] == [140, 224]
+    assert preview["seconds"] >= 0
+    assert "updated_at" in preview
+
+
+def test_preview_size_must_be_a_patch_multiple(fake_model):
+    s3 = MemoryS3()
+
+    with pytest.raises(ValueError, match="multiple of 14"):
+        vggt_s3_task.run_preview_tier.fn(s3, "bucket", None, ["/tmp/a.jpg"], "runs/1", preview_size=200)
+
+    assert s3.objects == {}
+
+
+def test_tier_status_moves_from_running_to_complete_and_keeps_the_preview(fake_model):
+    s3 = MemoryS3()
+    vggt_s3_task.run_preview_tier.fn(s3, "bucket", None, ["/tmp/a.jpg", "/tmp/b.jpg"], "runs/1")
+    preview = s3.tiers("runs/1")["preview"]
+
+    vggt_s3_task.write_tier_status(s3, "bucket", "runs/1", "full", {"status": "running"})
+    tiers = s3.tiers("runs/1")
+    assert tiers["full"]["status"] == "running"
+    assert tiers["preview"] == preview
+
+    vggt_s3_task.write_tier_status(s3, "bucket", "runs/1", "full", {
+        "status": "complete", "manifest": "runs/1/manifest.json", "frames": 2, "resolution": [350, 518]
+    })
+    tiers = s3.tiers("runs/1")
+    assert tiers["full"]["status"] == "complete"
+    assert tiers["full"]["manifest"] == "runs/1/manifest.json"
+    assert tiers["full"]["updated_at"] >= tiers["preview"]["updated_at"]
+    assert tiers["preview"] == preview
+
+
+def test_tier_status_creates_tiers_json():
+    s3 = MemoryS3()
+
+    path = vggt_s3_task.write_tier_status(s3, "bucket", "runs/2", "full", {"status": "running"})
+
+    assert path == "runs/2/tiers.json"
+    tiers = json.loads(s3.objects[path][0])
+    assert tiers["version"] == 1
+    assert list(tiers["tiers"]) == ["full"]
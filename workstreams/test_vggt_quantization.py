@@ -0,0 +1,82 @@
+"""Quantized VGGT cache: conversion once, then meta-built loads of the cached int8 weights."""
+import pickle
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from vggt_quantization import QUANTIZED_CACHE_FILE, load_quantized_vggt
+
+
+class Block(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.norm = torch.nn.LayerNorm(16)
+        self.mlp = torch.nn.Sequential(torch.nn.Linear(16, 32), torch.nn.GELU(), torch.nn.Linear(32, 16))
+
+    def forward(self, x):
+        return x + self.mlp(self.norm(x))
+
+
+class TinyModel(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.blocks = torch.nn.Sequential(Block(), Block())
+        self.head = torch.nn.Linear(16, 4)
+        self.register_buffer("scale", torch.full((4,), 2.0), persistent=False)
+
+    def forward(self, x):
+        return self.head(self.blocks(x)) * self.scale
+
+
+@pytest.fixture
+def reference():
+    torch.manual_seed(0)
+    return TinyModel().eval()
+
+
+def test_cached_load_matches_the_converted_model(tmp_path, reference):
+    x = torch.randn(3, 16)
+    converted = load_quantized_vggt(TinyModel, lambda: reference, cache_dir=str(tmp_path))
+    assert (tmp_path / QUANTIZED_CACHE_FILE).exists()
+
+    built_on_meta = []
+
+    def build_model():
+        model = TinyModel()
+        built_on_meta.append(all(param.is_meta for param in model.parameters()))
+        return model
+
+    def load_fp32_model():
+        raise AssertionError("the cached weights should be used")
+
+    cached = load_quantized_vggt(build_model, load_fp32_model, cache_dir=str(tmp_path))
+
+    assert built_on_meta == [True]
+    assert not any(param.is_meta for param in cached.parameters())
+    assert type(cached.head) is type(converted.head) is not torch.nn.Linear
+    assert torch.equal(cached.scale, torch.full((4,), 2.0))
+    assert torch.equal(cached(x), converted(x))
+
+
+class _Planted:
+    def __reduce__(self):
+        return (print, ("planted code ran",))
+
+
+def test_cached_load_refuses_arbitrary_pickles(tmp_path):
+    torch.save({"head.bias": _Planted()}, tmp_path / QUANTIZED_CACHE_FILE)
+
+    with pytest.raises(pickle.UnpicklingError):
+        load_quantized_vggt(TinyModel, TinyModel, cache_dir=str(tmp_path))
+
+
+def test_incomplete_cache_is_rejected(tmp_path, reference):
+    converted = load_quantized_vggt(TinyModel, lambda: reference, cache_dir=str(tmp_path))
+    state_dict = converted.state_dict()
+    for key in [key for key in state_dict if key.startswith("blocks.0.norm")]:
+        del state_dict[key]
+    torch.save(state_dict, tmp_path / QUANTIZED_CACHE_FILE)
+
+    with pytest.raises(RuntimeError):
+        load_quantized_vggt(TinyModel, TinyModel, cache_dir=str(tmp_path))
@@ -0,0 +1,48 @@
+"""Execution profiles: physical core detection and environment overrides."""
+import pytest
+
+pytest.importorskip("torch")
+
+import vggt_runtime
+
+
+def _fake_topology(root, cpus):
+    """Write sysfs topology files for {cpu: (package, core)}."""
+    for cpu, (package, core) in cpus.items():
+        topology = root / f"cpu{cpu}" / "topology"
+        topology.mkdir(parents=True)
+        (topology / "physical_package_id").write_text(f"{package}\n")
+        (topology / "core_id").write_text(f"{core}\n")
+
+
+def test_physical_cores_skips_smt_siblings(tmp_path, monkeypatch):
+    # Two sockets with two cores each, two threads per core
+    _fake_topology(tmp_path, {
+        0: (0, 0), 1: (0, 1), 2: (1, 0), 3: (1, 1),
+        4: (0, 0), 5: (0, 1), 6: (1, 0), 7: (1, 1),
+    })
+    monkeypatch.setattr(vggt_runtime, "SYSFS_CPU_DIR", str(tmp_path))
+    monkeypatch.setattr(vggt_runtime.os, "sched_getaffinity", lambda pid: set(range(8)), raising=False)
+    assert vggt_runtime.physical_cores() == 4
+
+    # A cpuset holding both threads of one core and one thread of another
+    monkeypatch.setattr(vggt_runtime.os, "sched_getaffinity", lambda pid: {0, 4, 1}, raising=False)
+    assert vggt_runtime.physical_cores() == 2
+
+
+def test_physical_cores_falls_back_to_affinity(tmp_path, monkeypatch):
+    monkeypatch.setattr(vggt_runtime, "SYSFS_CPU_DIR", str(tmp_path / "missing"))
+    monkeypatch.setattr(vggt_runtime.os, "sched_getaffinity", lambda pid: {0, 1, 2}, raising=False)
+    assert vggt_runtime.physical_cores() == 3
+
+
+def test_execution_profile_thread_overrides(monkeypatch):
+    monkeypatch.setenv("VGGT_INTRA_OP_THREADS", "3")
+    monkeypatch.delenv("VGGT_INTER_OP_THREADS", raising=False)
+    profile = vggt_runtime.get_execution_profile("cpu-bf16")
+    assert profile.intra_op_threads == 3
+    assert profile.inter_op_threads == 1
+    assert profile.cpu_autocast_dtype == "bfloat16"
+
+    with pytest.raises(ValueError):
+        vggt_runtime.get_execution_profile("gpu-magic")
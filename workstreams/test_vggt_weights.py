@@ -0,0 +1,83 @@
+"""Meta-device model construction in vggt_weights, including overlapping loads from threads."""
+import threading
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+import vggt_weights
+
+
+def test_parameters_on_meta_only_affects_the_building_thread():
+    original = torch.nn.Module.register_parameter
+    inside = threading.Event()
+    built = threading.Event()
+    other = {}
+
+    def build_elsewhere():
+        inside.wait()
+        other["model"] = torch.nn.Linear(4, 4)
+        built.set()
+
+    thread = threading.Thread(target=build_elsewhere)
+    thread.start()
+    with vggt_weights._parameters_on_meta():
+        model = torch.nn.Linear(4, 4)
+        inside.set()
+        built.wait()
+    thread.join()
+
+    assert model.weight.is_meta
+    assert not other["model"].weight.is_meta
+    assert torch.nn.Module.register_parameter is original
+
+
+def test_overlapping_loads_restore_register_parameter():
+    original = torch.nn.Module.register_parameter
+    first_entered = threading.Event()
+    second_entered = threading.Event()
+    first_exited = threading.Event()
+    results = {}
+
+    def first():
+        with vggt_weights._parameters_on_meta():
+            first_entered.set()
+            second_entered.wait()
+            results["first"] = torch.nn.Linear(2, 2)
+        # Built while the second load is still inside
+        results["first_after"] = torch.nn.Linear(2, 2)
+        first_exited.set()
+
+    def second():
+        with vggt_weights._parameters_on_meta():
+            second_entered.set()
+            first_exited.wait()
+            results["second"] = torch.nn.Linear(2, 2)
+
+    threads = [threading.Thread(target=first), threading.Thread(target=second)]
+    threads[0].start()
+    first_entered.wait()
+    threads[1].start()
+    for thread in threads:
+        thread.join()
+
+    assert results["first"].weight.is_meta and results["second"].weight.is_meta
+    assert not results["first_after"].weight.is_meta
+    assert torch.nn.Module.register_parameter is original
+    assert not torch.nn.Linear(2, 2).weight.is_meta
+
+
+def test_load_model_from_store_assigns_weights(tmp_path, monkeypatch):
+    reference = torch.nn.Sequential(torch.nn.Linear(3, 5), torch.nn.LayerNorm(5))
+    path = tmp_path / "model.pt"
+    torch.save(reference.state_dict(), path)
+    monkeypatch.setenv("VGGT_WEIGHTS_PATH", str(path))
+    monkeypatch.setenv("VGGT_CACHE_DIR", str(tmp_path / "cache"))
+
+    model = vggt_weights.load_model_from_store(
+        lambda: torch.nn.Sequential(torch.nn.Linear(3, 5), torch.nn.LayerNorm(5)), offline=True
+    )
+
+    assert not model.training
+    for name, value in reference.state_dict().items():
+        assert torch.equal(model.state_dict()[name], value)
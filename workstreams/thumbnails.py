@@ -0,0 +1,280 @@
+"""Prefect flow that generates thumbnails and previews for ingested image assets."""
+from prefect import flow, task, get_run_logger
+from prefect.cache_policies import NO_CACHE
+import os
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import List, Dict, Any, Optional, Tuple
+
+from metrics import BYTES_TRANSFERRED, OBJECTS_LISTED, track_flow
+from storage import get_s3_client
+from vggt_pipeline import PipelineStage, run_pipeline
+
+# Configure logging
+logger = logging.getLogger("thumbnails")
+logger.setLevel(logging.INFO)
+
+# Longest edge in pixels of each generated size: grid thumbnail and lightbox preview
+THUMBNAIL_SIZES = [256, 1024]
+THUMBNAIL_QUALITY = 85
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.tif', '.tiff', '.webp')
+
+
+def thumbnail_key(asset_key: str, size: int, asset_prefix: str = "assets/", thumbnail_prefix: str = "thumbnails/") -> str:
+    """
+    S3 key of one thumbnail size of an asset.
+
+    ``assets/{owner}/{uuid}.jpg`` maps to ``thumbnails/{owner}/{uuid}/{size}.jpg``, so the
+    location can be derived from the asset's stored_path alone.
+
+    Args:
+        asset_key: Stored path of the asset
+        size: Longest edge of the thumbnail
+        asset_prefix: Prefix the assets live under
+        thumbnail_prefix: Prefix the thumbnails are written to
+
+    Returns:
+        str: Thumbnail key
+    """
+    relative = asset_key[len(asset_prefix):] if asset_key.startswith(asset_prefix) else asset_key
+    stem = os.path.splitext(relative)[0]
+    return f"{thumbnail_prefix}{stem}/{size}.jpg"
+
+
+def render_thumbnails(data: bytes, sizes: List[int], quality: int = THUMBNAIL_QUALITY) -> Dict[int, bytes]:
+    """
+    Decode an image once and encode a JPEG for every requested size.
+
+    JPEGs are decoded in draft mode, which lets libjpeg scale by 1/2, 1/4 or 1/8 during
+    the DCT instead of decoding the full-resolution frame and shrinking it afterwards.
+    Sizes are produced largest first so each one is resampled from the previous, smaller
+    image. Runs in a worker process, so it only takes and returns plain bytes.
+
+    Args:
+        data: Encoded source image
+        sizes: Longest edge of each thumbnail
+        quality: JPEG quality of the output
+
+    Returns:
+        Dict[int, bytes]: Encoded JPEG per size
+    """
+    from PIL import Image, ImageOps
+
+    largest = max(sizes)
+    with Image.open(BytesIO(data)) as img:
+        if img.format == "JPEG":
+            # Draft mode never scales below the requested size, so quality is unaffected
+            img.draft("RGB", (largest, largest))
+        img = ImageOps.exif_transpose(img)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+
+        outputs = {}
+        for size in sorted(sizes, reverse=True):
+            img.thumbnail((size, size), Image.Resampling.LANCZOS, reducing_gap=2.0)
+            buffer = BytesIO()
+            img.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+            outputs[size] = buffer.getvalue()
+    return outputs
+
+
+@dataclass
+class ThumbnailJob:
+    """One asset whose thumbnails need to be (re)generated."""
+    asset_key: str
+    size_bytes: int
+    thumbnail_keys: Dict[int, str] = field(default_factory=dict)
+    data: Optional[bytes] = None
+    outputs: Optional[Dict[int, bytes]] = None
+
+
+@task(name="Find Pending Thumbnails",
+      description="List image assets that are missing one or more thumbnail sizes",
+      cache_policy=NO_CACHE)
+def find_pending_assets(
+    s3_client,
+    bucket_name: str,
+    sizes: List[int],
+    asset_prefix: str = "assets/",
+    thumbnail_prefix: str = "thumbnails/",
+    force: bool = False
+) -> Tuple[List[ThumbnailJob], int]:
+    """
+    Find image assets that still need thumbnails.
+
+    The existing thumbnails are listed once up front, so deciding whether an asset is done
+    costs no request per asset. An asset only counts as done when every size exists, which
+    makes reruns after a partial failure finish the missing sizes.
+
+    Args:
+        s3_client: Configured S3 client
+        bucket_name: S3 bucket name
+        sizes: Thumbnail sizes to generate
+        asset_prefix: Prefix the assets live under
+        thumbnail_prefix: Prefix the thumbnails are written to
+        force: Regenerate thumbnails that already exist
+
+    Returns:
+        Tuple containing:
+            - Jobs for assets missing thumbnails
+            - Number of assets skipped because they are already done
+    """
+    paginator = s3_client.get_paginator('list_objects_v2')
+
+    existing = set()
+    if not force:
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=thumbnail_prefix):
+            OBJECTS_LISTED.labels("thumbnails").inc(len(page.get('Contents', [])))
+            existing.update(obj['Key'] for obj in page.get('Contents', []))
+
+    jobs, skipped = [], 0
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=asset_prefix):
+        OBJECTS_LISTED.labels("thumbnails").inc(len(page.get('Contents', [])))
+        for obj in page.get('Contents', []):
+            if not obj['Key'].lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            keys = {size: thumbnail_key(obj['Key'], size, asset_prefix, thumbnail_prefix) for size in sizes}
+            if all(key in existing for key in keys.values()):
+                skipped += 1
+                continue
+            jobs.append(ThumbnailJob(obj['Key'], obj['Size'], keys))
+
+    logger.info(f"{len(jobs)} assets need thumbnails, {skipped} already done")
+    return jobs, skipped
+
+
+@flow(name="Asset Thumbnails",
+      description="Generate thumbnails and previews for image assets",
+      log_prints=True)
+@track_flow("thumbnails")
+def generate_thumbnails(
+    bucket_name: str = "skystore",
+    asset_prefix: str = "assets/",
+    thumbnail_prefix: str = "thumbnails/",
+    sizes: Optional[List[int]] = None,
+    minio_endpoint: str = "minio",
+    minio_port: int = 9000,
+    minio_access_key: str = "minioadmin",
+    minio_secret_key: str = "minioadmin",
+    num_workers: Optional[int] = None,
+    io_workers: int = 8,
+    force: bool = False
+) -> Dict[str, Any]:
+    """
+    Prefect flow that writes thumbnails for every image asset that does not have them yet.
+
+    Assets are pushed through a download -> render -> upload pipeline. Downloads and uploads
+    run on threads sharing one S3 client; decoding and encoding run on a process pool so
+    they are not serialized by the GIL. Reruns skip assets whose thumbnails all exist.
+
+    Args:
+        bucket_name: S3 bucket name
+        asset_prefix: Prefix the assets live under
+        thumbnail_prefix: Prefix the thumbnails are written to
+        sizes: Longest edge of each thumbnail. If None, uses THUMBNAIL_SIZES.
+        minio_endpoint: MinIO server endpoint
+        minio_port: MinIO server port
+        minio_access_key: MinIO access key (defaults to standard MinIO default)
+        minio_secret_key: MinIO secret key (defaults to standard MinIO default)
+        num_workers: Render processes. If None, one per CPU.
+        io_workers: Concurrent downloads and concurrent uploads
+        force: Regenerate thumbnails that already exist
+
+    Returns:
+        Dict[str, Any]: Counts and throughput of the run
+    """
+    run_logger = get_run_logger()
+    sizes = sorted(sizes or THUMBNAIL_SIZES)
+    num_workers = num_workers or os.cpu_count() or 1
+
+    s3_client = get_s3_client(
+        f"http://{minio_endpoint}:{minio_port}",
+        minio_access_key,
+        minio_secret_key
+    )
+    jobs, skipped = find_pending_assets(s3_client, bucket_name, sizes, asset_prefix, thumbnail_prefix, force)
+    if not jobs:
+        run_logger.info("No assets need thumbnails")
+        return {'assets_total': skipped, 'assets_processed': 0, 'assets_skipped': skipped, 'assets_failed': 0}
+
+    run_logger.info(f"Generating {len(sizes)} sizes {sizes} for {len(jobs)} assets "
+                    f"with {num_workers} render processes")
+
+    # The flow process already runs Prefect's API and log threads, and forking a threaded
+    # process can deadlock the child
+    with ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+
+        def download(job: ThumbnailJob) -> ThumbnailJob:
+            response = s3_client.get_object(Bucket=bucket_name, Key=job.asset_key)
+            job.data = response['Body'].read()
+            BYTES_TRANSFERRED.labels("thumbnails", "download").inc(len(job.data))
+            return job
+
+        def render(job: ThumbnailJob) -> ThumbnailJob:
+            job.outputs = pool.submit(render_thumbnails, job.data, sizes).result()
+            job.data = None
+            return job
+
+        def upload(job: ThumbnailJob) -> ThumbnailJob:
+            for size in sizes:
+                s3_client.put_object(
+                    Bucket=bucket_name,
+                    Key=job.thumbnail_keys[size],
+                    Body=job.outputs[size],
+                    ContentType="image/jpeg",
+                    Metadata={'source-key': job.asset_key}
+                )
+                BYTES_TRANSFERRED.labels("thumbnails", "upload").inc(len(job.outputs[size]))
+            job.outputs = None
+            return job
+
+        def record_failure(stage: str, job: ThumbnailJob, error: Exception):
+            job.data = None
+            job.outputs = None
+            run_logger.warning(f"Thumbnail {stage} failed for {job.asset_key}: {error}")
+
+        # Render threads only wait on the pool, so one per process keeps every process busy
+        pipeline = run_pipeline(
+            jobs,
+            [
+                PipelineStage("download", download, workers=io_workers),
+                PipelineStage("render", render, workers=num_workers),
+                PipelineStage("upload", upload, workers=io_workers),
+            ],
+            queue_size=2 * num_workers,
+            on_error=record_failure,
+            metrics_workstream="thumbnails"
+        )
+
+    elapsed = pipeline.elapsed_seconds
+    processed = len(pipeline.outputs)
+    source_mb = sum(job.size_bytes for job in pipeline.outputs) / 1e6
+    assets_per_sec = processed / elapsed if elapsed > 0 else 0.0
+
+    run_logger.info("📊 Thumbnail Summary:")
+    run_logger.info(f"Assets processed: {processed}/{len(jobs)} ({len(pipeline.errors)} failed, {skipped} skipped)")
+    run_logger.info(f"Duration: {elapsed:.2f} seconds")
+    run_logger.info(f"Throughput: {assets_per_sec:.2f} assets/sec, "
+                    f"{source_mb / elapsed if elapsed > 0 else 0.0:.2f} MB/sec of source images")
+    for stage in pipeline.stages:
+        run_logger.info(f"Stage {stage.name}: {stage.busy_seconds:.2f}s busy across {stage.workers} worker(s)")
+
+    return {
+        'assets_total': len(jobs) + skipped,
+        'assets_processed': processed,
+        'assets_skipped': skipped,
+        'assets_failed': len(pipeline.errors),
+        'duration': elapsed,
+        'assets_per_sec': assets_per_sec,
+        'stage_seconds': {stage.name: stage.busy_seconds for stage in pipeline.stages},
+    }
+
+
+if __name__ == "__main__":
+    summary = generate_thumbnails(minio_endpoint="localhost", minio_port=4164)
+    print(f"Generated thumbnails for {summary['assets_processed']} assets "
+          f"({summary['assets_skipped']} already done)")
@@ -2,14 +2,14 @@
 """
 Script to upload test images to MinIO for VGGT processing.
 """
-import boto3
-from botocore.client import Config
 import logging
 import sys
 import os
 import argparse
 from pathlib import Path
 
+from storage import get_s3_client
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -57,14 +57,7 @@ def upload_images_to_minio(
     try:
         # Create S3 client
         logger.info(f"Connecting to MinIO at {endpoint_url}")
-        s3_client = boto3.client(
-            's3',
-            endpoint_url=endpoint_url,
-            aws_access_key_id=access_key,
-            aws_secret_access_key=secret_key,
-            region_name="us-east-1",
-            config=Config(signature_version='s3v4')
-        )
+        s3_client = get_s3_client(endpoint_url, access_key, secret_key)
         
         # Check if bucket exists
         existing_buckets = [bucket['Name'] for bucket in s3_client.list_buckets()['Buckets']]
@@ -0,0 +1,388 @@
+"""Batch VGGT processing across many flights with a pool of long-lived model workers."""
+from prefect import flow, task, get_run_logger
+from prefect.cache_policies import NO_CACHE
+import shutil
+import tempfile
+import threading
+import time
+import logging
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional
+
+from vggt_s3_task import (
+    check_vggt_install,
+    export_camera_poses,
+    setup_s3_client,
+    download_images_from_s3,
+    load_images_cached,
+    load_vggt_model,
+    preprocess_images,
+    run_vggt_aggregator,
+    predict_cameras,
+    predict_depth_maps,
+    predict_point_maps,
+    construct_point_cloud,
+    prepare_results,
+    save_results_to_s3,
+    write_results_manifest,
+)
+from metrics import OBJECTS_LISTED, track_flow
+from vggt_pipeline import PipelineStage, run_pipeline
+
+# Configure logging
+logger = logging.getLogger("vggt_batch")
+logger.setLevel(logging.INFO)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.tif', '.tiff')
+
+
+@dataclass
+class FlightJob:
+    """A single flight (image set) to run through VGGT."""
+    flight_id: str
+    s3_image_paths: List[str]
+    output_prefix: str
+    size_bytes: int = 0
+
+    @property
+    def num_images(self) -> int:
+        return len(self.s3_image_paths)
+
+
+@dataclass
+class FlightResult:
+    """Outcome of processing a single flight."""
+    flight_id: str
+    success: bool
+    num_images: int
+    output_paths: Dict[str, str] = field(default_factory=dict)
+    download_seconds: float = 0.0
+    preprocess_seconds: float = 0.0
+    inference_seconds: float = 0.0
+    upload_seconds: float = 0.0
+    error: Optional[str] = None
+    worker: Optional[str] = None
+
+
+@task(name="Resolve Flight Jobs",
+      description="Expand flight specs into image lists and order them by size",
+      cache_policy=NO_CACHE)
+def resolve_flight_jobs(
+    s3_client,
+    bucket_name: str,
+    flights: List[Dict[str, Any]],
+    output_root: str = "vggt_results"
+) -> List[FlightJob]:
+    """
+    Turn flight specs into FlightJobs, largest flight first.
+
+    Each spec provides either ``s3_image_paths`` or an ``image_prefix`` to list, plus an
+    optional ``flight_id`` and ``output_prefix``. Flights are ordered by image count (then
+    bytes) descending so the longest runs start first and the tail of the batch is made of
+    short flights, which keeps the worker pool evenly loaded.
+
+    Args:
+        s3_client: Configured S3 client
+        bucket_name: S3 bucket name
+        flights: List of flight specs
+        output_root: Prefix used for flights without an explicit output_prefix
+
+    Returns:
+        List[FlightJob]: Jobs sorted by descending size
+    """
+    jobs = []
+    for index, spec in enumerate(flights):
+        image_prefix = spec.get('image_prefix')
+        flight_id = spec.get('flight_id') or (image_prefix.strip('/').split('/')[-1] if image_prefix else f"flight_{index}")
+        paths = list(spec.get('s3_image_paths') or [])
+        size_bytes = 0
+
+        if image_prefix:
+            paginator = s3_client.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=bucket_name, Prefix=image_prefix):
+                OBJECTS_LISTED.labels("vggt_batch").inc(len(page.get('Contents', [])))
+                for obj in page.get('Contents', []):
+                    if obj['Key'].lower().endswith(IMAGE_EXTENSIONS):
+                        paths.append(obj['Key'])
+                        size_bytes += obj['Size']
+            paths.sort()
+
+        if not paths:
+            logger.warning(f"Flight {flight_id} has no images, skipping")
+            continue
+
+        jobs.append(FlightJob(
+            flight_id=flight_id,
+            s3_image_paths=paths,
+            output_prefix=spec.get('output_prefix') or f"{output_root}/{flight_id}",
+            size_bytes=size_bytes
+        ))
+
+    jobs.sort(key=lambda job: (job.num_images, job.size_bytes), reverse=True)
+    return jobs
+
+
+@dataclass
+class _FlightWork:
+    """State carried through the pipeline stages for one flight."""
+    job: FlightJob
+    result: FlightResult
+    local_dir: Optional[str] = None
+    local_paths: Optional[List[str]] = None
+    images: Any = None
+    results: Optional[Dict[str, Any]] = None
+
+
+def _infer_flight(model, images, use_point_map: bool) -> Dict[str, Any]:
+    """Run the VGGT stages for one flight on an already-loaded model."""
+    images_batch, aggregated_tokens_list, ps_idx = run_vggt_aggregator.fn(model, images=images)
+    extrinsic, intrinsic = predict_cameras.fn(model, aggregated_tokens_list, images_batch)
+    depth_map, depth_conf = predict_depth_maps.fn(model, aggregated_tokens_list, images_batch, ps_idx)
+    point_map, point_conf = predict_point_maps.fn(model, aggregated_tokens_list, images_batch, ps_idx)
+    final_point_map, final_point_conf = construct_point_cloud.fn(
+        extrinsic, intrinsic, depth_map, depth_conf, point_map, point_conf, use_point_map
+    )
+    return prepare_results.fn(
+        extrinsic, intrinsic, depth_map, depth_conf, point_map, point_conf,
+        final_point_map, final_point_conf
+    )
+
+
+def _build_stages(
+    s3_client,
+    bucket_name: str,
+    use_point_map: bool,
+    device: Optional[str],
+    execution_profile: Optional[str],
+    quantized: bool,
+    num_workers: int,
+    upload_workers: int,
+    preprocess_workers: Optional[int] = None,
+    cache_preprocessed: bool = False,
+    storage_precision: str = "fp32",
+    result_layout: str = "tensor"
+) -> List[PipelineStage]:
+    """Download -> preprocess -> inference -> upload, with one model per inference worker."""
+    worker_state = threading.local()
+
+    def download(work: _FlightWork) -> _FlightWork:
+        start = time.perf_counter()
+        work.local_dir = tempfile.mkdtemp(prefix=f"vggt_{work.job.flight_id}_")
+        if cache_preprocessed:
+            # Cache hits skip download and decode entirely, preprocess has nothing left to do
+            work.images = load_images_cached.fn(
+                s3_client, bucket_name, work.job.s3_image_paths, work.local_dir, preprocess_workers
+            )
+        else:
+            work.local_paths = download_images_from_s3.fn(
+                s3_client, bucket_name, work.job.s3_image_paths, work.local_dir
+            )
+        work.result.download_seconds = time.perf_counter() - start
+        return work
+
+    def preprocess(work: _FlightWork) -> _FlightWork:
+        start = time.perf_counter()
+        if work.images is None:
+            work.images = preprocess_images.fn(work.local_paths, preprocess_workers)
+        # The decoded tensor is all inference needs, free the disk right away
+        shutil.rmtree(work.local_dir, ignore_errors=True)
+        work.result.preprocess_seconds = time.perf_counter() - start
+        return work
+
+    def inference(work: _FlightWork) -> _FlightWork:
+        if getattr(worker_state, 'model', None) is None:
+            worker_state.model = load_vggt_model.fn(device, execution_profile, quantized)
+        start = time.perf_counter()
+        logger.info(f"{threading.current_thread().name} processing flight "
+                    f"{work.job.flight_id} ({work.job.num_images} images)")
+        work.results = _infer_flight(worker_state.model, work.images, use_point_map)
+        work.images = None
+        work.result.worker = threading.current_thread().name
+        work.result.inference_seconds = time.perf_counter() - start
+        return work
+
+    def upload(work: _FlightWork) -> _FlightWork:
+        start = time.perf_counter()
+        output_paths = save_results_to_s3.fn(
+            s3_client, bucket_name, work.results, work.job.output_prefix,
+            storage_precision=storage_precision, layout=result_layout
+        )
+        output_paths["manifest"] = write_results_manifest.fn(
+            s3_client, bucket_name, work.job.output_prefix, output_paths, storage_precision
+        )
+        output_paths["poses"] = export_camera_poses.fn(
+            s3_client, bucket_name, work.job.output_prefix,
+            work.results["extrinsic"], work.results["intrinsic"],
+            tuple(work.results["depth_map"].shape[-3:-1]), work.job.s3_image_paths
+        )
+        work.result.output_paths = output_paths
+        work.results = None
+        work.result.upload_seconds = time.perf_counter() - start
+        work.result.success = True
+        return work
+
+    return [
+        PipelineStage("download", download),
+        PipelineStage("preprocess", preprocess),
+        PipelineStage("inference", inference, workers=num_workers),
+        PipelineStage("upload", upload, workers=upload_workers),
+    ]
+
+
+@flow(name="VGGT Batch Flight Processing",
+      description="Process many flights with VGGT on a pool of long-lived model workers",
+      log_prints=True)
+@track_flow("vggt_batch")
+def vggt_process_flights_from_s3(
+    bucket_name: str,
+    flights: List[Dict[str, Any]],
+    output_root: str = "vggt_results",
+    minio_endpoint: str = "minio",
+    minio_port: int = 9000,
+    minio_access_key: str = "minioadmin",
+    minio_secret_key: str = "minioadmin",
+    use_point_map: bool = False,
+    num_workers: int = 1,
+    prefetch_flights: int = 1,
+    upload_workers: int = 2,
+    device: Optional[str] = None,
+    execution_profile: Optional[str] = None,
+    quantized: bool = False,
+    preprocess_workers: Optional[int] = None,
+    cache_preprocessed: bool = False,
+    storage_precision: str = "fp32",
+    result_layout: str = "tensor"
+) -> Dict[str, Any]:
+    """
+    Prefect flow that runs VGGT over many flights in one run.
+
+    Flights are ordered largest first and pushed through a download -> preprocess ->
+    inference -> upload pipeline with bounded queues between the stages, so the next
+    flight's images download while the current one is in inference and finished results
+    upload in the background. Each of the ``num_workers`` inference workers loads the model
+    once and reuses it for every flight it picks up; all stages share a single S3 client.
+
+    Args:
+        bucket_name: S3 bucket name
+        flights: Flight specs, each with ``s3_image_paths`` or ``image_prefix`` and optionally
+            ``flight_id`` and ``output_prefix``
+        output_root: Output prefix for flights that do not set ``output_prefix``
+        minio_endpoint: MinIO server endpoint
+        minio_port: MinIO server port
+        minio_access_key: MinIO access key (defaults to standard MinIO default)
+        minio_secret_key: MinIO secret key (defaults to standard MinIO default)
+        use_point_map: Whether to use point map instead of depth map for 3D points
+        num_workers: Number of model-holding workers
+        prefetch_flights: Number of flights allowed to wait between two stages
+        upload_workers: Number of concurrent background uploaders
+        device: Device for the models. If None, will use CUDA if available, otherwise CPU.
+        execution_profile: Execution profile for inference (see vggt_runtime.PROFILES)
+        quantized: Run the dynamic int8 quantized model on the CPU
+        preprocess_workers: Processes decoding each flight's images (see
+            vggt_s3_task.preprocess_images)
+        cache_preprocessed: Reuse preprocessed images from the local tensor cache (see
+            vggt_cache), so repeat runs on the same flights skip download and decode
+        storage_precision: How depth, point and confidence maps are stored (see
+            vggt_encoding.STORAGE_PRECISIONS)
+        result_layout: "tensor", "frames" or "both" (see vggt_encoding.RESULT_LAYOUTS)
+
+    Returns:
+        Dict[str, Any]: Aggregate throughput and per-flight results
+    """
+    from vggt_encoding import RESULT_LAYOUTS, STORAGE_PRECISIONS
+
+    run_logger = get_run_logger()
+
+    if not check_vggt_install():
+        raise ImportError("VGGT package is not available. Cannot proceed with processing.")
+    if storage_precision not in STORAGE_PRECISIONS:
+        raise ValueError(f"Unknown storage precision '{storage_precision}'. Available: {', '.join(STORAGE_PRECISIONS)}")
+    if result_layout not in RESULT_LAYOUTS:
+        raise ValueError(f"Unknown result layout '{result_layout}'. Available: {', '.join(RESULT_LAYOUTS)}")
+
+    endpoint_url = f"http://{minio_endpoint}:{minio_port}"
+    s3_client = setup_s3_client(
+        endpoint_url=endpoint_url,
+        access_key=minio_access_key,
+        secret_key=minio_secret_key
+    )
+
+    jobs = resolve_flight_jobs(s3_client, bucket_name, flights, output_root)
+    if not jobs:
+        run_logger.info("No flights with images to process")
+        return {
+            'flights_total': 0,
+            'flights_succeeded': 0,
+            'flights_failed': 0,
+            'images_processed': 0,
+            'duration': 0.0,
+            'flights_per_hour': 0.0,
+            'stage_seconds': {},
+            'flights': []
+        }
+
+    num_workers = max(1, min(num_workers, len(jobs)))
+    run_logger.info(f"Processing {len(jobs)} flights with {num_workers} workers "
+                    f"(prefetch depth {prefetch_flights})")
+
+    results: List[FlightResult] = []
+
+    def record_failure(stage: str, work: _FlightWork, error: Exception):
+        if work.local_dir:
+            shutil.rmtree(work.local_dir, ignore_errors=True)
+        work.images = None
+        work.results = None
+        work.result.error = f"{stage}: {error}"
+        results.append(work.result)
+
+    pipeline = run_pipeline(
+        (_FlightWork(job, FlightResult(job.flight_id, False, job.num_images)) for job in jobs),
+        _build_stages(s3_client, bucket_name, use_point_map, device, execution_profile, quantized,
+                      num_workers, max(1, upload_workers), preprocess_workers, cache_preprocessed,
+                      storage_precision, result_layout),
+        queue_size=prefetch_flights,
+        on_error=record_failure,
+        metrics_workstream="vggt_batch"
+    )
+    results.extend(work.result for work in pipeline.outputs)
+
+    elapsed = pipeline.elapsed_seconds
+    succeeded = [r for r in results if r.success]
+    failed = [r for r in results if not r.success]
+    images_done = sum(r.num_images for r in succeeded)
+    flights_per_hour = len(succeeded) / elapsed * 3600 if elapsed > 0 else 0.0
+
+    run_logger.info("📊 Batch Summary:")
+    run_logger.info(f"Flights processed: {len(succeeded)}/{len(jobs)} ({len(failed)} failed)")
+    run_logger.info(f"Images processed: {images_done}")
+    run_logger.info(f"Duration: {elapsed:.2f} seconds")
+    run_logger.info(f"Throughput: {flights_per_hour:.2f} flights/hour, "
+                    f"{images_done / elapsed if elapsed > 0 else 0.0:.2f} images/sec")
+    for stage in pipeline.stages:
+        run_logger.info(f"Stage {stage.name}: {stage.busy_seconds:.2f}s busy across {stage.workers} worker(s)")
+    run_logger.info(f"Sequential estimate: {pipeline.sequential_seconds:.2f}s, "
+                    f"bottleneck stage: {pipeline.bottleneck_seconds:.2f}s")
+    for r in failed:
+        run_logger.warning(f"  - {r.flight_id}: {r.error}")
+
+    return {
+        'flights_total': len(jobs),
+        'flights_succeeded': len(succeeded),
+        'flights_failed': len(failed),
+        'images_processed': images_done,
+        'duration': elapsed,
+        'flights_per_hour': flights_per_hour,
+        'stage_seconds': {stage.name: stage.busy_seconds for stage in pipeline.stages},
+        'flights': [r.__dict__ for r in results]
+    }
+
+
+if __name__ == "__main__":
+    summary = vggt_process_flights_from_s3(
+        bucket_name="skystore",
+        flights=[{'image_prefix': "test_images/"}],
+        minio_endpoint="localhost",
+        minio_port=4164
+    )
+    print(f"Processed {summary['flights_succeeded']}/{summary['flights_total']} flights "
+          f"at {summary['flights_per_hour']:.2f} flights/hour")
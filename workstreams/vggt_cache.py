@@ -0,0 +1,158 @@
+"""
+Local on-disk cache of preprocessed VGGT input images.
+
+Re-running VGGT on the same flight with different options downloads and decodes the same
+JPEGs every time. This cache stores each preprocessed (3, H, W) float32 image as a ``.npy``
+file keyed by the S3 object's ETag and the preprocessing parameters, so a changed object or
+a different target size is a miss while a repeat run skips both download and decode. Hits
+are memory-mapped rather than read, and the least recently used entries are evicted once
+the cache grows past its byte budget.
+
+Configuration:
+    VGGT_TENSOR_CACHE_DIR: Cache directory (default: <VGGT_CACHE_DIR>/tensors)
+    VGGT_TENSOR_CACHE_BYTES: Byte budget before eviction (default: 10 GB)
+"""
+import os
+import hashlib
+import threading
+import logging
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Configure logging
+logger = logging.getLogger("vggt_cache")
+logger.setLevel(logging.INFO)
+
+DEFAULT_MAX_BYTES = 10 * 1024 ** 3
+
+# Bump when the preprocessing itself changes, so entries written by older code are misses
+PREPROCESS_VERSION = 1
+
+
+def get_tensor_cache_dir() -> str:
+    """Cache directory, overridable with VGGT_TENSOR_CACHE_DIR."""
+    default_root = os.environ.get("VGGT_CACHE_DIR", os.path.expanduser("~/.cache/skystore/vggt"))
+    return os.environ.get("VGGT_TENSOR_CACHE_DIR", os.path.join(default_root, "tensors"))
+
+
+class TensorCache:
+    """
+    LRU cache of preprocessed images on local disk.
+
+    Recency is tracked through file modification times, which hits refresh, so the cache
+    needs no index and can be shared by several worker processes on the same machine.
+    Entries are written to a temp file and renamed, so readers never see partial files.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        """
+        Args:
+            cache_dir: Directory for the entries. If None, uses get_tensor_cache_dir().
+            max_bytes: Budget enforced by evict(). If None, uses VGGT_TENSOR_CACHE_BYTES or 10 GB.
+        """
+        self.cache_dir = cache_dir or get_tensor_cache_dir()
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            os.environ.get("VGGT_TENSOR_CACHE_BYTES", DEFAULT_MAX_BYTES)
+        )
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(bucket: str, s3_key: str, etag: str, target_size: int) -> str:
+        """
+        Cache key of one object preprocessed with the given parameters.
+
+        Args:
+            bucket: S3 bucket name
+            s3_key: Object key
+            etag: Object ETag, which changes whenever the object is overwritten
+            target_size: Preprocessing target size
+
+        Returns:
+            str: Hex digest used as the entry's file name
+        """
+        etag = etag.strip('"')
+        raw = f"{PREPROCESS_VERSION}|{bucket}|{s3_key}|{etag}|{target_size}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def get(self, key: str) -> Optional["np.ndarray"]:
+        """
+        Memory-map a cached image.
+
+        Args:
+            key: Cache key from make_key
+
+        Returns:
+            Optional[np.ndarray]: Copy-on-write mapped (3, H, W) array, or None on a miss
+        """
+        import numpy as np
+
+        path = self._path(key)
+        try:
+            array = np.load(path, mmap_mode="c")
+            os.utime(path)
+        except (FileNotFoundError, ValueError, OSError):
+            # Missing, or evicted/truncated between the check and the load
+            return None
+        return array
+
+    def put(self, key: str, array: "np.ndarray"):
+        """
+        Store a preprocessed image.
+
+        Does not evict; call evict() once after a batch of puts.
+
+        Args:
+            key: Cache key from make_key
+            array: Preprocessed (3, H, W) float32 image
+        """
+        import numpy as np
+
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.save(f, np.ascontiguousarray(array, dtype=np.float32))
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def evict(self) -> int:
+        """
+        Delete least recently used entries until the cache fits its byte budget.
+
+        Returns:
+            int: Number of entries deleted
+        """
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith(".npy"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+
+        if removed:
+            logger.info(f"Evicted {removed} cached images, {total / 1e9:.2f} GB of "
+                        f"{self.max_bytes / 1e9:.2f} GB in use")
+        return removed
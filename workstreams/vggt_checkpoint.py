@@ -0,0 +1,274 @@
+"""
+Stage checkpoints for resumable VGGT runs.
+
+Without checkpoints a failure late in ``vggt_process_images_from_s3`` (e.g. during upload)
+throws away the downloaded images and the inference results, and a retry starts over from
+the download. With checkpoints every completed stage (aggregator tokens, each head's
+predictions) is written to a scratch prefix in S3 together with a run manifest, and a retry
+of the same run restores the latest completed stages instead of recomputing them.
+
+Layout:
+    {scratch_prefix}/{run_key}/run.json       Run manifest: params, completed stages, expiry
+    {scratch_prefix}/{run_key}/{stage}.pt     One serialized checkpoint per stage
+
+The run key is derived from the flow parameters that determine the results, so a Prefect
+retry or a manual rerun with the same parameters finds the checkpoints. Stage files hold
+only tensors in dicts, lists and tuples with primitive values, and are loaded with
+``torch.load(weights_only=True)``: anyone who can write to the scratch prefix must not be
+able to run code in the flow by planting a pickle. Anything else about a run belongs in
+run.json. Checkpoints are
+deleted when the run succeeds; runs that never succeed are removed once their TTL expires.
+"""
+import json
+import hashlib
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+from typing import Any, Dict, List, Optional
+
+# Configure logging
+logger = logging.getLogger("vggt_checkpoint")
+logger.setLevel(logging.INFO)
+
+DEFAULT_SCRATCH_PREFIX = "vggt_scratch"
+DEFAULT_TTL_HOURS = 24.0
+RUN_MANIFEST_FILE = "run.json"
+
+
+def make_run_key(params: Dict[str, Any]) -> str:
+    """Stable key for a run from the parameters that determine its results."""
+    raw = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()[:24]
+
+
+def pack_tokens(model: Any, aggregated_tokens_list: List[Any]) -> Dict[str, Any]:
+    """
+    Keep only the aggregator layers the heads read.
+
+    The aggregator returns one token tensor per transformer block (24 for VGGT-1B), but the
+    camera head reads only the last and the DPT heads only their ``intermediate_layer_idx``,
+    so checkpointing those few layers is several times smaller than the full list.
+    """
+    num_layers = len(aggregated_tokens_list)
+    needed = {num_layers - 1}
+    for name in ("depth_head", "point_head"):
+        head = getattr(model, name, None)
+        if head is None:
+            continue
+        indices = getattr(head, "intermediate_layer_idx", None)
+        if indices is None:
+            # Unknown head layout, keep everything
+            needed = set(range(num_layers))
+            break
+        needed.update(index % num_layers for index in indices)
+    return {"num_layers": num_layers, "layers": {i: aggregated_tokens_list[i] for i in sorted(needed)}}
+
+
+def unpack_tokens(packed: Dict[str, Any]) -> List[Any]:
+    """Rebuild the aggregator token list, with None for layers no head reads."""
+    tokens = [None] * packed["num_layers"]
+    for index, layer in packed["layers"].items():
+        tokens[index] = layer
+    return tokens
+
+
+class StageCheckpoints:
+    """
+    Checkpoints of one run in S3.
+
+    Writes happen on a background thread so inference is not held up by uploads; ``flush``
+    waits for them. Each write uploads the stage and then rewrites the run manifest, so a
+    stage is only listed once its data is complete.
+    """
+
+    def __init__(
+        self,
+        s3_client,
+        bucket_name: str,
+        run_key: str,
+        params: Optional[Dict[str, Any]] = None,
+        scratch_prefix: str = DEFAULT_SCRATCH_PREFIX,
+        ttl_hours: float = DEFAULT_TTL_HOURS
+    ):
+        """
+        Args:
+            s3_client: Configured S3 client
+            bucket_name: S3 bucket name
+            run_key: Key identifying the run, see make_run_key
+            params: Flow parameters recorded in the manifest
+            scratch_prefix: Prefix holding the checkpoints of all runs
+            ttl_hours: Hours after the last write before the run's checkpoints may be deleted
+        """
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.run_key = run_key
+        self.prefix = f"{scratch_prefix.rstrip('/')}/{run_key}"
+        self.ttl_hours = ttl_hours
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint")
+        self._pending: List[Future] = []
+        self.manifest = self._read_manifest() or {
+            "run_key": run_key,
+            "params": params or {},
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "stages": {},
+        }
+        if self.manifest["stages"]:
+            logger.info(f"Found checkpoints for run {run_key}: {', '.join(self.manifest['stages'])}")
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=f"{self.prefix}/{RUN_MANIFEST_FILE}")
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+        return json.loads(response['Body'].read())
+
+    def _write_manifest(self):
+        now = datetime.now(timezone.utc)
+        self.manifest["updated_at"] = now.isoformat()
+        self.manifest["expires_at"] = (now + timedelta(hours=self.ttl_hours)).isoformat()
+        self.s3_client.put_object(
+            Bucket=self.bucket_name,
+            Key=f"{self.prefix}/{RUN_MANIFEST_FILE}",
+            Body=json.dumps(self.manifest, indent=2).encode(),
+            ContentType="application/json"
+        )
+
+    def has(self, stage: str) -> bool:
+        """Whether a stage has a complete checkpoint."""
+        return stage in self.manifest["stages"]
+
+    def load(self, stage: str) -> Optional[Any]:
+        """
+        Load a stage's checkpoint.
+
+        Args:
+            stage: Stage name
+
+        Returns:
+            Optional[Any]: The saved value with tensors on the CPU, or None if the stage has
+                no checkpoint
+
+        Raises:
+            pickle.UnpicklingError: If the stage file holds anything but tensors, containers
+                and primitives
+        """
+        import torch
+
+        if not self.has(stage):
+            return None
+        path = self.manifest["stages"][stage]["path"]
+        response = self.s3_client.get_object(Bucket=self.bucket_name, Key=path)
+        value = torch.load(BytesIO(response['Body'].read()), map_location="cpu", weights_only=True)
+        logger.info(f"Restored stage '{stage}' from s3://{self.bucket_name}/{path}")
+        return value
+
+    def save(self, stage: str, value: Any):
+        """
+        Checkpoint a stage in the background.
+
+        Args:
+            stage: Stage name
+            value: Tensors in dicts, lists or tuples, with ints, floats, strings or None
+                alongside; tensors are moved to the CPU before serializing
+        """
+        self._pending.append(self._executor.submit(self._save, stage, value))
+
+    def _save(self, stage: str, value: Any):
+        import torch
+        from torch.utils._pytree import tree_map
+
+        value = tree_map(lambda x: x.detach().cpu() if isinstance(x, torch.Tensor) else x, value)
+        buffer = BytesIO()
+        torch.save(value, buffer)
+        size = buffer.tell()
+        buffer.seek(0)
+
+        path = f"{self.prefix}/{stage}.pt"
+        self.s3_client.upload_fileobj(buffer, self.bucket_name, path)
+        self.manifest["stages"][stage] = {
+            "path": path,
+            "size_bytes": size,
+            "completed_at": datetime.now(timezone.utc).isoformat(),
+        }
+        self._write_manifest()
+        logger.info(f"Checkpointed stage '{stage}' ({size / 1e6:.1f} MB)")
+
+    def flush(self):
+        """Wait for background checkpoint writes. Failed writes are logged, not raised."""
+        for future in self._pending:
+            try:
+                future.result()
+            except Exception as e:
+                logger.warning(f"Checkpoint write failed, a retry will recompute that stage: {e}")
+        self._pending.clear()
+
+    def discard(self):
+        """Delete all checkpoints of the run, e.g. once its results are saved."""
+        self.flush()
+        self._executor.shutdown()
+        deleted = delete_prefix(self.s3_client, self.bucket_name, f"{self.prefix}/")
+        logger.info(f"Deleted {deleted} checkpoint objects of run {self.run_key}")
+
+
+def delete_prefix(s3_client, bucket_name: str, prefix: str) -> int:
+    """Delete every object under a prefix and return how many were deleted."""
+    deleted = 0
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        objects = [{'Key': obj['Key']} for obj in page.get('Contents', [])]
+        if objects:
+            s3_client.delete_objects(Bucket=bucket_name, Delete={'Objects': objects, 'Quiet': True})
+            deleted += len(objects)
+    return deleted
+
+
+def cleanup_expired_checkpoints(
+    s3_client,
+    bucket_name: str,
+    scratch_prefix: str = DEFAULT_SCRATCH_PREFIX,
+    now: Optional[datetime] = None
+) -> List[str]:
+    """
+    Delete the checkpoints of runs whose TTL has expired.
+
+    Runs without a readable manifest (e.g. a crash before the first manifest write) are
+    judged by the age of their newest object against the default TTL.
+
+    Args:
+        s3_client: Configured S3 client
+        bucket_name: S3 bucket name
+        scratch_prefix: Prefix holding the checkpoints of all runs
+        now: Current time, for testing
+
+    Returns:
+        List[str]: Keys of the runs that were deleted
+    """
+    now = now or datetime.now(timezone.utc)
+    paginator = s3_client.get_paginator('list_objects_v2')
+
+    runs: Dict[str, Dict[str, Any]] = {}
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=f"{scratch_prefix.rstrip('/')}/"):
+        for obj in page.get('Contents', []):
+            run_key = obj['Key'][len(scratch_prefix.rstrip('/')) + 1:].split('/')[0]
+            run = runs.setdefault(run_key, {'manifest': None, 'last_modified': obj['LastModified']})
+            run['last_modified'] = max(run['last_modified'], obj['LastModified'])
+            if obj['Key'].endswith(f"/{RUN_MANIFEST_FILE}"):
+                run['manifest'] = obj['Key']
+
+    expired = []
+    for run_key, run in runs.items():
+        expires_at = run['last_modified'] + timedelta(hours=DEFAULT_TTL_HOURS)
+        if run['manifest']:
+            try:
+                body = s3_client.get_object(Bucket=bucket_name, Key=run['manifest'])['Body'].read()
+                expires_at = datetime.fromisoformat(json.loads(body)['expires_at'])
+            except Exception as e:
+                logger.warning(f"Unreadable manifest for checkpoint run {run_key}: {e}")
+        if expires_at <= now:
+            delete_prefix(s3_client, bucket_name, f"{scratch_prefix.rstrip('/')}/{run_key}/")
+            expired.append(run_key)
+
+    if expired:
+        logger.info(f"Deleted expired checkpoints of {len(expired)} runs")
+    return expired
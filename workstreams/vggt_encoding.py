@@ -0,0 +1,174 @@
+"""
+Storage encodings for VGGT results.
+
+VGGT predicts depth, point and confidence maps as float32. Stored as-is, a flight's outputs
+are several times the size of its JPEGs. The encodings here trade precision the maps do not
+carry for size:
+
+    fp32       Stored as predicted (default)
+    fp16       Float maps as float16: half the size, ~3 significant digits
+    quantized  Depth as 16-bit integers with a scale and offset, confidence as 8-bit
+               integers on a log scale, point maps as float16
+
+Cameras (extrinsic, intrinsic) are always kept at full precision. Every encoded result is
+described by a small dict that is stored in the results manifest, and ``decode_result``
+turns a stored tensor back into float32 with it.
+"""
+import json
+import math
+import logging
+from io import BytesIO
+from typing import Any, Dict, Tuple
+
+import torch
+
+# Configure logging
+logger = logging.getLogger("vggt_encoding")
+logger.setLevel(logging.INFO)
+
+STORAGE_PRECISIONS = ("fp32", "fp16", "quantized")
+
+# One .pt per result, one .npy object per frame and result, or both
+RESULT_LAYOUTS = ("tensor", "frames", "both")
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+
+# Quality tiers of a run: a low-resolution preview under PREVIEW_DIR, the full results, or both
+TIERS = ("full", "preview", "both")
+TIERS_FILE = "tiers.json"
+PREVIEW_DIR = "preview"
+# Preview input width; like 518 a multiple of VGGT's 14 px patch size
+PREVIEW_SIZE = 224
+
+# Results that are dense per-pixel maps; everything else is stored as predicted
+DEPTH_RESULTS = ("depth_map",)
+POINT_RESULTS = ("point_map", "final_point_map", "fused_points")
+CONFIDENCE_RESULTS = ("depth_conf", "point_conf", "final_point_conf", "fused_conf")
+
+# Results without a frame axis (the fused cloud), stored whole in every layout
+UNFRAMED_RESULTS = ("fused_points", "fused_conf", "fused_colors")
+
+# torch has no general uint16 support, so 16-bit codes are signed and centered on the offset
+INT16_MAX = 32767
+UINT8_MAX = 255
+
+
+def _finite_range(data: torch.Tensor) -> Tuple[float, float]:
+    """Minimum and maximum over the finite values of a tensor."""
+    finite = data[torch.isfinite(data)]
+    if finite.numel() == 0:
+        return 0.0, 0.0
+    return finite.min().item(), finite.max().item()
+
+
+def _quantize_linear_int16(data: torch.Tensor) -> Tuple[torch.Tensor, Dict[str, Any]]:
+    """Map values linearly onto [-32767, 32767] around the midpoint of their range."""
+    low, high = _finite_range(data)
+    offset = (low + high) / 2
+    scale = (high - low) / (2 * INT16_MAX) or 1.0
+    codes = ((data.float() - offset) / scale).nan_to_num(0.0).round().clamp(-INT16_MAX, INT16_MAX)
+    return codes.to(torch.int16), {"encoding": "linear", "dtype": "int16", "scale": scale, "offset": offset}
+
+
+def _quantize_log_uint8(data: torch.Tensor) -> Tuple[torch.Tensor, Dict[str, Any]]:
+    """Map log-values linearly onto [0, 255]; confidences span orders of magnitude."""
+    logs = data.float().clamp_min(1e-6).log()
+    low, high = _finite_range(logs)
+    scale = (high - low) / UINT8_MAX or 1.0
+    codes = ((logs - low) / scale).nan_to_num(0.0).round().clamp(0, UINT8_MAX)
+    return codes.to(torch.uint8), {"encoding": "log-linear", "dtype": "uint8", "scale": scale, "offset": low}
+
+
+def encode_result(name: str, data: torch.Tensor, precision: str = "fp32") -> Tuple[torch.Tensor, Dict[str, Any]]:
+    """
+    Encode one result for storage.
+
+    Args:
+        name: Result name, e.g. "depth_map"; decides which encoding applies
+        data: Result tensor on the CPU
+        precision: One of STORAGE_PRECISIONS
+
+    Returns:
+        Tuple containing:
+            - Tensor to store
+            - Encoding description for the manifest
+    """
+    if precision not in STORAGE_PRECISIONS:
+        raise ValueError(f"Unknown storage precision '{precision}'. Available: {', '.join(STORAGE_PRECISIONS)}")
+
+    is_map = name in DEPTH_RESULTS + POINT_RESULTS + CONFIDENCE_RESULTS
+    if precision == "fp32" or not is_map or not data.is_floating_point():
+        return data, {"encoding": "raw", "dtype": str(data.dtype).replace("torch.", "")}
+
+    if precision == "quantized" and name in DEPTH_RESULTS:
+        return _quantize_linear_int16(data)
+    if precision == "quantized" and name in CONFIDENCE_RESULTS:
+        return _quantize_log_uint8(data)
+    return data.half(), {"encoding": "raw", "dtype": "float16"}
+
+
+def decode_result(data: torch.Tensor, encoding: Dict[str, Any]) -> torch.Tensor:
+    """
+    Turn a stored result back into a float tensor.
+
+    Args:
+        data: Tensor loaded from a result file, or an array loaded from a per-frame .npy
+        encoding: The result's encoding from the manifest
+
+    Returns:
+        torch.Tensor: Decoded values (float32 for encoded maps, the stored dtype for raw results)
+    """
+    data = torch.as_tensor(data)
+    kind = encoding.get("encoding", "raw")
+    if kind == "raw":
+        return data.float() if data.dtype == torch.float16 else data
+    if kind == "linear":
+        return data.float() * encoding["scale"] + encoding["offset"]
+    if kind == "log-linear":
+        return (data.float() * encoding["scale"] + encoding["offset"]).exp()
+    raise ValueError(f"Unknown result encoding '{kind}'")
+
+
+def max_decode_error(encoding: Dict[str, Any]) -> float:
+    """Largest absolute error an encoding introduces (relative error for log-linear), for logging."""
+    kind = encoding.get("encoding", "raw")
+    if kind == "linear":
+        return encoding["scale"] / 2
+    if kind == "log-linear":
+        return math.expm1(encoding["scale"] / 2)
+    return 0.0
+
+
+def read_manifest(s3_client, bucket_name: str, output_prefix: str) -> Dict[str, Any]:
+    """Load the results manifest written by write_results_manifest."""
+    response = s3_client.get_object(Bucket=bucket_name, Key=f"{output_prefix}/{MANIFEST_FILE}")
+    return json.loads(response['Body'].read())
+
+
+def load_result(s3_client, bucket_name: str, manifest: Dict[str, Any], name: str) -> torch.Tensor:
+    """
+    Download and decode one result listed in a manifest.
+
+    Args:
+        s3_client: Configured S3 client
+        bucket_name: S3 bucket name
+        manifest: Manifest from read_manifest
+        name: Result name, e.g. "fused_points"
+
+    Returns:
+        torch.Tensor: Decoded result; per-frame results are stacked along the frame axis
+    """
+    import numpy as np
+
+    entry = manifest["results"][name]
+    if "path" in entry and "{frame}" not in entry["path"]:
+        body = s3_client.get_object(Bucket=bucket_name, Key=entry["path"])['Body'].read()
+        data = torch.load(BytesIO(body), map_location="cpu", weights_only=True)
+    else:
+        frames = []
+        for index in range(entry["frames"]):
+            body = s3_client.get_object(Bucket=bucket_name, Key=entry["frame_path"].format(frame=index))['Body'].read()
+            frames.append(np.load(BytesIO(body)))
+        data = np.stack(frames)
+    return decode_result(data, entry)
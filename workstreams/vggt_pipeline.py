@@ -0,0 +1,167 @@
+"""Producer/consumer pipeline with bounded queues between stages."""
+import queue
+import threading
+import time
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Configure logging
+logger = logging.getLogger("vggt_pipeline")
+logger.setLevel(logging.INFO)
+
+# Sentinel passed down the queues once a stage has drained its input
+_STOP = object()
+
+
+@dataclass
+class PipelineStage:
+    """
+    One stage of a pipeline.
+
+    ``fn`` receives the item produced by the previous stage and returns the item for the
+    next one. ``workers`` threads run the stage concurrently; use more than one for I/O
+    bound stages such as uploads.
+    """
+    name: str
+    fn: Callable[[Any], Any]
+    workers: int = 1
+
+
+@dataclass
+class StageStats:
+    """Timing for a single stage across all items."""
+    name: str
+    workers: int = 1
+    items: int = 0
+    failures: int = 0
+    busy_seconds: float = 0.0
+
+
+@dataclass
+class PipelineResult:
+    """Items that made it through every stage, failures and per-stage timings."""
+    outputs: List[Any] = field(default_factory=list)
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+    stages: List[StageStats] = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+
+    @property
+    def sequential_seconds(self) -> float:
+        """Time the same work would have taken with the stages run back to back."""
+        return sum(s.busy_seconds for s in self.stages)
+
+    @property
+    def bottleneck_seconds(self) -> float:
+        """Per-worker busy time of the slowest stage, the lower bound for elapsed time."""
+        return max((s.busy_seconds / s.workers for s in self.stages), default=0.0)
+
+
+def run_pipeline(
+    items: Iterable[Any],
+    stages: List[PipelineStage],
+    queue_size: int = 1,
+    on_error: Optional[Callable[[str, Any, Exception], None]] = None,
+    metrics_workstream: Optional[str] = None
+) -> PipelineResult:
+    """
+    Push items through the stages with a bounded queue in front of each stage.
+
+    While stage N works on item i, stage N-1 can already produce item i+1, so the total
+    time approaches that of the slowest stage rather than the sum of all of them. The
+    bounded queues keep at most ``queue_size`` finished items waiting per stage, which caps
+    memory (e.g. how many downloaded flights sit on disk).
+
+    A failing item is dropped from the pipeline and recorded in ``errors``; the remaining
+    items keep flowing.
+
+    Args:
+        items: Inputs for the first stage
+        stages: Stages in execution order
+        queue_size: Capacity of each inter-stage queue
+        on_error: Optional callback invoked as ``on_error(stage_name, item, exception)``
+        metrics_workstream: If set, every item's time in each stage is recorded in the
+            skystore_stage_seconds histogram under this workstream label (see metrics)
+
+    Returns:
+        PipelineResult: Outputs of the last stage, errors and stage statistics
+    """
+    result = PipelineResult(stages=[StageStats(s.name, s.workers) for s in stages])
+    lock = threading.Lock()
+    queues = [queue.Queue(maxsize=max(1, queue_size)) for _ in stages]
+    remaining = [s.workers for s in stages]
+    stage_seconds = None
+    if metrics_workstream is not None:
+        from metrics import STAGE_SECONDS
+        stage_seconds = [STAGE_SECONDS.labels(metrics_workstream, s.name) for s in stages]
+
+    def worker(index: int):
+        stage = stages[index]
+        stats = result.stages[index]
+        in_queue = queues[index]
+        out_queue = queues[index + 1] if index + 1 < len(stages) else None
+
+        while True:
+            item = in_queue.get()
+            if item is _STOP:
+                break
+            start = time.perf_counter()
+            try:
+                output = stage.fn(item)
+            except Exception as e:
+                logger.error(f"Pipeline stage '{stage.name}' failed: {e}")
+                elapsed = time.perf_counter() - start
+                if stage_seconds is not None:
+                    stage_seconds[index].observe(elapsed)
+                with lock:
+                    stats.failures += 1
+                    stats.busy_seconds += elapsed
+                    result.errors.append({'stage': stage.name, 'item': item, 'error': str(e)})
+                if on_error is not None:
+                    on_error(stage.name, item, e)
+                continue
+            elapsed = time.perf_counter() - start
+            if stage_seconds is not None:
+                stage_seconds[index].observe(elapsed)
+            with lock:
+                stats.items += 1
+                stats.busy_seconds += elapsed
+            if out_queue is not None:
+                out_queue.put(output)
+            else:
+                with lock:
+                    result.outputs.append(output)
+
+        # The last worker of a stage to finish tells every worker of the next stage to stop
+        with lock:
+            remaining[index] -= 1
+            last = remaining[index] == 0
+        if last and out_queue is not None:
+            for _ in range(stages[index + 1].workers):
+                out_queue.put(_STOP)
+
+    threads = []
+    for index, stage in enumerate(stages):
+        for n in range(stage.workers):
+            thread = threading.Thread(target=worker, args=(index,), name=f"pipeline-{stage.name}-{n}", daemon=True)
+            thread.start()
+            threads.append(thread)
+
+    start = time.perf_counter()
+    try:
+        for item in items:
+            queues[0].put(item)
+    finally:
+        for _ in range(stages[0].workers):
+            queues[0].put(_STOP)
+
+    for thread in threads:
+        thread.join()
+    result.elapsed_seconds = time.perf_counter() - start
+
+    for stats in result.stages:
+        logger.info(f"Stage '{stats.name}': {stats.items} items, {stats.failures} failed, "
+                    f"{stats.busy_seconds:.2f}s busy")
+    logger.info(f"Pipeline finished in {result.elapsed_seconds:.2f}s "
+                f"(sequential estimate {result.sequential_seconds:.2f}s)")
+    return result
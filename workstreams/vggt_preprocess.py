@@ -0,0 +1,263 @@
+"""
+Parallel VGGT image preprocessing into a shared-memory batch buffer.
+
+``vggt.utils.load_fn.load_and_preprocess_images`` decodes and resizes every image one after
+another in the calling process, then stacks the results into a new tensor. Here a pool of
+worker processes decodes the images and writes each one straight into its slot of a single
+(S, 3, H, W) float32 buffer, on tmpfs when it has room. The parent wraps that buffer with ``torch.from_numpy``,
+so the batch reaches the model without being pickled or copied.
+
+The output matches VGGT's "crop" mode: width resized to ``target_size`` with bicubic
+resampling, height scaled to a multiple of 14 and center-cropped to ``target_size``, and
+images of different shapes padded to the largest with 1.0 (white), centered.
+
+Configuration:
+    VGGT_PREPROCESS_WORKERS: Default number of worker processes (0 uses VGGT's serial loader)
+    VGGT_PREPROCESS_BUFFER_DIR: Directory for the batch buffer (default: /dev/shm). A batch
+        takes about 3.2 MB per image; when the directory has less free space than that, the
+        buffer goes to the temp directory instead. Docker gives containers a 64 MB /dev/shm
+        unless ``shm_size`` is set.
+"""
+import os
+import uuid
+import errno
+import shutil
+import tempfile
+import threading
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+    import torch
+
+# Configure logging
+logger = logging.getLogger("vggt_preprocess")
+logger.setLevel(logging.INFO)
+
+TARGET_SIZE = 518
+PATCH_SIZE = 14
+PAD_VALUE = 1.0
+
+# tmpfs-backed, so the buffer never touches disk
+SHARED_MEMORY_DIR = os.environ.get(
+    "VGGT_PREPROCESS_BUFFER_DIR",
+    "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def default_workers() -> int:
+    """Worker count from VGGT_PREPROCESS_WORKERS, else one per CPU up to 8."""
+    value = os.environ.get("VGGT_PREPROCESS_WORKERS")
+    if value is not None:
+        return int(value)
+    return min(8, os.cpu_count() or 1)
+
+
+def output_shape(width: int, height: int, target_size: int = TARGET_SIZE) -> Tuple[int, int]:
+    """
+    Height and width of one image after VGGT's crop-mode resize and crop.
+
+    Args:
+        width: Source width
+        height: Source height
+        target_size: Output width, and the maximum output height
+
+    Returns:
+        Tuple[int, int]: (height, width)
+    """
+    new_height = round(height * (target_size / width) / PATCH_SIZE) * PATCH_SIZE
+    return min(new_height, target_size), target_size
+
+
+def image_shapes(image_paths: List[str], target_size: int = TARGET_SIZE) -> List[Tuple[int, int]]:
+    """Output (height, width) of each image, read from the image headers only."""
+    from PIL import Image
+
+    shapes = []
+    for path in image_paths:
+        with Image.open(path) as img:
+            shapes.append(output_shape(*img.size, target_size))
+    return shapes
+
+
+def padded_region(batch_shape: Tuple[int, ...], shape: Tuple[int, int]) -> Tuple[slice, slice]:
+    """Rows and columns an image of ``shape`` occupies when centered in a padded batch."""
+    top = (batch_shape[-2] - shape[0]) // 2
+    left = (batch_shape[-1] - shape[1]) // 2
+    return slice(top, top + shape[0]), slice(left, left + shape[1])
+
+
+def stack_padded(arrays: List["np.ndarray"]) -> "torch.Tensor":
+    """
+    Stack preprocessed (3, h, w) images into one batch, padding smaller ones like VGGT does.
+
+    Args:
+        arrays: Preprocessed images, e.g. memory-mapped cache entries
+
+    Returns:
+        torch.Tensor: Batch of shape (S, 3, H, W)
+    """
+    import numpy as np
+    import torch
+
+    batch_shape = (len(arrays), 3, max(a.shape[1] for a in arrays), max(a.shape[2] for a in arrays))
+    batch = np.empty(batch_shape, dtype=np.float32)
+    for index, array in enumerate(arrays):
+        if array.shape[1:] != batch_shape[2:]:
+            batch[index] = PAD_VALUE
+        rows, cols = padded_region(batch_shape, array.shape[1:])
+        batch[index, :, rows, cols] = array
+    return torch.from_numpy(batch)
+
+
+def _get_pool(num_workers: int) -> ProcessPoolExecutor:
+    """Process pool shared by all calls in this process, resized when num_workers changes."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != num_workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # Flows run on threads, and forking a threaded process can deadlock the child
+            _pool = ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = num_workers
+        return _pool
+
+
+def _allocate_buffer(nbytes: int) -> str:
+    """
+    Create a buffer file of nbytes in SHARED_MEMORY_DIR, or the temp directory if it is full.
+
+    The space is reserved up front: writing through a mapping of a sparse file on a full
+    tmpfs kills the process with SIGBUS instead of raising an error.
+
+    Returns:
+        str: Path of the buffer file
+
+    Raises:
+        OSError: If neither directory has room for the buffer
+    """
+    directories = [SHARED_MEMORY_DIR]
+    if os.path.realpath(tempfile.gettempdir()) != os.path.realpath(SHARED_MEMORY_DIR):
+        directories.append(tempfile.gettempdir())
+
+    for directory in directories:
+        free = shutil.disk_usage(directory).free
+        if free < nbytes:
+            logger.warning(f"{directory} has {free / 1e6:.0f} MB free, the batch buffer needs "
+                           f"{nbytes / 1e6:.0f} MB")
+            continue
+        path = os.path.join(directory, f"vggt_batch_{uuid.uuid4().hex}.f32")
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o600)
+        try:
+            if hasattr(os, "posix_fallocate"):
+                os.posix_fallocate(fd, 0, nbytes)
+            else:
+                os.ftruncate(fd, nbytes)
+        except OSError as e:
+            # Another batch took the space since disk_usage
+            os.close(fd)
+            os.unlink(path)
+            logger.warning(f"Could not reserve {nbytes / 1e6:.0f} MB in {directory}: {e}")
+            continue
+        os.close(fd)
+        if directory != SHARED_MEMORY_DIR:
+            logger.warning(f"Batch buffer is on {directory} instead of {SHARED_MEMORY_DIR}; "
+                           f"raise the container's shm_size or set VGGT_PREPROCESS_BUFFER_DIR")
+        return path
+    raise OSError(errno.ENOSPC, f"No room for a {nbytes / 1e6:.0f} MB batch buffer in {', '.join(directories)}")
+
+
+def _decode_into(
+    image_path: str,
+    index: int,
+    buffer_path: str,
+    batch_shape: Tuple[int, int, int, int],
+    target_size: int
+) -> None:
+    """Decode, resize and crop one image and write it into slot ``index`` of the buffer."""
+    import numpy as np
+    from PIL import Image
+
+    with Image.open(image_path) as img:
+        if img.mode == "RGBA":
+            # Composite transparency onto white, as VGGT does
+            background = Image.new("RGBA", img.size, (255, 255, 255, 255))
+            img = Image.alpha_composite(background, img)
+        img = img.convert("RGB")
+        width, height = img.size
+        new_height = round(height * (target_size / width) / PATCH_SIZE) * PATCH_SIZE
+        img = img.resize((target_size, new_height), Image.Resampling.BICUBIC)
+        pixels = np.asarray(img)
+
+    if new_height > target_size:
+        start_y = (new_height - target_size) // 2
+        pixels = pixels[start_y:start_y + target_size]
+
+    batch = np.memmap(buffer_path, dtype=np.float32, mode="r+", shape=batch_shape)
+    slot = batch[index]
+    if pixels.shape[:2] != batch_shape[2:]:
+        slot[...] = PAD_VALUE
+    rows, cols = padded_region(batch_shape, pixels.shape[:2])
+    # HWC uint8 -> CHW float in [0, 1], the same arithmetic as torchvision's ToTensor
+    np.divide(pixels.transpose(2, 0, 1), 255, out=slot[:, rows, cols], dtype=np.float32)
+    del batch
+
+
+def preprocess_parallel(
+    image_paths: List[str],
+    num_workers: Optional[int] = None,
+    target_size: int = TARGET_SIZE
+) -> "torch.Tensor":
+    """
+    Decode and resize images on a process pool into one shared-memory tensor.
+
+    Only image headers are read in the calling process, to size the batch buffer; the
+    workers then decode in parallel and write directly into it.
+
+    Args:
+        image_paths: List of local image paths
+        num_workers: Worker processes. If None, uses default_workers(). With 1, or a single
+            image, the images are decoded in this process into the same buffer.
+        target_size: Output width in pixels (VGGT expects 518)
+
+    Returns:
+        torch.Tensor: Preprocessed images of shape (S, 3, H, W), backed by the shared buffer
+    """
+    import numpy as np
+    import torch
+
+    if not image_paths:
+        raise ValueError("At least 1 image is required")
+    num_workers = default_workers() if num_workers is None else num_workers
+
+    shapes = image_shapes(image_paths, target_size)
+    batch_shape = (len(image_paths), 3, max(h for h, _ in shapes), max(w for _, w in shapes))
+
+    buffer_path = _allocate_buffer(int(np.prod(batch_shape)) * np.dtype(np.float32).itemsize)
+    try:
+        batch = np.memmap(buffer_path, dtype=np.float32, mode="r+", shape=batch_shape)
+        if num_workers > 1 and len(image_paths) > 1:
+            pool = _get_pool(num_workers)
+            futures = [
+                pool.submit(_decode_into, path, index, buffer_path, batch_shape, target_size)
+                for index, path in enumerate(image_paths)
+            ]
+            for future in futures:
+                future.result()
+        else:
+            for index, path in enumerate(image_paths):
+                _decode_into(path, index, buffer_path, batch_shape, target_size)
+    finally:
+        # The mapping stays valid after unlinking and is freed with the last reference
+        os.unlink(buffer_path)
+
+    logger.info(f"Preprocessed {len(image_paths)} images into a {batch_shape} batch "
+                f"with {max(1, num_workers)} worker(s)")
+    return torch.from_numpy(np.asarray(batch))
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Dynamic int8 quantization of VGGT for CPU workers.
+
+The quantized model replaces every ``nn.Linear`` with a dynamically quantized int8 version.
+Conversion happens once; the quantized state dict is cached on local disk and later loads
+only rebuild the module structure, with its fp32 parameters on the meta device, before
+loading it.
+
+Running this file compares the quantized model against the fp32 baseline on a reference
+set of images and reports camera/depth error, speed and size.
+"""
+import os
+import sys
+import json
+import time
+import logging
+from io import BytesIO
+from typing import Callable, Dict, List, Optional
+
+import torch
+
+from vggt_weights import _parameters_on_meta, get_cache_dir
+
+# Configure logging
+logger = logging.getLogger("vggt_quantization")
+logger.setLevel(logging.INFO)
+
+QUANTIZED_CACHE_FILE = "vggt_1b_dynamic_int8.pt"
+
+
+def quantize_vggt(model: torch.nn.Module) -> torch.nn.Module:
+    """
+    Convert a VGGT model to dynamic int8 quantization of its linear layers.
+
+    Weights are stored as int8 and activations are quantized on the fly, so no calibration
+    data is needed. Dynamic quantization only runs on the CPU.
+
+    Args:
+        model: fp32 VGGT model
+
+    Returns:
+        torch.nn.Module: Quantized model on the CPU
+    """
+    model = model.to("cpu").eval()
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _quantized_structure(module: torch.nn.Module) -> torch.nn.Module:
+    """
+    Swap every nn.Linear for an empty dynamic int8 Linear, as quantize_dynamic would.
+
+    Unlike quantize_dynamic it never reads the fp32 weights, so it works on a model built on
+    the meta device; the int8 weights come from load_state_dict.
+    """
+    for name, child in module.named_children():
+        # Exact type, like quantize_dynamic's mapping: subclasses such as MultiheadAttention's
+        # out_proj stay fp32
+        if type(child) is torch.nn.Linear:
+            setattr(module, name, torch.ao.nn.quantized.dynamic.Linear(
+                child.in_features, child.out_features, bias_=child.bias is not None, dtype=torch.qint8
+            ))
+        else:
+            _quantized_structure(child)
+    return module
+
+
+def load_quantized_vggt(
+    build_model: Callable[[], torch.nn.Module],
+    load_fp32_model: Callable[[], torch.nn.Module],
+    cache_dir: Optional[str] = None
+) -> torch.nn.Module:
+    """
+    Load the quantized VGGT model, converting and caching it on first use.
+
+    Args:
+        build_model: Returns a VGGT module; only its structure is used, built on meta
+        load_fp32_model: Returns the fp32 VGGT model with pretrained weights, used for the
+            one-time conversion
+        cache_dir: Directory for the cached quantized state dict (default: get_cache_dir())
+
+    Returns:
+        torch.nn.Module: Quantized model in eval mode on the CPU
+    """
+    cache_dir = cache_dir or get_cache_dir()
+    cache_path = os.path.join(cache_dir, QUANTIZED_CACHE_FILE)
+
+    if os.path.exists(cache_path):
+        logger.info(f"Loading quantized VGGT weights from {cache_path}")
+        with _parameters_on_meta():
+            model = build_model()
+        model = _quantized_structure(model)
+        state_dict = torch.load(cache_path, map_location="cpu", weights_only=True)
+        # assign=True replaces the meta parameters instead of copying into them
+        model.load_state_dict(state_dict, assign=True)
+        missing = [name for name, param in model.named_parameters() if param.is_meta]
+        if missing:
+            raise RuntimeError(f"Quantized VGGT cache {cache_path} is missing {len(missing)} parameters, "
+                               f"e.g. {missing[:3]}")
+        return model.eval()
+
+    logger.info("No cached quantized weights, converting fp32 VGGT to dynamic int8")
+    start = time.perf_counter()
+    model = quantize_vggt(load_fp32_model())
+    logger.info(f"Quantization took {time.perf_counter() - start:.1f}s")
+
+    # Write to a temp file and rename so concurrent workers never see a partial cache
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    torch.save(model.state_dict(), tmp_path)
+    os.replace(tmp_path, cache_path)
+    logger.info(f"Cached quantized weights at {cache_path} ({os.path.getsize(cache_path) / 1e6:.0f} MB)")
+    return model.eval()
+
+
+def _rotation_angle_deg(r1: torch.Tensor, r2: torch.Tensor) -> torch.Tensor:
+    """Angle of the relative rotation between two batches of 3x3 rotations, in degrees."""
+    relative = r1 @ r2.transpose(-1, -2)
+    cos = ((relative.diagonal(dim1=-2, dim2=-1).sum(-1) - 1) / 2).clamp(-1.0, 1.0)
+    return torch.rad2deg(torch.acos(cos))
+
+
+def compare_outputs(baseline: Dict[str, torch.Tensor], candidate: Dict[str, torch.Tensor]) -> Dict[str, float]:
+    """
+    Compare camera and depth predictions of a candidate model against the fp32 baseline.
+
+    Args:
+        baseline: Dict with extrinsic (S, 3, 4), intrinsic (S, 3, 3), depth_map and depth_conf
+        candidate: Same keys from the model under test
+
+    Returns:
+        Dict[str, float]: Rotation/translation/focal errors and depth error statistics
+    """
+    b_ext, c_ext = baseline["extrinsic"].float(), candidate["extrinsic"].float()
+    rot_err = _rotation_angle_deg(b_ext[..., :3, :3], c_ext[..., :3, :3])
+    trans_err = (b_ext[..., :3, 3] - c_ext[..., :3, 3]).norm(dim=-1)
+    trans_scale = b_ext[..., :3, 3].norm(dim=-1).clamp_min(1e-6)
+
+    b_focal = baseline["intrinsic"].float()[..., [0, 1], [0, 1]]
+    c_focal = candidate["intrinsic"].float()[..., [0, 1], [0, 1]]
+    focal_rel = ((b_focal - c_focal).abs() / b_focal.abs().clamp_min(1e-6))
+
+    b_depth, c_depth = baseline["depth_map"].float(), candidate["depth_map"].float()
+    valid = b_depth > 1e-6
+    depth_abs_rel = ((b_depth - c_depth).abs() / b_depth.clamp_min(1e-6))[valid]
+    conf_abs = (baseline["depth_conf"].float() - candidate["depth_conf"].float()).abs()
+
+    # torch.quantile is limited to 16M elements, sample larger depth maps
+    depth_sample = depth_abs_rel
+    if depth_sample.numel() > 16_000_000:
+        depth_sample = depth_sample[torch.randperm(depth_sample.numel())[:16_000_000]]
+
+    return {
+        "rotation_error_deg_mean": rot_err.mean().item(),
+        "rotation_error_deg_max": rot_err.max().item(),
+        "translation_error_rel_mean": (trans_err / trans_scale).mean().item(),
+        "focal_error_rel_mean": focal_rel.mean().item(),
+        "depth_abs_rel_mean": depth_abs_rel.mean().item(),
+        "depth_abs_rel_p95": depth_sample.quantile(0.95).item(),
+        "depth_within_1pct": (depth_abs_rel < 0.01).float().mean().item(),
+        "depth_conf_abs_mean": conf_abs.mean().item(),
+    }
+
+
+def _predict(model: torch.nn.Module, images: torch.Tensor) -> Dict[str, torch.Tensor]:
+    """Run aggregator, camera head and depth head and return CPU predictions."""
+    from vggt_s3_task import run_vggt_aggregator, predict_cameras, predict_depth_maps
+
+    images_batch, tokens, ps_idx = run_vggt_aggregator.fn(model, images=images)
+    extrinsic, intrinsic = predict_cameras.fn(model, tokens, images_batch)
+    depth_map, depth_conf = predict_depth_maps.fn(model, tokens, images_batch, ps_idx)
+    return {
+        "extrinsic": extrinsic.squeeze(0).cpu(),
+        "intrinsic": intrinsic.squeeze(0).cpu(),
+        "depth_map": depth_map.squeeze(0).cpu(),
+        "depth_conf": depth_conf.squeeze(0).cpu(),
+    }
+
+
+def _state_dict_megabytes(model: torch.nn.Module) -> float:
+    """Serialized size of a model's state dict in MB."""
+    buffer = BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.getbuffer().nbytes / 1e6
+
+
+def check_accuracy(image_paths: List[str], repeats: int = 1) -> Dict[str, float]:
+    """
+    Run fp32 and int8 VGGT on the same images and report the speed/size vs. quality trade-off.
+
+    Args:
+        image_paths: Reference images
+        repeats: Timed forward passes per model
+
+    Returns:
+        Dict[str, float]: Error metrics plus timing and size of both models
+    """
+    from vggt_s3_task import load_vggt_model, preprocess_images
+
+    images = preprocess_images.fn(image_paths)
+    report = {"images": len(image_paths)}
+
+    for name, quantized in (("fp32", False), ("int8", True)):
+        model = load_vggt_model.fn("cpu", quantized=quantized)
+        _predict(model, images)  # warmup
+        start = time.perf_counter()
+        for _ in range(repeats):
+            outputs = _predict(model, images)
+        report[f"{name}_seconds_per_pass"] = (time.perf_counter() - start) / repeats
+        report[f"{name}_size_mb"] = _state_dict_megabytes(model)
+        if quantized:
+            report.update(compare_outputs(baseline, outputs))
+        else:
+            baseline = outputs
+        del model
+
+    report["speedup"] = report["fp32_seconds_per_pass"] / report["int8_seconds_per_pass"]
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    from pathlib import Path
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='Compare int8 quantized VGGT against the fp32 baseline')
+    parser.add_argument('image_dir', help='Directory containing reference images')
+    parser.add_argument('--num-images', type=int, default=8, help='Number of reference images')
+    parser.add_argument('--repeats', type=int, default=1, help='Timed passes per model')
+    parser.add_argument('--output', help='Optional path for a JSON report')
+    args = parser.parse_args()
+
+    paths = []
+    for ext in ['*.jpg', '*.jpeg', '*.png']:
+        paths.extend(Path(args.image_dir).glob(ext))
+        paths.extend(Path(args.image_dir).glob(ext.upper()))
+    paths = [str(p) for p in sorted(set(paths))[:args.num_images]]
+    if not paths:
+        logger.error(f"No image files found in '{args.image_dir}'.")
+        sys.exit(1)
+
+    result = check_accuracy(paths, args.repeats)
+    for key, value in result.items():
+        print(f"{key:<30} {value:.6g}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
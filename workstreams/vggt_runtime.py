@@ -0,0 +1,197 @@
+"""Execution profiles controlling how VGGT inference runs on a device."""
+import os
+import contextlib
+import logging
+from dataclasses import dataclass, replace
+from typing import Dict, Optional
+
+import torch
+
+# Configure logging
+logger = logging.getLogger("vggt_runtime")
+logger.setLevel(logging.INFO)
+
+SYSFS_CPU_DIR = "/sys/devices/system/cpu"
+
+
+def physical_cores() -> int:
+    """
+    Physical cores this process may run on.
+
+    Counts distinct (package, core) pairs among the CPUs in the affinity mask, read from
+    sysfs, so SMT siblings and CPUs outside a container's cpuset are not counted. Falls back
+    to the CPUs in the affinity mask, or os.cpu_count(), where the topology is not exposed.
+    """
+    try:
+        cpus = sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+    cores = set()
+    try:
+        for cpu in cpus:
+            topology = os.path.join(SYSFS_CPU_DIR, f"cpu{cpu}", "topology")
+            with open(f"{topology}/physical_package_id") as package, open(f"{topology}/core_id") as core:
+                cores.add((package.read().strip(), core.read().strip()))
+    except OSError:
+        return len(cpus) or 1
+    return len(cores) or 1
+
+
+@dataclass(frozen=True)
+class ExecutionProfile:
+    """
+    How to run VGGT inference.
+
+    Attributes:
+        name: Profile name as accepted by the flows
+        intra_op_threads: Threads used inside a single op (torch.set_num_threads). None keeps the default.
+        inter_op_threads: Threads used to run independent ops in parallel. None keeps the default.
+        cpu_autocast_dtype: Autocast dtype on CPU ("bfloat16"), or None for full fp32
+        channels_last: Convert the model and inputs to channels-last memory format
+        compile: Wrap the aggregator and heads with torch.compile
+    """
+    name: str
+    intra_op_threads: Optional[int] = None
+    inter_op_threads: Optional[int] = None
+    cpu_autocast_dtype: Optional[str] = None
+    channels_last: bool = False
+    compile: bool = False
+
+
+PROFILES: Dict[str, ExecutionProfile] = {
+    # Previous behaviour: CUDA autocast only, fp32 with default threading on CPU
+    "default": ExecutionProfile("default"),
+    # All physical cores, fp32
+    "cpu-fp32": ExecutionProfile("cpu-fp32", intra_op_threads=physical_cores(), inter_op_threads=1),
+    # bf16 autocast on CPUs with native bf16 (AVX512-BF16 / AMX), channels-last
+    "cpu-bf16": ExecutionProfile("cpu-bf16", intra_op_threads=physical_cores(), inter_op_threads=1,
+                                 cpu_autocast_dtype="bfloat16", channels_last=True),
+    # cpu-bf16 plus torch.compile; slow first run, fastest steady state
+    "cpu-bf16-compile": ExecutionProfile("cpu-bf16-compile", intra_op_threads=physical_cores(), inter_op_threads=1,
+                                         cpu_autocast_dtype="bfloat16", channels_last=True, compile=True),
+}
+
+
+def get_execution_profile(name: Optional[str] = None) -> ExecutionProfile:
+    """
+    Look up an execution profile, applying thread-count overrides from the environment.
+
+    ``VGGT_INTRA_OP_THREADS`` and ``VGGT_INTER_OP_THREADS`` override the profile's thread
+    counts so the same deployment can be tuned per worker machine.
+
+    Args:
+        name: Profile name. If None, uses ``VGGT_EXECUTION_PROFILE`` or "default".
+
+    Returns:
+        ExecutionProfile: The resolved profile
+    """
+    name = name or os.environ.get("VGGT_EXECUTION_PROFILE", "default")
+    if name not in PROFILES:
+        raise ValueError(f"Unknown execution profile '{name}'. Available: {', '.join(PROFILES)}")
+
+    profile = PROFILES[name]
+    overrides = {}
+    if os.environ.get("VGGT_INTRA_OP_THREADS"):
+        overrides["intra_op_threads"] = int(os.environ["VGGT_INTRA_OP_THREADS"])
+    if os.environ.get("VGGT_INTER_OP_THREADS"):
+        overrides["inter_op_threads"] = int(os.environ["VGGT_INTER_OP_THREADS"])
+    return replace(profile, **overrides) if overrides else profile
+
+
+def cpu_supports_bf16() -> bool:
+    """Whether the CPU has native bfloat16 support through oneDNN."""
+    try:
+        return torch.backends.mkldnn.is_available() and torch.ops.mkldnn._is_mkldnn_bf16_supported()
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def configure_threads(profile: ExecutionProfile):
+    """
+    Apply the profile's thread settings to the process.
+
+    The inter-op pool can only be sized before it is first used, so a failure there is
+    logged and ignored rather than aborting the run.
+    """
+    if profile.intra_op_threads:
+        torch.set_num_threads(profile.intra_op_threads)
+    if profile.inter_op_threads:
+        try:
+            torch.set_num_interop_threads(profile.inter_op_threads)
+        except RuntimeError as e:
+            logger.warning(f"Could not set inter-op threads to {profile.inter_op_threads}: {e}")
+    logger.info(f"Torch threads: intra-op={torch.get_num_threads()}, inter-op={torch.get_num_interop_threads()}")
+
+
+def autocast_dtype(device: torch.device, profile: ExecutionProfile) -> Optional[torch.dtype]:
+    """
+    Pick the autocast dtype for a device, or None to run in full precision.
+
+    On CUDA this keeps the existing rule: bfloat16 on Ampere or newer, float16 otherwise.
+    On CPU autocast is only used when the profile asks for it and the CPU supports bf16.
+    """
+    device = torch.device(device)
+    if device.type == "cuda":
+        if torch.cuda.get_device_capability(device)[0] >= 8:
+            return torch.bfloat16
+        return torch.float16
+    if device.type == "cpu" and profile.cpu_autocast_dtype == "bfloat16":
+        if cpu_supports_bf16():
+            return torch.bfloat16
+        logger.warning("CPU has no native bfloat16 support, running in fp32")
+    return None
+
+
+def prepare_model(model: torch.nn.Module, profile: ExecutionProfile) -> torch.nn.Module:
+    """
+    Apply the execution profile to a loaded model.
+
+    The profile is stored on the model so the inference tasks can pick the matching
+    autocast and memory format without every task taking a profile argument.
+    """
+    device = next(model.parameters()).device
+    if device.type == "cpu":
+        configure_threads(profile)
+
+    if profile.channels_last:
+        model = model.to(memory_format=torch.channels_last)
+
+    if profile.compile:
+        logger.info("Compiling VGGT aggregator and heads with torch.compile")
+        for name in ("aggregator", "camera_head", "depth_head", "point_head"):
+            module = getattr(model, name, None)
+            if module is not None:
+                setattr(model, name, torch.compile(module))
+
+    model.execution_profile = profile
+    model.autocast_dtype = autocast_dtype(device, profile)
+    logger.info(f"Execution profile '{profile.name}' on {device} "
+                f"(autocast dtype: {model.autocast_dtype or 'none, fp32'})")
+    return model
+
+
+def inference_context(model: torch.nn.Module):
+    """
+    Context manager for running VGGT: inference mode plus autocast for the model's device.
+
+    Models that were not prepared with an execution profile fall back to the default profile.
+    """
+    device = next(model.parameters()).device
+    dtype = getattr(model, "autocast_dtype", None) if hasattr(model, "execution_profile") \
+        else autocast_dtype(device, PROFILES["default"])
+
+    stack = contextlib.ExitStack()
+    stack.enter_context(torch.inference_mode())
+    if dtype is not None:
+        stack.enter_context(torch.autocast(device_type=device.type, dtype=dtype))
+    return stack
+
+
+def prepare_inputs(images: torch.Tensor, model: torch.nn.Module) -> torch.Tensor:
+    """Move images to the model's device in the memory format its profile expects."""
+    device = next(model.parameters()).device
+    images = images.to(device)
+    profile = getattr(model, "execution_profile", None)
+    if profile is not None and profile.channels_last and images.dim() == 4:
+        images = images.contiguous(memory_format=torch.channels_last)
+    return images
@@ -1,17 +1,27 @@
 from prefect import flow, task
 import os
 import sys
-import boto3
-from botocore.client import Config
-import torch
-from PIL import Image
-from io import BytesIO
+import json
 import tempfile
 import shutil
 import logging
-from typing import List, Dict, Any, Optional, Tuple
-from pathlib import Path
-import numpy as np
+from io import BytesIO
+from typing import List, Dict, Any, Optional, Tuple, TYPE_CHECKING
+from dataclasses import replace
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import BYTES_TRANSFERRED, timed_stage, track_flow
+from profiling import profiled_flow
+from storage import S3ClientSettings, get_s3_client, get_transfer_config
+
+# torch, numpy, boto3 and VGGT take seconds to import. They are loaded on first task
+# execution so that deployments and tools that only need the flow signature import fast.
+if TYPE_CHECKING:
+    import boto3
+    import numpy as np
+    import torch
+    from vggt_cache import TensorCache
+    from vggt_checkpoint import StageCheckpoints
 
 # Configure logging
 logger = logging.getLogger("vggt_s3_task")
@@ -20,36 +30,75 @@ handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s -
 logger.addHandler(handler)
 logger.setLevel(logging.INFO)
 
-# First check if VGGT is in /opt/vggt (the Docker container location)
-VGGT_AVAILABLE = False
+# Locations probed for a VGGT checkout, the first being the Docker container location
 vggt_possible_paths = [
     "/opt/vggt",
     os.path.expanduser("~/vggt"),
     os.path.join(os.path.dirname(os.path.abspath(__file__)), "vggt")
 ]
 
-for vggt_path in vggt_possible_paths:
-    if os.path.exists(vggt_path):
-        logger.info(f"Found VGGT at {vggt_path}")
-        if vggt_path not in sys.path:
-            sys.path.append(vggt_path)
-            logger.info(f"Added {vggt_path} to sys.path")
-        break
-    else:
-        logger.warning(f"VGGT not found at {vggt_path}")
-
-# Try to import VGGT
-try:
-    # Import VGGT model
-    from vggt.models.vggt import VGGT
-    from vggt.utils.load_fn import load_and_preprocess_images
-    from vggt.utils.pose_enc import pose_encoding_to_extri_intri
-    from vggt.utils.geometry import unproject_depth_map_to_point_map
-    VGGT_AVAILABLE = True
-    logger.info("VGGT package imported successfully")
-except ImportError as e:
-    logger.error(f"VGGT package import failed: {e}")
-    VGGT_AVAILABLE = False
+# None until the first check, then whether the VGGT package could be imported
+VGGT_AVAILABLE = None
+
+
+def _import_torch():
+    """Import torch and numpy into the module namespace on first use."""
+    global torch, np
+    import torch
+    import numpy as np
+
+
+def _discover_vggt() -> bool:
+    """
+    Find VGGT, add its checkout to sys.path and import the parts used by the tasks.
+    
+    Runs once per process; later calls return the cached result.
+    
+    Returns:
+        bool: True if VGGT is available, False otherwise
+    """
+    global VGGT_AVAILABLE, VGGT, load_and_preprocess_images, pose_encoding_to_extri_intri, unproject_depth_map_to_point_map
+    if VGGT_AVAILABLE is not None:
+        return VGGT_AVAILABLE
+    
+    _import_torch()
+    for vggt_path in vggt_possible_paths:
+        if os.path.exists(vggt_path):
+            logger.info(f"Found VGGT at {vggt_path}")
+            if vggt_path not in sys.path:
+                sys.path.append(vggt_path)
+                logger.info(f"Added {vggt_path} to sys.path")
+            break
+        else:
+            logger.warning(f"VGGT not found at {vggt_path}")
+    
+    # Try to import VGGT
+    try:
+        # Import VGGT model
+        from vggt.models.vggt import VGGT
+        from vggt.utils.load_fn import load_and_preprocess_images
+        from vggt.utils.pose_enc import pose_encoding_to_extri_intri
+        from vggt.utils.geometry import unproject_depth_map_to_point_map
+        VGGT_AVAILABLE = True
+        logger.info("VGGT package imported successfully")
+    except ImportError as e:
+        logger.error(f"VGGT package import failed: {e}")
+        VGGT_AVAILABLE = False
+    return VGGT_AVAILABLE
+
+
+def _require_vggt():
+    """
+    Import VGGT and the torch-dependent helpers into the module namespace on first use.
+    
+    Raises:
+        ImportError: If VGGT is not installed
+    """
+    global get_execution_profile, prepare_model, load_quantized_vggt
+    if not check_vggt_install():
+        raise ImportError("VGGT package is not available. Please make sure it's installed correctly.")
+    from vggt_runtime import get_execution_profile, prepare_model
+    from vggt_quantization import load_quantized_vggt
 
 
 @task(name="Setup S3 Client", description="Connect to MinIO S3-compatible storage")
@@ -58,7 +107,7 @@ def setup_s3_client(
     region_name: str = "us-east-1",
     access_key: str = "minioadmin", 
     secret_key: str = "minioadmin"
-) -> boto3.client:
+) -> "boto3.client":
     """
     Set up and return an S3 client connected to MinIO.
     
@@ -72,23 +121,18 @@ def setup_s3_client(
         boto3.client: Configured S3 client
     """
     logger.info(f"Setting up S3 client with endpoint URL: {endpoint_url}")
-    s3_client = boto3.client(
-        's3',
-        endpoint_url=endpoint_url,
-        aws_access_key_id=access_key,
-        aws_secret_access_key=secret_key,
-        region_name=region_name,
-        config=Config(signature_version='s3v4')
-    )
-    return s3_client
+    # Shared per process, so repeated flow runs and threads reuse one connection pool
+    return get_s3_client(endpoint_url, access_key, secret_key, region_name)
 
 
 @task(name="Download Images", description="Download images from S3 storage to local filesystem")
+@timed_stage("vggt", "download")
 def download_images_from_s3(
-    s3_client: boto3.client,
+    s3_client: "boto3.client",
     bucket_name: str,
     s3_paths: List[str],
-    local_dir: Optional[str] = None
+    local_dir: Optional[str] = None,
+    max_workers: int = 16
 ) -> List[str]:
     """
     Download images from S3 to a local directory.
@@ -98,6 +142,7 @@ def download_images_from_s3(
         bucket_name: S3 bucket name
         s3_paths: List of S3 paths to download
         local_dir: Optional local directory to save images. If None, a temporary directory is created.
+        max_workers: Number of concurrent downloads
         
     Returns:
         List[str]: List of local file paths
@@ -108,15 +153,19 @@ def download_images_from_s3(
         os.makedirs(local_dir, exist_ok=True)
     
     logger.info(f"Downloading {len(s3_paths)} images from bucket {bucket_name} to {local_dir}")
-    local_paths = []
     
-    for s3_path in s3_paths:
+    def download(s3_path: str) -> str:
         filename = os.path.basename(s3_path)
         local_path = os.path.join(local_dir, filename)
         
-        logger.info(f"Downloading s3://{bucket_name}/{s3_path} to {local_path}")
+        logger.debug(f"Downloading s3://{bucket_name}/{s3_path} to {local_path}")
         s3_client.download_file(bucket_name, s3_path, local_path)
-        local_paths.append(local_path)
+        BYTES_TRANSFERRED.labels("vggt", "download").inc(os.path.getsize(local_path))
+        return local_path
+    
+    # The shared client's pool is sized for parallel transfers
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(s3_paths)))) as executor:
+        local_paths = list(executor.map(download, s3_paths))
     
     return local_paths
 
@@ -128,7 +177,7 @@ def check_vggt_install():
     Returns:
         bool: True if VGGT is available, False otherwise
     """
-    if not VGGT_AVAILABLE:
+    if not _discover_vggt():
         logger.error("VGGT package is not available. Please make sure it's installed correctly.")
         logger.error("You may need to rebuild the Docker image or install VGGT manually.")
         logger.error("The Docker build should clone VGGT to /opt/vggt and install it in development mode.")
@@ -137,54 +186,161 @@ def check_vggt_install():
 
 
 @task(name="Load VGGT Model", description="Initialize and load the VGGT model weights")
-def load_vggt_model(device: str = None) -> torch.nn.Module:
+@timed_stage("vggt", "load_model")
+def load_vggt_model(
+    device: str = None,
+    execution_profile: Optional[str] = None,
+    quantized: bool = False
+) -> "torch.nn.Module":
     """
     Load the VGGT model and return it.
     
     Args:
         device: Device to load the model on. If None, will use CUDA if available, otherwise CPU.
+        execution_profile: Name of the execution profile (see vggt_runtime.PROFILES). If None,
+            uses the VGGT_EXECUTION_PROFILE environment variable or "default".
+        quantized: Load the dynamic int8 variant (CPU only). The first load converts the fp32
+            weights and caches the result on local disk.
         
     Returns:
         torch.nn.Module: Loaded VGGT model
     """
-    if not check_vggt_install():
-        raise ImportError("VGGT package is not available. Please make sure it's installed correctly.")
+    _require_vggt()
 
     if device is None:
-        device = "cuda" if torch.cuda.is_available() else "cpu"
+        device = "cuda" if torch.cuda.is_available() and not quantized else "cpu"
     
-    logger.info(f"Loading VGGT model on {device}")
+    profile = get_execution_profile(execution_profile)
     
-    # Determine dtype based on GPU capabilities
-    if torch.cuda.is_available() and torch.cuda.get_device_capability()[0] >= 8:
-        dtype = torch.bfloat16
-        logger.info("Using bfloat16 precision (Ampere+ GPU detected)")
+    if quantized:
+        if device != "cpu":
+            raise ValueError(f"The quantized VGGT model only runs on the CPU, not on {device}")
+        if profile.cpu_autocast_dtype or profile.compile:
+            # Quantized linear layers take fp32 activations and do not compile cleanly
+            logger.info(f"Disabling autocast and compile of profile '{profile.name}' for the quantized model")
+            profile = replace(profile, cpu_autocast_dtype=None, compile=False)
+        logger.info("Loading dynamic int8 quantized VGGT model on cpu")
+        model = load_quantized_vggt(VGGT, lambda: _load_pretrained_vggt("cpu"))
     else:
-        dtype = torch.float16
-        logger.info("Using float16 precision")
+        logger.info(f"Loading VGGT model on {device}")
+        model = _load_pretrained_vggt(device)
     
-    # Initialize the model and load pretrained weights using torch.hub
-    logger.info("Loading VGGT model from pretrained weights using torch.hub")
-    model = VGGT()
-    _URL = "https://huggingface.co/facebook/VGGT-1B/resolve/main/model.pt"
-    model.load_state_dict(torch.hub.load_state_dict_from_url(_URL))
-    model = model.to(device)
-    model.eval()
+    # Threads, autocast dtype, memory format and compilation
+    return prepare_model(model, profile)
+
+
+def _load_pretrained_vggt(device: str) -> "torch.nn.Module":
+    """Build VGGT and load the pretrained fp32 weights."""
+    from vggt_weights import load_model_from_store
     
-    return model
+    # Weights are memory-mapped from the local store, downloaded and converted on first use
+    logger.info("Loading VGGT model from the local weights store")
+    return load_model_from_store(VGGT, device)
+
+
+@task(name="Preprocess Images", description="Load and preprocess images into a VGGT input tensor")
+@timed_stage("vggt", "preprocess")
+def preprocess_images(image_paths: List[str], num_workers: Optional[int] = None) -> "torch.Tensor":
+    """
+    Load and preprocess images on the CPU.
+    
+    Kept separate from the aggregator so decoding can overlap model loading or another
+    flight's inference.
+    
+    Args:
+        image_paths: List of local image paths
+        num_workers: Decoding processes writing into a shared batch buffer (see
+            vggt_preprocess). 0 uses VGGT's serial loader. If None, uses VGGT_PREPROCESS_WORKERS
+            or one per CPU up to 8.
+        
+    Returns:
+        torch.Tensor: Preprocessed images of shape (S, 3, H, W)
+    """
+    from vggt_preprocess import default_workers, preprocess_parallel
+    
+    _require_vggt()
+    num_workers = default_workers() if num_workers is None else num_workers
+    logger.info(f"Loading and preprocessing {len(image_paths)} images")
+    if num_workers == 0:
+        return load_and_preprocess_images(image_paths)
+    return preprocess_parallel(image_paths, num_workers)
+
+
+@task(name="Load Images With Cache", description="Load preprocessed images from the local tensor cache, downloading only misses")
+@timed_stage("vggt", "load_images_cached")
+def load_images_cached(
+    s3_client: "boto3.client",
+    bucket_name: str,
+    s3_paths: List[str],
+    local_dir: Optional[str] = None,
+    num_workers: Optional[int] = None,
+    cache: Optional["TensorCache"] = None,
+    max_workers: int = 16
+) -> "torch.Tensor":
+    """
+    Build the VGGT input batch from the preprocessed-tensor cache.
+    
+    Only object metadata is fetched for every image, to look up its ETag. Cached images
+    are memory-mapped from local disk; the rest are downloaded, preprocessed and added to
+    the cache, so a repeat run on the same flight skips both download and decode.
+    
+    Args:
+        s3_client: Configured S3 client
+        bucket_name: S3 bucket name
+        s3_paths: List of S3 paths to images
+        local_dir: Directory for downloading misses. If None, a temporary directory is created.
+        num_workers: Decoding processes for misses (see vggt_preprocess)
+        cache: Tensor cache. If None, uses the default cache (see vggt_cache).
+        max_workers: Number of concurrent metadata requests and downloads
+        
+    Returns:
+        torch.Tensor: Preprocessed images of shape (S, 3, H, W)
+    """
+    from vggt_cache import TensorCache
+    from vggt_preprocess import TARGET_SIZE, image_shapes, padded_region, preprocess_parallel, stack_padded
+    
+    _import_torch()
+    cache = cache or TensorCache()
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(s3_paths)))) as executor:
+        etags = list(executor.map(
+            lambda path: s3_client.head_object(Bucket=bucket_name, Key=path)['ETag'], s3_paths
+        ))
+    keys = [TensorCache.make_key(bucket_name, path, etag, TARGET_SIZE) for path, etag in zip(s3_paths, etags)]
+    arrays = [cache.get(key) for key in keys]
+    
+    missing = [index for index, array in enumerate(arrays) if array is None]
+    logger.info(f"Tensor cache: {len(s3_paths) - len(missing)} hits, {len(missing)} misses")
+    if missing:
+        local_paths = download_images_from_s3.fn(
+            s3_client, bucket_name, [s3_paths[i] for i in missing], local_dir, max_workers
+        )
+        batch = preprocess_parallel(local_paths, num_workers).numpy()
+        for slot, (index, shape) in enumerate(zip(missing, image_shapes(local_paths))):
+            rows, cols = padded_region(batch.shape, shape)
+            arrays[index] = batch[slot, :, rows, cols]
+            cache.put(keys[index], arrays[index])
+        cache.evict()
+    
+    return stack_padded(arrays)
 
 
 @task(name="VGGT Aggregation", description="Run VGGT aggregator on input images")
+@timed_stage("vggt", "aggregator")
 def run_vggt_aggregator(
-    model: torch.nn.Module,
-    image_paths: List[str]
-) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    model: "torch.nn.Module",
+    image_paths: Optional[List[str]] = None,
+    images: Optional["torch.Tensor"] = None,
+    preprocess_workers: Optional[int] = None
+) -> "Tuple[torch.Tensor, torch.Tensor, torch.Tensor]":
     """
     Run the VGGT aggregator on input images.
     
     Args:
         model: Loaded VGGT model
         image_paths: List of local image paths
+        images: Already preprocessed images; when given, image_paths is ignored
+        preprocess_workers: Decoding processes used for image_paths (see preprocess_images)
         
     Returns:
         Tuple containing:
@@ -192,35 +348,31 @@ def run_vggt_aggregator(
             - aggregated_tokens_list: Token list from aggregator
             - ps_idx: Point sampling indices
     """
-    device = next(model.parameters()).device
-    logger.info(f"Running VGGT aggregator on {len(image_paths)} images on {device}")
+    from vggt_runtime import inference_context, prepare_inputs
     
-    # Determine dtype based on GPU capabilities
-    if torch.cuda.is_available() and torch.cuda.get_device_capability()[0] >= 8:
-        dtype = torch.bfloat16
-    else:
-        dtype = torch.float16
+    device = next(model.parameters()).device
+    if images is None:
+        images = preprocess_images.fn(image_paths, preprocess_workers)
+    logger.info(f"Running VGGT aggregator on {images.shape[0]} images on {device}")
     
-    # Load and preprocess the images
-    logger.info("Loading and preprocessing images")
-    images = load_and_preprocess_images(image_paths).to(device)
+    images = prepare_inputs(images, model)
     
-    with torch.no_grad():
-        with torch.cuda.amp.autocast(dtype=dtype):
-            logger.info("Running VGGT aggregator")
-            # Add batch dimension for a single scene
-            images_batch = images[None]
-            aggregated_tokens_list, ps_idx = model.aggregator(images_batch)
+    with inference_context(model):
+        logger.info("Running VGGT aggregator")
+        # Add batch dimension for a single scene
+        images_batch = images[None]
+        aggregated_tokens_list, ps_idx = model.aggregator(images_batch)
     
     return images_batch, aggregated_tokens_list, ps_idx
 
 
 @task(name="Predict Cameras", description="Predict camera parameters from VGGT aggregated tokens")
+@timed_stage("vggt", "cameras")
 def predict_cameras(
-    model: torch.nn.Module,
-    aggregated_tokens_list: torch.Tensor,
-    images_batch: torch.Tensor
-) -> Tuple[torch.Tensor, torch.Tensor]:
+    model: "torch.nn.Module",
+    aggregated_tokens_list: "torch.Tensor",
+    images_batch: "torch.Tensor"
+) -> "Tuple[torch.Tensor, torch.Tensor]":
     """
     Predict camera parameters using the VGGT camera head.
     
@@ -234,30 +386,25 @@ def predict_cameras(
             - extrinsic: Camera extrinsic parameters
             - intrinsic: Camera intrinsic parameters
     """
-    device = next(model.parameters()).device
-    
-    # Determine dtype based on GPU capabilities
-    if torch.cuda.is_available() and torch.cuda.get_device_capability()[0] >= 8:
-        dtype = torch.bfloat16
-    else:
-        dtype = torch.float16
+    from vggt_runtime import inference_context
     
-    with torch.no_grad():
-        with torch.cuda.amp.autocast(dtype=dtype):
-            logger.info("Predicting camera parameters")
-            pose_enc = model.camera_head(aggregated_tokens_list)[-1]
-            extrinsic, intrinsic = pose_encoding_to_extri_intri(pose_enc, images_batch.shape[-2:])
+    _require_vggt()
+    with inference_context(model):
+        logger.info("Predicting camera parameters")
+        pose_enc = model.camera_head(aggregated_tokens_list)[-1]
+        extrinsic, intrinsic = pose_encoding_to_extri_intri(pose_enc, images_batch.shape[-2:])
     
     return extrinsic, intrinsic
 
 
 @task(name="Predict Depth Maps", description="Predict depth maps from VGGT aggregated tokens")
+@timed_stage("vggt", "depth")
 def predict_depth_maps(
-    model: torch.nn.Module,
-    aggregated_tokens_list: torch.Tensor,
-    images_batch: torch.Tensor,
-    ps_idx: torch.Tensor
-) -> Tuple[torch.Tensor, torch.Tensor]:
+    model: "torch.nn.Module",
+    aggregated_tokens_list: "torch.Tensor",
+    images_batch: "torch.Tensor",
+    ps_idx: "torch.Tensor"
+) -> "Tuple[torch.Tensor, torch.Tensor]":
     """
     Predict depth maps using the VGGT depth head.
     
@@ -272,29 +419,23 @@ def predict_depth_maps(
             - depth_map: Predicted depth maps
             - depth_conf: Depth confidence maps
     """
-    device = next(model.parameters()).device
-    
-    # Determine dtype based on GPU capabilities
-    if torch.cuda.is_available() and torch.cuda.get_device_capability()[0] >= 8:
-        dtype = torch.bfloat16
-    else:
-        dtype = torch.float16
+    from vggt_runtime import inference_context
     
-    with torch.no_grad():
-        with torch.cuda.amp.autocast(dtype=dtype):
-            logger.info("Predicting depth maps")
-            depth_map, depth_conf = model.depth_head(aggregated_tokens_list, images_batch, ps_idx)
+    with inference_context(model):
+        logger.info("Predicting depth maps")
+        depth_map, depth_conf = model.depth_head(aggregated_tokens_list, images_batch, ps_idx)
     
     return depth_map, depth_conf
 
 
 @task(name="Predict Point Maps", description="Predict point maps from VGGT aggregated tokens")
+@timed_stage("vggt", "points")
 def predict_point_maps(
-    model: torch.nn.Module,
-    aggregated_tokens_list: torch.Tensor,
-    images_batch: torch.Tensor,
-    ps_idx: torch.Tensor
-) -> Tuple[torch.Tensor, torch.Tensor]:
+    model: "torch.nn.Module",
+    aggregated_tokens_list: "torch.Tensor",
+    images_batch: "torch.Tensor",
+    ps_idx: "torch.Tensor"
+) -> "Tuple[torch.Tensor, torch.Tensor]":
     """
     Predict point maps using the VGGT point head.
     
@@ -309,32 +450,26 @@ def predict_point_maps(
             - point_map: Predicted point maps
             - point_conf: Point confidence maps
     """
-    device = next(model.parameters()).device
+    from vggt_runtime import inference_context
     
-    # Determine dtype based on GPU capabilities
-    if torch.cuda.is_available() and torch.cuda.get_device_capability()[0] >= 8:
-        dtype = torch.bfloat16
-    else:
-        dtype = torch.float16
-    
-    with torch.no_grad():
-        with torch.cuda.amp.autocast(dtype=dtype):
-            logger.info("Predicting point maps")
-            point_map, point_conf = model.point_head(aggregated_tokens_list, images_batch, ps_idx)
+    with inference_context(model):
+        logger.info("Predicting point maps")
+        point_map, point_conf = model.point_head(aggregated_tokens_list, images_batch, ps_idx)
     
     return point_map, point_conf
 
 
 @task(name="Construct 3D Point Cloud", description="Construct final 3D point cloud from depth or point maps")
+@timed_stage("vggt", "point_cloud")
 def construct_point_cloud(
-    extrinsic: torch.Tensor,
-    intrinsic: torch.Tensor,
-    depth_map: torch.Tensor,
-    depth_conf: torch.Tensor,
-    point_map: torch.Tensor,
-    point_conf: torch.Tensor,
+    extrinsic: "torch.Tensor",
+    intrinsic: "torch.Tensor",
+    depth_map: "torch.Tensor",
+    depth_conf: "torch.Tensor",
+    point_map: "torch.Tensor",
+    point_conf: "torch.Tensor",
     use_point_map: bool = False
-) -> Tuple[torch.Tensor, torch.Tensor]:
+) -> "Tuple[torch.Tensor, torch.Tensor]":
     """
     Construct the final 3D point cloud based on user preference.
     
@@ -352,14 +487,16 @@ def construct_point_cloud(
             - final_point_map: Final 3D point map
             - final_point_conf: Point confidence values
     """
+    _require_vggt()
     logger.info(f"Constructing final 3D point cloud (use_point_map={use_point_map})")
     
     if use_point_map:
         final_point_map = point_map.squeeze(0)
         final_point_conf = point_conf.squeeze(0)
     else:
-        # Unproject depth map to point map
-        final_point_map = unproject_depth_map_to_point_map(
+        # Unproject all frames at once instead of VGGT's per-frame NumPy loop
+        from point_fusion import unproject_depth_maps
+        final_point_map = unproject_depth_maps(
             depth_map.squeeze(0), 
             extrinsic.squeeze(0), 
             intrinsic.squeeze(0)
@@ -369,16 +506,56 @@ def construct_point_cloud(
     return final_point_map, final_point_conf
 
 
+@task(name="Fuse Point Cloud", description="Merge overlapping points of all views into one deduplicated cloud")
+@timed_stage("vggt", "fusion")
+def fuse_point_cloud(
+    extrinsic: "torch.Tensor",
+    intrinsic: "torch.Tensor",
+    depth_map: "torch.Tensor",
+    depth_conf: "torch.Tensor",
+    images_batch: Optional["torch.Tensor"] = None,
+    conf_percentile: float = 50.0,
+    voxel_size: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Fuse the depth maps of all frames into one confidence-filtered, deduplicated cloud.
+    
+    Args:
+        extrinsic: Camera extrinsic parameters
+        intrinsic: Camera intrinsic parameters
+        depth_map: Predicted depth maps
+        depth_conf: Depth confidence maps
+        images_batch: Input images, for point colors (optional)
+        conf_percentile: Pixels below this percentile of depth_conf are dropped
+        voxel_size: Merge distance in world units. If None, the median footprint of one pixel.
+        
+    Returns:
+        Dict[str, Any]: "fused_points", "fused_conf" and, with images, "fused_colors" on the CPU
+    """
+    import point_fusion
+    
+    fused = point_fusion.fuse_point_cloud(
+        extrinsic.squeeze(0),
+        intrinsic.squeeze(0),
+        depth_map.squeeze(0),
+        depth_conf.squeeze(0),
+        images=images_batch.squeeze(0) if images_batch is not None else None,
+        conf_percentile=conf_percentile,
+        voxel_size=voxel_size
+    )
+    return results_to_cpu(fused, squeeze=False)
+
+
 @task(name="Prepare Results", description="Prepare and format VGGT results for saving")
 def prepare_results(
-    extrinsic: torch.Tensor,
-    intrinsic: torch.Tensor,
-    depth_map: torch.Tensor,
-    depth_conf: torch.Tensor,
-    point_map: torch.Tensor,
-    point_conf: torch.Tensor,
-    final_point_map: torch.Tensor,
-    final_point_conf: torch.Tensor
+    extrinsic: "torch.Tensor",
+    intrinsic: "torch.Tensor",
+    depth_map: "torch.Tensor",
+    depth_conf: "torch.Tensor",
+    point_map: "torch.Tensor",
+    point_conf: "torch.Tensor",
+    final_point_map: "torch.Tensor",
+    final_point_conf: "torch.Tensor"
 ) -> Dict[str, Any]:
     """
     Prepare and format the VGGT results for saving.
@@ -398,73 +575,523 @@ def prepare_results(
     """
     logger.info("Preparing results for saving")
     
-    # Helper function to safely move data to CPU
-    def to_cpu(data):
-        if hasattr(data, 'cpu'):
-            return data.cpu()
-        return data
-    
-    # Store results, safely handling both PyTorch tensors and NumPy arrays
-    results = {
-        "extrinsic": to_cpu(extrinsic.squeeze(0)),
-        "intrinsic": to_cpu(intrinsic.squeeze(0)),
-        "depth_map": to_cpu(depth_map.squeeze(0)),
-        "depth_conf": to_cpu(depth_conf.squeeze(0)),
-        "point_map": to_cpu(point_map.squeeze(0)),
-        "point_conf": to_cpu(point_conf.squeeze(0)),
-        "final_point_map": to_cpu(final_point_map),
-        "final_point_conf": to_cpu(final_point_conf),
-    }
+    # Store results, safely handling both PyTorch tensors and NumPy arrays. A single call
+    # keeps results that share memory (final_point_map is point_map with use_point_map)
+    # shared on the CPU, so they are stored once.
+    return results_to_cpu({
+        "extrinsic": extrinsic.squeeze(0),
+        "intrinsic": intrinsic.squeeze(0),
+        "depth_map": depth_map.squeeze(0),
+        "depth_conf": depth_conf.squeeze(0),
+        "point_map": point_map.squeeze(0),
+        "point_conf": point_conf.squeeze(0),
+        "final_point_map": final_point_map,
+        "final_point_conf": final_point_conf,
+    }, squeeze=False)
+
+
+def _memory_identity(data: Any) -> Optional[Tuple]:
+    """Identifies the memory a tensor or array views; equal for views of the same data."""
+    if hasattr(data, 'data_ptr'):
+        return (str(data.device), data.data_ptr(), tuple(data.shape), data.stride(), data.dtype)
+    if hasattr(data, '__array_interface__'):
+        return ('numpy', data.__array_interface__['data'][0], data.shape, data.strides, data.dtype.str)
+    return None
+
+
+def results_to_cpu(tensors: Dict[str, Any], squeeze: bool = True) -> Dict[str, Any]:
+    """
+    Drop the batch dimension and move results to the CPU.
     
-    return results
+    Args:
+        tensors: Dictionary of PyTorch tensors or NumPy arrays
+        squeeze: Whether to remove the leading batch dimension
+        
+    Returns:
+        Dict[str, Any]: The same results, ready to be saved
+    """
+    cpu_results = {}
+    # Views of the same device memory map to one CPU tensor instead of separate copies
+    copies = {}
+    for key, data in tensors.items():
+        if squeeze:
+            data = data.squeeze(0)
+        if hasattr(data, 'cpu'):
+            identity = _memory_identity(data)
+            if identity not in copies:
+                copies[identity] = data.cpu()
+            data = copies[identity]
+        cpu_results[key] = data
+    return cpu_results
+
+
+def _result_path(output_prefix: str, key: str, layout: str = "tensor") -> str:
+    """S3 path of a result: its .pt file, or the per-frame path template for the frames layout."""
+    if layout == "frames":
+        return f"{output_prefix}/frames/{{frame}}/{key}.npy"
+    return f"{output_prefix}/{key}.pt"
 
 
 @task(name="Save Results to S3", description="Upload VGGT processing results back to S3 storage")
+@timed_stage("vggt", "upload")
 def save_results_to_s3(
-    s3_client: boto3.client,
+    s3_client: "boto3.client",
     bucket_name: str,
     results: Dict[str, Any],
-    output_prefix: str
+    output_prefix: str,
+    max_workers: int = 8,
+    storage_precision: str = "fp32",
+    aliases: Optional[Dict[str, str]] = None,
+    layout: str = "tensor"
 ) -> Dict[str, str]:
     """
     Save the VGGT results back to S3.
     
+    Each result is serialized into an in-memory buffer and streamed to S3 as a multipart
+    upload, with all results uploading concurrently, so nothing is written to local disk.
+    Results that share memory are uploaded once and the others point at that file. The
+    encoding of each file is attached as object metadata for write_results_manifest.
+    
+    With the "frames" layout every frame of a per-frame result is written as its own
+    ``frames/{i}/{name}.npy`` object, so a viewer can fetch one frame with a single GET.
+    All frames of a result share one encoding (and scale/offset when quantized).
+    
     Args:
         s3_client: Configured S3 client
         bucket_name: S3 bucket name
         results: Dictionary of VGGT results
         output_prefix: Prefix for output files in S3
+        max_workers: Number of results uploaded at the same time
+        storage_precision: Storage encoding of the maps (see vggt_encoding.STORAGE_PRECISIONS)
+        aliases: Results that are identical to a result saved under the same prefix by
+            another call, mapped to that result's name; nothing is uploaded for them
+        layout: "tensor" for one .pt per result, "frames" for per-frame .npy objects, or
+            "both" (see vggt_encoding.RESULT_LAYOUTS)
         
     Returns:
-        Dict[str, str]: Dictionary mapping result types to their S3 paths
+        Dict[str, str]: Dictionary mapping result types to their S3 paths (a path template
+            with a ``{frame}`` placeholder for the frames layout)
     """
-    logger.info(f"Saving results to S3 bucket {bucket_name} with prefix {output_prefix}")
-    output_paths = {}
+    from vggt_encoding import UNFRAMED_RESULTS, encode_result, max_decode_error
     
-    # Save each tensor as a .pt file
+    _import_torch()
+    logger.info(f"Saving results to S3 bucket {bucket_name} with prefix {output_prefix} "
+                f"(storage precision {storage_precision}, layout {layout})")
+    
+    # Convert numpy arrays to tensors; from_numpy shares memory, so duplicates stay visible
+    results = {key: torch.from_numpy(data) if isinstance(data, np.ndarray) else data
+               for key, data in results.items()}
+    
+    path_layout = "frames" if layout == "frames" else "tensor"
+    unique, output_paths = {}, {}
+    stored_as = {}
     for key, data in results.items():
-        with tempfile.NamedTemporaryFile(suffix='.pt') as temp_file:
-            logger.info(f"Saving {key} data to temporary file")
-            
-            # Convert numpy array to tensor if needed
-            if isinstance(data, np.ndarray):
-                logger.info(f"{key} is a NumPy array, converting to tensor")
-                data = torch.from_numpy(data)
-            
-            torch.save(data, temp_file.name)
-            temp_file.flush()
-            
-            s3_path = f"{output_prefix}/{key}.pt"
-            logger.info(f"Uploading {key} to s3://{bucket_name}/{s3_path}")
-            s3_client.upload_file(temp_file.name, bucket_name, s3_path)
-            output_paths[key] = s3_path
+        identity = _memory_identity(data)
+        if identity in stored_as:
+            logger.info(f"{key} is identical to {stored_as[identity]}, storing it once")
+            output_paths[key] = _result_path(output_prefix, stored_as[identity], path_layout)
+        else:
+            stored_as[identity] = key
+            unique[key] = data
+    for key, target in (aliases or {}).items():
+        output_paths[key] = _result_path(output_prefix, target, path_layout)
+    if not unique:
+        return output_paths
+    
+    # Split the connection pool between the concurrent uploads
+    max_workers = max(1, min(max_workers, len(unique)))
+    settings = S3ClientSettings.from_env()
+    transfer_config = get_transfer_config(settings, max(1, settings.max_pool_connections // max_workers))
+    
+    def upload_frames(key: str, data: "torch.Tensor", metadata: Dict[str, Any], executor: ThreadPoolExecutor):
+        frame_template = _result_path(output_prefix, key, "frames")
+        
+        def put_frame(index: int):
+            buffer = BytesIO()
+            # .npy keeps frames readable without torch, and the header is a fixed small prefix
+            np.save(buffer, data[index].numpy())
+            s3_client.put_object(
+                Bucket=bucket_name,
+                Key=frame_template.format(frame=index),
+                Body=buffer.getvalue(),
+                Metadata={'vggt-encoding': json.dumps(metadata)}
+            )
+            BYTES_TRANSFERRED.labels("vggt", "upload").inc(buffer.tell())
+        
+        logger.info(f"Uploading {data.shape[0]} frames of {key} to s3://{bucket_name}/{frame_template}")
+        list(executor.map(put_frame, range(data.shape[0])))
+    
+    def upload(item: Tuple[str, Any], frame_executor: Optional[ThreadPoolExecutor]) -> Tuple[str, str]:
+        key, data = item
+        data, encoding = encode_result(key, data, storage_precision)
+        if encoding["encoding"] != "raw":
+            logger.info(f"{key} encoded as {encoding['encoding']} {encoding['dtype']}, "
+                        f"max error {max_decode_error(encoding):.3g}")
+        
+        # 0-d results and the fused cloud have no frame axis and always stay whole
+        per_frame = frame_executor is not None and data.dim() > 0 and key not in UNFRAMED_RESULTS
+        metadata = dict(encoding)
+        if per_frame:
+            metadata["frames"] = data.shape[0]
+            metadata["frame_shape"] = list(data.shape[1:])
+            metadata["frame_path"] = _result_path(output_prefix, key, "frames")
+            upload_frames(key, data, metadata, frame_executor)
+            if layout == "frames":
+                return key, metadata["frame_path"]
+        
+        buffer = BytesIO()
+        torch.save(data, buffer)
+        size = buffer.tell()
+        buffer.seek(0)
+        
+        s3_path = _result_path(output_prefix, key)
+        logger.info(f"Uploading {key} ({size / 1e6:.1f} MB) to s3://{bucket_name}/{s3_path}")
+        s3_client.upload_fileobj(
+            buffer, bucket_name, s3_path,
+            ExtraArgs={'Metadata': {'vggt-encoding': json.dumps(metadata)}},
+            Config=transfer_config
+        )
+        BYTES_TRANSFERRED.labels("vggt", "upload").inc(size)
+        return key, s3_path
+    
+    frame_executor = None
+    if layout in ("frames", "both"):
+        frame_executor = ThreadPoolExecutor(max_workers=settings.max_pool_connections)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            output_paths.update(executor.map(lambda item: upload(item, frame_executor), unique.items()))
+    finally:
+        if frame_executor is not None:
+            frame_executor.shutdown()
+    
+    return {key: output_paths[key] for key in list(results) + list(aliases or {})}
+
+
+@task(name="Write Results Manifest", description="Record the files and encodings of a result set")
+def write_results_manifest(
+    s3_client: "boto3.client",
+    bucket_name: str,
+    output_prefix: str,
+    output_paths: Dict[str, str],
+    storage_precision: str = "fp32"
+) -> str:
+    """
+    Write manifest.json next to the results, describing how each one is stored.
+    
+    For every result it records the file, its encoding (dtype, scale and offset of
+    quantized maps) and, for results stored once under another name, which result it is
+    an alias of along with that result's file and encoding. Readers decode files with vggt_encoding.decode_result and the manifest.
+    
+    When results were saved per frame, the manifest doubles as the frame index: it lists
+    the frame count and the results available for every frame, and each such result
+    carries a ``frame_path`` template where ``{frame}`` is the frame number.
+    
+    Args:
+        s3_client: Configured S3 client
+        bucket_name: S3 bucket name
+        output_prefix: Prefix the results were saved under
+        output_paths: Result names mapped to their S3 paths, as returned by save_results_to_s3
+        storage_precision: Storage precision the results were saved with
+        
+    Returns:
+        str: S3 path of the manifest
+    """
+    from vggt_encoding import MANIFEST_FILE, MANIFEST_VERSION
+    
+    entries = {}
+    for key, path in output_paths.items():
+        owner = os.path.splitext(os.path.basename(path))[0]
+        if owner != key:
+            entries[key] = {"alias_of": owner}
+            continue
+        if "{frame}" in path:
+            # Frames-only layout: every frame carries the same metadata, read it from the first
+            head = s3_client.head_object(Bucket=bucket_name, Key=path.format(frame=0))
+            entry = {}
+        else:
+            head = s3_client.head_object(Bucket=bucket_name, Key=path)
+            entry = {"path": path, "size_bytes": head['ContentLength']}
+        entry.update(json.loads(head.get('Metadata', {}).get('vggt-encoding', '{"encoding": "raw"}')))
+        entries[key] = entry
+    for entry in entries.values():
+        if "alias_of" in entry:
+            # An alias is read like its target: same file, same encoding and frame count
+            target = entries.get(entry["alias_of"], {})
+            entry.update({field: value for field, value in target.items() if field != "size_bytes"})
+    
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "storage_precision": storage_precision,
+        "results": entries,
+    }
+    per_frame = {key: entry for key, entry in entries.items() if "frame_path" in entry}
+    if per_frame:
+        manifest["frames"] = max(entry.get("frames", 0) for entry in per_frame.values())
+        manifest["frame_results"] = sorted(per_frame)
+    manifest_path = f"{output_prefix}/{MANIFEST_FILE}"
+    s3_client.put_object(
+        Bucket=bucket_name,
+        Key=manifest_path,
+        Body=json.dumps(manifest, indent=2).encode(),
+        ContentType="application/json"
+    )
+    logger.info(f"Wrote results manifest to s3://{bucket_name}/{manifest_path}")
+    return manifest_path
+
+
+@task(name="Select Keyframes", description="Drop near-duplicate frames using EXIF GPS, capture times and perceptual hashes")
+@timed_stage("vggt", "keyframes")
+def select_keyframes_from_s3(
+    s3_client: "boto3.client",
+    bucket_name: str,
+    s3_image_paths: List[str],
+    max_frames: Optional[int] = None,
+    min_hash_distance: int = 6,
+    min_spacing_m: float = 2.0
+) -> List[str]:
+    """
+    Pick a representative subset of a flight's images before they are downloaded.
+    
+    Args:
+        s3_client: Configured S3 client
+        bucket_name: S3 bucket name
+        s3_image_paths: S3 paths of all images of the flight
+        max_frames: Frame budget. If None, only near-duplicates are dropped.
+        min_hash_distance: dHash bits two frames must differ by to both be kept
+        min_spacing_m: GPS distance under which similar-looking frames are duplicates
+        
+    Returns:
+        List[str]: S3 paths of the kept images, in their original order
+    """
+    from keyframes import estimate_savings, gather_frame_info, select_keyframes
     
+    frames = gather_frame_info(s3_client, bucket_name, s3_image_paths)
+    kept = select_keyframes(frames, max_frames, min_hash_distance, min_spacing_m)
+    savings = estimate_savings(len(frames), len(kept))
+    with_gps = sum(frame.gps is not None for frame in frames)
+    logger.info(f"Kept {len(kept)}/{len(frames)} frames ({len(frames) - len(kept)} dropped, "
+                f"{with_gps} with GPS). Estimated compute saved: "
+                f"{savings['global_attention']:.0%} of global attention, "
+                f"{savings['linear']:.0%} of per-frame work")
+    return [frame.s3_path for frame in kept]
+
+
+@task(name="Export Camera Poses", description="Write compact camera poses and a COLMAP model next to the results")
+@timed_stage("vggt", "poses")
+def export_camera_poses(
+    s3_client: "boto3.client",
+    bucket_name: str,
+    output_prefix: str,
+    extrinsic: Any,
+    intrinsic: Any,
+    image_size: Tuple[int, int],
+    s3_image_paths: Optional[List[str]] = None
+) -> str:
+    """
+    Export the predicted cameras as poses.npz and COLMAP text (see camera_poses).
+    
+    Args:
+        s3_client: Configured S3 client
+        bucket_name: S3 bucket name
+        output_prefix: Prefix the results are saved under
+        extrinsic: Camera extrinsic parameters
+        intrinsic: Camera intrinsic parameters
+        image_size: (height, width) of the model input the intrinsics refer to
+        s3_image_paths: Source image of each frame, used for the image names
+        
+    Returns:
+        str: S3 path of poses.npz
+    """
+    from camera_poses import poses_from_cameras, write_poses
+    
+    _import_torch()
+    names = [os.path.basename(path) for path in s3_image_paths] if s3_image_paths else None
+    extrinsic, intrinsic = (data.detach().cpu().numpy() if hasattr(data, 'detach') else data
+                            for data in (extrinsic, intrinsic))
+    poses = poses_from_cameras(extrinsic, intrinsic, image_size, names)
+    return write_poses(s3_client, bucket_name, output_prefix, poses)
+
+
+def write_tier_status(
+    s3_client: "boto3.client",
+    bucket_name: str,
+    output_prefix: str,
+    tier: str,
+    status: Dict[str, Any]
+) -> str:
+    """
+    Record the state of one tier in <output_prefix>/tiers.json.
+    
+    The UI reads this file to show the best tier that is complete, e.g. the preview
+    while the full-resolution pass is still running.
+    
+    Args:
+        s3_client: Configured S3 client
+        bucket_name: S3 bucket name
+        output_prefix: Prefix of the run
+        tier: "preview" or "full"
+        status: Tier entry, with at least "status"
+        
+    Returns:
+        str: S3 path of tiers.json
+    """
+    from datetime import datetime, timezone
+    from vggt_encoding import TIERS_FILE
+    
+    path = f"{output_prefix}/{TIERS_FILE}"
+    try:
+        tiers = json.loads(s3_client.get_object(Bucket=bucket_name, Key=path)['Body'].read())
+    except s3_client.exceptions.NoSuchKey:
+        tiers = {"version": 1, "tiers": {}}
+    tiers["tiers"][tier] = dict(status, updated_at=datetime.now(timezone.utc).isoformat())
+    s3_client.put_object(
+        Bucket=bucket_name,
+        Key=path,
+        Body=json.dumps(tiers, indent=2).encode(),
+        ContentType="application/json"
+    )
+    return path
+
+
+@task(name="Run Preview Tier", description="Low-resolution VGGT pass producing preview cameras and a sparse cloud")
+@timed_stage("vggt", "preview")
+def run_preview_tier(
+    s3_client: "boto3.client",
+    bucket_name: str,
+    model: "torch.nn.Module",
+    image_paths: List[str],
+    output_prefix: str,
+    s3_image_paths: Optional[List[str]] = None,
+    preview_size: int = 224,
+    preprocess_workers: Optional[int] = None
+) -> Dict[str, str]:
+    """
+    Run VGGT at a low input resolution and save a preview under <output_prefix>/preview.
+    
+    Tokens per frame grow with the square of the input width, so at 224 px the aggregator
+    sees about a fifth of the tokens of a 518 px run and global attention does under a
+    twentieth of the work. Only the camera and depth heads run; the depth maps are
+    fused into a sparse colored cloud and not stored themselves.
+    
+    Args:
+        s3_client: Configured S3 client
+        bucket_name: S3 bucket name
+        model: Loaded VGGT model
+        image_paths: Local image paths
+        output_prefix: Prefix of the run; the preview goes to <output_prefix>/preview
+        s3_image_paths: Source image of each frame, for the pose export
+        preview_size: Input width, a multiple of 14
+        preprocess_workers: Decoding processes (see vggt_preprocess)
+        
+    Returns:
+        Dict[str, str]: Preview results, manifest and poses mapped to their S3 paths
+    """
+    import time
+    from vggt_encoding import PREVIEW_DIR
+    from vggt_preprocess import PATCH_SIZE, preprocess_parallel
+    
+    if preview_size % PATCH_SIZE:
+        raise ValueError(f"preview_size must be a multiple of {PATCH_SIZE}, got {preview_size}")
+    start = time.perf_counter()
+    images = preprocess_parallel(image_paths, preprocess_workers, target_size=preview_size)
+    images_batch, aggregated_tokens_list, ps_idx = run_vggt_aggregator.fn(model, images=images)
+    extrinsic, intrinsic = predict_cameras.fn(model, aggregated_tokens_list, images_batch)
+    depth_map, depth_conf = predict_depth_maps.fn(model, aggregated_tokens_list, images_batch, ps_idx)
+    del aggregated_tokens_list
+    
+    results = results_to_cpu({"extrinsic": extrinsic, "intrinsic": intrinsic})
+    results.update(fuse_point_cloud.fn(extrinsic, intrinsic, depth_map, depth_conf, images_batch))
+    preview_prefix = f"{output_prefix}/{PREVIEW_DIR}"
+    output_paths = save_results_to_s3.fn(s3_client, bucket_name, results, preview_prefix)
+    output_paths["manifest"] = write_results_manifest.fn(s3_client, bucket_name, preview_prefix, output_paths)
+    output_paths["poses"] = export_camera_poses.fn(
+        s3_client, bucket_name, preview_prefix, extrinsic, intrinsic,
+        tuple(depth_map.shape[-3:-1]), s3_image_paths
+    )
+    
+    elapsed = time.perf_counter() - start
+    write_tier_status(s3_client, bucket_name, output_prefix, "preview", {
+        "status": "complete",
+        "manifest": output_paths["manifest"],
+        "frames": len(image_paths),
+        "resolution": list(depth_map.shape[-3:-1]),
+        "seconds": round(elapsed, 2),
+    })
+    logger.info(f"Preview of {len(image_paths)} frames at {tuple(depth_map.shape[-3:-1])} "
+                f"with {results['fused_points'].shape[0]:,} points ready in {elapsed:.1f}s")
     return output_paths
 
 
+# Head stages checkpointed by the flow; with all of them restored no inference is needed
+CHECKPOINT_HEAD_STAGES = ("cameras", "depth", "points")
+
+
+def open_checkpoints(
+    s3_client: "boto3.client",
+    bucket_name: str,
+    scratch_prefix: str,
+    ttl_hours: float,
+    params: Dict[str, Any]
+) -> "StageCheckpoints":
+    """
+    Open the checkpoints of the run identified by params, clearing expired runs first.
+    
+    Args:
+        s3_client: Configured S3 client
+        bucket_name: S3 bucket name
+        scratch_prefix: Prefix holding the checkpoints of all runs
+        ttl_hours: Hours before checkpoints of an unfinished run may be deleted
+        params: Flow parameters that determine the results
+        
+    Returns:
+        StageCheckpoints: Checkpoints of this run, possibly with stages from an earlier attempt
+    """
+    from vggt_checkpoint import StageCheckpoints, cleanup_expired_checkpoints, make_run_key
+    
+    try:
+        cleanup_expired_checkpoints(s3_client, bucket_name, scratch_prefix)
+    except Exception as e:
+        logger.warning(f"Could not clean up expired checkpoints: {e}")
+    return StageCheckpoints(s3_client, bucket_name, make_run_key(params), params, scratch_prefix, ttl_hours)
+
+
+def pack_aggregator(
+    model: "torch.nn.Module",
+    images_batch: "torch.Tensor",
+    aggregated_tokens_list: List["torch.Tensor"],
+    ps_idx: "torch.Tensor"
+) -> Dict[str, Any]:
+    """Aggregator outputs to checkpoint, keeping only the token layers the heads read."""
+    from vggt_checkpoint import pack_tokens
+    
+    return {"images_batch": images_batch, "tokens": pack_tokens(model, aggregated_tokens_list), "ps_idx": ps_idx}
+
+
+def restore_aggregator(model: "torch.nn.Module", packed: Dict[str, Any]) -> "Tuple[torch.Tensor, List[torch.Tensor], torch.Tensor]":
+    """Move a checkpointed aggregator output back onto the model's device."""
+    from vggt_checkpoint import unpack_tokens
+    
+    device = next(model.parameters()).device
+    tokens = [layer.to(device) if layer is not None else None for layer in unpack_tokens(packed["tokens"])]
+    ps_idx = packed["ps_idx"].to(device) if hasattr(packed["ps_idx"], "to") else packed["ps_idx"]
+    return packed["images_batch"].to(device), tokens, ps_idx
+
+
+def _profile_storage(arguments: Dict[str, Any]) -> Tuple["boto3.client", str]:
+    """S3 client and bucket of a flow run, for its profile."""
+    client = get_s3_client(
+        f"http://{arguments['minio_endpoint']}:{arguments['minio_port']}",
+        arguments['minio_access_key'],
+        arguments['minio_secret_key']
+    )
+    return client, arguments['bucket_name']
+
+
 @flow(name="VGGT Image Processing Pipeline", 
       description="Process images with VGGT model and save 3D information to S3",
       log_prints=True)
+@track_flow("vggt")
+@profiled_flow("vggt", storage=_profile_storage)
 def vggt_process_images_from_s3(
     bucket_name: str,
     s3_image_paths: List[str],
@@ -473,7 +1100,27 @@ def vggt_process_images_from_s3(
     minio_port: int = 9000,
     minio_access_key: str = "minioadmin",
     minio_secret_key: str = "minioadmin",
-    use_point_map: bool = False
+    use_point_map: bool = False,
+    pipelined: bool = False,
+    execution_profile: Optional[str] = None,
+    quantized: bool = False,
+    preprocess_workers: Optional[int] = None,
+    cache_preprocessed: bool = False,
+    storage_precision: str = "fp32",
+    result_layout: str = "tensor",
+    checkpoint: bool = False,
+    checkpoint_prefix: str = "vggt_scratch",
+    checkpoint_ttl_hours: float = 24.0,
+    fuse_views: bool = False,
+    fusion_voxel_size: Optional[float] = None,
+    fusion_conf_percentile: float = 50.0,
+    keyframes: bool = False,
+    max_frames: Optional[int] = None,
+    keyframe_hash_distance: int = 6,
+    keyframe_spacing_m: float = 2.0,
+    tier: str = "full",
+    preview_size: int = 224,
+    profile: Optional[bool] = None
 ) -> Dict[str, str]:
     """
     Prefect flow that processes images from S3 with VGGT and saves results back to S3.
@@ -487,13 +1134,57 @@ def vggt_process_images_from_s3(
         minio_access_key: MinIO access key (defaults to standard MinIO default)
         minio_secret_key: MinIO secret key (defaults to standard MinIO default)
         use_point_map: Whether to use point map instead of depth map for 3D points
+        pipelined: Overlap download and preprocessing with model loading, and upload each
+            result in the background as soon as the head producing it has finished
+        execution_profile: Execution profile for inference, e.g. "cpu-bf16" on CPU workers
+            (see vggt_runtime.PROFILES)
+        quantized: Run the dynamic int8 quantized model on the CPU
+        preprocess_workers: Processes decoding images into the input batch. 0 uses VGGT's
+            serial loader. If None, uses VGGT_PREPROCESS_WORKERS or one per CPU up to 8.
+        cache_preprocessed: Reuse preprocessed images from the local tensor cache (see
+            vggt_cache), so repeat runs on the same images skip download and decode
+        storage_precision: How depth, point and confidence maps are stored: "fp32", "fp16"
+            or "quantized" (see vggt_encoding). The encoding is recorded in manifest.json.
+        result_layout: "tensor" for one .pt per result, "frames" for one object per frame
+            under frames/{i}/ so viewers can fetch single frames, or "both"
+        checkpoint: Checkpoint the aggregator and each head to S3 so that a retry with the
+            same parameters resumes after the last completed stage (see vggt_checkpoint)
+        checkpoint_prefix: Scratch prefix for checkpoints
+        checkpoint_ttl_hours: Hours after which checkpoints of runs that never finished are
+            deleted
+        fuse_views: Also save a single cloud fused from all views (fused_points, fused_conf,
+            fused_colors), with low-confidence pixels dropped and overlapping points merged
+        fusion_voxel_size: Merge distance in world units for fuse_views. If None, the median
+            footprint of one pixel.
+        fusion_conf_percentile: Percentile of depth_conf below which fuse_views drops pixels
+        keyframes: Drop near-duplicate frames before downloading them, using EXIF GPS, capture
+            times and perceptual hashes (see keyframes)
+        max_frames: Frame budget for keyframes; further frames are dropped for the best
+            spatial coverage. If None, only near-duplicates are dropped.
+        keyframe_hash_distance: dHash bits two frames must differ by to both be kept
+        keyframe_spacing_m: GPS distance under which similar-looking frames are duplicates
+        tier: "full" for full-resolution results, "preview" for a quick low-resolution pass
+            (cameras and a sparse cloud under <output_prefix>/preview), or "both" to write the
+            preview first and then the full results. Progress is recorded in tiers.json.
+        preview_size: Input width of the preview pass, a multiple of 14
+        profile: Sample the run's stacks and publish them as folded stacks in S3 and a
+            Prefect artifact (see profiling). If None, follows SKYSTORE_PROFILE; False
+            turns it off even when SKYSTORE_PROFILE is set
         
     Returns:
-        Dict[str, str]: Dictionary mapping result types to their S3 paths
+        Dict[str, str]: Dictionary mapping result types (and the manifest) to their S3 paths
     """
+    from vggt_encoding import RESULT_LAYOUTS, STORAGE_PRECISIONS, TIERS
+    
     # Check if VGGT is available
     if not check_vggt_install():
         raise ImportError("VGGT package is not available. Cannot proceed with processing.")
+    if storage_precision not in STORAGE_PRECISIONS:
+        raise ValueError(f"Unknown storage precision '{storage_precision}'. Available: {', '.join(STORAGE_PRECISIONS)}")
+    if result_layout not in RESULT_LAYOUTS:
+        raise ValueError(f"Unknown result layout '{result_layout}'. Available: {', '.join(RESULT_LAYOUTS)}")
+    if tier not in TIERS:
+        raise ValueError(f"Unknown tier '{tier}'. Available: {', '.join(TIERS)}")
     
     print(f"Starting VGGT processing flow for {len(s3_image_paths)} images")
     print(f"Connection to MinIO at {minio_endpoint}:{minio_port}")
@@ -506,56 +1197,204 @@ def vggt_process_images_from_s3(
         secret_key=minio_secret_key
     )
     
+    if keyframes:
+        print("Stage 1b: Selecting keyframes")
+        s3_image_paths = select_keyframes_from_s3(
+            s3_client=s3_client,
+            bucket_name=bucket_name,
+            s3_image_paths=s3_image_paths,
+            max_frames=max_frames,
+            min_hash_distance=keyframe_hash_distance,
+            min_spacing_m=keyframe_spacing_m
+        )
+    
+    checkpoints = None
+    if checkpoint:
+        checkpoints = open_checkpoints(
+            s3_client, bucket_name, checkpoint_prefix, checkpoint_ttl_hours,
+            params={
+                "bucket_name": bucket_name,
+                "s3_image_paths": s3_image_paths,
+                "output_prefix": output_prefix,
+                "execution_profile": execution_profile,
+                "quantized": quantized,
+            }
+        )
+    
+    def run_stage(stage: str, compute):
+        """Restore a stage from its checkpoint, or compute and checkpoint it."""
+        if checkpoints is not None and checkpoints.has(stage):
+            print(f"Restoring {stage} from checkpoint")
+            return checkpoints.load(stage)
+        value = compute()
+        if checkpoints is not None:
+            checkpoints.save(stage, value)
+        return value
+    
+    # Stages that can be skipped entirely when resuming
+    heads_restored = checkpoints is not None and all(checkpoints.has(stage) for stage in CHECKPOINT_HEAD_STAGES)
+    tokens_restored = heads_restored or (checkpoints is not None and checkpoints.has("aggregator"))
+    
     # Create a temporary directory for the images
     temp_dir = tempfile.mkdtemp()
     print(f"Created temporary directory at {temp_dir}")
     
+    # Background uploads started in pipelined mode
+    upload_futures = []
+    
     try:
-        # STAGE 2: Download images from S3
-        print("Stage 2: Downloading images from S3")
-        local_image_paths = download_images_from_s3(
-            s3_client=s3_client,
-            bucket_name=bucket_name,
-            s3_paths=s3_image_paths,
-            local_dir=temp_dir
-        )
+        model = None
+        if tier in ("preview", "both"):
+            print("Preview: Low-resolution pass for cameras and a sparse point cloud")
+            local_image_paths = download_images_from_s3(
+                s3_client=s3_client,
+                bucket_name=bucket_name,
+                s3_paths=s3_image_paths,
+                local_dir=temp_dir
+            )
+            model = load_vggt_model(execution_profile=execution_profile, quantized=quantized)
+            preview_paths = run_preview_tier(
+                s3_client=s3_client,
+                bucket_name=bucket_name,
+                model=model,
+                image_paths=local_image_paths,
+                output_prefix=output_prefix,
+                s3_image_paths=s3_image_paths,
+                preview_size=preview_size,
+                preprocess_workers=preprocess_workers
+            )
+            if tier == "preview":
+                print("VGGT preview completed successfully")
+                return preview_paths
+            write_tier_status(s3_client, bucket_name, output_prefix, "full", {"status": "running"})
         
-        # STAGE 3: Load VGGT model
-        print("Stage 3: Loading VGGT model")
-        model = load_vggt_model()
+        if heads_restored:
+            print("Stages 2-4: Skipped, all predictions restored from checkpoints")
+        elif tokens_restored:
+            print("Stages 2-3: Aggregator restored from checkpoint, loading VGGT model")
+            if model is None:
+                model = load_vggt_model(execution_profile=execution_profile, quantized=quantized)
+        elif model is not None:
+            print("Stages 2-3: Images downloaded and VGGT model loaded by the preview pass")
+            images = None
+        elif pipelined:
+            # STAGES 2-3: Download and preprocess while the model loads
+            print("Stages 2-3: Downloading images and loading VGGT model concurrently")
+            if cache_preprocessed:
+                images_future = load_images_cached.submit(
+                    s3_client=s3_client,
+                    bucket_name=bucket_name,
+                    s3_paths=s3_image_paths,
+                    local_dir=temp_dir,
+                    num_workers=preprocess_workers
+                )
+            else:
+                download_future = download_images_from_s3.submit(
+                    s3_client=s3_client,
+                    bucket_name=bucket_name,
+                    s3_paths=s3_image_paths,
+                    local_dir=temp_dir
+                )
+                images_future = preprocess_images.submit(image_paths=download_future, num_workers=preprocess_workers)
+            model_future = load_vggt_model.submit(execution_profile=execution_profile, quantized=quantized)
+            images = images_future.result()
+            model = model_future.result()
+            local_image_paths = None
+        else:
+            if cache_preprocessed:
+                # STAGE 2: Load cached images, downloading and preprocessing only misses
+                print("Stage 2: Loading images through the tensor cache")
+                images = load_images_cached(
+                    s3_client=s3_client,
+                    bucket_name=bucket_name,
+                    s3_paths=s3_image_paths,
+                    local_dir=temp_dir,
+                    num_workers=preprocess_workers
+                )
+                local_image_paths = None
+            else:
+                # STAGE 2: Download images from S3
+                print("Stage 2: Downloading images from S3")
+                local_image_paths = download_images_from_s3(
+                    s3_client=s3_client,
+                    bucket_name=bucket_name,
+                    s3_paths=s3_image_paths,
+                    local_dir=temp_dir
+                )
+                images = None
+            
+            # STAGE 3: Load VGGT model
+            print("Stage 3: Loading VGGT model")
+            model = load_vggt_model(execution_profile=execution_profile, quantized=quantized)
         
         # STAGE 4: Process images with VGGT
-        print("Stage 4: Processing images with VGGT")
-        images_batch, aggregated_tokens_list, ps_idx = run_vggt_aggregator(
-            model=model,
-            image_paths=local_image_paths
-        )
+        if heads_restored:
+            images_batch = aggregated_tokens_list = ps_idx = None
+        elif tokens_restored:
+            images_batch, aggregated_tokens_list, ps_idx = restore_aggregator(model, checkpoints.load("aggregator"))
+        else:
+            print("Stage 4: Processing images with VGGT")
+            images_batch, aggregated_tokens_list, ps_idx = run_vggt_aggregator(
+                model=model,
+                image_paths=local_image_paths,
+                images=images,
+                preprocess_workers=preprocess_workers
+            )
+            if checkpoints is not None:
+                checkpoints.save("aggregator", pack_aggregator(model, images_batch, aggregated_tokens_list, ps_idx))
         
         # STAGE 5: Predict cameras
         print("Stage 5: Predicting cameras")
-        extrinsic, intrinsic = predict_cameras(
+        extrinsic, intrinsic = run_stage("cameras", lambda: predict_cameras(
             model=model,
             aggregated_tokens_list=aggregated_tokens_list,
             images_batch=images_batch
-        )
+        ))
+        if pipelined:
+            upload_futures.append(save_results_to_s3.submit(
+                s3_client=s3_client,
+                bucket_name=bucket_name,
+                results=results_to_cpu({"extrinsic": extrinsic, "intrinsic": intrinsic}),
+                output_prefix=output_prefix,
+                storage_precision=storage_precision,
+                layout=result_layout
+            ))
         
         # STAGE 6: Predict depth maps
         print("Stage 6: Predicting depth maps")
-        depth_map, depth_conf = predict_depth_maps(
+        depth_map, depth_conf = run_stage("depth", lambda: predict_depth_maps(
             model=model,
             aggregated_tokens_list=aggregated_tokens_list,
             images_batch=images_batch,
             ps_idx=ps_idx
-        )
+        ))
+        if pipelined:
+            upload_futures.append(save_results_to_s3.submit(
+                s3_client=s3_client,
+                bucket_name=bucket_name,
+                results=results_to_cpu({"depth_map": depth_map, "depth_conf": depth_conf}),
+                output_prefix=output_prefix,
+                storage_precision=storage_precision,
+                layout=result_layout
+            ))
         
         # STAGE 7: Predict point maps
         print("Stage 7: Predicting point maps")
-        point_map, point_conf = predict_point_maps(
+        point_map, point_conf = run_stage("points", lambda: predict_point_maps(
             model=model,
             aggregated_tokens_list=aggregated_tokens_list,
             images_batch=images_batch,
             ps_idx=ps_idx
-        )
+        ))
+        if pipelined:
+            upload_futures.append(save_results_to_s3.submit(
+                s3_client=s3_client,
+                bucket_name=bucket_name,
+                results=results_to_cpu({"point_map": point_map, "point_conf": point_conf}),
+                output_prefix=output_prefix,
+                storage_precision=storage_precision,
+                layout=result_layout
+            ))
         
         # STAGE 8: Construct 3D point cloud
         print("Stage 8: Constructing 3D point cloud")
@@ -569,32 +1408,110 @@ def vggt_process_images_from_s3(
             use_point_map=use_point_map
         )
         
-        # STAGE 9: Prepare results
-        print("Stage 9: Preparing results")
-        results = prepare_results(
-            extrinsic=extrinsic,
-            intrinsic=intrinsic,
-            depth_map=depth_map,
-            depth_conf=depth_conf,
-            point_map=point_map,
-            point_conf=point_conf,
-            final_point_map=final_point_map,
-            final_point_conf=final_point_conf
+        fused_results = {}
+        if fuse_views:
+            print("Stage 8b: Fusing views into one point cloud")
+            fused_results = fuse_point_cloud(
+                extrinsic=extrinsic,
+                intrinsic=intrinsic,
+                depth_map=depth_map,
+                depth_conf=depth_conf,
+                images_batch=images_batch,
+                conf_percentile=fusion_conf_percentile,
+                voxel_size=fusion_voxel_size
+            )
+        
+        if pipelined:
+            # STAGES 9-10: Upload the point cloud and collect the background uploads
+            print("Stages 9-10: Waiting for background uploads to finish")
+            if use_point_map:
+                # The final maps are the point maps already being uploaded, reference them
+                final_results = dict(fused_results)
+                aliases = {"final_point_map": "point_map", "final_point_conf": "point_conf"}
+            else:
+                final_results = results_to_cpu({
+                    "final_point_map": final_point_map,
+                    "final_point_conf": final_point_conf,
+                }, squeeze=False)
+                final_results.update(fused_results)
+                aliases = None
+            upload_futures.append(save_results_to_s3.submit(
+                s3_client=s3_client,
+                bucket_name=bucket_name,
+                results=final_results,
+                output_prefix=output_prefix,
+                storage_precision=storage_precision,
+                aliases=aliases,
+                layout=result_layout
+            ))
+            output_paths = {}
+            for future in upload_futures:
+                output_paths.update(future.result())
+        else:
+            # STAGE 9: Prepare results
+            print("Stage 9: Preparing results")
+            results = prepare_results(
+                extrinsic=extrinsic,
+                intrinsic=intrinsic,
+                depth_map=depth_map,
+                depth_conf=depth_conf,
+                point_map=point_map,
+                point_conf=point_conf,
+                final_point_map=final_point_map,
+                final_point_conf=final_point_conf
+            )
+            results.update(fused_results)
+            
+            # STAGE 10: Save results back to S3
+            print("Stage 10: Saving results to S3")
+            output_paths = save_results_to_s3(
+                s3_client=s3_client,
+                bucket_name=bucket_name,
+                results=results,
+                output_prefix=output_prefix,
+                storage_precision=storage_precision,
+                layout=result_layout
+            )
+        
+        output_paths["manifest"] = write_results_manifest(
+            s3_client=s3_client,
+            bucket_name=bucket_name,
+            output_prefix=output_prefix,
+            output_paths=output_paths,
+            storage_precision=storage_precision
         )
         
-        # STAGE 10: Save results back to S3
-        print("Stage 10: Saving results to S3")
-        output_paths = save_results_to_s3(
+        output_paths["poses"] = export_camera_poses(
             s3_client=s3_client,
             bucket_name=bucket_name,
-            results=results,
-            output_prefix=output_prefix
+            output_prefix=output_prefix,
+            extrinsic=extrinsic,
+            intrinsic=intrinsic,
+            image_size=tuple(depth_map.shape[-3:-1]),
+            s3_image_paths=s3_image_paths
         )
         
+        write_tier_status(s3_client, bucket_name, output_prefix, "full", {
+            "status": "complete",
+            "manifest": output_paths["manifest"],
+            "frames": len(s3_image_paths),
+            "resolution": list(depth_map.shape[-3:-1]),
+        })
+        
+        if checkpoints is not None:
+            # The results are saved, a retry has nothing left to resume
+            checkpoints.discard()
+        
         print("VGGT processing completed successfully")
         return output_paths
     
     finally:
+        # Don't leave background uploads running once the flow returns
+        for future in upload_futures:
+            future.wait()
+        if checkpoints is not None:
+            # Finish checkpoint writes so a retry can resume from them
+            checkpoints.flush()
         # Clean up temporary directory
         print(f"Cleaning up temporary directory {temp_dir}")
         shutil.rmtree(temp_dir, ignore_errors=True)
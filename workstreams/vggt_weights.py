@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Local, memory-mapped store for the VGGT-1B weights.
+
+The Hugging Face checkpoint is a pickled ``model.pt``. Loading it through
+``torch.hub.load_state_dict_from_url`` unpickles the whole state dict into RAM and then
+copies it into a freshly initialized model, so a cold start holds the weights twice and
+needs network access. This store converts the checkpoint once to safetensors and loads it
+with mmap into a model whose parameters were created on the meta device, assigning the
+mapped tensors directly instead of copying them.
+
+Configuration:
+    VGGT_WEIGHTS_PATH: Explicit weights file (.safetensors, or .pt for a checkpoint that
+        still needs converting). Use this to point workers at a baked-in or mounted copy.
+    VGGT_CACHE_DIR: Directory for converted weights (default: ~/.cache/skystore/vggt)
+    VGGT_OFFLINE: Set to 1 to never download; a missing local copy is then an error.
+"""
+import os
+import sys
+import time
+import contextlib
+import logging
+import threading
+from typing import Callable, Optional
+
+import torch
+
+# Configure logging
+logger = logging.getLogger("vggt_weights")
+logger.setLevel(logging.INFO)
+
+VGGT_WEIGHTS_URL = "https://huggingface.co/facebook/VGGT-1B/resolve/main/model.pt"
+WEIGHTS_FILE = "vggt_1b.safetensors"
+
+try:
+    from safetensors.torch import load_file as load_safetensors, save_file as save_safetensors
+    SAFETENSORS_AVAILABLE = True
+except ImportError:
+    SAFETENSORS_AVAILABLE = False
+
+
+def get_cache_dir() -> str:
+    """Local directory for converted weights, overridable with VGGT_CACHE_DIR."""
+    return os.environ.get("VGGT_CACHE_DIR", os.path.expanduser("~/.cache/skystore/vggt"))
+
+
+def is_offline() -> bool:
+    """Whether downloads are disabled (VGGT_OFFLINE or HF_HUB_OFFLINE)."""
+    return any(os.environ.get(var, "").lower() in ("1", "true", "yes") for var in ("VGGT_OFFLINE", "HF_HUB_OFFLINE"))
+
+
+def convert_checkpoint(source_path: str, output_path: str) -> str:
+    """
+    Convert a pickled VGGT checkpoint to safetensors.
+
+    The checkpoint is opened with ``mmap=True`` so conversion does not need the whole state
+    dict in RAM either. The result is written to a temp file and renamed, so workers never
+    see a partial file.
+
+    Args:
+        source_path: Path to the .pt checkpoint
+        output_path: Destination .safetensors path
+
+    Returns:
+        str: output_path
+    """
+    if not SAFETENSORS_AVAILABLE:
+        raise ImportError("safetensors is required to convert VGGT weights. Install it with `pip install safetensors`.")
+
+    logger.info(f"Converting {source_path} to {output_path}")
+    start = time.perf_counter()
+    state_dict = torch.load(source_path, map_location="cpu", mmap=True, weights_only=True)
+
+    # safetensors refuses tensors that share storage, give duplicates their own copy
+    seen = set()
+    tensors = {}
+    for key, tensor in state_dict.items():
+        tensor = tensor.contiguous()
+        pointer = tensor.untyped_storage().data_ptr()
+        tensors[key] = tensor.clone() if pointer in seen else tensor
+        seen.add(pointer)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    save_safetensors(tensors, tmp_path)
+    os.replace(tmp_path, output_path)
+    logger.info(f"Converted {len(tensors)} tensors in {time.perf_counter() - start:.1f}s "
+                f"({os.path.getsize(output_path) / 1e9:.2f} GB)")
+    return output_path
+
+
+def ensure_local_weights(offline: Optional[bool] = None) -> str:
+    """
+    Return the path of a local VGGT weights file, downloading and converting it if needed.
+
+    Args:
+        offline: Never download. If None, uses VGGT_OFFLINE / HF_HUB_OFFLINE.
+
+    Returns:
+        str: Path to a .safetensors file, or to a .pt file when safetensors is not installed
+    """
+    offline = is_offline() if offline is None else offline
+    explicit = os.environ.get("VGGT_WEIGHTS_PATH")
+
+    if explicit:
+        if not os.path.exists(explicit):
+            raise FileNotFoundError(f"VGGT_WEIGHTS_PATH points to a missing file: {explicit}")
+        if explicit.endswith(".safetensors") or not SAFETENSORS_AVAILABLE:
+            return explicit
+        # A raw checkpoint: convert it next to the other cached weights
+        converted = os.path.join(get_cache_dir(), WEIGHTS_FILE)
+        return converted if os.path.exists(converted) else convert_checkpoint(explicit, converted)
+
+    cache_dir = get_cache_dir()
+    converted = os.path.join(cache_dir, WEIGHTS_FILE)
+    checkpoint = os.path.join(cache_dir, "model.pt")
+    if SAFETENSORS_AVAILABLE and os.path.exists(converted):
+        return converted
+    if os.path.exists(checkpoint):
+        return convert_checkpoint(checkpoint, converted) if SAFETENSORS_AVAILABLE else checkpoint
+
+    if offline:
+        raise FileNotFoundError(
+            f"VGGT weights not found in {cache_dir} and downloads are disabled. "
+            f"Set VGGT_WEIGHTS_PATH or run `python vggt_weights.py` with network access first."
+        )
+
+    logger.info(f"Downloading VGGT weights from {VGGT_WEIGHTS_URL}")
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{checkpoint}.{os.getpid()}.tmp"
+    torch.hub.download_url_to_file(VGGT_WEIGHTS_URL, tmp_path)
+    os.replace(tmp_path, checkpoint)
+    if not SAFETENSORS_AVAILABLE:
+        return checkpoint
+
+    convert_checkpoint(checkpoint, converted)
+    # The pickled copy is no longer needed once converted
+    os.remove(checkpoint)
+    return converted
+
+
+# torch.nn.Module.register_parameter is patched while any thread builds a model on meta.
+# Loads overlap when vggt_batch runs several inference threads, so the patch is installed
+# by the first and removed by the last of them, and only applies to threads inside
+# _parameters_on_meta.
+_meta_lock = threading.Lock()
+_meta_users = 0
+_meta_thread = threading.local()
+_original_register_parameter = None
+
+
+def _register_parameter(module, name, param):
+    if param is not None and getattr(_meta_thread, "depth", 0):
+        param = torch.nn.Parameter(param.to("meta"), requires_grad=param.requires_grad)
+    _original_register_parameter(module, name, param)
+
+
+@contextlib.contextmanager
+def _parameters_on_meta():
+    """
+    Create module parameters of the calling thread on the meta device.
+
+    Parameters get no storage and their initializers run on meta, so building the 1B model
+    costs almost nothing. Buffers stay real, which keeps non-persistent buffers (not part of
+    the checkpoint) at their constructed values.
+    """
+    global _meta_users, _original_register_parameter
+    with _meta_lock:
+        if _meta_users == 0:
+            _original_register_parameter = torch.nn.Module.register_parameter
+            torch.nn.Module.register_parameter = _register_parameter
+        _meta_users += 1
+    _meta_thread.depth = getattr(_meta_thread, "depth", 0) + 1
+    try:
+        yield
+    finally:
+        _meta_thread.depth -= 1
+        with _meta_lock:
+            _meta_users -= 1
+            if _meta_users == 0:
+                torch.nn.Module.register_parameter = _original_register_parameter
+
+
+def load_model_from_store(
+    build_model: Callable[[], torch.nn.Module],
+    device: str = "cpu",
+    offline: Optional[bool] = None
+) -> torch.nn.Module:
+    """
+    Build a VGGT model with its weights memory-mapped from the local store.
+
+    On the CPU the parameters stay backed by the mapped file, so pages are only read as they
+    are touched and are shared between worker processes through the page cache.
+
+    Args:
+        build_model: Returns a VGGT module, e.g. the VGGT class
+        device: Device to move the model to
+        offline: Never download (see ensure_local_weights)
+
+    Returns:
+        torch.nn.Module: Model in eval mode on the requested device
+    """
+    path = ensure_local_weights(offline)
+    start = time.perf_counter()
+
+    with _parameters_on_meta():
+        model = build_model()
+
+    if path.endswith(".safetensors"):
+        state_dict = load_safetensors(path, device="cpu")
+    else:
+        state_dict = torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+
+    # assign=True keeps the mapped tensors instead of copying into preallocated parameters
+    model.load_state_dict(state_dict, assign=True)
+    missing = [name for name, param in model.named_parameters() if param.is_meta]
+    if missing:
+        raise RuntimeError(f"VGGT weights at {path} are missing {len(missing)} parameters, e.g. {missing[:3]}")
+
+    model = model.to(device)
+    model.eval()
+    logger.info(f"Loaded VGGT weights from {path} in {time.perf_counter() - start:.2f}s")
+    return model
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='Download and convert VGGT weights into the local store')
+    parser.add_argument('--source', help='Existing model.pt to convert instead of downloading')
+    parser.add_argument('--output', help='Destination .safetensors path (default: cache dir)')
+    args = parser.parse_args()
+
+    try:
+        if args.source:
+            path = convert_checkpoint(args.source, args.output or os.path.join(get_cache_dir(), WEIGHTS_FILE))
+        else:
+            path = ensure_local_weights(offline=False)
+    except Exception as e:
+        logger.error(f"Failed to prepare VGGT weights: {e}")
+        sys.exit(1)
+    print(path)